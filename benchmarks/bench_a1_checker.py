@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+check_a1_availability_with_pushover.sh の1回あたりの実行コスト計測
+
+一時ツリーに check_a1/ と最小限の config.json を置き、通常のチェック（インスタンス作成は
+容量不足で失敗）と朝のレポートを実行して、壁時計時間・子プロセスの CPU 時間・
+python3 の起動回数を計測する。
+- python3 は PATH 上のラッパー経由で起動回数を数える
+- OCI CLI（python3 -m oci）は即座に応答する偽物に置き換える（OCI CLI 自体の起動時間は含まない）
+- 通知キュー（common.notifier）は何もしない偽物に置き換える（Pushover には送らない）
+
+--baseline-ref を指定すると、その git リビジョンのスクリプトも同じ条件で計測して比較する。
+
+    python3 benchmarks/bench_a1_checker.py --repeat 5 --baseline-ref HEAD~1
+"""
+
+import argparse
+import json
+import os
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPT = "check_a1/check_a1_availability_with_pushover.sh"
+MODES = {"check": [], "morning-report": ["--morning-report"]}
+
+PYTHON_SHIM = """#!/bin/sh
+echo "python3" >> "$A1_BENCH_PYTHON_LOG"
+exec {python} "$@"
+"""
+
+FAKE_OCI = """
+import json, sys
+args = sys.argv[1:]
+if args[:3] == ["compute", "image", "get"]:
+    print(json.dumps({"data": {"display-name": "Oracle-Linux-9", "size-in-mbs": 47694, "lifecycle-state": "AVAILABLE"}}))
+elif args[:3] == ["compute", "instance", "launch"]:
+    print('ServiceError: {"code": "InternalError", "message": "Out of host capacity.", "status": 500}')
+    sys.exit(1)
+"""
+
+FAKE_NOTIFIER = """
+import sys
+sys.exit(0)
+"""
+
+
+def build_tree(directory, scripts):
+    """scripts: {ラベル: スクリプトの内容}。ラベルごとのスクリプトのパスを返す"""
+    check_dir = os.path.join(directory, "check_a1")
+    os.makedirs(check_dir)
+    for name in ("a1_config.py", "a1_probe.py"):
+        shutil.copy(os.path.join(REPO_DIR, "check_a1", name), check_dir)
+    common_dir = os.path.join(directory, "common")
+    os.makedirs(common_dir)
+    for name in ("__init__.py", "log_index.py", "state_store.py"):
+        shutil.copy(os.path.join(REPO_DIR, "common", name), common_dir)
+    with open(os.path.join(common_dir, "notifier.py"), "w") as f:
+        f.write(FAKE_NOTIFIER)
+
+    fake_dir = os.path.join(directory, "fake", "oci")
+    os.makedirs(fake_dir)
+    open(os.path.join(fake_dir, "__init__.py"), "w").close()
+    with open(os.path.join(fake_dir, "__main__.py"), "w") as f:
+        f.write(FAKE_OCI)
+
+    bin_dir = os.path.join(directory, "bin")
+    os.makedirs(bin_dir)
+    shim = os.path.join(bin_dir, "python3")
+    with open(shim, "w") as f:
+        f.write(PYTHON_SHIM.format(python=sys.executable))
+    os.chmod(shim, 0o755)
+
+    config = {
+        "oci": {
+            "key_file": os.path.join(directory, "oci_api_key.pem"),
+            "passphrase": "",
+            "compartment_id": "ocid1.compartment.oc1..bench",
+            "availability_domain": "AD-1",
+            "image_id": "ocid1.image.oc1..bench",
+            "subnet_id": "ocid1.subnet.oc1..bench",
+            "ssh_key": "ssh-ed25519 AAAA bench",
+        },
+        "a1_instance": {
+            "shape": "VM.Standard.A1.Flex",
+            "shape_config": {"ocpus": 4, "memory_in_gbs": 24},
+            "check_interval_minutes": 15,
+        },
+        "logging": {
+            "a1_check_log": os.path.join(directory, "a1_check.log"),
+            "last_check_file": os.path.join(directory, "a1_last_check"),
+        },
+    }
+    with open(os.path.join(directory, "config.json"), "w") as f:
+        json.dump(config, f)
+
+    paths = {}
+    for label, content in scripts.items():
+        path = os.path.join(check_dir, f"{label}.sh")
+        with open(path, "w") as f:
+            f.write(content)
+        os.chmod(path, 0o755)
+        paths[label] = path
+    return paths
+
+
+def measure(directory, script, args):
+    """1回実行して (壁時計秒, 子プロセスの CPU 秒, python3 の起動回数)"""
+    log = os.path.join(directory, "python3.log")
+    # 前回のチェック時刻・容量不足の backoff を消して毎回同じ条件で実行する
+    for path in (log, os.path.join(directory, "a1_last_check"), os.path.join(directory, "monitor_state.db")):
+        if os.path.exists(path):
+            os.remove(path)
+    env = dict(
+        os.environ,
+        PATH=os.path.join(directory, "bin") + os.pathsep + os.environ.get("PATH", ""),
+        PYTHONPATH=os.path.join(directory, "fake"),
+        A1_BENCH_PYTHON_LOG=log,
+    )
+    before = resource.getrusage(resource.RUSAGE_CHILDREN)
+    started = time.perf_counter()
+    subprocess.run(["bash", script, *args], cwd=os.path.dirname(script), env=env, capture_output=True, check=True)
+    elapsed = time.perf_counter() - started
+    after = resource.getrusage(resource.RUSAGE_CHILDREN)
+    cpu = (after.ru_utime - before.ru_utime) + (after.ru_stime - before.ru_stime)
+    with open(log) as f:
+        launches = sum(1 for _ in f)
+    return elapsed, cpu, launches
+
+
+def git_script(ref):
+    return subprocess.run(
+        ["git", "show", f"{ref}:{SCRIPT}"], cwd=REPO_DIR, capture_output=True, text=True, check=True
+    ).stdout
+
+
+def run(repeat=5, baseline_ref=None):
+    with open(os.path.join(REPO_DIR, SCRIPT)) as f:
+        scripts = {"current": f.read()}
+    if baseline_ref:
+        scripts = {"baseline": git_script(baseline_ref), **scripts}
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        paths = build_tree(directory, scripts)
+        for label, path in paths.items():
+            for mode, args in MODES.items():
+                samples = [measure(directory, path, args) for _ in range(repeat)]
+                results.append(
+                    {
+                        "script": label,
+                        "mode": mode,
+                        "wall_seconds": statistics.median(s[0] for s in samples),
+                        "cpu_seconds": statistics.median(s[1] for s in samples),
+                        "python_processes": samples[-1][2],
+                    }
+                )
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="A1 チェッカーの1回あたりの実行コスト計測")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--baseline-ref", help="比較する git リビジョン（例: HEAD~1）")
+    parser.add_argument("--json", action="store_true", help="結果を JSON で出力")
+    args = parser.parse_args()
+
+    results = run(args.repeat, args.baseline_ref)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'script':>10}{'mode':>16}{'wall(ms)':>10}{'cpu(ms)':>10}{'python3':>9}")
+    for r in results:
+        print(
+            f"{r['script']:>10}{r['mode']:>16}{r['wall_seconds'] * 1000:>10.1f}"
+            f"{r['cpu_seconds'] * 1000:>10.1f}{r['python_processes']:>9}"
+        )
+
+
+if __name__ == "__main__":
+    main()
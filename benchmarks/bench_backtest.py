@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+アラートバックテストのグリッド実行時間
+
+1年分の分足（525,600 サンプル）の合成価格に対し、閾値 × cooldown の
+グリッドを backtest_volatility で評価する。
+
+    python3 benchmarks/bench_backtest.py --thresholds 50 --cooldowns 40
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.backtest import backtest_transitions, backtest_volatility
+
+MINUTES_PER_YEAR = 525_600
+
+
+def synthetic_history(samples, seed=0):
+    rng = np.random.default_rng(seed)
+    times = 1_700_000_000 + 60.0 * np.arange(samples)
+    prices = 90000 * np.exp(np.cumsum(rng.standard_t(3, samples) * 0.0008))
+    return times, prices
+
+
+def main():
+    parser = argparse.ArgumentParser(description="アラートバックテストのグリッド実行時間")
+    parser.add_argument("--samples", type=int, default=MINUTES_PER_YEAR)
+    parser.add_argument("--thresholds", type=int, default=50, help="閾値の数（0.1%〜5%）")
+    parser.add_argument("--cooldowns", type=int, default=40, help="cooldown の数（0〜24時間）")
+    parser.add_argument("--levels", type=int, default=100, help="state transition 閾値の数")
+    parser.add_argument("--json", action="store_true", help="結果を JSON で出力")
+    args = parser.parse_args()
+
+    times, prices = synthetic_history(args.samples)
+    thresholds = np.linspace(0.001, 0.05, args.thresholds)
+    cooldowns = np.linspace(0, 86400, args.cooldowns)
+    levels = np.linspace(prices.min(), prices.max(), args.levels)
+
+    started = time.perf_counter()
+    volatility = backtest_volatility(times, prices, thresholds, cooldowns)
+    volatility_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    backtest_transitions(times, prices, levels)
+    transition_seconds = time.perf_counter() - started
+
+    results = {
+        "samples": args.samples,
+        "volatility_combinations": len(thresholds) * len(cooldowns),
+        "volatility_seconds": volatility_seconds,
+        "transition_levels": len(levels),
+        "transition_seconds": transition_seconds,
+        "max_notifications": int(volatility["notifications"].max()),
+    }
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(
+            f"ボラ型: {results['volatility_combinations']}通り × {args.samples}サンプル "
+            f"{volatility_seconds:.2f}s"
+        )
+        print(f"state transition: {len(levels)}通り {transition_seconds:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+ローソク足描画ベンチマーク
+
+従来の1本ごとに Rectangle + Line2D を追加する実装と、
+candlestick_renderer の Collection 一括描画を 1k / 10k / 50k 本で比較する。
+
+    python3 benchmarks/bench_candlestick.py --sizes 1000 10000 50000 --dpi 100
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import matplotlib
+
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+import numpy as np
+from matplotlib.patches import Rectangle
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "bitcoin"))
+from candlestick_renderer import draw_candlesticks, draw_volume_bars
+
+
+def synthetic_ohlcv(n, seed=0):
+    """ランダムウォークから OHLCV を生成"""
+    rng = np.random.default_rng(seed)
+    close = 90000 * np.exp(np.cumsum(rng.normal(0, 0.004, n)))
+    open_ = np.concatenate([[close[0]], close[:-1]])
+    spread = np.abs(rng.normal(0, 0.003, n)) * close
+    high = np.maximum(open_, close) + spread
+    low = np.minimum(open_, close) - spread
+    volume = rng.uniform(1e9, 5e9, n)
+    return open_, high, low, close, volume
+
+
+def draw_legacy(ax1, ax2, open_, high, low, close, volume):
+    """変更前の create_candlestick_chart と同じ描画（1本ごとにアーティストを追加）"""
+    for idx in range(len(close)):
+        color = "#00ff00" if close[idx] >= open_[idx] else "#ff0000"
+        height = abs(close[idx] - open_[idx])
+        bottom = min(open_[idx], close[idx])
+        ax1.add_patch(Rectangle((idx - 0.3, bottom), 0.6, height, facecolor=color, alpha=0.8))
+        ax1.plot([idx, idx], [low[idx], high[idx]], color="black", linewidth=1)
+    ax2.bar(range(len(close)), volume, alpha=0.6, color="gray")
+
+
+def draw_vectorized(ax1, ax2, open_, high, low, close, volume):
+    positions = np.arange(len(close))
+    draw_candlesticks(ax1, positions, open_, high, low, close)
+    draw_volume_bars(ax2, positions, volume)
+
+
+def render(draw, data, path, dpi, figsize=(12, 8)):
+    fig, (ax1, ax2) = plt.subplots(2, 1, figsize=figsize, gridspec_kw={"height_ratios": [3, 1]})
+    draw(ax1, ax2, *data)
+    fig.savefig(path, dpi=dpi)
+    plt.close(fig)
+
+
+def run(sizes, dpi, directory, skip_legacy_above):
+    results = []
+    for n in sizes:
+        data = synthetic_ohlcv(n)
+        row = {"candles": n}
+        for name, draw in (("legacy", draw_legacy), ("vectorized", draw_vectorized)):
+            if name == "legacy" and n > skip_legacy_above:
+                row[name] = None
+                continue
+            started = time.perf_counter()
+            render(draw, data, os.path.join(directory, f"{name}_{n}.png"), dpi)
+            row[name] = time.perf_counter() - started
+        if row["legacy"]:
+            row["speedup"] = row["legacy"] / row["vectorized"]
+        results.append(row)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ローソク足描画ベンチマーク")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--dpi", type=int, default=100)
+    parser.add_argument("--skip-legacy-above", type=int, default=50000,
+                        help="この本数を超えたら従来実装を計測しない")
+    parser.add_argument("--output-dir", default="/tmp")
+    parser.add_argument("--json", action="store_true", help="結果を JSON で出力")
+    args = parser.parse_args()
+
+    results = run(args.sizes, args.dpi, args.output_dir, args.skip_legacy_above)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'candles':>8}{'legacy(s)':>12}{'vectorized(s)':>15}{'speedup':>10}")
+    for r in results:
+        legacy = f"{r['legacy']:.2f}" if r["legacy"] else "-"
+        speedup = f"{r['speedup']:.1f}x" if r.get("speedup") else "-"
+        print(f"{r['candles']:>8}{legacy:>12}{r['vectorized']:>15.2f}{speedup:>10}")
+
+
+if __name__ == "__main__":
+    main()
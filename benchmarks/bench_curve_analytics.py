@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+利回りカーブ分析のベンチマーク
+
+数十年分の日次カーブ（年限の欠け方は実データと同じく時期によって変わる）について、
+1日ずつ計算する素朴な実装と curve_analytics.py の一括計算、キャッシュからの読み出しを比較する。
+
+    python3 benchmarks/bench_curve_analytics.py --years 1990 2025 --tenors 100
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "us_bonds"))
+from curve_analytics import CurveAnalytics, curve_metrics, interpolate, inversion_events, second_derivatives
+from curve_store import MATURITIES, YEARS, CurveStore
+
+# 年限ごとの公表開始・休止期間（この期間は NaN）
+MISSING = {
+    "1-Month": [(None, date(2001, 7, 30))],
+    "1.5-Month": [(None, date(2025, 2, 17))],
+    "2-Month": [(None, date(2018, 10, 15))],
+    "4-Month": [(None, date(2022, 10, 18))],
+    "20-Year": [(date(1987, 1, 1), date(1993, 9, 30))],
+    "30-Year": [(date(2002, 2, 19), date(2006, 2, 8))],
+}
+
+
+def synthetic_history(first_year=1990, last_year=2025, seed=0):
+    """営業日ごとのカーブ (date のリスト, (日数, 年限数) の利回り)"""
+    rng = np.random.default_rng(seed)
+    day = date(first_year, 1, 1)
+    days = []
+    while day.year <= last_year:
+        if day.weekday() < 5:
+            days.append(day)
+        day += timedelta(days=1)
+    n = len(days)
+    # 水準と傾きのランダムウォーク（傾きが負の期間が逆イールド）
+    level = 4 + np.cumsum(rng.normal(0, 0.03, n)).clip(-3.5, 4)
+    slope = 1 + np.cumsum(rng.normal(0, 0.02, n))
+    slope = np.clip(slope, -1.5, 3)
+    shape = 1 - np.exp(-YEARS / 2)
+    rates = level[:, None] + slope[:, None] * (shape - shape.mean()) + rng.normal(0, 0.01, (n, len(YEARS)))
+    ordinals = np.array([d.toordinal() for d in days])
+    names = [name for name, *_ in MATURITIES]
+    for name, periods in MISSING.items():
+        for start, end in periods:
+            lo = ordinals[0] if start is None else start.toordinal()
+            mask = (ordinals >= lo) & (ordinals <= end.toordinal())
+            rates[mask, names.index(name)] = np.nan
+    return days, np.round(rates, 2)
+
+
+def loop_second_derivatives(rates):
+    """1日ずつ節点を選んで自然3次スプラインの連立方程式を解く"""
+    result = np.full(rates.shape, np.nan)
+    for row, curve in enumerate(rates):
+        present = np.flatnonzero(np.isfinite(curve))
+        x, y = YEARS[present], curve[present]
+        n = len(x)
+        h = np.diff(x)
+        a = np.zeros((n, n))
+        b = np.zeros(n)
+        a[0, 0] = a[-1, -1] = 1
+        for i in range(1, n - 1):
+            a[i, i - 1], a[i, i], a[i, i + 1] = h[i - 1], 2 * (h[i - 1] + h[i]), h[i]
+            b[i] = 6 * ((y[i + 1] - y[i]) / h[i] - (y[i] - y[i - 1]) / h[i - 1])
+        result[row, present] = np.linalg.solve(a, b)
+    return result
+
+
+def loop_interpolate(rates, m2, tenors):
+    result = np.full((len(rates), len(tenors)), np.nan)
+    for row, curve in enumerate(rates):
+        present = np.flatnonzero(np.isfinite(curve))
+        x, y, m = YEARS[present], curve[present], m2[row, present]
+        for k, t in enumerate(tenors):
+            if not x[0] <= t <= x[-1]:
+                continue
+            j = min(max(np.searchsorted(x, t, side="right") - 1, 0), len(x) - 2)
+            h = x[j + 1] - x[j]
+            result[row, k] = (
+                m[j] * (x[j + 1] - t) ** 3 / (6 * h)
+                + m[j + 1] * (t - x[j]) ** 3 / (6 * h)
+                + (y[j] - m[j] * h**2 / 6) * (x[j + 1] - t) / h
+                + (y[j + 1] - m[j + 1] * h**2 / 6) * (t - x[j]) / h
+            )
+    return result
+
+
+def timed(func, *args):
+    started = time.perf_counter()
+    value = func(*args)
+    return time.perf_counter() - started, value
+
+
+def run(first_year=1990, last_year=2025, n_tenors=100, skip_loop=False):
+    days, rates = synthetic_history(first_year, last_year)
+    tenors = np.linspace(0.25, 30, n_tenors)
+    result = {"days": len(days), "tenors": n_tenors}
+
+    # 一括計算（指標・2階微分・補間・逆イールド）
+    started = time.perf_counter()
+    metrics = curve_metrics(rates)
+    m2 = second_derivatives(rates)
+    curve = interpolate(rates, m2, tenors)
+    events = inversion_events(np.array(days, dtype="datetime64[D]"), metrics[:, 0])
+    result["vectorized"] = time.perf_counter() - started
+    result["inversions_2s10s"] = len(events)
+
+    if not skip_loop:
+        seconds_m2, loop_m2 = timed(loop_second_derivatives, rates)
+        seconds_interp, loop_curve = timed(loop_interpolate, rates, loop_m2, tenors)
+        result["loop"] = seconds_m2 + seconds_interp
+        result["max_abs_diff"] = float(np.nanmax(np.abs(loop_curve - curve)))
+    else:
+        result["loop"] = None
+        result["max_abs_diff"] = None
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = CurveStore(tmp)
+        store.append(days, rates)
+        analytics = CurveAnalytics(store)
+        result["cache_build"], _ = timed(analytics.update)
+        # 1日追記したときの差分計算
+        store.append([days[-1] + timedelta(days=3)], rates[-1:])
+        result["cache_incremental"], _ = timed(analytics.update)
+        result["cache_latest"], _ = timed(analytics.latest)
+        result["cache_inversions"], _ = timed(analytics.inversions)
+        result["cache_interpolate"], _ = timed(analytics.interpolate, tenors)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="利回りカーブ分析のベンチマーク")
+    parser.add_argument("--years", type=int, nargs=2, default=[1990, 2025], metavar=("FIRST", "LAST"))
+    parser.add_argument("--tenors", type=int, default=100, help="補間する年限の数")
+    parser.add_argument("--skip-loop", action="store_true", help="1日ずつの実装を計測しない")
+    parser.add_argument("--json", action="store_true", help="結果を JSON で出力")
+    args = parser.parse_args()
+
+    result = run(args.years[0], args.years[1], args.tenors, args.skip_loop)
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+    print(f"{result['days']}日 × {result['tenors']}年限（2s10s 逆イールド {result['inversions_2s10s']}回）")
+    print(f"  一括計算          {result['vectorized'] * 1000:9.1f} ms")
+    if result["loop"] is not None:
+        print(f"  1日ずつ           {result['loop'] * 1000:9.1f} ms（最大誤差 {result['max_abs_diff']:.2e}）")
+    print(f"  キャッシュ作成    {result['cache_build'] * 1000:9.1f} ms")
+    print(f"  1日分の差分計算   {result['cache_incremental'] * 1000:9.1f} ms")
+    print(f"  最新日の読み出し  {result['cache_latest'] * 1000:9.1f} ms")
+    print(f"  逆イールド期間    {result['cache_inversions'] * 1000:9.1f} ms")
+    print(f"  全日付の補間      {result['cache_interpolate'] * 1000:9.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
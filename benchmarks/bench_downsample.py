@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+ライン / 出来高チャートの間引きベンチマーク
+
+全点をそのまま ax.plot / ax.bar に渡す従来の描画と、画素幅に間引いた描画
+（価格: minmax / lttb、出来高: 画素幅バケットの合計）の描画時間と、
+価格パネルの画素差（差のある画素の割合）を比較する。
+間引きの比較は線と出来高だけを描く（凡例・移動平均・保存なし）ため、本番の描画時間として
+create_price_chart（移動平均・凡例・出来高込みで SAVE_DPI の PNG を保存）も計測する。
+
+    python3 benchmarks/bench_downsample.py --sizes 10000 100000 1000000
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import matplotlib
+
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+import numpy as np
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_DIR, "bitcoin"))
+sys.path.insert(0, REPO_DIR)
+from candlestick_renderer import draw_volume_bars
+from downsample import bucket_sum, downsample
+
+# bitcoin_chart.SAVE_DPI（bitcoin_chart は import 時に config.json を読むためここでは参照しない）
+SAVE_DPI = 300
+START = 19700.0  # matplotlib の日付数値（2023-12 頃）
+
+
+def synthetic_series(n, days=30, seed=0):
+    """days 日に n 点のランダムウォーク（価格・出来高）"""
+    rng = np.random.default_rng(seed)
+    x = START + np.linspace(0, days, n)
+    price = 90000 * np.exp(np.cumsum(rng.normal(0, 0.3 / np.sqrt(n), n)))
+    volume = rng.uniform(1e6, 5e6, n)
+    return x, price, volume
+
+
+def draw_full(ax1, ax2, x, price, volume, points, method):
+    """変更前の create_price_chart と同じく全点を描画（出来高は1点1本）"""
+    ax1.plot(x, price, linewidth=2, color="#f7931a")
+    if ax2 is not None:
+        ax2.bar(x, volume, alpha=0.6, color="gray")
+
+
+def draw_downsampled(ax1, ax2, x, price, volume, points, method):
+    keep = downsample(x, price, points, method)
+    ax1.plot(x[keep], price[keep], linewidth=2, color="#f7931a")
+    if ax2 is not None:
+        centers, sums, width = bucket_sum(x, volume, points)
+        draw_volume_bars(ax2, centers, sums, width=width)
+
+
+def render(draw, data, dpi, figsize=(12, 8), method="minmax", volume=True):
+    """描画して (秒, 価格パネルの RGBA 画素) を返す"""
+    started = time.perf_counter()
+    if volume:
+        fig, (ax1, ax2) = plt.subplots(2, 1, figsize=figsize, dpi=dpi, gridspec_kw={"height_ratios": [3, 1]})
+    else:
+        fig, ax1 = plt.subplots(figsize=figsize, dpi=dpi)
+        ax2 = None
+    points = int(figsize[0] * dpi)
+    draw(ax1, ax2, *data, points, method)
+    fig.canvas.draw()
+    elapsed = time.perf_counter() - started
+    image = np.asarray(fig.canvas.buffer_rgba(), dtype=np.int16)
+    (x0, y0), (x1, y1) = ax1.get_window_extent().get_points().astype(int)
+    height = image.shape[0]
+    panel = image[height - y1 : height - y0, x0:x1].copy()
+    plt.close(fig)
+    return elapsed, panel
+
+
+def pixel_diff(a, b, tolerance=16):
+    """チャンネル差が tolerance を超える画素の割合"""
+    return float(np.any(np.abs(a - b) > tolerance, axis=-1).mean())
+
+
+def price_chart_seconds(n):
+    """本番の create_price_chart の描画時間（ベンチマークスイートの一時ツリーで1分足 n 件）"""
+    from benchmarks import bench_suite
+
+    report = bench_suite.run(
+        {"ticks": n, "log_lines": [], "repeat": 1}, only=["bitcoin_chart.create_price_chart*"]
+    )
+    return next(iter(report["results"].values()))["wall_seconds"]
+
+
+def run(sizes, dpi, methods, skip_full_above, chart=True):
+    results = []
+    for n in sizes:
+        data = synthetic_series(n)
+        row = {"points": n, "chart": price_chart_seconds(n) if chart else None}
+        reference = None
+        if n <= skip_full_above:
+            row["full"], reference = render(draw_full, data, dpi)
+        else:
+            row["full"] = None
+        for method in methods:
+            seconds, panel = render(draw_downsampled, data, dpi, method=method)
+            row[method] = seconds
+            row[f"{method}_diff"] = pixel_diff(reference, panel) if reference is not None else None
+        results.append(row)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ライン / 出来高チャートの間引きベンチマーク")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--dpi", type=int, default=SAVE_DPI)
+    parser.add_argument("--methods", nargs="+", default=["minmax", "lttb"])
+    parser.add_argument("--skip-full-above", type=int, default=200000,
+                        help="この点数を超えたら全点描画を計測しない（出来高が1点1本のため）")
+    parser.add_argument("--no-chart", action="store_true", help="create_price_chart の計測を省く")
+    parser.add_argument("--json", action="store_true", help="結果を JSON で出力")
+    args = parser.parse_args()
+
+    results = run(args.sizes, args.dpi, args.methods, args.skip_full_above, chart=not args.no_chart)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    header = f"{'points':>9}{'full(s)':>10}"
+    for method in args.methods:
+        header += f"{method + '(s)':>12}{'diff':>8}"
+    header += f"{'chart(s)':>10}"
+    print(header)
+    for r in results:
+        line = f"{r['points']:>9}" + (f"{r['full']:>10.2f}" if r["full"] else f"{'-':>10}")
+        for method in args.methods:
+            diff = f"{r[method + '_diff'] * 100:.2f}%" if r[method + "_diff"] is not None else "-"
+            line += f"{r[method]:>12.2f}{diff:>8}"
+        line += f"{r['chart']:>10.2f}" if r["chart"] is not None else f"{'-':>10}"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+Bitcoin価格履歴の読み込み比較（JSON vs カラム型ストア）
+
+指定件数の合成履歴を旧形式の JSON（indent=2、timestamp と ISO datetime の二重保持）と
+history_store のカラム型ストアに書き出し、新しいインタプリタで
+- json:     json.load → DataFrame → 直近 window_days 日を抽出（従来の load_historical_data）
+- columnar: memmap → 二分探索で直近 window_days 日をスライス → DataFrame
+- columnar-full: 全件の price を memmap で集計（全ページに触れる場合）
+の読み込み時間と最大 RSS（VmHWM と import 後の増分）を計測する。
+
+    python3 benchmarks/bench_history_store.py --sizes 100000 10000000 --memory-limit-mb 4096
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from datetime import datetime
+
+import numpy as np
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_DIR, "bitcoin"))
+from history_store import HistoryStore
+
+MODES = ("json", "columnar", "columnar-full")
+
+PROBE = """
+import json, os, resource, sys, time
+import numpy as np
+import pandas as pd
+sys.path.insert(0, sys.argv[4])
+from history_store import HistoryStore
+
+def peak_rss_mb():
+    # ru_maxrss は fork 元の値を引き継ぐため、exec 後のプロセスの VmHWM を使う
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024
+
+mode, path, window_ms = sys.argv[1], sys.argv[2], int(sys.argv[3])
+limit_mb = int(sys.argv[5])
+if limit_mb:
+    resource.setrlimit(resource.RLIMIT_AS, (limit_mb << 20, limit_mb << 20))
+baseline_mb = peak_rss_mb()
+started = time.perf_counter()
+try:
+    if mode == "json":
+        with open(path) as f:
+            data = json.load(f)
+        df = pd.DataFrame(data)
+        df["datetime"] = pd.to_datetime(df["timestamp"], unit="ms")
+        df.set_index("datetime", inplace=True)
+        df = df[df["timestamp"] >= df["timestamp"].iloc[-1] - window_ms]
+        rows = len(df)
+    elif mode == "columnar":
+        store = HistoryStore(path)
+        window = store.window(store.last_timestamp() - window_ms)
+        df = pd.DataFrame(
+            {"price": window["price"], "volume": window["volume"]},
+            index=pd.to_datetime(window["timestamp"], unit="ms"),
+        )
+        rows = len(df)
+    else:
+        columns = HistoryStore(path).columns()
+        rows = len(columns["price"])
+        float(columns["price"].sum())
+    error = None
+except MemoryError:
+    rows, error = 0, "MemoryError"
+elapsed = time.perf_counter() - started
+print(json.dumps({
+    "seconds": elapsed,
+    "rows": rows,
+    "error": error,
+    "rss_mb": peak_rss_mb(),
+    "rss_delta_mb": peak_rss_mb() - baseline_mb,
+}))
+"""
+
+
+def synthetic_history(size, seed=0):
+    rng = np.random.default_rng(seed)
+    timestamps = 1_600_000_000_000 + 60_000 * np.arange(size, dtype=np.int64)
+    prices = np.round(30000 * np.exp(np.cumsum(rng.normal(0, 0.0005, size))), 2)
+    volumes = np.round(rng.uniform(1e9, 5e9, size), 2)
+    return timestamps, prices, volumes
+
+
+def write_legacy_json(path, timestamps, prices, volumes, chunk=100_000):
+    """履歴ストア導入前の JSON 履歴と同じ形式（indent=2）をチャンクごとに書き出す"""
+    with open(path, "w") as f:
+        f.write("[")
+        for start in range(0, len(timestamps), chunk):
+            points = [
+                {
+                    "timestamp": int(ts),
+                    "datetime": datetime.fromtimestamp(ts / 1000).isoformat(),
+                    "price": float(price),
+                    "volume": float(volume),
+                }
+                for ts, price, volume in zip(
+                    timestamps[start : start + chunk],
+                    prices[start : start + chunk],
+                    volumes[start : start + chunk],
+                )
+            ]
+            body = json.dumps(points, indent=2)[1:-1]
+            f.write(("," if start else "") + body)
+        f.write("\n]")
+
+
+def probe(mode, path, window_ms, memory_limit_mb):
+    completed = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            PROBE,
+            mode,
+            path,
+            str(window_ms),
+            os.path.join(REPO_DIR, "bitcoin"),
+            str(memory_limit_mb),
+        ],
+        capture_output=True,
+        text=True,
+    )
+    if completed.returncode != 0:
+        return {"seconds": None, "rows": 0, "error": f"exit {completed.returncode}", "rss_mb": None}
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def run(sizes, window_days, memory_limit_mb):
+    results = []
+    window_ms = window_days * 24 * 3600 * 1000
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as directory:
+            timestamps, prices, volumes = synthetic_history(size)
+            json_path = os.path.join(directory, "history.json")
+            store_dir = os.path.join(directory, "history")
+            write_legacy_json(json_path, timestamps, prices, volumes)
+            HistoryStore(store_dir).replace(timestamps, prices, volumes)
+            disk = {
+                "json": os.path.getsize(json_path),
+                "columnar": sum(
+                    os.path.getsize(os.path.join(store_dir, name)) for name in os.listdir(store_dir)
+                ),
+            }
+            for mode in MODES:
+                path = json_path if mode == "json" else store_dir
+                result = probe(mode, path, window_ms, memory_limit_mb)
+                result.update(
+                    {
+                        "size": size,
+                        "mode": mode,
+                        "disk_mb": disk["json" if mode == "json" else "columnar"] / 2**20,
+                    }
+                )
+                results.append(result)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="履歴読み込み比較（JSON vs カラム型ストア）")
+    parser.add_argument("--sizes", nargs="+", type=int, default=[100_000, 10_000_000])
+    parser.add_argument("--window-days", type=int, default=7, help="チャートに切り出す日数")
+    parser.add_argument(
+        "--memory-limit-mb", type=int, default=0, help="計測プロセスの仮想メモリ上限（0 は無制限）"
+    )
+    parser.add_argument("--json", action="store_true", help="結果を JSON で出力")
+    args = parser.parse_args()
+
+    results = run(args.sizes, args.window_days, args.memory_limit_mb)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'points':>10}{'mode':>15}{'disk(MB)':>10}{'load(ms)':>12}{'rss(MB)':>10}{'Δrss(MB)':>10}")
+    for r in results:
+        if r["error"]:
+            print(f"{r['size']:>10}{r['mode']:>15}{r['disk_mb']:>10.1f}  失敗: {r['error']}")
+            continue
+        print(
+            f"{r['size']:>10}{r['mode']:>15}{r['disk_mb']:>10.1f}{r['seconds'] * 1000:>12.1f}"
+            f"{r['rss_mb']:>10.1f}{r['rss_delta_mb']:>10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+メトリクス計測のオーバーヘッド
+
+stage()（所要時間の計測）と count()（カウンタ）1回あたりのコストを、無効時・有効時で比較する。
+有効時は監視1回分（4監視 × 7段階 + カウンタ）を textfile へ書き出す時間も測る。
+
+    python3 benchmarks/bench_metrics.py --iterations 200000
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common import metrics
+
+MONITORS = ("rate_exchange", "bitcoin", "us_bonds", "bitcoin_chart")
+STAGES = ("fetch", "state_load", "evaluate", "notify", "state_save", "render", "cycle")
+
+
+def per_call_ns(func, iterations):
+    started = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - started) / iterations * 1e9
+
+
+def _stage():
+    with metrics.stage("rate_exchange", "evaluate"):
+        pass
+
+
+def _count():
+    metrics.count("rate_exchange", "cooldown_suppressed")
+
+
+def _empty():
+    pass
+
+
+def _set_state(enabled, directory=None):
+    metrics.registry = metrics.Registry()
+    metrics._enabled = enabled
+    metrics._textfile_dir = directory
+    metrics._flushed.clear()
+
+
+def run(iterations, directory):
+    saved = (metrics.registry, metrics._enabled, metrics._textfile_dir, dict(metrics._flushed))
+    try:
+        baseline = per_call_ns(_empty, iterations)
+        _set_state(False)
+        disabled = {"stage_ns": per_call_ns(_stage, iterations), "count_ns": per_call_ns(_count, iterations)}
+        _set_state(True, directory)
+        enabled = {"stage_ns": per_call_ns(_stage, iterations), "count_ns": per_call_ns(_count, iterations)}
+
+        # 監視1回分の記録を書き出す（初回はファイル作成、2回目以降は既存ファイルへの足し込み）
+        flush_ms = []
+        for _ in range(5):
+            for monitor in MONITORS:
+                for stage in STAGES:
+                    metrics.observe(monitor, stage, 0.01)
+                metrics.count(monitor, "notifications", priority="alert")
+            started = time.perf_counter()
+            metrics.flush()
+            flush_ms.append((time.perf_counter() - started) * 1e3)
+        enabled["flush_ms"] = sorted(flush_ms)[len(flush_ms) // 2]
+    finally:
+        metrics.registry, metrics._enabled, metrics._textfile_dir = saved[:3]
+        metrics._flushed.clear()
+        metrics._flushed.update(saved[3])
+    return {"call_overhead_ns": baseline, "disabled": disabled, "enabled": enabled}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=200000)
+    parser.add_argument("--json", action="store_true", help="結果を JSON で出力")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        results = run(args.iterations, directory)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"関数呼び出しのみ: {results['call_overhead_ns']:.0f} ns")
+    for mode in ("disabled", "enabled"):
+        r = results[mode]
+        print(f"{mode:<9} stage: {r['stage_ns']:>7.0f} ns  count: {r['count_ns']:>7.0f} ns")
+    print(f"textfile 書き出し（監視1回分）: {results['enabled']['flush_ms']:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+通知ディスパッチャの負荷試験（ローカルの Pushover モックサーバ相手）
+
+複数プロセスが同じ送信待ちキューに数千件の通知（優先度混在・一部は上限超えの長文）を積み、
+各プロセスの送信スレッドが共有トークンバケットの範囲で送り切るまでを計測する。
+モックサーバは毎秒 server_rate 件を超えると 429、本文 1024 文字・タイトル 250 文字を超えると 400 を返し、
+X-Limit-App-* ヘッダで残り通数（quota）を返す。
+
+    python3 benchmarks/bench_notifier.py --alerts 3000 --processes 4 --rate 200 --server-rate 250
+    python3 benchmarks/bench_notifier.py --alerts 3000 --no-limit     # 流量制限なし（429 の発生を確認）
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import socket
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.notifier import MESSAGE_LIMIT, PRIORITIES, TITLE_LIMIT, Notifier, TokenBucket
+
+# 優先度ごとの比率（ボラティリティアラートが大半）
+MIX = (("transition", 0.05), ("alert", 0.75), ("report", 0.2))
+
+
+class MockPushover:
+    """Pushover API のモック（毎秒の上限・月間残数・文字数上限を再現）"""
+
+    def __init__(self, server_rate=250, quota=10000, reset_seconds=60, latency=0.0):
+        self.server_rate = server_rate
+        self.quota = quota
+        self.reset_at = int(time.time() + reset_seconds)
+        self.latency = latency
+        self.counts = {"ok": 0, "throttled": 0, "rejected": 0, "quota": 0}
+        self._window = (0, 0)
+        self._lock = threading.Lock()
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                # ヘッダと本文を別々に書くため、Nagle と遅延 ACK で 1 件 40ms 待たないようにする
+                self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                form = {k: v[-1] for k, v in parse_qs(self.rfile.read(length).decode()).items()}
+                status, headers = mock.handle(form)
+                body = json.dumps({"status": 1 if status == 200 else 0}).encode()
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.httpd.server_port}/1/messages.json"
+
+    def handle(self, form):
+        time.sleep(self.latency)
+        with self._lock:
+            if len(form.get("message", "")) > MESSAGE_LIMIT or len(form.get("title", "")) > TITLE_LIMIT:
+                self.counts["rejected"] += 1
+                return 400, {}
+            second = int(time.monotonic())
+            window, count = self._window
+            count = count + 1 if window == second else 1
+            self._window = (second, count)
+            if self.quota <= 0:
+                self.counts["quota"] += 1
+                status = 429
+            elif count > self.server_rate:
+                self.counts["throttled"] += 1
+                status = 429
+            else:
+                self.quota -= 1
+                self.counts["ok"] += 1
+                status = 200
+            headers = {
+                "X-Limit-App-Limit": "10000",
+                "X-Limit-App-Remaining": str(max(self.quota, 0)),
+                "X-Limit-App-Reset": str(self.reset_at),
+            }
+            return status, headers
+
+    def __enter__(self):
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def _producer(path, url, count, seed, limit, max_pending, oversize, deadline, start_event):
+    """1プロセス分: 通知を積み、送信スレッドがキューを送り切るか deadline まで待つ"""
+    rng = random.Random(seed)
+    notifier = Notifier(
+        "token",
+        "user",
+        path=path,
+        api_url=url,
+        coalesce_seconds=0,
+        base_delay=0.5,
+        max_delay=2,
+        rate_limit=TokenBucket(*limit) if limit else None,
+        max_pending=max_pending,
+    )
+    names = [name for name, _ in MIX]
+    weights = [weight for _, weight in MIX]
+    start_event.wait()
+    for i in range(count):
+        priority = rng.choices(names, weights)[0]
+        body = f"{priority} {seed}-{i}\n現在: {rng.uniform(1, 5):.3f}%"
+        if rng.random() < oversize:
+            body = "\n".join([body] * 120)
+        # タイトルを通知ごとに変えてまとめ送信を効かせない（送信通数を最大にする）
+        notifier.notify(body, f"{priority} {seed}-{i}", source="bench", priority=priority)
+    while time.time() < deadline and notifier.pending_count():
+        time.sleep(0.05)
+    notifier.close(timeout=1)
+
+
+def _latencies(path):
+    conn = sqlite3.connect(path)
+    result = {}
+    for name, value in PRIORITIES.items():
+        rows = [
+            r[0]
+            for r in conn.execute(
+                "SELECT sent_at - created_at FROM outbox WHERE status = 'sent' AND priority = ? ORDER BY 1",
+                (value,),
+            )
+        ]
+        result[name] = {
+            "sent": len(rows),
+            "p50_s": rows[len(rows) // 2] if rows else None,
+            "max_s": rows[-1] if rows else None,
+        }
+    statuses = dict(conn.execute("SELECT status, COUNT(*) FROM outbox GROUP BY status").fetchall())
+    conn.close()
+    return result, statuses
+
+
+def run(alerts=3000, processes=4, capacity=20, rate=200.0, server_rate=250, quota=100000,
+        max_pending=100000, oversize=0.01, latency=0.0, timeout=120.0):
+    """負荷試験を1回実行して結果の dict を返す（rate=None で流量制限なし）"""
+    limit = (capacity, rate) if rate else None
+    ctx = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as tmp, MockPushover(server_rate, quota, latency=latency) as server:
+        path = os.path.join(tmp, "outbox.db")
+        Notifier("token", "user", path=path).connection  # スキーマ作成
+        start_event = ctx.Event()
+        deadline = time.time() + timeout
+        share = [alerts // processes + (i < alerts % processes) for i in range(processes)]
+        workers = [
+            ctx.Process(
+                target=_producer,
+                args=(path, server.url, share[i], i, limit, max_pending, oversize, deadline, start_event),
+            )
+            for i in range(processes)
+        ]
+        for worker in workers:
+            worker.start()
+        started = time.perf_counter()
+        start_event.set()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - started
+        by_priority, statuses = _latencies(path)
+    return {
+        "alerts": alerts,
+        "processes": processes,
+        "rate_limit": limit,
+        "seconds": elapsed,
+        "sent_per_second": server.counts["ok"] / elapsed,
+        "server": server.counts,
+        "outbox": statuses,
+        "by_priority": by_priority,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="通知ディスパッチャの負荷試験")
+    parser.add_argument("--alerts", type=int, default=3000, help="積む通知の件数（全プロセス合計）")
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--capacity", type=int, default=20, help="トークンバケットの容量")
+    parser.add_argument("--rate", type=float, default=200.0, help="トークンの回復速度（通/秒）")
+    parser.add_argument("--no-limit", action="store_true", help="送信側の流量制限を無効にする")
+    parser.add_argument("--server-rate", type=int, default=250, help="モックが 429 を返し始める通数/秒")
+    parser.add_argument("--quota", type=int, default=100000, help="モックの残り通数（0 で 429）")
+    parser.add_argument("--max-pending", type=int, default=100000, help="送信待ちの上限（超えた分は破棄）")
+    parser.add_argument("--oversize", type=float, default=0.01, help="上限超えの長文にする割合")
+    parser.add_argument("--latency", type=float, default=0.0, help="モックの応答遅延（秒）")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--json", action="store_true", help="結果を JSON で出力")
+    args = parser.parse_args()
+
+    result = run(
+        args.alerts,
+        args.processes,
+        args.capacity,
+        None if args.no_limit else args.rate,
+        args.server_rate,
+        args.quota,
+        args.max_pending,
+        args.oversize,
+        args.latency,
+        args.timeout,
+    )
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+    print(f"alerts={result['alerts']} processes={result['processes']} rate_limit={result['rate_limit']}")
+    print(f"elapsed: {result['seconds']:.2f}s  sent: {result['sent_per_second']:.1f}/s")
+    print(f"server: {result['server']}")
+    print(f"outbox: {result['outbox']}")
+    for name, r in result["by_priority"].items():
+        if r["sent"]:
+            print(f"  {name:<10} sent={r['sent']:>6}  p50={r['p50_s']:.2f}s  max={r['max_s']:.2f}s")
+        else:
+            print(f"  {name:<10} sent={r['sent']:>6}")
+
+
+if __name__ == "__main__":
+    main()
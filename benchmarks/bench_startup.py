@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+bitcoin_trading_tool.py の起動コスト計測（アクションごと）
+
+最小の config.json を置いた一時ツリーに bitcoin/ と common/ をコピーし、
+新しいインタプリタで `load_action(action)` までの import 時間と最大 RSS、
+読み込まれた重い依存（pandas / matplotlib / numpy）を計測する。
+--check を付けると track が TRACK_ALLOWED（numpy）以外の重い依存を読み込んだ場合に終了コード 1 で失敗する。
+
+    python3 benchmarks/bench_startup.py --repeat 5 --check
+"""
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ACTIONS = ("track", "chart", "both")
+HEAVY_MODULES = ("pandas", "matplotlib", "numpy")
+# track（15分ごとの価格取得）が読み込んでよい重い依存
+# numpy はウォッチリストの一括判定と履歴ストアで毎回使うため、遅延させずに起動時に読み込む
+# （import 約 0.1 秒・RSS 約 +28MB。pandas / matplotlib は chart だけ）
+TRACK_ALLOWED = ("numpy",)
+TRACK_FORBIDDEN = tuple(m for m in HEAVY_MODULES if m not in TRACK_ALLOWED)
+
+PROBE = """
+import json, resource, sys, time
+started = time.perf_counter()
+import bitcoin_trading_tool
+bitcoin_trading_tool.load_action(sys.argv[1])
+elapsed = time.perf_counter() - started
+print(json.dumps({
+    "import_seconds": elapsed,
+    "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    "heavy_modules": [m for m in %r if m in sys.modules],
+}))
+""" % (HEAVY_MODULES,)
+
+
+def build_tree(directory):
+    """bitcoin/ と common/ のコピーと、import に必要な最小限の config.json を作成"""
+    for name in ("bitcoin", "common"):
+        shutil.copytree(
+            os.path.join(REPO_DIR, name),
+            os.path.join(directory, name),
+            ignore=shutil.ignore_patterns("__pycache__"),
+        )
+    config = {
+        "logging": {"bitcoin_log": os.path.join(directory, "bitcoin.log")},
+        "bitcoin": {},
+    }
+    with open(os.path.join(directory, "config.json"), "w") as f:
+        json.dump(config, f)
+    return os.path.join(directory, "bitcoin")
+
+
+def probe(workdir, action):
+    """新しいインタプリタで1回計測"""
+    output = subprocess.run(
+        [sys.executable, "-c", PROBE, action],
+        cwd=workdir,
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def run(actions, repeat):
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        workdir = build_tree(directory)
+        for action in actions:
+            samples = [probe(workdir, action) for _ in range(repeat)]
+            results.append(
+                {
+                    "action": action,
+                    "import_seconds": statistics.median(s["import_seconds"] for s in samples),
+                    "max_rss_mb": statistics.median(s["max_rss_kb"] for s in samples) / 1024,
+                    "heavy_modules": samples[0]["heavy_modules"],
+                }
+            )
+    return results
+
+
+def check(results):
+    """track が重い依存を読み込んでいないか（違反内容のリスト）"""
+    errors = []
+    for r in results:
+        if r["action"] == "track":
+            loaded = [m for m in r["heavy_modules"] if m in TRACK_FORBIDDEN]
+            if loaded:
+                errors.append(f"track が {', '.join(loaded)} を読み込んでいます")
+    return errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description="bitcoin_trading_tool 起動コスト計測")
+    parser.add_argument("--actions", nargs="+", choices=ACTIONS, default=list(ACTIONS))
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--check", action="store_true", help="track の重い依存読み込みを検出したら失敗")
+    parser.add_argument("--json", action="store_true", help="結果を JSON で出力")
+    args = parser.parse_args()
+
+    results = run(args.actions, args.repeat)
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"{'action':>8}{'import(ms)':>12}{'rss(MB)':>10}  heavy modules")
+        for r in results:
+            heavy = ", ".join(r["heavy_modules"]) or "-"
+            print(f"{r['action']:>8}{r['import_seconds'] * 1000:>12.1f}{r['max_rss_mb']:>10.1f}  {heavy}")
+
+    if args.check:
+        errors = check(results)
+        for error in errors:
+            print(f"NG: {error}", file=sys.stderr)
+        if errors:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
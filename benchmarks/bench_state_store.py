@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+状態保存の書き込みレイテンシ比較
+
+従来の JSON ファイル全体書き換え（save_rate / save_bonds_data 相当）と、
+SQLite WAL 状態ストアのキー単位 UPSERT を比較する。
+
+    python3 benchmarks/bench_state_store.py --iterations 2000
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.state_store import StateStore
+
+BOND_DATA = {
+    f"{name} Treasury": {"rate": 4.25 + i * 0.1, "date": "2025-01-01"}
+    for i, name in enumerate(["2-Year", "10-Year", "30-Year"])
+}
+
+
+def measure(func, iterations):
+    samples = []
+    for i in range(iterations):
+        started = time.perf_counter()
+        func(i)
+        samples.append((time.perf_counter() - started) * 1e6)
+    samples.sort()
+    return {
+        "mean_us": statistics.fmean(samples),
+        "p50_us": samples[len(samples) // 2],
+        "p99_us": samples[int(len(samples) * 0.99) - 1],
+    }
+
+
+def run(iterations, directory):
+    rate_file = os.path.join(directory, "usd_jpy_rate.json")
+    bonds_file = os.path.join(directory, "us_bonds_data.json")
+    store = StateStore(os.path.join(directory, "state.db"))
+
+    def json_rate(i):
+        with open(rate_file, "w") as f:
+            json.dump({"rate": 150 + i * 1e-4, "timestamp": "x", "last_notif_ts": i}, f)
+
+    def json_bonds(i):
+        payload = {"data": BOND_DATA, "timestamp": "x", "cooldown": {"10-Year Treasury": i}}
+        with open(bonds_file, "w") as f:
+            json.dump(payload, f, indent=2)
+
+    def sqlite_rate(i):
+        store.set("rate_exchange", "USD/JPY", {"rate": 150 + i * 1e-4, "last_notif_ts": i})
+
+    def sqlite_bonds(i):
+        store.set_many(
+            "us_bonds",
+            {"rates": BOND_DATA, "cooldown": {"10-Year Treasury": i}, "timestamp": "x"},
+        )
+
+    results = {
+        "json_rewrite_rate": measure(json_rate, iterations),
+        "json_rewrite_bonds": measure(json_bonds, iterations),
+        "sqlite_upsert_rate": measure(sqlite_rate, iterations),
+        "sqlite_upsert_bonds": measure(sqlite_bonds, iterations),
+    }
+    store.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--json", action="store_true", help="結果を JSON で出力")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        results = run(args.iterations, directory)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'case':<22}{'mean(us)':>12}{'p50(us)':>12}{'p99(us)':>12}")
+    for name, r in results.items():
+        print(f"{name:<22}{r['mean_us']:>12.1f}{r['p50_us']:>12.1f}{r['p99_us']:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,643 @@
+#!/usr/bin/env python3
+"""
+監視パイプライン全体のベンチマークスイート（ベースライン比較つき）
+
+一時ツリーに rate-exchange/ bitcoin/ us_bonds/ common/ をコピーし、上流APIは記録済みの
+レスポンス（tests/fixtures）をローカルのスタブサーバから返す。ログ・為替サンプル・価格履歴は
+合成データを生成する。関数ごとに新しいインタプリタで実行し、実行時間（中央値）と
+ピークメモリ（tracemalloc による Python / NumPy の確保量、プロセスの最大 RSS）を計測する。
+
+    python3 benchmarks/bench_suite.py --output results.json
+    python3 benchmarks/bench_suite.py --compare                   # benchmarks/baseline.json と比較（悪化で終了コード 1）
+    python3 benchmarks/bench_suite.py --save-baseline             # ベースラインを更新
+    python3 benchmarks/bench_suite.py --log-lines 10000 1000000 10000000 --only 'us_bonds.*'
+"""
+
+import argparse
+import fnmatch
+import gc
+import importlib.util
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+import numpy as np
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+FIXTURES = os.path.join(REPO_DIR, "tests", "fixtures")
+DEFAULT_BASELINE = os.path.join(REPO_DIR, "benchmarks", "baseline.json")
+COPY_DIRS = ("rate-exchange", "bitcoin", "us_bonds", "common")
+
+DEFAULT_OPTIONS = {
+    "repeat": 3,
+    "log_lines": [10_000, 1_000_000],
+    "ticks": 100_000,
+    "assets": 250,
+    "log_days": 30,
+}
+# 比較で悪化とみなす最小の差（これ未満の揺れは許容範囲に関係なく無視）
+MIN_WALL_DELTA_SECONDS = 0.005
+MIN_MEMORY_DELTA_MB = 1.0
+
+FX_WATCHLIST = ["USD/JPY", "EUR/JPY", "GBP/JPY", "AUD/JPY", "EUR/USD", "GBP/USD", "USD/CHF", "USD/CAD"]
+A1_MARKERS = {
+    "check_count": "A1インスタンス空き確認開始",
+    "success_count": "A1インスタンス作成成功",
+    "fail_count": "A1インスタンス作成失敗",
+}
+BOND_MESSAGES = [
+    "INFO - 米国債金利チェック開始",
+    "INFO - 米国債金利データを取得中...",
+    "INFO - 2-Year Treasury: 3.89% (2025-03-31)",
+    "INFO - 10-Year Treasury: 4.23% (2025-03-31)",
+    "INFO - 30-Year Treasury: 4.59% (2025-03-31)",
+    "INFO - 10-Year Treasury: prev=4.210%, curr=4.230%, Δ=0.48%",
+    "INFO - 発火条件未達のため通知なし",
+    "INFO - 米国債金利チェック完了",
+]
+A1_MESSAGES = [
+    "A1インスタンス空き確認開始",
+    "A1インスタンス作成を試行",
+    "起動試行 [default|AD-1|4x24]: 容量不足",
+    "起動試行 [default|AD-2|4x24]: 容量不足",
+    "A1インスタンス作成失敗: 2件試行: 容量不足 2",
+]
+
+
+# ---- 記録済みAPIレスポンスのスタブ ---------------------------------------------
+
+
+def _fixture(name):
+    with open(os.path.join(FIXTURES, name), "rb") as f:
+        return f.read()
+
+
+def upstream_route(method, path, query, body):
+    """為替レートAPI・Treasury.gov の利回りカーブ（記録がない年はヘッダだけの CSV）"""
+    if path == "/v4/latest/USD":
+        return 200, {"Content-Type": "application/json"}, _fixture("exchangerate_latest_usd.json")
+    if path.startswith("/daily-treasury-rates.csv/"):
+        month = query.get("field_tdr_date_value_month")
+        year = month[:4] if month else query["field_tdr_date_value"]
+        try:
+            content = _fixture(f"treasury_yield_curve_{year}.csv")
+        except FileNotFoundError:
+            content = _fixture("treasury_yield_curve_2025.csv").splitlines(keepends=True)[0]
+        if month:
+            lines = content.decode("utf-8-sig").splitlines(keepends=True)
+            prefix = f"{month[4:]}/"
+            content = "".join([lines[0]] + [line for line in lines[1:] if line.startswith(prefix)]).encode()
+        return 200, {"Content-Type": "text/csv"}, content
+    return 404, {}, b""
+
+
+# ---- 合成データ ---------------------------------------------------------------
+
+
+def synthetic_log(path, lines, days, messages, with_millis=True):
+    """直近 days 日（今日を含む）に lines 行を等間隔で並べたログ"""
+    end = datetime.now().replace(microsecond=0)
+    start = (end - timedelta(days=days - 1)).replace(hour=0, minute=0, second=0)
+    step = (end - start).total_seconds() / max(lines, 1)
+    prefix_minute, prefix = None, ""
+    chunk = []
+    with open(path, "w") as f:
+        for i in range(lines):
+            offset = i * step
+            ts = start + timedelta(seconds=int(offset))
+            minute = ts.replace(second=0)
+            if minute != prefix_minute:
+                prefix_minute, prefix = minute, minute.strftime("%Y-%m-%d %H:%M:")
+            millis = f",{int((offset % 1) * 1000):03d}" if with_millis else ""
+            chunk.append(f"{prefix}{ts.second:02d}{millis} - {messages[i % len(messages)]}\n")
+            if len(chunk) >= 100_000:
+                f.write("".join(chunk))
+                chunk = []
+        f.write("".join(chunk))
+
+
+def synthetic_rate_samples(count, days, seed=0):
+    """直近 days 日の USD/JPY サンプル（ランダムウォーク）"""
+    rng = np.random.default_rng(seed)
+    end = time.time()
+    ts = np.linspace(end - days * 86400, end, count).astype(np.int64)
+    rates = 150 * np.exp(np.cumsum(rng.normal(0, 2e-4, count)))
+    return list(zip(ts.tolist(), rates.tolist()))
+
+
+def synthetic_history(count, seed=0):
+    """1分間隔の価格・出来高（ランダムウォーク、最新が現在時刻）"""
+    rng = np.random.default_rng(seed)
+    end_ms = int(time.time()) * 1000
+    timestamps = end_ms - (count - 1 - np.arange(count, dtype=np.int64)) * 60_000
+    prices = 60_000 * np.exp(np.cumsum(rng.normal(0, 1e-3, count)))
+    volumes = rng.uniform(1e8, 5e8, count)
+    return timestamps, prices, volumes
+
+
+def synthetic_prices(assets, seed=0):
+    """/simple/price 形式のレスポンス（前回価格から ±5% の変動）"""
+    rng = np.random.default_rng(seed)
+    ids = ["bitcoin"] + [f"coin-{i}" for i in range(1, assets)]
+    previous = rng.uniform(0.1, 60_000, assets)
+    current = previous * (1 + rng.uniform(-0.05, 0.05, assets))
+    prices = {
+        coin_id: {"usd": float(p), "usd_24h_change": float(c), "usd_24h_vol": 1e6, "last_updated_at": 1700000000}
+        for coin_id, p, c in zip(ids, current, rng.normal(0, 3, assets))
+    }
+    return ids, prices, previous
+
+
+# ---- ツリー ---------------------------------------------------------------
+
+
+def build_tree(directory, server_url, options):
+    """コードのコピー・config.json・合成データを用意して options を保存"""
+    for name in COPY_DIRS:
+        shutil.copytree(
+            os.path.join(REPO_DIR, name),
+            os.path.join(directory, name),
+            ignore=shutil.ignore_patterns("__pycache__", "config.json"),
+        )
+    data = os.path.join(directory, "data")
+    os.makedirs(os.path.join(data, "logs"))
+    config = {
+        "logging": {
+            "rate_exchange_log": os.path.join(data, "rate_exchange.log"),
+            "bitcoin_log": os.path.join(data, "bitcoin.log"),
+            "us_bonds_log": os.path.join(data, "us_bonds.log"),
+        },
+        "pushover": {"api_token": "bench", "user_key": "bench"},
+        "notifier": {"outbox_path": os.path.join(data, "notify_outbox.db")},
+        "state_store": {"path": os.path.join(data, "monitor_state.db")},
+        # 毎回スタブまで取りに行く（キャッシュの当たり外れで結果が変わらないように）
+        "http_cache": {"enabled": False},
+        "exchange_rate": {
+            "api_url": f"{server_url}/v4/latest/USD",
+            "threshold": 0.05,
+            "cooldown_seconds": 3600,
+            "watchlist": FX_WATCHLIST,
+            "save_file": os.path.join(data, "usd_jpy_rate.json"),
+            "store_dir": os.path.join(data, "usd_jpy_store"),
+        },
+        "bitcoin": {
+            "api": {"coingecko_base_url": f"{server_url}/api/v3", "timeout": 10},
+            "trading": {"symbol": "bitcoin", "vs_currency": "usd", "chart_days": 30},
+            "alerts": {"price_change_threshold": 0.03, "cooldown_seconds": 3600, "enable_pushover": False},
+            "history_dir": os.path.join(data, "bitcoin_history"),
+            "rollup_dir": os.path.join(data, "bitcoin_ohlcv"),
+            "chart": {
+                "width": 12,
+                "height": 8,
+                "style": "default",
+                "show_volume": True,
+                "save_path": os.path.join(data, "bitcoin_chart.png"),
+                "cache": {"enabled": False},
+            },
+        },
+        "us_bonds": {
+            "monitoring": {
+                "absolute_threshold": 5.0,
+                "volatility_threshold": 0.05,
+                "cooldown_seconds": 3600,
+                "save_file": os.path.join(data, "us_bonds_data.json"),
+            },
+            "treasury": {
+                "base_url": server_url,
+                "data_dir": os.path.join(data, "treasury"),
+                "backfill_start_year": 2024,
+            },
+        },
+    }
+    with open(os.path.join(directory, "config.json"), "w") as f:
+        json.dump(config, f, ensure_ascii=False, indent=2)
+
+    sys.path.insert(0, os.path.join(directory, "bitcoin"))
+    sys.path.insert(0, os.path.join(directory, "rate-exchange"))
+    from history_store import HistoryStore
+    from ohlcv_rollup import OhlcvRollup
+    from rate_store import RateStore
+
+    for lines in options["log_lines"]:
+        synthetic_log(_log_path(directory, "us_bonds", lines), lines, options["log_days"], BOND_MESSAGES)
+        synthetic_log(
+            _log_path(directory, "a1_check", lines), lines, options["log_days"], A1_MESSAGES, with_millis=False
+        )
+        RateStore(_rate_store_dir(directory, lines)).import_samples(
+            synthetic_rate_samples(lines, options["log_days"])
+        )
+    history = HistoryStore(config["bitcoin"]["history_dir"])
+    history.append(*synthetic_history(options["ticks"]))
+    OhlcvRollup(config["bitcoin"]["rollup_dir"]).update(history)
+    sys.path.remove(os.path.join(directory, "bitcoin"))
+    sys.path.remove(os.path.join(directory, "rate-exchange"))
+
+    with open(os.path.join(directory, "options.json"), "w") as f:
+        json.dump(options, f)
+    return directory
+
+
+def _log_path(tree, kind, lines):
+    return os.path.join(tree, "data", "logs", f"{kind}_{lines}.log")
+
+
+def _rate_store_dir(tree, lines):
+    return os.path.join(tree, "data", f"usd_jpy_store_{lines}")
+
+
+def _import_monitor(tree, relpath, name):
+    """監視スクリプトを cron と同じくそのディレクトリを cwd にして import"""
+    path = os.path.join(tree, relpath)
+    directory = os.path.dirname(path)
+    sys.path.insert(0, directory)
+    os.chdir(directory)
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def _yesterday():
+    return (datetime.now() - timedelta(days=1)).strftime("%Y-%m-%d")
+
+
+# ---- ケース（ワーカープロセスで実行） -------------------------------------------
+# setup(tree, options, **params) → (計測する関数, 毎回の前処理 or None)
+
+
+def setup_check_usdjpy(tree, options):
+    module = _import_monitor(tree, "rate-exchange/rate-exchange.py", "rate_exchange")
+    return module.check_usdjpy, None
+
+
+def setup_rate_summary(tree, options, samples):
+    module = _import_monitor(tree, "rate-exchange/rate-exchange.py", "rate_exchange")
+    module.rate_store = module.RateStore(_rate_store_dir(tree, samples))
+    return module.get_yesterday_rate_summary, None
+
+
+def setup_check_price_alerts(tree, options, assets):
+    module = _import_monitor(tree, "bitcoin/bitcoin_tracker.py", "bitcoin_tracker")
+    tracker = module.BitcoinTracker()
+    ids, prices, previous = synthetic_prices(assets)
+    tracker.config["watchlist"] = ids[1:]
+    watchlist = tracker.build_watchlist()
+    table = watchlist.price_table(prices, "usd")
+    previous_states = [{"price": float(p), "last_notif_ts": None} for p in previous]
+    indicators = {"rsi_14": 55.0}
+    return lambda: tracker.check_price_alerts(watchlist, table, previous_states, indicators), None
+
+
+def setup_check_us_bonds(tree, options):
+    module = _import_monitor(tree, "us_bonds/us_bond_checker.py", "us_bond_checker")
+    return module.check_us_bonds, None
+
+
+def _index_reset(path, cold):
+    index_path = path + ".index.json"
+
+    def reset():
+        if cold and os.path.exists(index_path):
+            os.remove(index_path)
+
+    return reset
+
+
+def setup_bond_log_summary(tree, options, lines, index):
+    module = _import_monitor(tree, "us_bonds/us_bond_checker.py", "us_bond_checker")
+    path = _log_path(tree, "us_bonds", lines)
+    module.config["logging"]["us_bonds_log"] = path
+    return module.get_yesterday_summary, _index_reset(path, index == "cold")
+
+
+def setup_a1_log_summary(tree, options, lines, index):
+    """check_a1 の朝のレポート（`python3 -m common.log_index counts` と同じ処理）"""
+    sys.path.insert(0, tree)
+    from common.log_index import LogIndex
+
+    path = _log_path(tree, "a1_check", lines)
+    day = _yesterday()
+
+    def summary():
+        log_index = LogIndex(path, A1_MARKERS)
+        log_index.update()
+        return log_index.counts(day)
+
+    return summary, _index_reset(path, index == "cold")
+
+
+def _chart(tree):
+    _import_monitor(tree, "bitcoin/bitcoin_tracker.py", "bitcoin_tracker")
+    import bitcoin_chart
+
+    return bitcoin_chart.BitcoinChart()
+
+
+def setup_load_historical_data(tree, options):
+    return _chart(tree).load_historical_data, None
+
+
+def setup_moving_averages(tree, options):
+    chart = _chart(tree)
+    df = chart.load_historical_data()
+    return lambda: chart.calculate_moving_averages(df), None
+
+
+def _close_figures():
+    import matplotlib.pyplot as plt
+
+    plt.close("all")
+
+
+def setup_price_chart(tree, options):
+    chart = _chart(tree)
+    df = chart.load_historical_data()
+    save_path = os.path.join(tree, "data", "bench_price.png")
+    return lambda: chart.create_price_chart(df, save_path), _close_figures
+
+
+def setup_candlestick_chart(tree, options):
+    chart = _chart(tree)
+    df = chart.load_historical_data()
+    bars = chart.load_bars("1h", df, update=False)
+    save_path = os.path.join(tree, "data", "bench_candlestick.png")
+    return lambda: chart.create_candlestick_chart(df, save_path, "1h", bars), _close_figures
+
+
+def setup_generate_summary(tree, options):
+    chart = _chart(tree)
+    df = chart.load_historical_data()
+    bars = chart.load_bars("1h", df, update=False)
+    return lambda: chart.generate_summary(df, bars, "1h"), None
+
+
+def build_cases(options):
+    """{ケース名: (setup, 引数)}"""
+    cases = {
+        "rate_exchange.check_usdjpy": (setup_check_usdjpy, {}),
+        f"bitcoin.check_price_alerts[assets={options['assets']}]": (
+            setup_check_price_alerts,
+            {"assets": options["assets"]},
+        ),
+        "us_bonds.check_us_bonds": (setup_check_us_bonds, {}),
+    }
+    for lines in options["log_lines"]:
+        cases[f"rate_exchange.get_yesterday_rate_summary[samples={lines}]"] = (setup_rate_summary, {"samples": lines})
+        for index in ("cold", "warm"):
+            params = {"lines": lines, "index": index}
+            cases[f"us_bonds.get_yesterday_summary[lines={lines},index={index}]"] = (setup_bond_log_summary, params)
+            cases[f"check_a1.get_yesterday_log_summary[lines={lines},index={index}]"] = (setup_a1_log_summary, params)
+    ticks = options["ticks"]
+    for name, setup in (
+        ("load_historical_data", setup_load_historical_data),
+        ("calculate_moving_averages", setup_moving_averages),
+        ("create_price_chart", setup_price_chart),
+        ("create_candlestick_chart", setup_candlestick_chart),
+        ("generate_summary", setup_generate_summary),
+    ):
+        cases[f"bitcoin_chart.{name}[ticks={ticks}]"] = (setup, {})
+    return cases
+
+
+def peak_rss_mb():
+    # ru_maxrss は fork 元の値を引き継ぐため、exec 後のプロセスの VmHWM を使う
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024
+    return None
+
+
+def measure(call, reset, repeat):
+    """ウォームアップ1回 → repeat 回の実行時間 → tracemalloc を有効にして1回（ピークメモリ）"""
+    if reset:
+        reset()
+    call()
+    samples = []
+    for _ in range(repeat):
+        if reset:
+            reset()
+        started = time.perf_counter()
+        call()
+        samples.append(time.perf_counter() - started)
+
+    if reset:
+        reset()
+    gc.collect()
+    tracemalloc.start()
+    try:
+        call()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        "wall_seconds": statistics.median(samples),
+        "wall_min_seconds": min(samples),
+        "repeat": repeat,
+        "peak_memory_mb": peak / 2**20,
+        "max_rss_mb": peak_rss_mb(),
+    }
+
+
+def worker(tree, name):
+    with open(os.path.join(tree, "options.json")) as f:
+        options = json.load(f)
+    setup, params = build_cases(options)[name]
+    call, reset = setup(tree, options, **params)
+    return measure(call, reset, options["repeat"])
+
+
+# ---- 親プロセス側 -------------------------------------------------------------
+
+
+def run_case(tree, name):
+    completed = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--worker", name, "--tree", tree],
+        capture_output=True,
+        text=True,
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"{name} の計測に失敗しました:\n{completed.stderr[-2000:]}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def environment():
+    try:
+        revision = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, capture_output=True, text=True
+        ).stdout.strip()
+    except OSError:
+        revision = ""
+    return {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "revision": revision,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def selected(name, only):
+    return not only or any(fnmatch.fnmatchcase(name, pattern) for pattern in only)
+
+
+def run(options=None, only=None, progress=None):
+    """全ケース（only で fnmatch 絞り込み）を計測して {"meta", "options", "results"} を返す"""
+    from tests.stub_server import StubServer
+
+    options = {**DEFAULT_OPTIONS, **(options or {})}
+    names = [name for name in build_cases(options) if selected(name, only)]
+    results = {}
+    with tempfile.TemporaryDirectory() as directory, StubServer(upstream_route) as server:
+        tree = build_tree(directory, server.url, options)
+        for name in names:
+            results[name] = run_case(tree, name)
+            if progress:
+                progress(name, results[name])
+    return {"meta": environment(), "options": options, "results": results}
+
+
+def compare(report, baseline, tolerance=0.25, memory_tolerance=None):
+    """
+    ケースごとに実行時間（中央値）とピークメモリをベースラインと比較
+    status: ok / regression / improved / new（ベースラインにない）/ missing（今回計測していない）
+    """
+    if memory_tolerance is None:
+        memory_tolerance = tolerance
+    rows = []
+    for name, current in report["results"].items():
+        base = baseline["results"].get(name)
+        if base is None:
+            rows.append({"name": name, "status": "new", "regressions": []})
+            continue
+        regressions = []
+        improved = False
+        for metric, allowed, floor in (
+            ("wall_seconds", tolerance, MIN_WALL_DELTA_SECONDS),
+            ("peak_memory_mb", memory_tolerance, MIN_MEMORY_DELTA_MB),
+            ("max_rss_mb", memory_tolerance, MIN_MEMORY_DELTA_MB),
+        ):
+            if current.get(metric) is None or base.get(metric) is None:
+                continue
+            delta = current[metric] - base[metric]
+            if delta > base[metric] * allowed and delta > floor:
+                regressions.append(metric)
+            elif -delta > base[metric] * allowed and -delta > floor:
+                improved = True
+        rows.append(
+            {
+                "name": name,
+                "status": "regression" if regressions else "improved" if improved else "ok",
+                "regressions": regressions,
+                "wall_ratio": current["wall_seconds"] / base["wall_seconds"] if base["wall_seconds"] else None,
+                "memory_ratio": (
+                    current["peak_memory_mb"] / base["peak_memory_mb"] if base["peak_memory_mb"] else None
+                ),
+            }
+        )
+    for name in baseline["results"]:
+        if name not in report["results"]:
+            rows.append({"name": name, "status": "missing", "regressions": []})
+    return rows
+
+
+def _write_json(path, data):
+    with open(path, "w") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+        f.write("\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=DEFAULT_OPTIONS["repeat"])
+    parser.add_argument("--log-lines", type=int, nargs="+", default=DEFAULT_OPTIONS["log_lines"],
+                        help="ログ集計に使う合成ログの行数（為替サンプル数も同じ）")
+    parser.add_argument("--ticks", type=int, default=DEFAULT_OPTIONS["ticks"], help="合成価格履歴の件数（1分間隔）")
+    parser.add_argument("--assets", type=int, default=DEFAULT_OPTIONS["assets"], help="価格アラート判定の銘柄数")
+    parser.add_argument("--only", nargs="+", metavar="PATTERN", help="計測するケース（fnmatch パターン）")
+    parser.add_argument("--list", action="store_true", help="ケース一覧を表示")
+    parser.add_argument("--output", help="結果を JSON で保存")
+    parser.add_argument("--compare", nargs="?", const=DEFAULT_BASELINE, metavar="BASELINE",
+                        help="ベースラインと比較し、悪化があれば終了コード 1（既定: benchmarks/baseline.json）")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="実行時間の許容悪化率")
+    parser.add_argument("--memory-tolerance", type=float, help="メモリの許容悪化率（既定: --tolerance）")
+    parser.add_argument("--save-baseline", nargs="?", const=DEFAULT_BASELINE, metavar="BASELINE",
+                        help="結果をベースラインとして保存")
+    parser.add_argument("--json", action="store_true", help="結果を JSON で出力")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    parser.add_argument("--tree", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(worker(args.tree, args.worker)))
+        return
+
+    options = {
+        "repeat": args.repeat,
+        "log_lines": args.log_lines,
+        "ticks": args.ticks,
+        "assets": args.assets,
+        "log_days": DEFAULT_OPTIONS["log_days"],
+    }
+    if args.list:
+        for name in build_cases(options):
+            print(name)
+        return
+
+    def progress(name, result):
+        if not args.json:
+            print(
+                f"{name:<70}{result['wall_seconds'] * 1e3:>11.2f} ms"
+                f"{result['peak_memory_mb']:>10.1f} MB{result['max_rss_mb']:>10.1f} MB",
+                flush=True,
+            )
+
+    if not args.json:
+        print(f"{'case':<70}{'wall(p50)':>14}{'peak':>13}{'max RSS':>13}")
+    report = run(options, only=args.only, progress=progress)
+
+    rows = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        # --only で外したケースは missing にしない
+        baseline["results"] = {k: v for k, v in baseline["results"].items() if selected(k, args.only)}
+        rows = compare(report, baseline, args.tolerance, args.memory_tolerance)
+        report["comparison"] = {"baseline": args.compare, "baseline_meta": baseline.get("meta"), "cases": rows}
+    if args.output:
+        _write_json(args.output, report)
+    if args.save_baseline:
+        _write_json(args.save_baseline, {k: report[k] for k in ("meta", "options", "results")})
+
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    elif rows is not None:
+        base_meta = report["comparison"]["baseline_meta"] or {}
+        print(f"\nベースライン: {args.compare} ({base_meta.get('revision', '?')}, {base_meta.get('platform', '?')})")
+        if base_meta.get("platform") != report["meta"]["platform"]:
+            print("注意: ベースラインと計測環境が異なります")
+        for row in rows:
+            if row["status"] in ("new", "missing"):
+                print(f"{row['name']:<70}{row['status']:>12}")
+                continue
+            wall = f"{row['wall_ratio']:.2f}x" if row["wall_ratio"] is not None else "-"
+            memory = f"{row['memory_ratio']:.2f}x" if row["memory_ratio"] is not None else "-"
+            detail = f" ({', '.join(row['regressions'])})" if row["regressions"] else ""
+            print(f"{row['name']:<70}{wall:>8}{memory:>8}  {row['status']}{detail}")
+    if rows is not None and any(row["status"] == "regression" for row in rows):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+暗号資産ウォッチリスト監視
+
+CoinGecko の /simple/price は ids にカンマ区切りで複数銘柄を指定できるため、
+監視対象を batch_size 件ずつまとめて取得し（N銘柄で ceil(N / batch_size) 回）、
+変動閾値と cooldown を NumPy で一括判定する
+"""
+
+import math
+
+import numpy as np
+
+from common.watchlist import evaluate_thresholds
+
+# 1リクエストあたりの銘柄数（URL 長と API 側の上限に余裕を持たせる）
+DEFAULT_BATCH_SIZE = 100
+
+
+class AssetWatchlist:
+    def __init__(self, entries, default_threshold, default_cooldown=0):
+        """
+        entries: ["bitcoin", {"id": "ethereum", "label": "ETH", "threshold": 0.05, "cooldown_seconds": 3600}, ...]
+        銘柄ごとに閾値・cooldown を上書き可能（未指定は既定値）
+        """
+        self.ids = []
+        self.labels = []
+        thresholds = []
+        cooldowns = []
+        for entry in entries:
+            if isinstance(entry, str):
+                entry = {"id": entry}
+            coin_id = entry["id"].lower()
+            if coin_id in self.ids:
+                continue
+            self.ids.append(coin_id)
+            self.labels.append(entry.get("label", coin_id.capitalize()))
+            thresholds.append(entry.get("threshold", default_threshold))
+            cooldowns.append(entry.get("cooldown_seconds", default_cooldown))
+        self.thresholds = np.asarray(thresholds, dtype=np.float64)
+        self.cooldowns = np.asarray(cooldowns, dtype=np.float64)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def batches(self, batch_size=DEFAULT_BATCH_SIZE):
+        """/simple/price に渡す ids のまとまり（ceil(N / batch_size) 個）"""
+        return [self.ids[i : i + batch_size] for i in range(0, len(self.ids), batch_size)]
+
+    def expected_calls(self, batch_size=DEFAULT_BATCH_SIZE):
+        return math.ceil(len(self.ids) / batch_size)
+
+    def price_table(self, data, vs_currency):
+        """
+        /simple/price のレスポンス（複数バッチをマージしたもの）を銘柄順の配列に変換
+        レスポンスにない銘柄は NaN
+        """
+        columns = {
+            "price": vs_currency,
+            "change_24h": f"{vs_currency}_24h_change",
+            "volume_24h": f"{vs_currency}_24h_vol",
+            "last_updated": "last_updated_at",
+        }
+        return {
+            name: np.array(
+                [(data.get(coin_id) or {}).get(key, np.nan) for coin_id in self.ids],
+                dtype=np.float64,
+            )
+            for name, key in columns.items()
+        }
+
+    def evaluate(self, current, previous, last_notif, now_ts):
+        """
+        全銘柄の閾値判定と cooldown 判定を一括で行う（common.watchlist.evaluate_thresholds）
+
+        current / previous / last_notif: 銘柄順の配列（欠損は NaN、未通知は 0）
+        戻り値: change, valid, exceeded, suppressed, notify, last_notif
+        """
+        return evaluate_thresholds(current, previous, last_notif, now_ts, self.thresholds, self.cooldowns)
@@ -4,19 +4,29 @@ Bitcoin チャート表示ツール
 取得したBitcoin価格データをチャートで可視化
 """
 
+import os
+import matplotlib
+
+# cron / 常駐デーモンではディスプレイがないため、明示指定がなければ Agg で描画
+if not os.environ.get('MPLBACKEND'):
+    matplotlib.use('Agg')
+
 import matplotlib.pyplot as plt
 import matplotlib.dates as mdates
-from matplotlib.patches import Rectangle
 import pandas as pd
 import numpy as np
-import json
-import os
 from datetime import datetime
 import logging
-from bitcoin_tracker import load_config, BitcoinTracker
-
-# 設定読み込み
-config = load_config()
+import time
+# 設定は bitcoin_tracker で読み込み済みのものを使う（メトリクスも bitcoin_tracker で有効化済み）
+from bitcoin_tracker import config, BitcoinTracker, HISTORY_DIR, ROLLUP_DIR
+from common import metrics
+from candlestick_renderer import draw_candlesticks, draw_volume_bars
+from downsample import downsample, bucket_sum
+from chart_cache import ChartCache
+from history_store import HistoryStore
+from ohlcv_rollup import OhlcvRollup, TIMEFRAMES
+import chart_jobs
 
 # ログ設定
 logging.basicConfig(
@@ -25,10 +35,20 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+TIMEFRAME_LABELS = {'1m': '1分足', '5m': '5分足', '15m': '15分足', '1h': '1時間足', '4h': '4時間足', '1d': '日足'}
+BAR_FIELDS = ('open', 'high', 'low', 'close', 'volume')
+SAVE_DPI = 300
+METRICS_MONITOR = 'bitcoin_chart'
+
 class BitcoinChart:
     def __init__(self):
         self.config = config['bitcoin']['chart']
         self.trading_config = config['bitcoin']['trading']
+        # 入力データと設定が前回と同じなら PNG を再生成しない
+        self.render_cache = ChartCache.from_config(self.config)
+        self.render_stats = self.render_cache.stats
+        self.history_store = HistoryStore(config['bitcoin'].get('history_dir', HISTORY_DIR))
+        self.rollup = OhlcvRollup(config['bitcoin'].get('rollup_dir', ROLLUP_DIR))
         
         # フィギュアサイズ設定
         plt.rcParams['figure.figsize'] = (self.config['width'], self.config['height'])
@@ -40,22 +60,22 @@ class BitcoinChart:
             plt.style.use('default')
     
     def load_historical_data(self):
-        """履歴データを読み込み"""
+        """履歴データを読み込み（履歴ストアから直近 chart_days 日分を切り出す）"""
         try:
-            filepath = '/tmp/bitcoin_historical_data.json'
-            if not os.path.exists(filepath):
-                logger.warning("履歴データファイルが見つかりません。データを取得中...")
-                tracker = BitcoinTracker()
-                data = tracker.get_historical_data()
-                tracker.save_data(data, 'bitcoin_historical_data.json')
-            else:
-                with open(filepath, 'r') as f:
-                    data = json.load(f)
+            store = self.history_store
+            if not len(store):
+                logger.warning("履歴データが見つかりません。データを取得中...")
+                BitcoinTracker().get_historical_data()
+            
+            last_ts = store.last_timestamp()
+            window = store.window(last_ts - self.trading_config['chart_days'] * 24 * 3600 * 1000)
             
             # DataFrameに変換
-            df = pd.DataFrame(data)
-            df['datetime'] = pd.to_datetime(df['timestamp'], unit='ms')
-            df.set_index('datetime', inplace=True)
+            df = pd.DataFrame(
+                {'timestamp': window['timestamp'], 'price': window['price'], 'volume': window['volume']},
+                index=pd.to_datetime(window['timestamp'], unit='ms'),
+            )
+            df.index.name = 'datetime'
             
             logger.info(f"履歴データ読み込み完了: {len(df)}件")
             return df
@@ -64,33 +84,74 @@ class BitcoinChart:
             logger.error(f"履歴データ読み込みエラー: {e}")
             raise
     
+    def load_bars(self, timeframe, df, update=True):
+        """df の期間を含む足（保存済みの確定足 + 未確定足）を読み込み"""
+        # トラッカーが取り込んでいない追記分があれば畳み込む（描画ワーカーは更新済みの足を読むだけ）
+        if update:
+            self.rollup.update(self.history_store)
+        period_ms = TIMEFRAMES[timeframe]
+        start_ms = pd.Timestamp(df.index[0]).value // 1_000_000
+        bars = self.rollup.bars(timeframe, start_ms - start_ms % period_ms)
+        bars_df = pd.DataFrame({field: bars[field] for field in BAR_FIELDS},
+                               index=pd.to_datetime(bars['timestamp'], unit='ms'))
+        bars_df.index.name = 'datetime'
+        return bars_df
+    
     def calculate_moving_averages(self, df, periods=[7, 25, 50]):
-        """移動平均線を計算"""
+        """移動平均線を計算（系列全体は pandas でまとめて計算、指標エンジンは1サンプルずつの更新用）"""
         for period in periods:
             if len(df) >= period:
                 df[f'MA{period}'] = df['price'].rolling(window=period).mean()
         return df
     
+    def _render_fingerprint(self, df, chart_type, columns=('price', 'volume'), **extra):
+        """描画キャッシュのキー（入力系列・チャート種別・チャート設定）"""
+        extra['vs_currency'] = self.trading_config['vs_currency']
+        return self.render_cache.fingerprint(df, chart_type, self.config, extra=extra, columns=columns)
+    
+    def downsample_settings(self):
+        """間引き方法と目標点数（chart.downsample、点数の既定は保存画像の横幅ピクセル数）"""
+        settings = self.config.get('downsample', {})
+        points = settings.get('points') or int(self.config['width'] * SAVE_DPI)
+        return settings.get('method', 'minmax'), points
+    
+    def plot_series(self, ax, x, y, **kwargs):
+        """画素幅を超える点を間引いて折れ線を描画"""
+        method, points = self.downsample_settings()
+        y = np.asarray(y, dtype=np.float64)
+        keep = downsample(x, y, points, method)
+        return ax.plot(x[keep], y[keep], **kwargs)
+    
     def create_price_chart(self, df, save_path=None):
-        """価格チャートを作成"""
+        """価格チャートを作成（キャッシュ済みなら描画せず (None, ()) を返す）"""
         try:
+            if save_path is None:
+                save_path = self.config['save_path']
+            fingerprint = self._render_fingerprint(df, 'line')
+            if self.render_cache.restore(fingerprint, save_path):
+                return None, ()
+            started = time.perf_counter()
+            
             fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(self.config['width'], self.config['height']), 
                                          gridspec_kw={'height_ratios': [3, 1]})
             
-            # 価格チャート
-            ax1.plot(df.index, df['price'], label='Bitcoin価格', linewidth=2, color='#f7931a')
+            # 価格チャート（画像の横幅を超える点は極値を残して間引く）
+            x = mdates.date2num(df.index)
+            self.plot_series(ax1, x, df['price'], label='Bitcoin価格', linewidth=2, color='#f7931a')
             
             # 移動平均線
             df = self.calculate_moving_averages(df)
             if 'MA7' in df.columns:
-                ax1.plot(df.index, df['MA7'], label='7日移動平均', alpha=0.7, color='blue')
+                self.plot_series(ax1, x, df['MA7'], label='7日移動平均', alpha=0.7, color='blue')
             if 'MA25' in df.columns:
-                ax1.plot(df.index, df['MA25'], label='25日移動平均', alpha=0.7, color='red')
+                self.plot_series(ax1, x, df['MA25'], label='25日移動平均', alpha=0.7, color='red')
+            ax1.xaxis_date()
             
             ax1.set_title(f'Bitcoin (BTC/{self.trading_config["vs_currency"].upper()}) 価格チャート', 
                          fontsize=16, fontweight='bold')
             ax1.set_ylabel('価格 (USD)', fontsize=12)
-            ax1.legend()
+            # loc='best' は描画した全パスとの重なりを探索して遅いため位置を固定（上端は価格・統計の表示）
+            ax1.legend(loc='lower left')
             ax1.grid(True, alpha=0.3)
             
             # 価格フォーマット
@@ -98,9 +159,13 @@ class BitcoinChart:
             
             # ボリュームチャート（表示設定が有効な場合）
             if self.config.get('show_volume', False):
-                ax2.bar(df.index, df['volume'], alpha=0.6, color='gray', label='取引量')
+                # 出来高は画素幅のバケットに合計して1つの Collection で描画
+                centers, volumes, width = bucket_sum(x, df['volume'], self.downsample_settings()[1])
+                bars = draw_volume_bars(ax2, centers, volumes, width=width)
+                bars.set_label('取引量')
+                ax2.xaxis_date()
                 ax2.set_ylabel('取引量', fontsize=12)
-                ax2.legend()
+                ax2.legend(loc='upper left')
                 ax2.grid(True, alpha=0.3)
                 
                 # ボリュームフォーマット
@@ -145,10 +210,9 @@ class BitcoinChart:
                     verticalalignment='top', horizontalalignment='right')
             
             # 保存
-            if save_path is None:
-                save_path = self.config['save_path']
-            
-            plt.savefig(save_path, dpi=300, bbox_inches='tight')
+            plt.savefig(save_path, dpi=SAVE_DPI, bbox_inches='tight')
+            self.render_cache.store(fingerprint, save_path)
+            metrics.observe(METRICS_MONITOR, 'render', time.perf_counter() - started)
             logger.info(f"チャート保存完了: {save_path}")
             
             return fig, (ax1, ax2) if self.config.get('show_volume', False) else (ax1,)
@@ -157,60 +221,53 @@ class BitcoinChart:
             logger.error(f"チャート作成エラー: {e}")
             raise
     
-    def create_candlestick_chart(self, df, save_path=None):
-        """ローソク足チャートを作成（簡易版）"""
+    def create_candlestick_chart(self, df, save_path=None, timeframe='1h', bars=None):
+        """ローソク足チャートを作成（キャッシュ済みなら描画せず (None, ()) を返す）"""
         try:
-            # 1時間足のデータを作成（簡易的にOHLCを生成）
-            hourly_df = df.resample('1H').agg({
-                'price': ['first', 'max', 'min', 'last'],
-                'volume': 'sum'
-            }).dropna()
-            
-            hourly_df.columns = ['open', 'high', 'low', 'close', 'volume']
+            if save_path is None:
+                save_path = self.config['save_path'].replace('.png', '_candlestick.png')
+            # 保存済みの足を読むだけで、全履歴の resample はしない
+            if bars is None:
+                bars = self.load_bars(timeframe, df)
+            fingerprint = self._render_fingerprint(bars, 'candlestick', columns=BAR_FIELDS,
+                                                   timeframe=timeframe)
+            if self.render_cache.restore(fingerprint, save_path):
+                return None, ()
+            started = time.perf_counter()
             
             fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(self.config['width'], self.config['height']),
                                          gridspec_kw={'height_ratios': [3, 1]})
             
-            # ローソク足を描画
-            for idx, (timestamp, row) in enumerate(hourly_df.iterrows()):
-                color = '#00ff00' if row['close'] >= row['open'] else '#ff0000'  # 緑=上昇、赤=下降
-                
-                # ローソク足の実体
-                height = abs(row['close'] - row['open'])
-                bottom = min(row['open'], row['close'])
-                
-                ax1.add_patch(Rectangle((idx - 0.3, bottom), 0.6, height, 
-                                      facecolor=color, alpha=0.8))
-                
-                # ひげ
-                ax1.plot([idx, idx], [row['low'], row['high']], color='black', linewidth=1)
+            # ローソク足を描画（実体・ひげを各1つの Collection で一括描画）
+            positions = np.arange(len(bars))
+            draw_candlesticks(ax1, positions, bars['open'].to_numpy(), bars['high'].to_numpy(),
+                              bars['low'].to_numpy(), bars['close'].to_numpy())
             
-            ax1.set_title(f'Bitcoin ローソク足チャート (1時間足)', fontsize=16, fontweight='bold')
+            ax1.set_title(f'Bitcoin ローソク足チャート ({TIMEFRAME_LABELS[timeframe]})', fontsize=16, fontweight='bold')
             ax1.set_ylabel('価格 (USD)', fontsize=12)
             ax1.grid(True, alpha=0.3)
             
             # X軸のラベル設定
-            tick_positions = range(0, len(hourly_df), max(1, len(hourly_df) // 10))
+            tick_positions = range(0, len(bars), max(1, len(bars) // 10))
             ax1.set_xticks(tick_positions)
-            ax1.set_xticklabels([hourly_df.index[i].strftime('%m/%d %H:%M') 
+            ax1.set_xticklabels([bars.index[i].strftime('%m/%d %H:%M') 
                                for i in tick_positions], rotation=45)
             
             # ボリュームチャート
             if self.config.get('show_volume', False):
-                ax2.bar(range(len(hourly_df)), hourly_df['volume'], alpha=0.6, color='gray')
+                draw_volume_bars(ax2, positions, bars['volume'].to_numpy())
                 ax2.set_ylabel('取引量', fontsize=12)
                 ax2.set_xticks(tick_positions)
-                ax2.set_xticklabels([hourly_df.index[i].strftime('%m/%d %H:%M') 
+                ax2.set_xticklabels([bars.index[i].strftime('%m/%d %H:%M') 
                                    for i in tick_positions], rotation=45)
                 ax2.grid(True, alpha=0.3)
             
             plt.tight_layout()
             
             # 保存
-            if save_path is None:
-                save_path = self.config['save_path'].replace('.png', '_candlestick.png')
-            
-            plt.savefig(save_path, dpi=300, bbox_inches='tight')
+            plt.savefig(save_path, dpi=SAVE_DPI, bbox_inches='tight')
+            self.render_cache.store(fingerprint, save_path)
+            metrics.observe(METRICS_MONITOR, 'render', time.perf_counter() - started)
             logger.info(f"ローソク足チャート保存完了: {save_path}")
             
             return fig, (ax1, ax2) if self.config.get('show_volume', False) else (ax1,)
@@ -223,8 +280,8 @@ class BitcoinChart:
         """チャートを表示"""
         plt.show()
     
-    def generate_summary(self, df):
-        """価格サマリーを生成"""
+    def generate_summary(self, df, bars=None, timeframe=None):
+        """価格サマリーを生成（bars があれば指定した足の最新足も含める）"""
         try:
             current_price = df['price'].iloc[-1]
             previous_price = df['price'].iloc[0]
@@ -245,6 +302,12 @@ class BitcoinChart:
                 'period_start': df.index[0].isoformat(),
                 'period_end': df.index[-1].isoformat()
             }
+            if bars is not None and len(bars):
+                latest = bars.iloc[-1]
+                summary['timeframe'] = timeframe
+                summary['bars'] = len(bars)
+                summary['latest_bar'] = {'start': bars.index[-1].isoformat(),
+                                         **{field: float(latest[field]) for field in BAR_FIELDS}}
             
             logger.info(f"価格サマリー生成完了")
             return summary
@@ -253,33 +316,14 @@ class BitcoinChart:
             logger.error(f"サマリー生成エラー: {e}")
             raise
 
-def main():
-    """メイン処理"""
+def main(timeframe=None, timeframes=None):
+    """
+    メイン処理（timeframe / timeframes: ローソク足・サマリーの足、未指定は chart.timeframe）
+    描画は chart_jobs でチャートごとのジョブに分けてプロセスプールで行う
+    """
     try:
         logger.info("Bitcoinチャート作成開始")
-        
-        chart = BitcoinChart()
-        df = chart.load_historical_data()
-        
-        # チャートタイプに応じて作成
-        chart_type = chart.config.get('chart_type', 'line')
-        
-        if chart_type == 'candlestick':
-            fig, axes = chart.create_candlestick_chart(df)
-        else:
-            fig, axes = chart.create_price_chart(df)
-        
-        # サマリー生成
-        summary = chart.generate_summary(df)
-        
-        logger.info("チャート作成完了")
-        logger.info(f"現在価格: ${summary['current_price']:,.2f}")
-        logger.info(f"期間変動: {summary['price_change_percent']:+.2f}%")
-        
-        # チャート表示（オプション）
-        # chart.show_chart()
-        
-        return summary
+        return chart_jobs.run(timeframe=timeframe, timeframes=timeframes)
         
     except Exception as e:
         logger.error(f"メイン処理エラー: {e}")
@@ -4,13 +4,27 @@ Bitcoin価格取得・チャート表示ツール
 CoinGecko APIを使用してBitcoinの価格データを取得し、チャートで表示
 """
 
+import numpy as np
 import requests
 import json
 import os
+import sys
 import logging
-from datetime import datetime, timedelta, timezone
+from datetime import datetime, timezone
 import time
 
+# 共通モジュール（/home/opc/common）を参照できるようにする
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common import metrics
+from common.http_cache import HttpCache
+from common.notifier import Notifier
+from common.state_store import StateStore
+from asset_watchlist import DEFAULT_BATCH_SIZE, AssetWatchlist
+from history_ingest import HistoryIngestor
+from ohlcv_rollup import DEFAULT_DIRECTORY as ROLLUP_DIR
+from ohlcv_rollup import OhlcvRollup
+from indicators import IndicatorEngine
+
 
 def load_config():
     """設定ファイルを読み込み"""
@@ -24,6 +38,7 @@ def load_config():
 
 # 設定読み込み
 config = load_config()
+metrics.configure(config)
 
 # ログ設定
 logging.basicConfig(
@@ -36,6 +51,11 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+STATE_NAMESPACE = "bitcoin"
+# 旧形式の JSON 履歴（履歴ストアが空のときに一度だけ取り込む）
+HISTORY_FILE = "bitcoin_historical_data.json"
+HISTORY_DIR = "/tmp/bitcoin_history"
+
 
 class BitcoinTracker:
     def __init__(self):
@@ -44,27 +64,70 @@ class BitcoinTracker:
         self.trading_config = self.config["trading"]
         self.base_url = self.api_config["coingecko_base_url"]
         self.session = requests.Session()
-
-    def get_current_price(self):
-        """現在のBitcoin価格を取得"""
+        self.http_cache = HttpCache.from_config(config, self.session)
+        self.state_store = StateStore.from_config(config)
+        self.notifier = Notifier.from_config(config)
+        self.history = HistoryIngestor(
+            self.session,
+            self.base_url,
+            self.trading_config["symbol"],
+            self.trading_config["vs_currency"],
+            self.config.get("history_dir", HISTORY_DIR),
+            legacy_path=os.path.join("/tmp", HISTORY_FILE),
+            timeout=self.api_config["timeout"],
+        )
+        self.rollup = OhlcvRollup(self.config.get("rollup_dir", ROLLUP_DIR))
+        # 指標の状態は初回の update_indicators で状態ストアから復元する
+        self.indicators = None
+
+    def build_watchlist(self):
+        """監視銘柄（主銘柄 trading.symbol は常に先頭）"""
+        alerts = self.config["alerts"]
+        entries = [self.trading_config["symbol"]] + list(self.config.get("watchlist", []))
+        # 主銘柄の設定がウォッチリスト側にあればそちらを使う
+        for entry in entries[1:]:
+            if isinstance(entry, dict) and entry["id"].lower() == entries[0]:
+                entries[0] = entry
+        return AssetWatchlist(
+            entries,
+            alerts["price_change_threshold"],
+            alerts.get("cooldown_seconds", 0),
+        )
+
+    def get_prices(self, watchlist):
+        """監視銘柄の価格を batch_size 件ずつまとめて取得（API 呼び出しは ceil(N / batch_size) 回）"""
+        url = f"{self.base_url}/simple/price"
+        batch_size = self.api_config.get("batch_size", DEFAULT_BATCH_SIZE)
+        data = {}
         try:
-            url = f"{self.base_url}/simple/price"
-            params = {
-                "ids": self.trading_config["symbol"],
-                "vs_currencies": self.trading_config["vs_currency"],
-                "include_24hr_change": "true",
-                "include_24hr_vol": "true",
-                "include_last_updated_at": "true",
-            }
+            with metrics.stage(STATE_NAMESPACE, "fetch"):
+                for ids in watchlist.batches(batch_size):
+                    params = {
+                        "ids": ",".join(ids),
+                        "vs_currencies": self.trading_config["vs_currency"],
+                        "include_24hr_change": "true",
+                        "include_24hr_vol": "true",
+                        "include_last_updated_at": "true",
+                    }
+                    logger.info(f"現在価格取得: {url} ({len(ids)}銘柄)")
+                    response = self.http_cache.get(
+                        url, params=params, timeout=self.api_config["timeout"]
+                    )
+                    response.raise_for_status()
+                    data.update(response.json())
+            return data
 
-            logger.info(f"現在価格取得: {url}")
-            response = self.session.get(
-                url, params=params, timeout=self.api_config["timeout"]
-            )
-            response.raise_for_status()
+        except Exception as e:
+            metrics.count(STATE_NAMESPACE, "api_errors", api="coingecko")
+            logger.error(f"価格取得エラー: {e}")
+            raise
 
-            data = response.json()
-            bitcoin_data = data[self.trading_config["symbol"]]
+    def get_current_price(self, prices=None):
+        """現在のBitcoin価格を取得（prices を渡した場合はそこから取り出す）"""
+        try:
+            if prices is None:
+                prices = self.get_prices(AssetWatchlist([self.trading_config["symbol"]], 0))
+            bitcoin_data = prices[self.trading_config["symbol"]]
 
             price_info = {
                 "price": bitcoin_data[self.trading_config["vs_currency"]],
@@ -88,62 +151,28 @@ class BitcoinTracker:
             raise
 
     def get_historical_data(self, days=None):
-        """履歴データを取得（簡易版：現在価格から模擬データを生成）"""
+        """履歴データを取得（CoinGecko の実データを差分取得して履歴ストアと OHLCV 足に保存）"""
         if days is None:
             days = self.trading_config["chart_days"]
 
         try:
-            # まず現在価格を取得
-            current_data = self.get_current_price()
-            current_price = current_data["price"]
-
-            # 簡易的な履歴データを生成（実際のAPIエラー回避用）
-            logger.info(f"履歴データ生成: {days}日間（模擬データ）")
-
-            historical_data = []
-            import random
-
-            base_time = datetime.now()
-
-            for i in range(days * 24):  # 1時間ごとのデータを生成
-                # ランダムな価格変動を追加（±3%以内）
-                price_variation = random.uniform(-0.03, 0.03)
-                price = current_price * (1 + price_variation)
-
-                # ランダムなボリューム
-                volume = random.uniform(1000000, 5000000)
-
-                timestamp = base_time - timedelta(hours=days * 24 - i)
-
-                historical_data.append(
-                    {
-                        "timestamp": int(timestamp.timestamp() * 1000),
-                        "datetime": timestamp.isoformat(),
-                        "price": price,
-                        "volume": volume,
-                    }
-                )
-
-            logger.info(f"履歴データ生成完了: {len(historical_data)}件")
+            with metrics.stage(STATE_NAMESPACE, "history"):
+                historical_data = self.history.refresh(days)
+            logger.info(f"履歴データ取得完了: {len(historical_data['timestamp'])}件")
+            # 追記分だけを各足の未確定足に畳み込む
+            self.rollup.update(self.history.store)
             return historical_data
 
         except Exception as e:
-            logger.error(f"履歴データ生成エラー: {e}")
-            raise
-
-    def save_data(self, data, filename):
-        """データをJSONファイルに保存"""
-        try:
-            filepath = os.path.join("/tmp", filename)
-            with open(filepath, "w") as f:
-                json.dump(data, f, indent=2, ensure_ascii=False)
-            logger.info(f"データ保存完了: {filepath}")
-        except Exception as e:
-            logger.error(f"データ保存エラー: {e}")
+            metrics.count(STATE_NAMESPACE, "api_errors", api="coingecko")
+            logger.error(f"履歴データ取得エラー: {e}")
             raise
 
     def load_data(self, filename):
-        """JSONファイルからデータを読み込み"""
+        """
+        状態ストア導入前の JSON ファイル（/tmp/<filename>）を読み込み
+        load_state の一度きりの引き継ぎ専用。保存は状態ストアと履歴ストアに行い、JSON には書き戻さない
+        """
         try:
             filepath = os.path.join("/tmp", filename)
             if not os.path.exists(filepath):
@@ -157,90 +186,152 @@ class BitcoinTracker:
             logger.error(f"データ読み込みエラー: {e}")
             return None
 
-    def check_price_alerts(self, current_price, previous_price, previous_data=None):
-        """価格アラートをチェック（cooldown 対応、戻り値: 発火した notif の UTC epoch 秒 or None）"""
-        if not previous_price:
-            return None
-
-        threshold = self.config["alerts"]["price_change_threshold"]
-        change_ratio = abs(current_price - previous_price) / previous_price
-
-        if change_ratio < threshold:
-            return None
-
-        # Cooldown チェック
-        cooldown_seconds = self.config["alerts"].get("cooldown_seconds", 0)
-        last_notif_ts = (previous_data or {}).get("last_notif_ts")
-        now_ts = int(time.time())
-        if last_notif_ts and (now_ts - last_notif_ts) < cooldown_seconds:
-            elapsed = now_ts - last_notif_ts
-            logger.info(
-                f"閾値超過だが cooldown 中 (前回通知から {elapsed}s < {cooldown_seconds}s) - 通知スキップ"
+    def load_state(self):
+        """前回の価格・cooldown 状態を状態ストアから読み込み"""
+        state = self.state_store.get(STATE_NAMESPACE, "current_price")
+        if state is None:
+            # 状態ストア導入前の JSON ファイルから引き継ぎ
+            state = self.load_data("bitcoin_current_price.json")
+        return state
+
+    def load_asset_states(self, watchlist):
+        """主銘柄以外の前回価格・cooldown 状態（キー: asset:<id>）"""
+        stored = self.state_store.get_all(STATE_NAMESPACE)
+        return {coin_id: stored.get(f"asset:{coin_id}") or {} for coin_id in watchlist.ids[1:]}
+
+    def save_state(self, current_data, asset_states=None):
+        """現在の価格・cooldown 状態と指標・各銘柄の状態を状態ストアへ原子的に保存"""
+        values = {"current_price": current_data}
+        if self.indicators is not None:
+            values["indicators"] = self.indicators.to_state()
+        for coin_id, state in (asset_states or {}).items():
+            values[f"asset:{coin_id}"] = state
+        with metrics.stage(STATE_NAMESPACE, "state_save"):
+            self.state_store.set_many(STATE_NAMESPACE, values)
+        logger.info("状態保存完了")
+
+    def update_indicators(self, current_data):
+        """現在価格で各テクニカル指標を O(1) 更新して最新値を返す"""
+        if self.indicators is None:
+            self.indicators = IndicatorEngine.from_state(
+                self.state_store.get(STATE_NAMESPACE, "indicators"),
+                self.config.get("indicators"),
             )
-            return None
-
-        direction = "上昇" if current_price > previous_price else "下落"
-        change_percent = change_ratio * 100
-
-        message = f"🚨 Bitcoin価格アラート！\n"
-        message += f"価格{direction}: {change_percent:.2f}%\n"
-        message += f"現在価格: ${current_price:,.2f}\n"
-        message += f"前回価格: ${previous_price:,.2f}"
-
-        logger.warning(message)
-
-        # Pushover通知（設定で有効な場合）
-        if self.config["alerts"]["enable_pushover"]:
-            self.send_pushover_notification(message)
-
-        return now_ts
-
-    def send_pushover_notification(self, message):
-        """Pushover通知を送信"""
-        try:
-            pushover_config = config["pushover"]
-            response = requests.post(
-                "https://api.pushover.net/1/messages.json",
-                data={
-                    "token": pushover_config["api_token"],
-                    "user": pushover_config["user_key"],
-                    "message": message,
-                    "title": "🪙 Bitcoin価格アラート",
-                },
-                timeout=30,
-            )
-            response.raise_for_status()
-            logger.info("Pushover通知送信成功")
-        except Exception as e:
-            logger.error(f"Pushover通知送信エラー: {e}")
-
-
-def main():
-    """メイン処理"""
+        values = self.indicators.update(
+            current_data["price"],
+            current_data["volume_24h"],
+            timestamp=current_data["last_updated"],
+        )
+        rsi_key = f"rsi_{self.indicators.settings['rsi_period']}"
+        logger.info(
+            f"指標更新: {rsi_key.upper()}={values[rsi_key]:.1f}, "
+            f"BB=[{values['bb_lower']:,.2f}, {values['bb_upper']:,.2f}] "
+            f"(サンプル {self.indicators.samples}件)"
+        )
+        return values
+
+    def check_price_alerts(self, watchlist, table, previous_states, indicators=None):
+        """
+        全銘柄の価格アラートを一括判定（cooldown 対応）
+        previous_states: 銘柄順の前回状態 {"price", "last_notif_ts"}
+        戻り値: 銘柄順の新しい last_notif_ts（未通知は None）
+        """
+        current = table["price"]
+        previous = np.array(
+            [state.get("price") or np.nan for state in previous_states], dtype=np.float64
+        )
+        last_notif = np.array(
+            [state.get("last_notif_ts") or 0 for state in previous_states], dtype=np.float64
+        )
+        now_ts = int(time.time())
+        with metrics.stage(STATE_NAMESPACE, "evaluate"):
+            result = watchlist.evaluate(current, previous, last_notif, now_ts)
+
+        messages = []
+        for i, label in enumerate(watchlist.labels):
+            if not result["valid"][i]:
+                continue
+            if result["suppressed"][i]:
+                metrics.count(STATE_NAMESPACE, "cooldown_suppressed")
+                elapsed = now_ts - int(last_notif[i])
+                logger.info(
+                    f"[{label}] 閾値超過だが cooldown 中 (前回通知から {elapsed}s < {int(watchlist.cooldowns[i])}s) - 通知スキップ"
+                )
+            elif result["notify"][i]:
+                direction = "上昇" if result["change"][i] > 0 else "下落"
+                message = f"🚨 {label}価格アラート！\n"
+                message += f"価格{direction}: {abs(result['change'][i]) * 100:.2f}%\n"
+                message += f"現在価格: ${current[i]:,.2f}\n"
+                message += f"前回価格: ${previous[i]:,.2f}"
+                if i == 0:
+                    for name, value in (indicators or {}).items():
+                        # 計算済みの RSI があれば添える（ウィンドウが埋まるまでは NaN）
+                        if name.startswith("rsi_") and value == value:
+                            message += f"\nRSI({name[4:]}): {value:.1f}"
+                logger.warning(message)
+                messages.append(message)
+
+        # Pushover通知（設定で有効な場合、複数銘柄は1通にまとめる）
+        if messages and self.config["alerts"]["enable_pushover"]:
+            title = f"🪙 {watchlist.labels[0]}価格アラート" if len(watchlist) == 1 else "🪙 暗号資産価格アラート"
+            self.send_pushover_notification("\n\n".join(messages), title)
+
+        return [int(ts) or None for ts in result["last_notif"]]
+
+    def send_pushover_notification(self, message, title="🪙 Bitcoin価格アラート", priority="alert"):
+        """Pushover通知を送信（キューに積んでバックグラウンドで送信）"""
+        with metrics.stage(STATE_NAMESPACE, "notify"):
+            self.notifier.notify(message, title, source=STATE_NAMESPACE, priority=priority)
+        metrics.count(STATE_NAMESPACE, "notifications", priority=priority)
+
+
+def main(tracker=None):
+    """メイン処理（常駐モードでは tracker を使い回してセッションを維持）"""
     try:
         logger.info("Bitcoin価格取得開始")
-        tracker = BitcoinTracker()
-
-        # 現在価格取得
-        current_data = tracker.get_current_price()
+        if tracker is None:
+            tracker = BitcoinTracker()
+
+        # 監視銘柄の現在価格をまとめて取得
+        watchlist = tracker.build_watchlist()
+        prices = tracker.get_prices(watchlist)
+        table = watchlist.price_table(prices, tracker.trading_config["vs_currency"])
+        current_data = tracker.get_current_price(prices)
+        current_data["indicators"] = tracker.update_indicators(current_data)
+        for i, label in enumerate(watchlist.labels[1:], start=1):
+            if np.isnan(table["price"][i]):
+                logger.warning(f"[{label}] レスポンスに価格がありません - スキップ")
+            else:
+                logger.info(
+                    f"[{label}] 価格: ${table['price'][i]:,.2f} (24h変動: {table['change_24h'][i]:.2f}%)"
+                )
 
         # 前回データと比較（cooldown 履歴を引き継ぎ）
-        previous_data = tracker.load_data("bitcoin_current_price.json") or {}
-        notif_ts = None
-        if previous_data.get("price"):
-            notif_ts = tracker.check_price_alerts(
-                current_data["price"], previous_data.get("price"), previous_data
-            )
+        with metrics.stage(STATE_NAMESPACE, "state_load"):
+            previous_data = tracker.load_state() or {}
+            asset_states = tracker.load_asset_states(watchlist)
+        previous_states = [previous_data] + [asset_states[c] for c in watchlist.ids[1:]]
+        last_notif = tracker.check_price_alerts(
+            watchlist, table, previous_states, current_data["indicators"]
+        )
 
         # cooldown 履歴を保持: 通知発火時のみ更新、それ以外は前回値を引き継ぐ
-        current_data["last_notif_ts"] = notif_ts or previous_data.get("last_notif_ts")
+        current_data["last_notif_ts"] = last_notif[0]
+        new_asset_states = {}
+        for i, coin_id in enumerate(watchlist.ids[1:], start=1):
+            if np.isnan(table["price"][i]):
+                continue
+            new_asset_states[coin_id] = {
+                "price": float(table["price"][i]),
+                "change_24h": float(table["change_24h"][i]),
+                "last_notif_ts": last_notif[i],
+            }
 
         # 現在データを保存
-        tracker.save_data(current_data, "bitcoin_current_price.json")
+        tracker.save_state(current_data, new_asset_states)
 
-        # 履歴データ取得
+        # 履歴データ取得（取得した差分は HistoryIngestor が保存）
         historical_data = tracker.get_historical_data()
-        tracker.save_data(historical_data, "bitcoin_historical_data.json")
 
         logger.info("Bitcoin価格取得完了")
         return current_data, historical_data
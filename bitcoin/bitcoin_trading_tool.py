@@ -6,9 +6,22 @@ Bitcoin自動売買ツール（メイン実行ファイル）
 
 import sys
 import argparse
-import logging
-from bitcoin_tracker import BitcoinTracker, main as tracker_main
-from bitcoin_chart import BitcoinChart, main as chart_main
+
+
+def load_action(action):
+    """
+    アクションに必要なモジュールだけを読み込む
+    track では pandas / matplotlib を読み込まない（chart も描画ワーカー側で読み込む）
+    """
+    runners = {}
+    if action in ['track', 'both']:
+        from bitcoin_tracker import main as tracker_main
+        runners['track'] = tracker_main
+    if action in ['chart', 'both']:
+        import chart_jobs
+        runners['chart'] = chart_jobs.run
+        runners['chart_prepare'] = chart_jobs.prepare
+    return runners
 
 def main():
     parser = argparse.ArgumentParser(description='Bitcoin自動売買ツール')
@@ -18,23 +31,47 @@ def main():
                        help='履歴データの日数 (デフォルト: 7日)')
     parser.add_argument('--chart-type', choices=['line', 'candlestick'], default='candlestick',
                        help='チャートタイプ (line: ライン, candlestick: ローソク足)')
+    parser.add_argument('--timeframe', choices=['1m', '5m', '15m', '1h', '4h', '1d'], nargs='+',
+                       help='ローソク足の足（複数指定で足ごとに並列描画、サマリーは先頭の足。'
+                            'デフォルト: config の chart.timeframe、未設定は 1h）')
+    parser.add_argument('--workers', type=int,
+                       help='チャート描画のワーカー数 (デフォルト: config の chart.workers、未設定は CPU コア数)')
     
     args = parser.parse_args()
     
     try:
-        if args.action in ['track', 'both']:
+        runners = load_action(args.action)
+        
+        executor = None
+        if 'chart' in runners and 'track' in runners:
+            # 価格取得（ネットワーク待ち）の間に描画ワーカーの起動と import を済ませておく
+            executor = runners['chart_prepare'](timeframes=args.timeframe, workers=args.workers)
+        
+        if 'track' in runners:
             print("📊 Bitcoin価格データを取得中...")
-            current_data, historical_data = tracker_main()
+            current_data, historical_data = runners['track']()
             print(f"✅ 現在価格: ${current_data['price']:,.2f}")
             print(f"✅ 24h変動: {current_data['change_24h']:+.2f}%")
         
-        if args.action in ['chart', 'both']:
+        if 'chart' in runners:
             print("📈 チャートを生成中...")
-            summary = chart_main()
-            print(f"✅ チャート生成完了")
+            try:
+                summary = runners['chart'](timeframes=args.timeframe, workers=args.workers, executor=executor)
+            finally:
+                if executor is not None:
+                    executor.shutdown()
+            render_stats = summary['render_stats']
+            print(f"✅ チャート生成完了 (描画 {render_stats['rendered']}件 / キャッシュ利用 {render_stats['skipped']}件, "
+                  f"{summary['render_wall_seconds']:.2f}秒)")
+            for job in summary['render_jobs']:
+                print(f"   {job['name']}: {job['seconds']:.2f}秒 ({job['status']}) → {job['save_path']}")
             print(f"   期間変動: {summary['price_change_percent']:+.2f}%")
             print(f"   最高値: ${summary['max_price']:,.2f}")
             print(f"   最安値: ${summary['min_price']:,.2f}")
+            if 'latest_bar' in summary:
+                bar = summary['latest_bar']
+                print(f"   最新{summary['timeframe']}足: 始値 ${bar['open']:,.2f} / 高値 ${bar['high']:,.2f} / "
+                      f"安値 ${bar['low']:,.2f} / 終値 ${bar['close']:,.2f}")
         
         print("\n🎉 処理完了！")
         
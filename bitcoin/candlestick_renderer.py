@@ -0,0 +1,93 @@
+"""
+ベクトル化ローソク足レンダラ
+
+実体・ひげ・出来高バーをそれぞれ1つの Collection として NumPy 配列から構築する。
+ローソク1本ごとに Rectangle と Line2D を追加する方式と同じ見た目のまま、
+アーティスト数が本数に依存しないため数万本でも描画時間がほぼ線形に収まる。
+"""
+
+import numpy as np
+from matplotlib.collections import LineCollection, PolyCollection
+from matplotlib.colors import to_rgba
+
+UP_COLOR = "#00ff00"  # 緑=上昇
+DOWN_COLOR = "#ff0000"  # 赤=下降
+
+
+def _bar_verts(x, bottom, top, width):
+    """中心 x・下端 bottom・上端 top の矩形頂点配列 (n, 4, 2)"""
+    half = width / 2.0
+    verts = np.empty((len(x), 4, 2))
+    verts[:, 0, 0] = verts[:, 1, 0] = x - half
+    verts[:, 2, 0] = verts[:, 3, 0] = x + half
+    verts[:, 0, 1] = verts[:, 3, 1] = bottom
+    verts[:, 1, 1] = verts[:, 2, 1] = top
+    return verts
+
+
+def candle_geometry(x, open_, high, low, close, width=0.6):
+    """
+    ローソク足の頂点・線分・上昇マスクをまとめて計算
+    戻り値: (body_verts (n,4,2), wick_segments (n,2,2), up_mask (n,))
+    """
+    x = np.asarray(x, dtype=np.float64)
+    open_ = np.asarray(open_, dtype=np.float64)
+    close = np.asarray(close, dtype=np.float64)
+    up = close >= open_
+    body = _bar_verts(x, np.minimum(open_, close), np.maximum(open_, close), width)
+    wicks = np.empty((len(x), 2, 2))
+    wicks[:, :, 0] = x[:, None]
+    wicks[:, 0, 1] = low
+    wicks[:, 1, 1] = high
+    return body, wicks, up
+
+
+def draw_candlesticks(
+    ax,
+    x,
+    open_,
+    high,
+    low,
+    close,
+    width=0.6,
+    up_color=UP_COLOR,
+    down_color=DOWN_COLOR,
+    alpha=0.8,
+    wick_color="black",
+    wick_width=1,
+):
+    """実体とひげをそれぞれ1つの Collection で描画（実体の上にひげを重ねる）"""
+    body, wicks, up = candle_geometry(x, open_, high, low, close, width)
+    colors = np.where(up[:, None], to_rgba(up_color, alpha), to_rgba(down_color, alpha))
+
+    bodies = PolyCollection(body, facecolors=colors, edgecolors="none", zorder=1)
+    # ax.plot（Line2D）の既定と同じく線端を線幅の半分だけ延ばす
+    lines = LineCollection(
+        wicks, colors=wick_color, linewidths=wick_width, capstyle="projecting", zorder=2
+    )
+    ax.add_collection(bodies, autolim=True)
+    ax.add_collection(lines, autolim=True)
+    ax.autoscale_view()
+    return bodies, lines
+
+
+def draw_volume_bars(ax, x, volume, width=0.8, color="gray", alpha=0.6, up_mask=None):
+    """
+    出来高バーを1つの Collection で描画
+    up_mask を渡すと上昇/下降で色分けする（未指定時は単色）
+    """
+    x = np.asarray(x, dtype=np.float64)
+    volume = np.asarray(volume, dtype=np.float64)
+    verts = _bar_verts(x, np.zeros_like(volume), volume, width)
+    if up_mask is None:
+        facecolors = [to_rgba(color, alpha)]
+    else:
+        facecolors = np.where(
+            np.asarray(up_mask)[:, None], to_rgba(UP_COLOR, alpha), to_rgba(DOWN_COLOR, alpha)
+        )
+    bars = PolyCollection(verts, facecolors=facecolors, edgecolors="none")
+    # ax.bar と同様に 0 より下へ余白を取らない
+    bars.sticky_edges.y.append(0)
+    ax.add_collection(bars, autolim=True)
+    ax.autoscale_view()
+    return bars
@@ -0,0 +1,134 @@
+"""
+チャート描画結果のコンテンツアドレス型キャッシュ
+
+入力系列（時刻・価格・出来高）、チャート種別、描画に効くチャート設定から
+フィンガープリントを計算し、同じフィンガープリントの PNG が保存済みなら
+savefig を行わずにそのファイルを保存先へコピーする。
+キャッシュは合計サイズ上限を超えたら最終利用の古い順に削除する（LRU）。
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DIRECTORY = "/tmp/bitcoin_chart_cache"
+DEFAULT_MAX_BYTES = 50 * 1024 * 1024
+# 描画処理を変えたら上げる（古いキャッシュを無効化する）
+RENDER_VERSION = 2
+# 出力先やキャッシュ自体の設定は描画結果に影響しないためフィンガープリントから除外
+IGNORED_OPTIONS = ("save_path", "cache")
+
+
+class ChartCache:
+    def __init__(self, directory=DEFAULT_DIRECTORY, max_bytes=DEFAULT_MAX_BYTES, enabled=True):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self.stats = {"rendered": 0, "skipped": 0}
+        if enabled:
+            os.makedirs(directory, exist_ok=True)
+
+    @classmethod
+    def from_config(cls, chart_config):
+        """config.json の bitcoin.chart.cache セクションから生成（未設定時は既定値）"""
+        cache_config = chart_config.get("cache", {})
+        return cls(
+            directory=cache_config.get("directory", DEFAULT_DIRECTORY),
+            max_bytes=cache_config.get("max_bytes", DEFAULT_MAX_BYTES),
+            enabled=cache_config.get("enabled", True),
+        )
+
+    # ---- 公開API --------------------------------------------------------
+
+    def fingerprint(self, df, chart_type, options, extra=None, columns=("price", "volume")):
+        """入力系列（columns）・チャート種別・描画設定の SHA-256"""
+        digest = hashlib.sha256()
+        header = {
+            "version": RENDER_VERSION,
+            "chart_type": chart_type,
+            "options": {k: v for k, v in options.items() if k not in IGNORED_OPTIONS},
+            "extra": extra or {},
+            "rows": len(df),
+        }
+        digest.update(json.dumps(header, sort_keys=True, default=str).encode("utf-8"))
+        digest.update(df.index.asi8.tobytes())
+        for column in columns:
+            digest.update(df[column].to_numpy(dtype="float64").tobytes())
+        return digest.hexdigest()
+
+    def restore(self, fingerprint, save_path):
+        """キャッシュ済みなら save_path へコピーして True（描画をスキップしてよい）"""
+        if not self.enabled:
+            return False
+        path = self._path(fingerprint)
+        try:
+            # mtime を最終利用時刻として LRU に使う
+            os.utime(path)
+        except OSError:
+            return False
+        if not os.path.exists(save_path) or not _same_file(path, save_path):
+            self._copy(path, save_path)
+        self.stats["skipped"] += 1
+        logger.info(f"チャートキャッシュ利用（描画スキップ）: {save_path}")
+        return True
+
+    def store(self, fingerprint, save_path):
+        """描画済みの save_path をキャッシュへ登録"""
+        self.stats["rendered"] += 1
+        if not self.enabled:
+            return
+        self._copy(save_path, self._path(fingerprint))
+        self._evict()
+
+    # ---- 内部処理 -------------------------------------------------------
+
+    def _path(self, fingerprint):
+        return os.path.join(self.directory, fingerprint + ".png")
+
+    def _copy(self, src, dst):
+        # 一時ファイルにコピーしてから rename し、読み手が途中状態を見ないようにする
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(dst)), suffix=".tmp")
+        os.close(fd)
+        try:
+            shutil.copyfile(src, tmp_path)
+            os.replace(tmp_path, dst)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def _evict(self):
+        entries = []
+        total = 0
+        for name in os.listdir(self.directory):
+            if not name.endswith(".png"):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            logger.info(f"チャートキャッシュ削除: {os.path.basename(path)}")
+
+
+def _same_file(a, b):
+    """サイズと内容が同じか（保存先が既に最新ならコピーしない）"""
+    if os.path.getsize(a) != os.path.getsize(b):
+        return False
+    with open(a, "rb") as fa, open(b, "rb") as fb:
+        return fa.read() == fb.read()
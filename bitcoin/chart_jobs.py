@@ -0,0 +1,212 @@
+"""
+チャート描画ジョブの並列実行
+
+ライン / ローソク足（足ごと）の描画をジョブに分け、上限付きのプロセスプールで描画する
+（matplotlib はスレッドセーフではないため）。各ワーカーは履歴ストアと OHLCV 足の
+memmap ファイルを直接開くので、DataFrame を pickle で受け渡さない。
+ワーカーは forkserver から起動し、bitcoin_chart（pandas / matplotlib）の import は
+forkserver で一度だけ行う。
+"""
+
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TIMEFRAME = "1h"
+
+# ワーカープロセス内で使い回す BitcoinChart
+_chart = None
+
+
+def build_jobs(chart_config, timeframes=None):
+    """
+    描画ジョブ一覧
+    chart.jobs（[{"chart_type": "candlestick", "timeframe": "4h"}, ...]）、未設定なら
+    chart_type / timeframe の1枚。timeframes を指定するとローソク足をその足ごとに描画する
+    """
+    default_timeframe = chart_config.get("timeframe", DEFAULT_TIMEFRAME)
+    specs = chart_config.get("jobs") or [
+        {"chart_type": chart_config.get("chart_type", "line"), "timeframe": default_timeframe}
+    ]
+    jobs = []
+    for spec in specs:
+        chart_type = spec.get("chart_type", "line")
+        if chart_type == "candlestick":
+            spec_timeframes = timeframes or [spec.get("timeframe", default_timeframe)]
+        else:
+            # ライン（ティックそのまま）は足によらず1枚
+            spec_timeframes = [None]
+        for timeframe in spec_timeframes:
+            name = chart_type if timeframe is None else f"{chart_type}_{timeframe}"
+            if any(job["name"] == name for job in jobs):
+                continue
+            jobs.append(
+                {
+                    "name": name,
+                    "chart_type": chart_type,
+                    "timeframe": timeframe,
+                    "save_path": job_save_path(chart_config, chart_type, timeframe, default_timeframe),
+                }
+            )
+    return jobs
+
+
+def job_save_path(chart_config, chart_type, timeframe, default_timeframe=DEFAULT_TIMEFRAME):
+    """ライン: save_path / ローソク足: *_candlestick.png（既定以外の足は *_candlestick_<足>.png）"""
+    save_path = chart_config["save_path"]
+    if chart_type != "candlestick":
+        return save_path
+    if timeframe == default_timeframe:
+        return save_path.replace(".png", "_candlestick.png")
+    return save_path.replace(".png", f"_candlestick_{timeframe}.png")
+
+
+def resolve_workers(configured, job_count):
+    """ワーカー数（設定値、未設定は CPU コア数。コア数とジョブ数を超えない）"""
+    cores = os.cpu_count() or 1
+    return max(1, min(configured or cores, cores, job_count))
+
+
+# ---- ワーカー側 ---------------------------------------------------------------
+
+
+def _get_chart():
+    global _chart
+    if _chart is None:
+        from bitcoin_chart import BitcoinChart
+
+        _chart = BitcoinChart()
+    return _chart
+
+
+def _warm_up():
+    """ワーカーの起動と import を先に済ませる"""
+    _get_chart()
+    return os.getpid()
+
+
+def render_job(job):
+    """1ジョブを描画（入力はストアのファイルから読むので引数はジョブ定義だけ）"""
+    import matplotlib.pyplot as plt
+
+    started = time.perf_counter()
+    chart = _get_chart()
+    rendered_before = chart.render_stats["rendered"]
+    df = chart.load_historical_data()
+    if job["chart_type"] == "candlestick":
+        bars = chart.load_bars(job["timeframe"], df, update=False)
+        chart.create_candlestick_chart(df, job["save_path"], job["timeframe"], bars)
+    else:
+        chart.create_price_chart(df, job["save_path"])
+    # ワーカーは使い回すので描画したフィギュアを解放する
+    plt.close("all")
+    # ワーカープロセスは atexit を通らずに終了するため、描画時間はジョブごとに書き出す
+    from common import metrics
+
+    metrics.flush()
+    return {
+        "name": job["name"],
+        "save_path": job["save_path"],
+        "status": "rendered" if chart.render_stats["rendered"] > rendered_before else "skipped",
+        "seconds": time.perf_counter() - started,
+        "pid": os.getpid(),
+    }
+
+
+def summarize(timeframe):
+    """価格サマリー（指定した足の最新足を含む）"""
+    chart = _get_chart()
+    df = chart.load_historical_data()
+    bars = chart.load_bars(timeframe, df, update=False)
+    return chart.generate_summary(df, bars, timeframe)
+
+
+# ---- 親プロセス側 -------------------------------------------------------------
+
+
+def start_executor(workers):
+    """forkserver（bitcoin_chart を preload）からワーカーを起動して温めておく"""
+    context = multiprocessing.get_context("forkserver")
+    context.set_forkserver_preload(["bitcoin_chart"])
+    executor = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+    for _ in range(workers):
+        executor.submit(_warm_up)
+    return executor
+
+
+def prepare(timeframes=None, workers=None):
+    """
+    描画ワーカーを先に起動する（bitcoin_trading_tool --action both で価格取得と並行して
+    pandas / matplotlib の import を済ませる）。戻り値は run(executor=...) に渡す
+    """
+    from bitcoin_tracker import config
+
+    chart_config = config["bitcoin"]["chart"]
+    jobs = build_jobs(chart_config, timeframes)
+    return start_executor(resolve_workers(workers or chart_config.get("workers"), len(jobs)))
+
+
+def _refresh_inputs(config):
+    """描画前に履歴の有無を確認し、OHLCV 足を一度だけ更新（ワーカーは読むだけ）"""
+    from bitcoin_tracker import HISTORY_DIR, ROLLUP_DIR, BitcoinTracker
+    from history_store import HistoryStore
+    from ohlcv_rollup import OhlcvRollup
+
+    history = HistoryStore(config["bitcoin"].get("history_dir", HISTORY_DIR))
+    if not len(history):
+        logger.warning("履歴データが見つかりません。データを取得中...")
+        BitcoinTracker().get_historical_data()
+    OhlcvRollup(config["bitcoin"].get("rollup_dir", ROLLUP_DIR)).update(history)
+
+
+def run(timeframe=None, timeframes=None, workers=None, executor=None):
+    """
+    全ジョブを描画してサマリーを返す
+    ワーカー数が1でプールも渡されなければ、このプロセスで順に描画する
+    """
+    from bitcoin_tracker import config
+
+    chart_config = config["bitcoin"]["chart"]
+    if timeframe and not timeframes:
+        timeframes = [timeframe]
+    summary_timeframe = (timeframes or [chart_config.get("timeframe", DEFAULT_TIMEFRAME)])[0]
+    _refresh_inputs(config)
+    jobs = build_jobs(chart_config, timeframes)
+    workers = resolve_workers(workers or chart_config.get("workers"), len(jobs))
+
+    started = time.perf_counter()
+    if executor is None and workers == 1:
+        results = [render_job(job) for job in jobs]
+        summary = summarize(summary_timeframe)
+    else:
+        own_executor = executor is None
+        if own_executor:
+            executor = start_executor(workers)
+        try:
+            summary_future = executor.submit(summarize, summary_timeframe)
+            results = list(executor.map(render_job, jobs))
+            summary = summary_future.result()
+        finally:
+            if own_executor:
+                executor.shutdown()
+    wall_seconds = time.perf_counter() - started
+
+    for result in results:
+        logger.info(f"チャート {result['name']}: {result['seconds']:.2f}s ({result['status']})")
+    summary["render_jobs"] = results
+    summary["render_wall_seconds"] = wall_seconds
+    summary["render_stats"] = {
+        "rendered": sum(r["status"] == "rendered" for r in results),
+        "skipped": sum(r["status"] == "skipped" for r in results),
+    }
+    logger.info(
+        f"チャート作成完了 ({len(jobs)}件 / {wall_seconds:.2f}s, "
+        f"描画 {summary['render_stats']['rendered']}件 / キャッシュ利用 {summary['render_stats']['skipped']}件)"
+    )
+    logger.info(f"現在価格: ${summary['current_price']:,.2f}")
+    logger.info(f"期間変動: {summary['price_change_percent']:+.2f}%")
+    return summary
@@ -0,0 +1,99 @@
+"""
+描画前の時系列間引き（見た目を保ったまま点数を画素幅程度に減らす）
+
+- minmax: x を等幅のバケットに分け、各バケットの最小・最大の点を残す（極値が必ず残る）
+- lttb:   Largest-Triangle-Three-Buckets。前に選んだ点と次バケットの平均点とで作る
+          三角形の面積が最大になる点を各バケットから1点選ぶ
+- none:   間引かない
+
+出来高は bucket_sum で画素幅のバケットに合計して描画する。
+"""
+
+import numpy as np
+
+METHODS = ("minmax", "lttb", "none")
+
+
+def _bucket_ids(x, n_buckets):
+    """昇順の x を [x[0], x[-1]] の等幅 n_buckets 個に割り当てる"""
+    span = x[-1] - x[0]
+    if span <= 0:
+        return np.zeros(len(x), dtype=np.int64)
+    ids = ((x - x[0]) * (n_buckets / span)).astype(np.int64)
+    return np.minimum(ids, n_buckets - 1)
+
+
+def minmax_indices(x, y, n_buckets):
+    """各バケットの最小・最大（と先頭・末尾）の点のインデックス（昇順）"""
+    n = len(y)
+    if n <= 2 * n_buckets:
+        return np.arange(n)
+    ids = _bucket_ids(x, n_buckets)
+    # バケット順 → 値の順に並べると、各バケットの先頭が最小・末尾が最大
+    order = np.lexsort((y, ids))
+    sorted_ids = ids[order]
+    first = np.concatenate([[0], np.flatnonzero(np.diff(sorted_ids)) + 1])
+    last = np.append(first[1:], n) - 1
+    return np.unique(np.concatenate([order[first], order[last], [0, n - 1]]))
+
+
+def lttb_indices(x, y, n_out):
+    """LTTB で n_out 点を選んだインデックス（先頭・末尾は必ず残す）"""
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    # 先頭・末尾を除く点を件数で n_out - 2 個のバケットに分ける（最後の要素は末尾の点）
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    counts = np.diff(np.append(edges, n))
+    mean_x = np.add.reduceat(x, edges) / counts
+    mean_y = np.add.reduceat(y, edges) / counts
+
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        ax, ay = x[a], y[a]
+        area = np.abs((ax - mean_x[i + 1]) * (y[lo:hi] - ay) - (ax - x[lo:hi]) * (mean_y[i + 1] - ay))
+        a = lo + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+
+def downsample(x, y, points, method="minmax"):
+    """
+    x（昇順）・y を間引いたインデックス（points は画素幅）
+    lttb は points 点、minmax は points 個のバケットから最小・最大（最大 2 * points 点）を選ぶ。
+    y の NaN（移動平均の先頭など）は除いて選ぶ
+    """
+    if method not in METHODS:
+        raise ValueError(f"未対応の間引き方法です: {method}（{', '.join(METHODS)}）")
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    finite = np.flatnonzero(np.isfinite(y))
+    if method == "none" or not points or len(finite) <= points:
+        return finite
+    if method == "lttb":
+        return finite[lttb_indices(x[finite], y[finite], points)]
+    return finite[minmax_indices(x[finite], y[finite], points)]
+
+
+def bucket_sum(x, values, n_buckets):
+    """
+    x（昇順）を等幅 n_buckets 個に分けて values を合計
+    戻り値: (バケット中心, 合計, バケット幅)。点のないバケットは含めない
+    """
+    x = np.asarray(x, dtype=np.float64)
+    values = np.asarray(values, dtype=np.float64)
+    if not len(x):
+        return np.empty(0), np.empty(0), 0.0
+    span = x[-1] - x[0]
+    if span <= 0:
+        return x[:1], np.array([values.sum()]), 1.0
+    n_buckets = max(1, min(n_buckets, len(x)))
+    width = span / n_buckets
+    ids = _bucket_ids(x, n_buckets)
+    sums = np.bincount(ids, weights=values, minlength=n_buckets)
+    present = np.bincount(ids, minlength=n_buckets) > 0
+    centers = x[0] + (np.arange(n_buckets) + 0.5) * width
+    return centers[present], sums[present], width
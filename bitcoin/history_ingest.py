@@ -0,0 +1,158 @@
+"""
+Bitcoin価格履歴の差分取り込み
+
+CoinGecko の /coins/{id}/market_chart/range から実データを取得してカラム型ストア
+（history_store.py）に保存し、次回以降は最後に保存した時刻以降（と保存済み系列の
+欠損区間）だけを取得する。重複する時刻の点は1点にまとめる。
+API 側にもデータがない欠損区間（取得済みの範囲に収まる欠損）は ingest_state.json に
+記録し、次回以降は取得し直さない。
+"""
+
+import json
+import logging
+import os
+import time
+from datetime import datetime
+
+import numpy as np
+
+from history_store import HistoryStore, import_json
+
+logger = logging.getLogger(__name__)
+
+HOUR_MS = 3600 * 1000
+# この間隔を超えて点が空いていれば欠損とみなす（1〜90日のレンジは1時間粒度で返る）
+DEFAULT_MAX_GAP_MS = 2 * HOUR_MS
+# 1回の実行で埋める欠損区間の上限（API レート制限対策）
+DEFAULT_MAX_HOLE_FETCHES = 3
+
+
+class HistoryIngestor:
+    def __init__(
+        self,
+        session,
+        base_url,
+        coin_id,
+        vs_currency,
+        directory,
+        legacy_path=None,
+        timeout=30,
+        max_gap_ms=DEFAULT_MAX_GAP_MS,
+        max_hole_fetches=DEFAULT_MAX_HOLE_FETCHES,
+    ):
+        self.session = session
+        self.base_url = base_url
+        self.coin_id = coin_id
+        self.vs_currency = vs_currency
+        self.store = HistoryStore(directory)
+        self.state_path = os.path.join(directory, "ingest_state.json")
+        self.legacy_path = legacy_path
+        self.timeout = timeout
+        self.max_gap_ms = max_gap_ms
+        self.max_hole_fetches = max_hole_fetches
+        self.api_calls = 0
+
+    # ---- ローカル保存 ---------------------------------------------------
+
+    def migrate_legacy(self):
+        """ストアが空で旧形式の JSON 履歴があれば取り込む"""
+        if len(self.store) or not self.legacy_path or not os.path.exists(self.legacy_path):
+            return 0
+        try:
+            return import_json(self.store, self.legacy_path)
+        except ValueError:
+            logger.warning(f"旧履歴ファイルが壊れているため取り込みません: {self.legacy_path}")
+            return 0
+
+    def _load_fetched(self):
+        """取得済みの範囲 [[start_ms, end_ms], ...]（重なる範囲はまとめてある）"""
+        try:
+            with open(self.state_path, "r") as f:
+                return json.load(f)["fetched_ranges"]
+        except (FileNotFoundError, ValueError, KeyError):
+            return []
+
+    def _save_fetched(self, ranges):
+        os.makedirs(os.path.dirname(self.state_path), exist_ok=True)
+        tmp_path = self.state_path + ".tmp"
+        merged = []
+        for start_ms, end_ms in sorted(ranges):
+            if merged and start_ms <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], end_ms)
+            else:
+                merged.append([start_ms, end_ms])
+        with open(tmp_path, "w") as f:
+            json.dump({"fetched_ranges": merged}, f)
+        os.replace(tmp_path, self.state_path)
+
+    # ---- 取得 -----------------------------------------------------------
+
+    def fetch_range(self, start_ms, end_ms):
+        """[start_ms, end_ms] の価格・出来高を取得して (timestamp, price, volume) の配列に変換"""
+        url = f"{self.base_url}/coins/{self.coin_id}/market_chart/range"
+        params = {
+            "vs_currency": self.vs_currency,
+            "from": int(start_ms // 1000),
+            "to": int(end_ms // 1000),
+        }
+        logger.info(
+            f"履歴取得: {datetime.fromtimestamp(start_ms / 1000):%m/%d %H:%M} 〜 "
+            f"{datetime.fromtimestamp(end_ms / 1000):%m/%d %H:%M}"
+        )
+        response = self.session.get(url, params=params, timeout=self.timeout)
+        response.raise_for_status()
+        self.api_calls += 1
+        data = response.json()
+
+        volumes = {int(ts): vol for ts, vol in data.get("total_volumes", [])}
+        prices = data.get("prices", [])
+        return (
+            np.array([int(ts) for ts, _ in prices], dtype=np.int64),
+            np.array([price for _, price in prices], dtype=np.float64),
+            np.array([volumes.get(int(ts), 0.0) for ts, _ in prices], dtype=np.float64),
+        )
+
+    def find_holes(self, timestamps):
+        """昇順の時刻列で max_gap_ms を超えて空いている区間"""
+        gaps = np.flatnonzero(np.diff(timestamps) > self.max_gap_ms)
+        return [(int(timestamps[i]), int(timestamps[i + 1])) for i in gaps]
+
+    def refresh(self, days, now_ms=None):
+        """
+        保存済み履歴を最新化して直近 days 日分のカラム（timestamp / price / volume）を返す
+        - 保存なし / ウィンドウ先頭が不足: 不足区間を取得
+        - 末尾: 最後の保存時刻から現在までの差分だけ取得
+        - 内部の欠損区間: 最大 max_hole_fetches 件まで取得
+        先頭・欠損区間は取得済みの範囲に収まっていれば取得しない（API 側にもデータがない）
+        """
+        now_ms = int(time.time() * 1000) if now_ms is None else int(now_ms)
+        window_start = now_ms - days * 24 * HOUR_MS
+        self.migrate_legacy()
+        stored = self.store.window(window_start)["timestamp"]
+        # ウィンドウ外に出た範囲は忘れる
+        fetched = [r for r in self._load_fetched() if r[1] > window_start]
+
+        def unfetched(start_ms, end_ms):
+            return not any(s <= start_ms and end_ms <= e for s, e in fetched)
+
+        ranges = []
+        if not len(stored):
+            ranges.append((window_start, now_ms))
+        else:
+            if stored[0] - window_start > self.max_gap_ms and unfetched(window_start, int(stored[0])):
+                ranges.append((window_start, int(stored[0])))
+            holes = [hole for hole in self.find_holes(stored) if unfetched(*hole)]
+            if len(holes) > self.max_hole_fetches:
+                logger.info(f"欠損区間 {len(holes)}件のうち {self.max_hole_fetches}件を取得")
+            ranges.extend(holes[: self.max_hole_fetches])
+            ranges.append((int(stored[-1]), now_ms))
+
+        for start_ms, end_ms in ranges:
+            # 重複時刻は新しく取得した値で上書き
+            self.store.merge(*self.fetch_range(start_ms, end_ms))
+            fetched.append([start_ms, end_ms])
+        self._save_fetched(fetched)
+
+        points = self.store.window(window_start, now_ms)
+        logger.info(f"履歴更新完了: {len(points['timestamp'])}件 (API {len(ranges)}回)")
+        return points
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+Bitcoin価格履歴のカラム型ストア
+
+meta.json              : 世代番号と確定済みの件数
+timestamp.<世代>.bin   : epoch ミリ秒 (int64, 昇順・重複なし)
+price.<世代>.bin       : 価格 (float64)
+volume.<世代>.bin      : 出来高 (float64)
+
+読み取りは各カラムを np.memmap で開き、期間の切り出しは timestamp の二分探索と
+スライス（コピーなし）で行う。追記はカラム末尾に書いてから meta.json の件数を
+置き換えるため、書き込み途中で落ちても確定済みの件数より後ろは読まれない。
+途中への挿入（欠損区間の補完）は新しい世代のファイルに書き直して meta.json を切り替える。
+
+既存の JSON 履歴の変換:
+    python3 history_store.py convert /tmp/bitcoin_historical_data.json
+    python3 history_store.py info
+"""
+
+import argparse
+import json
+import logging
+import os
+from datetime import datetime
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+COLUMNS = {
+    "timestamp": np.dtype("<i8"),
+    "price": np.dtype("<f8"),
+    "volume": np.dtype("<f8"),
+}
+DEFAULT_DIRECTORY = "/tmp/bitcoin_history"
+
+
+def _normalize(schema, values):
+    """カラム順の配列を先頭カラム（時刻）順に並べ、同時刻は後ろの値を残す"""
+    arrays = [np.asarray(v, dtype=dtype) for v, dtype in zip(values, schema.values())]
+    order = np.argsort(arrays[0], kind="stable")
+    key = arrays[0][order]
+    keep = np.append(key[1:] != key[:-1], True)[: len(key)]
+    return {name: array[order][keep] for name, array in zip(schema, arrays)}
+
+
+class HistoryStore:
+    def __init__(self, directory=DEFAULT_DIRECTORY, columns=COLUMNS):
+        """columns: カラム名 → dtype（先頭カラムが昇順の時刻キー）"""
+        self.directory = directory
+        self.schema = columns
+        self.key = next(iter(columns))
+        self.meta_path = os.path.join(directory, "meta.json")
+
+    # ---- 読み取り -------------------------------------------------------
+
+    def meta(self):
+        """世代番号と確定済みの件数"""
+        try:
+            with open(self.meta_path, "r") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {"generation": 0, "length": 0}
+
+    def _column_path(self, name, generation):
+        return os.path.join(self.directory, f"{name}.{generation}.bin")
+
+    def __len__(self):
+        return self.meta()["length"]
+
+    def columns(self):
+        """確定済みの全カラム（読み取り専用 memmap）"""
+        for _ in range(3):
+            meta = self.meta()
+            length = meta["length"]
+            if length == 0:
+                return {name: np.empty(0, dtype=dtype) for name, dtype in self.schema.items()}
+            try:
+                return {
+                    name: np.memmap(
+                        self._column_path(name, meta["generation"]),
+                        dtype=dtype,
+                        mode="r",
+                        shape=(length,),
+                    )
+                    for name, dtype in self.schema.items()
+                }
+            except FileNotFoundError:
+                # 読み取り中に書き直しで世代が切り替わった
+                continue
+        raise RuntimeError(f"履歴ストアを読み取れません: {self.directory}")
+
+    def window(self, start_ms=None, end_ms=None):
+        """[start_ms, end_ms] の点（二分探索 + スライスでコピーしない）"""
+        columns = self.columns()
+        timestamps = columns[self.key]
+        lo = 0 if start_ms is None else int(np.searchsorted(timestamps, start_ms, side="left"))
+        hi = len(timestamps) if end_ms is None else int(np.searchsorted(timestamps, end_ms, side="right"))
+        return {name: column[lo:hi] for name, column in columns.items()}
+
+    def last_timestamp(self):
+        timestamps = self.columns()[self.key]
+        return int(timestamps[-1]) if len(timestamps) else None
+
+    # ---- 書き込み -------------------------------------------------------
+
+    def _write_meta(self, meta):
+        tmp_path = self.meta_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(meta, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.meta_path)
+
+    def append(self, *values):
+        """最終時刻より後の点を末尾に追記し、追記件数を返す（values はカラム順）"""
+        new = _normalize(self.schema, values)
+        last = self.last_timestamp()
+        if last is not None:
+            after = new[self.key] > last
+            new = {name: column[after] for name, column in new.items()}
+        count = len(new[self.key])
+        if count == 0:
+            return 0
+
+        os.makedirs(self.directory, exist_ok=True)
+        meta = self.meta()
+        for name, dtype in self.schema.items():
+            path = self._column_path(name, meta["generation"])
+            with open(path, "ab") as f:
+                # 確定件数より後ろの端数（書き込み途中で落ちた分）を切り捨てる
+                f.truncate(meta["length"] * dtype.itemsize)
+                f.write(new[name].tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+        meta["length"] += count
+        self._write_meta(meta)
+        return count
+
+    def replace(self, *values):
+        """全件を新しい世代に書き直す"""
+        new = _normalize(self.schema, values)
+        os.makedirs(self.directory, exist_ok=True)
+        old_generation = self.meta()["generation"]
+        generation = old_generation + 1
+        for name in self.schema:
+            with open(self._column_path(name, generation), "wb") as f:
+                f.write(new[name].tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+        self._write_meta({"generation": generation, "length": len(new[self.key])})
+        for name in self.schema:
+            try:
+                os.remove(self._column_path(name, old_generation))
+            except FileNotFoundError:
+                pass
+        return len(new[self.key])
+
+    def merge(self, *values):
+        """
+        取得した点を取り込む（同時刻は新しい値で上書き）
+        末尾以降だけなら追記、途中に入る点があれば全件を書き直す
+        """
+        new = _normalize(self.schema, values)
+        if not len(new[self.key]):
+            return 0
+        last = self.last_timestamp()
+        if last is None or new[self.key][0] > last:
+            return self.append(*new.values())
+        if new[self.key][0] == last:
+            # 差分取得は最終時刻を含むため、最終点だけの上書きは書き直さずに済ませる
+            self._overwrite_last({name: column[0] for name, column in new.items()})
+            return self.append(*(column[1:] for column in new.values()))
+
+        existing = self.columns()
+        return self.replace(
+            *(np.concatenate([np.asarray(existing[name]), new[name]]) for name in self.schema)
+        )
+
+    def _overwrite_last(self, row):
+        meta = self.meta()
+        index = meta["length"] - 1
+        for name, dtype in self.schema.items():
+            if name == self.key:
+                continue
+            with open(self._column_path(name, meta["generation"]), "r+b") as f:
+                f.seek(index * dtype.itemsize)
+                f.write(np.asarray(row[name], dtype=dtype).tobytes())
+
+
+def import_json(store, path):
+    """既存の JSON 履歴（[{"timestamp", "price", "volume", ...}, ...]）をストアに取り込む"""
+    with open(path, "r") as f:
+        points = json.load(f)
+    timestamps = np.fromiter((p["timestamp"] for p in points), dtype=np.int64, count=len(points))
+    prices = np.fromiter((p["price"] for p in points), dtype=np.float64, count=len(points))
+    volumes = np.fromiter((p.get("volume", 0.0) for p in points), dtype=np.float64, count=len(points))
+    imported = store.merge(timestamps, prices, volumes)
+    logger.info(f"JSON 履歴取り込み: {path} ({len(points)}件)")
+    return imported
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    parser = argparse.ArgumentParser(description="Bitcoin価格履歴のカラム型ストア")
+    parser.add_argument("command", choices=["convert", "info"])
+    parser.add_argument("paths", nargs="*", help="convert: 取り込む JSON 履歴ファイル")
+    parser.add_argument("--dir", default=DEFAULT_DIRECTORY, help="ストアのディレクトリ")
+    args = parser.parse_args()
+
+    store = HistoryStore(args.dir)
+    if args.command == "convert":
+        for path in args.paths:
+            import_json(store, path)
+    columns = store.columns()
+    print(f"{args.dir}: {len(columns['timestamp'])}件")
+    if len(columns["timestamp"]):
+        first, last = (datetime.fromtimestamp(columns["timestamp"][i] / 1000) for i in (0, -1))
+        print(f"  {first:%Y-%m-%d %H:%M} 〜 {last:%Y-%m-%d %H:%M}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,368 @@
+"""
+インクリメンタル テクニカル指標エンジン
+
+新しいサンプルが届くたびに SMA / EMA / RSI / ボリンジャーバンド / ATR / VWAP を
+リングバッファと累積和だけで O(1) 更新する。状態は JSON にそのまま保存でき、
+次回実行時に続きから更新できる。
+
+各指標の加減算の順序・補正は pandas の実装（rolling().mean() / rolling().sum() の
+Kahan 加減算、ewm(adjust=False) の正規化）と同じにしてあるため、同じ系列を
+batch() に通した結果は pandas と1ビット単位で一致する（ボリンジャーバンドの
+標準偏差 bb_std も rolling().std() と一致）。
+
+track（15分ごとの価格取得）で1サンプルずつ更新するためのもので、pandas には依存しない。
+チャートのように系列全体をまとめて計算する場合は pandas の rolling() を使う
+（1点ずつの Python ループより大幅に速い）。
+"""
+
+import math
+from collections import deque
+
+NAN = float("nan")
+
+DEFAULT_SETTINGS = {
+    "sma_periods": [7, 25, 50],
+    "ema_periods": [12, 26],
+    "rsi_period": 14,
+    "bollinger_period": 20,
+    "bollinger_k": 2,
+    "atr_period": 14,
+    "vwap_period": 24,
+}
+
+
+def _div(a, b):
+    """IEEE 754 と同じ除算（0除算で inf / nan を返す）"""
+    if b == 0:
+        if a == 0 or a != a:
+            return NAN
+        return math.copysign(math.inf, a) * math.copysign(1.0, b)
+    return a / b
+
+
+class RollingSum:
+    """固定長ウィンドウの合計・平均（pandas の roll_sum / roll_mean と同じ Kahan 加減算）"""
+
+    def __init__(self, size):
+        self.size = size
+        self.values = deque(maxlen=size)
+        self.total = 0.0
+        self.add_comp = 0.0
+        self.remove_comp = 0.0
+        self.neg_count = 0
+        self.same_count = 0
+        self.prev = None
+
+    def push(self, value):
+        # 先にウィンドウから外れる値を引き、その後で新しい値を足す
+        if len(self.values) == self.size:
+            removed = self.values[0]
+            y = -removed - self.remove_comp
+            t = self.total + y
+            self.remove_comp = t - self.total - y
+            self.total = t
+            if math.copysign(1.0, removed) < 0:
+                self.neg_count -= 1
+
+        y = value - self.add_comp
+        t = self.total + y
+        self.add_comp = t - self.total - y
+        self.total = t
+        if math.copysign(1.0, value) < 0:
+            self.neg_count += 1
+        self.same_count = self.same_count + 1 if value == self.prev else 1
+        self.prev = value
+        self.values.append(value)
+
+    @property
+    def ready(self):
+        return len(self.values) == self.size
+
+    def sum(self):
+        if not self.ready:
+            return NAN
+        nobs = len(self.values)
+        if self.same_count >= nobs:
+            return self.prev * nobs
+        return self.total
+
+    def mean(self):
+        if not self.ready:
+            return NAN
+        nobs = len(self.values)
+        result = self.total / nobs
+        if self.same_count >= nobs:
+            return self.prev
+        if self.neg_count == 0 and result < 0:
+            return 0.0
+        if self.neg_count == nobs and result > 0:
+            return 0.0
+        return result
+
+    def to_state(self):
+        return {
+            "values": list(self.values),
+            "total": self.total,
+            "add_comp": self.add_comp,
+            "remove_comp": self.remove_comp,
+            "neg_count": self.neg_count,
+            "same_count": self.same_count,
+            "prev": self.prev,
+        }
+
+    def load_state(self, state):
+        self.values = deque(state["values"], maxlen=self.size)
+        self.total = state["total"]
+        self.add_comp = state["add_comp"]
+        self.remove_comp = state["remove_comp"]
+        self.neg_count = state["neg_count"]
+        self.same_count = state["same_count"]
+        self.prev = state["prev"]
+
+
+class RollingVariance:
+    """固定長ウィンドウの不偏分散（Welford 法 + Kahan 補正、ddof=1）"""
+
+    def __init__(self, size, ddof=1):
+        self.size = size
+        self.ddof = ddof
+        self.values = deque(maxlen=size)
+        self.mean = 0.0
+        self.ssqdm = 0.0
+        self.add_comp = 0.0
+        self.remove_comp = 0.0
+        self.same_count = 0
+        self.prev = None
+
+    def push(self, value):
+        if len(self.values) == self.size:
+            removed = self.values[0]
+            nobs = len(self.values) - 1
+            if nobs:
+                prev_mean = self.mean - self.remove_comp
+                y = removed - self.remove_comp
+                t = y - self.mean
+                self.remove_comp = t + self.mean - y
+                self.mean = self.mean - t / nobs
+                self.ssqdm = self.ssqdm - (removed - prev_mean) * (removed - self.mean)
+            else:
+                self.mean = 0.0
+                self.ssqdm = 0.0
+
+        self.same_count = self.same_count + 1 if value == self.prev else 1
+        self.prev = value
+        self.values.append(value)
+        nobs = len(self.values)
+        prev_mean = self.mean - self.add_comp
+        y = value - self.add_comp
+        t = y - self.mean
+        self.add_comp = t + self.mean - y
+        self.mean = self.mean + t / nobs
+        self.ssqdm = self.ssqdm + (value - prev_mean) * (value - self.mean)
+        if self.same_count >= nobs:
+            # ウィンドウ内が全て同じ値なら誤差の蓄積を捨てる
+            self.mean = value
+            self.ssqdm = 0.0
+
+    def var(self):
+        nobs = len(self.values)
+        if nobs < self.size or nobs <= self.ddof:
+            return NAN
+        if nobs == 1 or self.same_count >= nobs:
+            return 0.0
+        return self.ssqdm / (nobs - self.ddof)
+
+    def std(self):
+        var = self.var()
+        return math.sqrt(var) if var > 0 else (0.0 if var == var else NAN)
+
+    def to_state(self):
+        return {
+            "values": list(self.values),
+            "mean": self.mean,
+            "ssqdm": self.ssqdm,
+            "add_comp": self.add_comp,
+            "remove_comp": self.remove_comp,
+            "same_count": self.same_count,
+            "prev": self.prev,
+        }
+
+    def load_state(self, state):
+        self.values = deque(state["values"], maxlen=self.size)
+        self.mean = state["mean"]
+        self.ssqdm = state["ssqdm"]
+        self.add_comp = state["add_comp"]
+        self.remove_comp = state["remove_comp"]
+        self.same_count = state["same_count"]
+        self.prev = state["prev"]
+
+
+class Ewm:
+    """指数加重平均（pandas の ewm(alpha=..., adjust=False).mean() と同じ更新式）"""
+
+    def __init__(self, alpha, min_periods=0):
+        self.alpha = alpha
+        self.min_periods = max(min_periods, 1)
+        self.weighted = NAN
+        self.nobs = 0
+        self.started = False
+
+    def push(self, value):
+        is_observation = value == value
+        self.nobs += is_observation
+        if not self.started:
+            self.weighted = value
+            self.started = True
+        elif self.weighted == self.weighted:
+            if is_observation:
+                old_weight = 1.0 - self.alpha
+                # 一定値の系列で誤差が出ないよう、値が変わらない場合は更新しない
+                if self.weighted != value:
+                    self.weighted = old_weight * self.weighted + self.alpha * value
+                    self.weighted /= old_weight + self.alpha
+        elif is_observation:
+            self.weighted = value
+
+    def value(self):
+        return self.weighted if self.nobs >= self.min_periods else NAN
+
+    def to_state(self):
+        return {"weighted": self.weighted, "nobs": self.nobs, "started": self.started}
+
+    def load_state(self, state):
+        self.weighted = state["weighted"]
+        self.nobs = state["nobs"]
+        self.started = state["started"]
+
+
+class IndicatorEngine:
+    """価格サンプルごとに全指標を O(1) で更新する"""
+
+    def __init__(self, settings=None):
+        self.settings = dict(DEFAULT_SETTINGS, **(settings or {}))
+        s = self.settings
+        self.sma = {p: RollingSum(p) for p in s["sma_periods"]}
+        self.ema = {p: Ewm(2.0 / (p + 1)) for p in s["ema_periods"]}
+        self.rsi_gain = Ewm(1.0 / s["rsi_period"], s["rsi_period"])
+        self.rsi_loss = Ewm(1.0 / s["rsi_period"], s["rsi_period"])
+        self.bb_mean = RollingSum(s["bollinger_period"])
+        self.bb_var = RollingVariance(s["bollinger_period"])
+        self.atr = Ewm(1.0 / s["atr_period"], s["atr_period"])
+        self.vwap_pv = RollingSum(s["vwap_period"])
+        self.vwap_volume = RollingSum(s["vwap_period"])
+        self.prev_close = None
+        self.last_timestamp = None
+        self.samples = 0
+
+    @classmethod
+    def from_state(cls, state, settings=None):
+        """保存済み状態から復元（指標設定が変わっていれば最初から計算し直す）"""
+        engine = cls(settings)
+        if not state or state.get("settings") != engine.settings:
+            return engine
+        for period, window in engine.sma.items():
+            window.load_state(state["sma"][str(period)])
+        for period, ewm in engine.ema.items():
+            ewm.load_state(state["ema"][str(period)])
+        engine.rsi_gain.load_state(state["rsi_gain"])
+        engine.rsi_loss.load_state(state["rsi_loss"])
+        engine.bb_mean.load_state(state["bb_mean"])
+        engine.bb_var.load_state(state["bb_var"])
+        engine.atr.load_state(state["atr"])
+        engine.vwap_pv.load_state(state["vwap_pv"])
+        engine.vwap_volume.load_state(state["vwap_volume"])
+        engine.prev_close = state["prev_close"]
+        engine.last_timestamp = state["last_timestamp"]
+        engine.samples = state["samples"]
+        return engine
+
+    def to_state(self):
+        return {
+            "settings": self.settings,
+            "sma": {str(p): w.to_state() for p, w in self.sma.items()},
+            "ema": {str(p): e.to_state() for p, e in self.ema.items()},
+            "rsi_gain": self.rsi_gain.to_state(),
+            "rsi_loss": self.rsi_loss.to_state(),
+            "bb_mean": self.bb_mean.to_state(),
+            "bb_var": self.bb_var.to_state(),
+            "atr": self.atr.to_state(),
+            "vwap_pv": self.vwap_pv.to_state(),
+            "vwap_volume": self.vwap_volume.to_state(),
+            "prev_close": self.prev_close,
+            "last_timestamp": self.last_timestamp,
+            "samples": self.samples,
+        }
+
+    def update(self, price, volume=0.0, high=None, low=None, timestamp=None):
+        """
+        1サンプル分を反映して最新の指標値を返す
+        timestamp が前回以下のサンプル（キャッシュ済みの同じ価格など）は二重に反映しない
+        """
+        if timestamp is not None and self.last_timestamp is not None:
+            if timestamp <= self.last_timestamp:
+                return self.values()
+        high = price if high is None else high
+        low = price if low is None else low
+
+        for window in self.sma.values():
+            window.push(price)
+        for ewm in self.ema.values():
+            ewm.push(price)
+
+        if self.prev_close is None:
+            self.rsi_gain.push(NAN)
+            self.rsi_loss.push(NAN)
+            true_range = high - low
+        else:
+            delta = price - self.prev_close
+            self.rsi_gain.push(delta if delta > 0 else 0.0)
+            self.rsi_loss.push(-delta if delta < 0 else 0.0)
+            true_range = max(
+                high - low, abs(high - self.prev_close), abs(low - self.prev_close)
+            )
+        self.atr.push(true_range)
+
+        self.bb_mean.push(price)
+        self.bb_var.push(price)
+        self.vwap_pv.push(price * volume)
+        self.vwap_volume.push(volume)
+
+        self.prev_close = price
+        if timestamp is not None:
+            self.last_timestamp = timestamp
+        self.samples += 1
+        return self.values()
+
+    def values(self):
+        """最新の指標値（ウィンドウが埋まっていない指標は NaN）"""
+        s = self.settings
+        result = {f"sma_{p}": w.mean() for p, w in self.sma.items()}
+        result.update({f"ema_{p}": e.value() for p, e in self.ema.items()})
+
+        rs = _div(self.rsi_gain.value(), self.rsi_loss.value())
+        result[f"rsi_{s['rsi_period']}"] = 100 - _div(100, 1 + rs)
+
+        middle = self.bb_mean.mean()
+        std = self.bb_var.std()
+        band = s["bollinger_k"] * std
+        result["bb_middle"] = middle
+        result["bb_std"] = std
+        result["bb_upper"] = middle + band
+        result["bb_lower"] = middle - band
+
+        result[f"atr_{s['atr_period']}"] = self.atr.value()
+        result[f"vwap_{s['vwap_period']}"] = _div(self.vwap_pv.sum(), self.vwap_volume.sum())
+        return result
+
+    def batch(self, prices, volumes=None, highs=None, lows=None):
+        """系列をまとめて流し込み、指標ごとの値のリストを返す（pandas の結果と一致）"""
+        n = len(prices)
+        volumes = volumes if volumes is not None else [0.0] * n
+        highs = highs if highs is not None else [None] * n
+        lows = lows if lows is not None else [None] * n
+        columns = {}
+        for price, volume, high, low in zip(prices, volumes, highs, lows):
+            for name, value in self.update(float(price), float(volume), high, low).items():
+                columns.setdefault(name, []).append(value)
+        return columns
+
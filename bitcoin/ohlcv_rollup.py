@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+マルチタイムフレーム OHLCV ロールアップ
+
+履歴ストア（history_store.py）に追記された点を 1m/5m/15m/1h/4h/1d の足に集計して保存する。
+
+<directory>/<足>/        確定した足（HistoryStore: timestamp=足の開始 epoch ms, open/high/low/close/volume）
+<directory>/state.json  処理済みの履歴位置（世代・件数・最後の点）と各足の未確定足
+
+更新時は前回以降に追記された点だけを読み、各足の未確定足に畳み込んで
+確定した足だけを追記する。足の区切りは UTC の 0 時起点で、
+pandas の df.resample(足).agg(first/max/min/last, volume は sum) と同じ。
+最後に畳み込んだ点が上書きされていた（merge の重なり）場合は、未確定足をその範囲の点から作り直す。
+履歴の途中に点が挿入された（世代が変わった）場合は全件から作り直す。
+
+    python3 ohlcv_rollup.py rebuild
+    python3 ohlcv_rollup.py info
+"""
+
+import argparse
+import json
+import logging
+import os
+
+import numpy as np
+
+from history_store import DEFAULT_DIRECTORY as HISTORY_DIRECTORY
+from history_store import HistoryStore
+
+logger = logging.getLogger(__name__)
+
+MINUTE_MS = 60 * 1000
+TIMEFRAMES = {
+    "1m": MINUTE_MS,
+    "5m": 5 * MINUTE_MS,
+    "15m": 15 * MINUTE_MS,
+    "1h": 60 * MINUTE_MS,
+    "4h": 240 * MINUTE_MS,
+    "1d": 1440 * MINUTE_MS,
+}
+BAR_COLUMNS = {
+    "timestamp": np.dtype("<i8"),
+    "open": np.dtype("<f8"),
+    "high": np.dtype("<f8"),
+    "low": np.dtype("<f8"),
+    "close": np.dtype("<f8"),
+    "volume": np.dtype("<f8"),
+}
+DEFAULT_DIRECTORY = "/tmp/bitcoin_rollup"
+
+
+def aggregate(timestamps, prices, volumes, period_ms):
+    """昇順の点を period_ms の足に集計（点のない足は作らない）"""
+    timestamps = np.asarray(timestamps, dtype=np.int64)
+    prices = np.asarray(prices, dtype=np.float64)
+    volumes = np.asarray(volumes, dtype=np.float64)
+    if not len(timestamps):
+        return {name: np.empty(0, dtype=dtype) for name, dtype in BAR_COLUMNS.items()}
+    starts = timestamps - timestamps % period_ms
+    first = np.concatenate([[0], np.flatnonzero(np.diff(starts)) + 1])
+    last = np.append(first[1:], len(starts)) - 1
+    return {
+        "timestamp": starts[first],
+        "open": prices[first],
+        "high": np.maximum.reduceat(prices, first),
+        "low": np.minimum.reduceat(prices, first),
+        "close": prices[last],
+        "volume": np.add.reduceat(volumes, first),
+    }
+
+
+def _row(timestamps, prices, volumes, index):
+    return [timestamps[index].item(), prices[index].item(), volumes[index].item()]
+
+
+def _source(meta, timestamps, prices, volumes):
+    """処理済みの履歴位置と最後に畳み込んだ点（上書きの検出用）"""
+    length = meta["length"]
+    last = _row(timestamps, prices, volumes, length - 1) if length else None
+    return {"generation": meta["generation"], "length": length, "last": last}
+
+
+class OhlcvRollup:
+    def __init__(self, directory=DEFAULT_DIRECTORY, timeframes=TIMEFRAMES):
+        self.directory = directory
+        self.timeframes = dict(timeframes)
+        self.state_path = os.path.join(directory, "state.json")
+        self.stores = {
+            name: HistoryStore(os.path.join(directory, name), columns=BAR_COLUMNS)
+            for name in self.timeframes
+        }
+
+    # ---- 状態 -----------------------------------------------------------
+
+    def _load_state(self):
+        try:
+            with open(self.state_path, "r") as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _save_state(self, state):
+        tmp_path = self.state_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.state_path)
+
+    # ---- 更新 -----------------------------------------------------------
+
+    def update(self, history):
+        """履歴ストアの未処理分を集計して確定足を追記。処理した点の件数を返す"""
+        meta = history.meta()
+        state = self._load_state()
+        if (
+            state is None
+            or state["source"]["generation"] != meta["generation"]
+            or state["source"]["length"] > meta["length"]
+            or "last" not in state["source"]
+            or set(state["open_bars"]) != set(self.timeframes)
+        ):
+            return self.rebuild(history)
+
+        start, stop = state["source"]["length"], meta["length"]
+        columns = history.columns()
+        timestamps = columns["timestamp"][:stop]
+        prices = columns["price"][:stop]
+        volumes = columns["volume"][:stop]
+        # 最後に畳み込んだ点が上書きされていれば、各足の未確定足を元の点から集計し直す
+        tail_changed = start > 0 and state["source"]["last"] != _row(timestamps, prices, volumes, start - 1)
+        if start == stop and not tail_changed:
+            return 0
+
+        for name, period_ms in self.timeframes.items():
+            open_bar = state["open_bars"][name]
+            first = start
+            if tail_changed and open_bar is not None:
+                first = int(np.searchsorted(timestamps[:start], open_bar[0]))
+                open_bar = None
+            bars = aggregate(timestamps[first:stop], prices[first:stop], volumes[first:stop], period_ms)
+            if open_bar is not None:
+                if open_bar[0] == bars["timestamp"][0]:
+                    # 未確定足の続き: 始値はそのまま、高値・安値・終値・出来高を更新
+                    bars["open"][0] = open_bar[1]
+                    bars["high"][0] = max(open_bar[2], bars["high"][0])
+                    bars["low"][0] = min(open_bar[3], bars["low"][0])
+                    bars["volume"][0] = open_bar[5] + bars["volume"][0]
+                else:
+                    bars = {
+                        column: np.concatenate([[open_bar[i]], bars[column]]).astype(dtype)
+                        for i, (column, dtype) in enumerate(BAR_COLUMNS.items())
+                    }
+            self.stores[name].append(*(bars[column][:-1] for column in BAR_COLUMNS))
+            state["open_bars"][name] = [bars[column][-1].item() for column in BAR_COLUMNS]
+
+        state["source"] = _source(meta, timestamps, prices, volumes)
+        self._save_state(state)
+        return stop - start
+
+    def rebuild(self, history):
+        """履歴ストアの全件から全ての足を作り直す"""
+        os.makedirs(self.directory, exist_ok=True)
+        meta = history.meta()
+        columns = history.columns()
+        length = meta["length"]
+        timestamps = columns["timestamp"][:length]
+        state = {
+            "source": _source(meta, timestamps, columns["price"][:length], columns["volume"][:length]),
+            "open_bars": {},
+        }
+        for name, period_ms in self.timeframes.items():
+            bars = aggregate(timestamps, columns["price"][:length], columns["volume"][:length], period_ms)
+            self.stores[name].replace(*(bars[column][:-1] for column in BAR_COLUMNS))
+            state["open_bars"][name] = (
+                [bars[column][-1].item() for column in BAR_COLUMNS] if len(bars["timestamp"]) else None
+            )
+        self._save_state(state)
+        logger.info(f"OHLCV ロールアップ再構築: {length}件")
+        return length
+
+    # ---- 読み取り -------------------------------------------------------
+
+    def bars(self, timeframe, start_ms=None, include_open=True):
+        """
+        start_ms 以降に始まる足（確定足は memmap のスライス）
+        include_open=True なら未確定足を末尾に加える（resample の最後の足と同じ）
+        """
+        if timeframe not in self.timeframes:
+            raise ValueError(f"未対応の足です: {timeframe}（{', '.join(self.timeframes)}）")
+        finished = self.stores[timeframe].window(start_ms)
+        state = self._load_state()
+        open_bar = state["open_bars"].get(timeframe) if state and include_open else None
+        if open_bar is None or (start_ms is not None and open_bar[0] < start_ms):
+            return finished
+        return {
+            column: np.append(finished[column], np.asarray(open_bar[i], dtype=dtype))
+            for i, (column, dtype) in enumerate(BAR_COLUMNS.items())
+        }
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    parser = argparse.ArgumentParser(description="マルチタイムフレーム OHLCV ロールアップ")
+    parser.add_argument("command", choices=["update", "rebuild", "info"])
+    parser.add_argument("--history-dir", default=HISTORY_DIRECTORY)
+    parser.add_argument("--dir", default=DEFAULT_DIRECTORY)
+    args = parser.parse_args()
+
+    rollup = OhlcvRollup(args.dir)
+    history = HistoryStore(args.history_dir)
+    if args.command == "update":
+        rollup.update(history)
+    elif args.command == "rebuild":
+        rollup.rebuild(history)
+    for name in rollup.timeframes:
+        print(f"{name:>4}: 確定足 {len(rollup.stores[name])}本")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+check_a1_availability_with_pushover.sh 用の設定・OCI CLI 出力の読み込み
+
+シェルスクリプトから値ごとに python3 を起動せず、1回の起動で必要な値をすべて
+シェルの代入文（KEY='value'）として出力する。スクリプト側は eval で取り込む。
+
+    eval "$(python3 a1_config.py env /home/opc/config.json)"
+    eval "$(python3 -m oci compute image get --image-id ... | python3 a1_config.py image)"
+"""
+
+import argparse
+import json
+import shlex
+import sys
+
+# (シェル変数名, config.json のキーのパス, 未設定時の値)
+CONFIG_VARIABLES = (
+    ("OCI_CLI_KEY_FILE", ("oci", "key_file"), ""),
+    ("OCI_CLI_PASSPHRASE", ("oci", "passphrase"), ""),
+    ("SHAPE", ("a1_instance", "shape"), ""),
+    ("COMPARTMENT_ID", ("oci", "compartment_id"), ""),
+    ("AVAILABILITY_DOMAIN", ("oci", "availability_domain"), ""),
+    ("IMAGE_ID", ("oci", "image_id"), ""),
+    ("SUBNET_ID", ("oci", "subnet_id"), ""),
+    ("SSH_KEY", ("oci", "ssh_key"), ""),
+    ("LOG_FILE", ("logging", "a1_check_log"), ""),
+    ("LAST_CHECK_FILE", ("logging", "last_check_file"), ""),
+    ("CHECK_INTERVAL_MINUTES", ("a1_instance", "check_interval_minutes"), ""),
+    ("OCPUS", ("a1_instance", "shape_config", "ocpus"), 4),
+    ("MEMORY", ("a1_instance", "shape_config", "memory_in_gbs"), 24),
+)
+UNKNOWN = "Unknown"
+
+
+def lookup(data, path, default):
+    """ネストした dict から値を取得（途中のキーがなければ default）"""
+    for key in path:
+        if not isinstance(data, dict) or key not in data:
+            return default
+        data = data[key]
+    return default if data is None else data
+
+
+def config_values(config):
+    """シェル変数名 → 値"""
+    return {name: lookup(config, path, default) for name, path, default in CONFIG_VARIABLES}
+
+
+def image_values(image):
+    """`oci compute image get` の出力から表示用の値（取れない項目は Unknown）"""
+    data = image.get("data", {}) if isinstance(image, dict) else {}
+    size_mb = data.get("size-in-mbs")
+    return {
+        "IMAGE_NAME": data.get("display-name") or UNKNOWN,
+        "IMAGE_SIZE_GB": round(size_mb / 1024, 1) if isinstance(size_mb, (int, float)) else UNKNOWN,
+        "IMAGE_STATE": data.get("lifecycle-state") or UNKNOWN,
+    }
+
+
+def shell_assignments(values):
+    """eval できる KEY='value' の行"""
+    return "".join(f"{name}={shlex.quote(str(value))}\n" for name, value in values.items())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="A1 チェッカーの設定・OCI CLI 出力をシェル変数として出力")
+    parser.add_argument("command", choices=["env", "image"])
+    parser.add_argument("config", nargs="?", help="env: config.json のパス")
+    args = parser.parse_args(argv)
+
+    if args.command == "env":
+        if not args.config:
+            parser.error("env には config.json のパスが必要です")
+        with open(args.config, "r") as f:
+            values = config_values(json.load(f))
+    else:
+        try:
+            image = json.load(sys.stdin)
+        except ValueError:
+            image = {}
+        values = image_values(image)
+    sys.stdout.write(shell_assignments(values))
+
+
+if __name__ == "__main__":
+    main()
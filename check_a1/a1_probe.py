@@ -0,0 +1,413 @@
+#!/usr/bin/env python3
+"""
+A1 インスタンスの空き確認（複数の AD・リージョン・シェイプ構成を並行して試行）
+
+config.json の a1_instance.probe に書いた組み合わせ（シェイプ構成 × リージョン × AD）ごとに
+`oci compute instance launch` を同時に最大 max_concurrency 個まで実行する。
+- どれか1つが作成に成功したら未実行の試行は行わない。実行中の試行は完了を待ち、
+  同時に作成されたインスタンスは削除する（中断すると OCI 側で作成済みかどうか分からなくなるため）
+- "Out of host capacity" で失敗した組み合わせは backoff（base × 2^(連続失敗数-1)、上限 max）の間スキップ。
+  backoff は状態ストア（namespace: check_a1）に保存し、cron の実行をまたいで引き継ぐ
+- 結果は check_a1_availability_with_pushover.sh が eval する KEY='value' の行で出力する。
+  試行ごとのログは標準エラー出力（スクリプトが a1_check_log に追記）
+
+    python3 a1_probe.py launch /home/opc/config.json
+    python3 a1_probe.py status /home/opc/config.json   # backoff の状態
+
+タイムアウト・例外で中断した試行は OCI 側で作成リクエストが受け付けられている可能性があるため、
+表示名（a1-instance-<時刻>-<番号>）でインスタンスを検索して削除する。
+"""
+
+import argparse
+import json
+import logging
+import os
+import re
+import shlex
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from a1_config import shell_assignments
+
+# 共通モジュール（/home/opc/common）を参照できるようにする
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.state_store import StateStore
+
+logger = logging.getLogger(__name__)
+
+STATE_NAMESPACE = "check_a1"
+BACKOFF_KEY = "probe_backoff"
+DEFAULT_OCI_COMMAND = "python3 -m oci"
+DEFAULT_SHAPE_CONFIG = {"ocpus": 4, "memory_in_gbs": 24}
+DEFAULT_MAX_CONCURRENCY = 2
+DEFAULT_BACKOFF_BASE_SECONDS = 600
+DEFAULT_BACKOFF_MAX_SECONDS = 3600
+DEFAULT_TIMEOUT_SECONDS = 120
+POLL_SECONDS = 0.05
+CAPACITY_ERROR = re.compile(r"out of (host )?capacity", re.I)
+INSTANCE_ID = re.compile(r'"id":\s*"([^"]+)"')
+GONE_STATES = ("TERMINATING", "TERMINATED")
+OUTCOME_LABELS = {
+    "success": "作成成功",
+    "capacity": "容量不足",
+    "error": "エラー",
+    "timeout": "タイムアウト",
+    "cancelled": "中断",
+}
+
+
+def probe_targets(config):
+    """
+    試行する組み合わせ（シェイプ構成の順 → リージョン → AD の順）
+    a1_instance.probe.targets を省略した場合は oci セクションの AD・サブネット・イメージのみ
+    """
+    oci = config.get("oci") or {}
+    a1 = config.get("a1_instance") or {}
+    probe = a1.get("probe") or {}
+    regions = probe.get("targets") or [{}]
+    shape_configs = probe.get("shape_configs") or [a1.get("shape_config") or DEFAULT_SHAPE_CONFIG]
+    targets = []
+    for shape_config in shape_configs:
+        ocpus = shape_config.get("ocpus", DEFAULT_SHAPE_CONFIG["ocpus"])
+        memory = shape_config.get("memory_in_gbs", DEFAULT_SHAPE_CONFIG["memory_in_gbs"])
+        for region in regions:
+            domains = region.get("availability_domains") or [oci.get("availability_domain")]
+            for domain in domains:
+                name = region.get("region")
+                targets.append(
+                    {
+                        "key": f"{name or 'default'}|{domain}|{ocpus}x{memory}",
+                        "region": name,
+                        "availability_domain": domain,
+                        "compartment_id": region.get("compartment_id", oci.get("compartment_id")),
+                        "subnet_id": region.get("subnet_id", oci.get("subnet_id")),
+                        "image_id": region.get("image_id", oci.get("image_id")),
+                        "shape": a1.get("shape", "VM.Standard.A1.Flex"),
+                        "ocpus": ocpus,
+                        "memory_in_gbs": memory,
+                    }
+                )
+    return targets
+
+
+def describe(target):
+    region = f"{target['region']} " if target["region"] else ""
+    return f"{region}{target['availability_domain']} {target['ocpus']}OCPU/{target['memory_in_gbs']}GB"
+
+
+def launch_command(command, target, display_name, ssh_key):
+    """target を作成する oci CLI のコマンドライン"""
+    shape_config = {"ocpus": target["ocpus"], "memory_in_gbs": target["memory_in_gbs"]}
+    argv = list(command) + ["compute", "instance", "launch"]
+    argv += ["--availability-domain", target["availability_domain"] or ""]
+    argv += ["--compartment-id", target["compartment_id"] or ""]
+    argv += ["--shape", target["shape"], "--shape-config", json.dumps(shape_config)]
+    argv += ["--display-name", display_name]
+    argv += ["--image-id", target["image_id"] or "", "--subnet-id", target["subnet_id"] or ""]
+    argv += ["--assign-public-ip", "true"]
+    argv += ["--metadata", json.dumps({"ssh_authorized_keys": ssh_key or ""})]
+    if target["region"]:
+        argv += ["--region", target["region"]]
+    return argv
+
+
+def classify(output):
+    """oci CLI の出力から (結果, インスタンス ID)"""
+    if '"lifecycle-state": "PROVISIONING"' in output:
+        match = INSTANCE_ID.search(output)
+        return "success", match.group(1) if match else ""
+    if CAPACITY_ERROR.search(output):
+        return "capacity", None
+    return "error", None
+
+
+class ProbeBackoff:
+    """組み合わせごとの容量不足 backoff（状態ストアに保存）"""
+
+    def __init__(self, store, base=DEFAULT_BACKOFF_BASE_SECONDS, maximum=DEFAULT_BACKOFF_MAX_SECONDS):
+        self.store = store
+        self.base = base
+        self.maximum = maximum
+        self.entries = store.get(STATE_NAMESPACE, BACKOFF_KEY, {}) or {}
+
+    def waiting(self, target, now):
+        """backoff 中なら再試行できるまでの秒数、そうでなければ 0"""
+        entry = self.entries.get(target["key"])
+        return max(0.0, entry["next_at"] - now) if entry else 0.0
+
+    def record(self, target, outcome, now):
+        if outcome == "capacity":
+            failures = self.entries.get(target["key"], {}).get("failures", 0) + 1
+            delay = min(self.base * 2 ** (failures - 1), self.maximum)
+            self.entries[target["key"]] = {"failures": failures, "next_at": now + delay}
+            return delay
+        if outcome == "success":
+            self.entries.pop(target["key"], None)
+        # エラー・タイムアウト・中断は容量の有無が分からないため backoff を変えない
+        return None
+
+    def save(self):
+        self.store.set(STATE_NAMESPACE, BACKOFF_KEY, self.entries)
+
+
+class ProbeScheduler:
+    def __init__(
+        self,
+        targets,
+        backoff,
+        command=None,
+        ssh_key="",
+        max_concurrency=DEFAULT_MAX_CONCURRENCY,
+        timeout=DEFAULT_TIMEOUT_SECONDS,
+    ):
+        self.targets = targets
+        self.backoff = backoff
+        self.command = command or shlex.split(DEFAULT_OCI_COMMAND)
+        self.ssh_key = ssh_key
+        self.max_concurrency = max(1, max_concurrency)
+        self.timeout = timeout
+
+    @classmethod
+    def from_config(cls, config, store, command=None):
+        probe = (config.get("a1_instance") or {}).get("probe") or {}
+        backoff = ProbeBackoff(
+            store,
+            base=probe.get("backoff_base_seconds", DEFAULT_BACKOFF_BASE_SECONDS),
+            maximum=probe.get("backoff_max_seconds", DEFAULT_BACKOFF_MAX_SECONDS),
+        )
+        return cls(
+            probe_targets(config),
+            backoff,
+            command=command,
+            ssh_key=(config.get("oci") or {}).get("ssh_key", ""),
+            max_concurrency=probe.get("max_concurrency", DEFAULT_MAX_CONCURRENCY),
+            timeout=probe.get("timeout_seconds", DEFAULT_TIMEOUT_SECONDS),
+        )
+
+    def run(self, now=None):
+        """
+        backoff 中でない組み合わせを並行して試行
+        戻り値: {"status": "success" | "capacity" | "error" | "skipped", "target": 成功した組み合わせ,
+                 "instance_id": ..., "attempts": [{"target", "display_name", "outcome", "seconds"}, ...],
+                 "skipped": [backoff でスキップした組み合わせ],
+                 "removed": [削除した余分なインスタンスの ID], "cleanup_failed": [削除できなかった表示名 / ID]}
+        """
+        now = time.time() if now is None else now
+        stamp = datetime.fromtimestamp(now).strftime("%Y%m%d-%H%M%S")
+        pending, skipped = [], []
+        for target in self.targets:
+            (skipped if self.backoff.waiting(target, now) else pending).append(target)
+        for target in skipped:
+            logger.info(f"起動試行スキップ [{describe(target)}]: backoff 中（残り {self.backoff.waiting(target, now):.0f}秒）")
+
+        running = {}
+        attempts = []
+        winner = None
+        # 削除するもの: 2つ目以降に作成に成功した試行 / 中断して作成されたか分からない試行
+        extras, orphans = [], []
+        cleanup = {"removed": [], "cleanup_failed": []}
+        try:
+            while running or (pending and winner is None):
+                while pending and winner is None and len(running) < self.max_concurrency:
+                    target = pending.pop(0)
+                    name = f"a1-instance-{stamp}-{len(attempts) + len(running) + 1}"
+                    output = tempfile.TemporaryFile()
+                    proc = subprocess.Popen(
+                        launch_command(self.command, target, name, self.ssh_key),
+                        stdout=output,
+                        stderr=subprocess.STDOUT,
+                        stdin=subprocess.DEVNULL,
+                    )
+                    running[proc] = (target, name, output, time.monotonic())
+
+                finished = False
+                for proc in list(running):
+                    target, name, output, started = running[proc]
+                    elapsed = time.monotonic() - started
+                    if proc.poll() is None:
+                        if elapsed < self.timeout:
+                            continue
+                        self._stop(proc)
+                        outcome, instance_id = "timeout", None
+                    else:
+                        output.seek(0)
+                        text = output.read().decode("utf-8", errors="replace")
+                        outcome, instance_id = classify(text)
+                        if outcome == "error":
+                            logger.warning(f"起動試行エラー [{describe(target)}]: {text.strip()[-500:]}")
+                    del running[proc]
+                    output.close()
+                    finished = True
+                    attempts.append(self._record(target, name, outcome, elapsed, now))
+                    if outcome == "timeout":
+                        orphans.append((target, name))
+                    elif outcome == "success" and winner is None:
+                        winner = (target, instance_id)
+                        if running:
+                            logger.info(f"作成成功のため、実行中の試行 {len(running)}件の完了を待って終了します")
+                    elif outcome == "success":
+                        logger.warning(f"同時に別のインスタンスも作成されました: {instance_id}（{name}）")
+                        extras.append((target, instance_id))
+                if not finished:
+                    time.sleep(POLL_SECONDS)
+        finally:
+            # 例外で抜けた場合も子プロセスを残さない
+            orphans += self._cancel(running, attempts, now)
+            self.backoff.save()
+            cleanup = self._clean_up(extras, orphans)
+
+        if winner is not None:
+            status = "success"
+        elif not attempts:
+            status = "skipped"
+        elif all(a["outcome"] == "capacity" for a in attempts):
+            status = "capacity"
+        else:
+            status = "error"
+        return {
+            "status": status,
+            "target": winner[0] if winner else None,
+            "instance_id": winner[1] if winner else None,
+            "attempts": attempts,
+            "skipped": skipped,
+            **cleanup,
+        }
+
+    def _record(self, target, name, outcome, elapsed, now):
+        delay = self.backoff.record(target, outcome, now)
+        detail = f"（{delay / 60:.0f}分間スキップ）" if delay else ""
+        logger.info(f"起動試行 [{describe(target)}] {name}: {OUTCOME_LABELS[outcome]} {elapsed:.1f}秒{detail}")
+        return {"target": target, "display_name": name, "outcome": outcome, "seconds": elapsed}
+
+    def _cancel(self, running, attempts, now):
+        cancelled = []
+        for proc in list(running):
+            target, name, output, started = running.pop(proc)
+            self._stop(proc)
+            output.close()
+            attempts.append(self._record(target, name, "cancelled", time.monotonic() - started, now))
+            cancelled.append((target, name))
+        return cancelled
+
+    def _clean_up(self, extras, orphans):
+        """余分なインスタンスと、中断した試行で作成されたインスタンスを削除"""
+        removed, failed = [], []
+        instances = [(target, instance_id, instance_id) for target, instance_id in extras]
+        for target, name in orphans:
+            instance_ids = self._find(target, name)
+            if instance_ids is None:
+                failed.append(name)
+                continue
+            if instance_ids:
+                logger.warning(f"中断した試行でインスタンスが作成されていました: {', '.join(instance_ids)}（{name}）")
+            instances += [(target, instance_id, name) for instance_id in instance_ids]
+        for target, instance_id, label in instances:
+            if self._oci(target, ["compute", "instance", "terminate", "--instance-id", instance_id, "--force"]) is None:
+                failed.append(label)
+                continue
+            logger.info(f"余分なインスタンスを削除 [{describe(target)}]: {instance_id}")
+            removed.append(instance_id)
+        return {"removed": removed, "cleanup_failed": failed}
+
+    def _find(self, target, name):
+        """表示名が name の削除されていないインスタンス ID（確認できなければ None）"""
+        output = self._oci(
+            target,
+            ["compute", "instance", "list", "--compartment-id", target["compartment_id"] or "", "--display-name", name],
+        )
+        if output is None:
+            return None
+        try:
+            instances = json.loads(output)["data"] if output.strip() else []
+        except (ValueError, KeyError, TypeError):
+            logger.warning(f"インスタンス一覧を解釈できません（{name}）: {output.strip()[-200:]}")
+            return None
+        return [i["id"] for i in instances if i.get("lifecycle-state") not in GONE_STATES]
+
+    def _oci(self, target, args):
+        """oci CLI を実行して標準出力を返す（失敗したら None）"""
+        argv = list(self.command) + args
+        if target["region"]:
+            argv += ["--region", target["region"]]
+        try:
+            completed = subprocess.run(
+                argv, capture_output=True, text=True, stdin=subprocess.DEVNULL, timeout=self.timeout
+            )
+        except subprocess.TimeoutExpired:
+            logger.warning(f"oci {' '.join(args[:3])} がタイムアウトしました [{describe(target)}]")
+            return None
+        if completed.returncode != 0:
+            logger.warning(f"oci {' '.join(args[:3])} に失敗しました [{describe(target)}]: {completed.stderr.strip()[-300:]}")
+            return None
+        return completed.stdout
+
+    @staticmethod
+    def _stop(proc):
+        proc.terminate()
+        try:
+            proc.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.wait()
+
+
+def summary(result):
+    """シェルスクリプトのログ・通知に使う1行の要約"""
+    counts = {}
+    for attempt in result["attempts"]:
+        label = OUTCOME_LABELS[attempt["outcome"]]
+        counts[label] = counts.get(label, 0) + 1
+    parts = [f"{label} {count}" for label, count in counts.items()]
+    if result["skipped"]:
+        parts.append(f"backoff中 {len(result['skipped'])}")
+    if result.get("removed"):
+        parts.append(f"余分なインスタンス削除 {len(result['removed'])}")
+    if result.get("cleanup_failed"):
+        parts.append(f"削除できず要確認 {', '.join(result['cleanup_failed'])}")
+    return f"{len(result['attempts'])}件試行: " + (", ".join(parts) or "なし")
+
+
+def result_values(result):
+    target = result["target"] or {}
+    values = {
+        "PROBE_STATUS": result["status"],
+        "PROBE_SUMMARY": summary(result),
+        "INSTANCE_ID": result["instance_id"] or "",
+        "PROBE_REGION": target.get("region") or "",
+        "PROBE_AD": target.get("availability_domain") or "",
+    }
+    if target:
+        values.update(OCPUS=target["ocpus"], MEMORY=target["memory_in_gbs"])
+    return values
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="A1 インスタンスの空き確認（組み合わせを並行して試行）")
+    parser.add_argument("command", choices=["launch", "status"])
+    parser.add_argument("config", help="config.json のパス")
+    parser.add_argument("--oci-command", default=DEFAULT_OCI_COMMAND, help="oci CLI の起動コマンド")
+    args = parser.parse_args(argv)
+
+    # a1_check_log と同じ "YYYY-MM-DD HH:MM:SS - メッセージ" 形式
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(message)s", datefmt="%Y-%m-%d %H:%M:%S")
+    with open(args.config, "r") as f:
+        config = json.load(f)
+    store = StateStore.from_config(config)
+    scheduler = ProbeScheduler.from_config(config, store, command=shlex.split(args.oci_command))
+
+    if args.command == "status":
+        now = time.time()
+        for target in scheduler.targets:
+            waiting = scheduler.backoff.waiting(target, now)
+            failures = scheduler.backoff.entries.get(target["key"], {}).get("failures", 0)
+            state = f"backoff 残り {waiting:.0f}秒（連続 {failures}回）" if waiting else "試行可"
+            print(f"{describe(target)}: {state}")
+        return
+    sys.stdout.write(shell_assignments(result_values(scheduler.run())))
+
+
+if __name__ == "__main__":
+    main()
@@ -14,57 +14,39 @@ if [ ! -f "$CONFIG_FILE" ]; then
     exit 1
 fi
 
-# JSON設定から値を読み取る関数
-get_config_value() {
-    python3 -c "import json; config=json.load(open('$CONFIG_FILE')); print(config['$1']['$2'])" 2>/dev/null
-}
-
 # 設定値の読み込み
-export OCI_CLI_KEY_FILE=$(get_config_value "oci" "key_file")
-export OCI_CLI_PASSPHRASE=$(get_config_value "oci" "passphrase")
+# 全ての値を1回の python3 起動でまとめて読み込む（a1_config.py が KEY='value' の行を出力する）
+# SHAPE / COMPARTMENT_ID / AVAILABILITY_DOMAIN / IMAGE_ID / SUBNET_ID / SSH_KEY /
+# LOG_FILE / LAST_CHECK_FILE / CHECK_INTERVAL_MINUTES / OCPUS / MEMORY / OCI_CLI_*
+if ! CONFIG_VALUES=$(python3 "$SCRIPT_DIR/a1_config.py" env "$CONFIG_FILE"); then
+    echo "Error: config.json could not be read"
+    exit 1
+fi
+eval "$CONFIG_VALUES"
+export OCI_CLI_KEY_FILE OCI_CLI_PASSPHRASE
 export PATH=/home/opc/.local/bin:$PATH
 
 # A1インスタンス空き確認スクリプト
 # OCI CLI を使用してA1.Flexインスタンスの空きをチェック
 
-# 設定
-SHAPE=$(get_config_value "a1_instance" "shape")
-COMPARTMENT_ID=$(get_config_value "oci" "compartment_id")
-AVAILABILITY_DOMAIN=$(get_config_value "oci" "availability_domain")
-IMAGE_ID=$(get_config_value "oci" "image_id")
-SUBNET_ID=$(get_config_value "oci" "subnet_id")
-SSH_KEY=$(get_config_value "oci" "ssh_key")
-
-# Pushover通知設定
-PUSHOVER_USER_KEY=$(get_config_value "pushover" "user_key")
-PUSHOVER_API_TOKEN=$(get_config_value "pushover" "api_token")
-
-# ログファイル
-LOG_FILE=$(get_config_value "logging" "a1_check_log")
-LAST_CHECK_FILE=$(get_config_value "logging" "last_check_file")
-
 # 関数: ログメッセージ
 log_message() {
     echo "$(date '+%Y-%m-%d %H:%M:%S') - $1" | tee -a "$LOG_FILE"
 }
 
 # 関数: Pushover通知送信
+# 共通の通知キュー（common/notifier.py）に積んで送信する（失敗時は他の監視の実行時にも再送される）
 send_pushover_notification() {
     local message="$1"
     local title="${2:-🚀 OCI A1インスタンス空き通知}"
+    local priority="${3:-alert}"
     log_message "Pushover通知送信: $message"
     
-    response=$(curl -s \
-        --form-string "token=$PUSHOVER_API_TOKEN" \
-        --form-string "user=$PUSHOVER_USER_KEY" \
-        --form-string "message=$message" \
-        --form-string "title=$title" \
-        https://api.pushover.net/1/messages.json)
-    
-    if echo "$response" | grep -q '"status":1'; then
-        log_message "Pushover通知送信成功"
+    if (cd "$(dirname "$SCRIPT_DIR")" && python3 -m common.notifier send --source check_a1 \
+            --priority "$priority" --title "$title" --message "$message") >> "$LOG_FILE" 2>&1; then
+        log_message "Pushover通知をキューに追加"
     else
-        log_message "Pushover通知送信失敗: $response"
+        log_message "Pushover通知キュー追加失敗"
     fi
 }
 
@@ -73,9 +55,14 @@ get_yesterday_log_summary() {
     local yesterday=$(date -d "yesterday" '+%Y-%m-%d' 2>/dev/null || date -v-1d '+%Y-%m-%d' 2>/dev/null)
     
     if [ -f "$LOG_FILE" ]; then
-        local check_count=$(grep "$yesterday" "$LOG_FILE" | grep -c "A1インスタンス空き確認開始" || echo "0")
-        local success_count=$(grep "$yesterday" "$LOG_FILE" | grep -c "A1インスタンス作成成功" || echo "0")
-        local fail_count=$(grep "$yesterday" "$LOG_FILE" | grep -c "A1インスタンス作成失敗" || echo "0")
+        # 日付インデックス（common/log_index.py）で昨日の件数だけを引く（ログ全体は読まない）
+        local check_count=0 success_count=0 fail_count=0
+        local counts=$(cd "$(dirname "$SCRIPT_DIR")" && python3 -m common.log_index counts "$LOG_FILE" \
+            --date "$yesterday" \
+            --marker "check_count=A1インスタンス空き確認開始" \
+            --marker "success_count=A1インスタンス作成成功" \
+            --marker "fail_count=A1インスタンス作成失敗" 2>/dev/null)
+        eval "$counts"
         
         echo "📊 昨日($yesterday)のA1チェック結果：
 チェック回数: ${check_count}回
@@ -94,14 +81,14 @@ get_current_image_info() {
     local image_info=$(python3 -m oci compute image get --image-id "$IMAGE_ID" 2>/dev/null)
     
     if [ $? -eq 0 ]; then
-        local display_name=$(echo "$image_info" | python3 -c "import json, sys; data=json.load(sys.stdin); print(data['data']['display-name'])" 2>/dev/null || echo "Unknown")
-        local size_gb=$(echo "$image_info" | python3 -c "import json, sys; data=json.load(sys.stdin); print(round(data['data']['size-in-mbs']/1024, 1))" 2>/dev/null || echo "Unknown")
-        local lifecycle_state=$(echo "$image_info" | python3 -c "import json, sys; data=json.load(sys.stdin); print(data['data']['lifecycle-state'])" 2>/dev/null || echo "Unknown")
+        # 名前・サイズ・状態を1回の python3 起動でまとめて取り出す
+        local IMAGE_NAME=Unknown IMAGE_SIZE_GB=Unknown IMAGE_STATE=Unknown
+        eval "$(echo "$image_info" | python3 "$SCRIPT_DIR/a1_config.py" image 2>/dev/null)"
         
         echo "🖥️ 使用イメージ情報：
-名前: $display_name
-サイズ: ${size_gb}GB
-状態: $lifecycle_state
+名前: $IMAGE_NAME
+サイズ: ${IMAGE_SIZE_GB}GB
+状態: $IMAGE_STATE
 Image ID: $IMAGE_ID"
     else
         echo "🖥️ イメージ情報取得失敗（認証エラーの可能性）"
@@ -127,54 +114,46 @@ $image_info
 設定:
 - Shape: $SHAPE
 - Domain: $AVAILABILITY_DOMAIN
-- チェック間隔: $(get_config_value "a1_instance" "check_interval_minutes")分
+- チェック間隔: ${CHECK_INTERVAL_MINUTES}分
 
 今日も監視を継続します！"
 
-    send_pushover_notification "$report_message" "🌅 A1監視 朝のレポート"
+    send_pushover_notification "$report_message" "🌅 A1監視 朝のレポート" report
     log_message "朝の定期レポート送信完了"
 }
 
 # 関数: A1インスタンス作成を試行
+# AD・リージョン・シェイプ構成の組み合わせを a1_probe.py で並行して試行し、
+# 最初に成功した1台だけを返す（同時に作成された分は a1_probe.py が削除、容量不足の組み合わせは backoff 中スキップ）
 try_launch_a1() {
-    local instance_name="a1-instance-$(date +%Y%m%d-%H%M%S)"
-    
-    log_message "A1インスタンス作成を試行: $instance_name"
+    log_message "A1インスタンス作成を試行"
     
-    # A1.Flexインスタンス作成コマンド（設定から取得）
-    OCPUS=$(get_config_value "a1_instance" "shape_config" | python3 -c "import json, sys; config=json.load(sys.stdin); print(config['ocpus'])" 2>/dev/null || echo "4")
-    MEMORY=$(get_config_value "a1_instance" "shape_config" | python3 -c "import json, sys; config=json.load(sys.stdin); print(config['memory_in_gbs'])" 2>/dev/null || echo "24")
+    local PROBE_STATUS=error PROBE_SUMMARY="a1_probe.py の実行に失敗" INSTANCE_ID="" PROBE_REGION="" PROBE_AD=""
+    local OCPUS="$OCPUS" MEMORY="$MEMORY"
+    eval "$(python3 "$SCRIPT_DIR/a1_probe.py" launch "$CONFIG_FILE" 2>>"$LOG_FILE")"
     
-    result=$(python3 -m oci compute instance launch \
-        --availability-domain "$AVAILABILITY_DOMAIN" \
-        --compartment-id "$COMPARTMENT_ID" \
-        --shape "$SHAPE" \
-        --shape-config "{\"ocpus\": $OCPUS, \"memory_in_gbs\": $MEMORY}" \
-        --display-name "$instance_name" \
-        --image-id "$IMAGE_ID" \
-        --subnet-id "$SUBNET_ID" \
-        --assign-public-ip true \
-        --metadata "{\"ssh_authorized_keys\": \"$SSH_KEY\"}" \
-        2>&1)
-    
-    if echo "$result" | grep -q '"lifecycle-state": "PROVISIONING"'; then
-        instance_id=$(echo "$result" | grep '"id":' | head -1 | sed 's/.*"id": "\([^"]*\)".*/\1/')
-        log_message "A1インスタンス作成成功! Instance ID: $instance_id"
+    if [ "$PROBE_STATUS" = "success" ]; then
+        log_message "A1インスタンス作成成功! Instance ID: $INSTANCE_ID"
         
         # Pushover通知を送信
         send_pushover_notification "🎉 A1インスタンス作成成功！
-Instance ID: $instance_id
+Instance ID: $INSTANCE_ID
 時刻: $(date)
-Shape: $SHAPE ($OCPUS OCPU, ${MEMORY}GB RAM)"
+Shape: $SHAPE ($OCPUS OCPU, ${MEMORY}GB RAM)
+Domain: $PROBE_AD${PROBE_REGION:+ ($PROBE_REGION)}" "🚀 OCI A1インスタンス空き通知" transition
         
         # 成功時は即座に削除（テストのため）
         log_message "テスト用インスタンスを削除中..."
-        python3 -m oci compute instance terminate --instance-id "$instance_id" --force
+        python3 -m oci compute instance terminate --instance-id "$INSTANCE_ID" --force \
+            ${PROBE_REGION:+--region "$PROBE_REGION"}
         log_message "テスト用インスタンス削除完了"
         
         return 0
+    elif [ "$PROBE_STATUS" = "skipped" ]; then
+        log_message "全ての組み合わせが容量不足の backoff 中のため試行しません: $PROBE_SUMMARY"
+        return 1
     else
-        log_message "A1インスタンス作成失敗: $result"
+        log_message "A1インスタンス作成失敗: $PROBE_SUMMARY"
         return 1
     fi
 }
@@ -208,7 +187,7 @@ main() {
     current_time=$(date +%s)
     time_diff=$((current_time - last_check))
     
-    CHECK_INTERVAL_SECONDS=$(($(get_config_value "a1_instance" "check_interval_minutes") * 60))
+    CHECK_INTERVAL_SECONDS=$((CHECK_INTERVAL_MINUTES * 60))
     if [ $time_diff -lt $CHECK_INTERVAL_SECONDS ]; then
         log_message "前回のチェックから$(($CHECK_INTERVAL_SECONDS/60))分経過していません。スキップします。"
         exit 0
@@ -0,0 +1,6 @@
+"""
+監視スクリプト共通モジュール
+
+各監視ディレクトリ (rate-exchange, bitcoin, us_bonds, check_a1) と同じ階層に配置し、
+親ディレクトリを sys.path に加えて `from common import ...` で利用する
+"""
@@ -0,0 +1,362 @@
+#!/usr/bin/env python3
+"""
+アラート閾値・cooldown のバックテスト
+
+保存済みの履歴を監視スクリプトと同じ判定で再生し、パラメータの組み合わせごとに
+通知回数と通知タイミングを集計する。
+- ボラ型: 直前サンプルとの変動率 |Δ| が閾値以上で発火し、前回通知から cooldown 秒
+  未満なら抑制（check_price_alerts / check_usdjpy / check_us_bonds と同じ）
+- state transition: 10年債が absolute_threshold を跨いだときだけ発火
+
+閾値はしきい値ごとの配列比較、cooldown は「次に通知できる超過イベント」への
+ポインタを searchsorted で作り、ダブリング（binary lifting）で全 cooldown を
+まとめて辿るため、1年分の分足 × 数千通りのグリッドでも数秒で終わる。
+
+使い方（/home/opc で実行）:
+    python3 -m common.backtest bitcoin --thresholds 0.01:0.1:10 --cooldowns 0 3600 21600
+    python3 -m common.backtest fx --thresholds 0.002 0.005 0.01
+    python3 -m common.backtest bonds --log us_bonds/us_bonds.log --levels 4.5 5.0
+    python3 -m common.backtest csv --file history.csv --thresholds 0.01 --cooldowns 0
+"""
+
+import argparse
+import gzip
+import json
+import os
+import re
+import time
+from datetime import datetime
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+BITCOIN_HISTORY = "/tmp/bitcoin_history"  # bitcoin/history_store.py のカラム型ストア
+RATE_SAMPLE_DTYPE = np.dtype([("ts", "<i8"), ("rate", "<f8")])  # rate_store の samples.bin
+BOND_LOG_PATTERN = re.compile(
+    r"^(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}).* - (.+?): prev=([-\d.]+)%, curr=([-\d.]+)%"
+)
+TEN_YEAR = "10-Year Treasury"
+
+# binary lifting のジャンプ表に使う要素数の上限（cooldown をこの範囲で分割して処理）
+LIFT_BUDGET = 8_000_000
+
+
+# ---- 判定 ---------------------------------------------------------------------
+
+
+def sample_changes(values):
+    """直前サンプルとの変動率（先頭・前回が 0 / 欠損のサンプルは NaN）"""
+    values = np.asarray(values, dtype=np.float64)
+    change = np.full(len(values), np.nan)
+    if len(values) < 2:
+        return change
+    previous, current = values[:-1], values[1:]
+    valid = np.isfinite(previous) & np.isfinite(current) & (previous != 0)
+    safe_previous = np.where(valid, previous, 1.0)
+    change[1:] = np.where(valid, (current - safe_previous) / safe_previous, np.nan)
+    return change
+
+
+def _greedy_chain(event_times, cooldowns):
+    """
+    昇順の超過イベント時刻から cooldown ごとに通知を貪欲に選んだときの
+    (通知回数, 最後の通知のイベント位置)
+    """
+    m = len(event_times)
+    positions = np.arange(m)
+    counts = np.empty(len(cooldowns), dtype=np.int64)
+    last = np.empty(len(cooldowns), dtype=np.int64)
+    levels = max(1, int(m).bit_length())
+    chunk = max(1, LIFT_BUDGET // ((m + 1) * levels))
+
+    for start in range(0, len(cooldowns), chunk):
+        block = cooldowns[start : start + chunk]
+        rows = np.arange(len(block))
+        # nxt[c, j]: j で通知した後、(now - last) >= cooldown を満たす最初のイベント（m は終端）
+        nxt = np.searchsorted(event_times, event_times[None, :] + block[:, None], side="left")
+        nxt = np.maximum(nxt, positions + 1)
+        nxt = np.concatenate([nxt, np.full((len(block), 1), m)], axis=1)
+        jumps = [nxt]
+        for _ in range(1, levels):
+            jumps.append(np.take_along_axis(jumps[-1], jumps[-1], axis=1))
+
+        current = np.zeros(len(block), dtype=np.int64)
+        count = np.ones(len(block), dtype=np.int64)
+        for k in range(levels - 1, -1, -1):
+            step = jumps[k][rows, current]
+            ok = step < m
+            current = np.where(ok, step, current)
+            count += ok.astype(np.int64) << k
+        counts[start : start + chunk] = count
+        last[start : start + chunk] = current
+    return counts, last
+
+
+def backtest_volatility(times, values, thresholds, cooldowns):
+    """
+    ボラ型アラートのグリッドバックテスト
+    戻り値: (閾値数, cooldown 数) の配列 notifications / exceeded / first_ts / last_ts / mean_interval
+    """
+    times = np.asarray(times, dtype=np.float64)
+    thresholds = np.asarray(thresholds, dtype=np.float64)
+    cooldowns = np.asarray(cooldowns, dtype=np.float64)
+    magnitude = np.abs(sample_changes(values))
+    magnitude[np.isnan(magnitude)] = -np.inf
+
+    shape = (len(thresholds), len(cooldowns))
+    result = {
+        "notifications": np.zeros(shape, dtype=np.int64),
+        "exceeded": np.zeros(shape, dtype=np.int64),
+        "first_ts": np.full(shape, np.nan),
+        "last_ts": np.full(shape, np.nan),
+        "mean_interval": np.full(shape, np.nan),
+    }
+    for i, threshold in enumerate(thresholds):
+        event_times = times[magnitude >= threshold]
+        if not len(event_times):
+            continue
+        counts, last = _greedy_chain(event_times, cooldowns)
+        result["notifications"][i] = counts
+        result["exceeded"][i] = len(event_times)
+        result["first_ts"][i] = event_times[0]
+        result["last_ts"][i] = event_times[last]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            result["mean_interval"][i] = np.where(
+                counts > 1, (event_times[last] - event_times[0]) / (counts - 1), np.nan
+            )
+    return result
+
+
+def backtest_transitions(times, values, levels):
+    """
+    state transition（levels を跨いだときだけ発火）のバックテスト
+    欠損サンプルは state を変えない。先頭サンプルは初期化のみ
+    """
+    times = np.asarray(times, dtype=np.float64)
+    values = np.asarray(values, dtype=np.float64)
+    levels = np.asarray(levels, dtype=np.float64)
+    valid = np.isfinite(values)
+    times, values = times[valid], values[valid]
+
+    result = {
+        "notifications": np.zeros(len(levels), dtype=np.int64),
+        "first_ts": np.full(len(levels), np.nan),
+        "last_ts": np.full(len(levels), np.nan),
+    }
+    if len(times) < 2:
+        return result
+
+    above = values[None, :] >= levels[:, None]
+    flips = above[:, 1:] != above[:, :-1]
+    fired = flips.any(axis=1)
+    flip_times = times[1:]
+    result["notifications"] = flips.sum(axis=1)
+    result["first_ts"] = np.where(fired, flip_times[np.argmax(flips, axis=1)], np.nan)
+    result["last_ts"] = np.where(
+        fired, flip_times[len(flip_times) - 1 - np.argmax(flips[:, ::-1], axis=1)], np.nan
+    )
+    return result
+
+
+# ---- 履歴の読み込み -------------------------------------------------------------
+
+
+def load_bitcoin_history(path=BITCOIN_HISTORY):
+    """履歴ストアのディレクトリ（timestamp / price カラムを memmap）または旧形式の JSON"""
+    if path.endswith(".json"):
+        with open(path, "r") as f:
+            points = json.load(f)
+        times = np.array([p["timestamp"] for p in points], dtype=np.float64) / 1000
+        prices = np.array([p["price"] for p in points], dtype=np.float64)
+        return times, prices
+
+    with open(os.path.join(path, "meta.json"), "r") as f:
+        meta = json.load(f)
+    columns = {}
+    for name, dtype in (("timestamp", "<i8"), ("price", "<f8")):
+        column_path = os.path.join(path, f"{name}.{meta['generation']}.bin")
+        columns[name] = np.memmap(column_path, dtype=dtype, mode="r", shape=(meta["length"],))
+    return columns["timestamp"] / 1000, columns["price"]
+
+
+def load_rate_samples(directory):
+    samples = np.fromfile(os.path.join(directory, "samples.bin"), dtype=RATE_SAMPLE_DTYPE)
+    return samples["ts"].astype(np.float64), samples["rate"]
+
+
+def load_bond_log(paths, bond=TEN_YEAR):
+    """us_bonds のログ（.gz 可）から指定銘柄の (時刻, 金利) を抽出"""
+    times, rates = [], []
+    for path in paths:
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, "rt", encoding="utf-8", errors="replace") as f:
+            for line in f:
+                match = BOND_LOG_PATTERN.match(line)
+                if not match or match.group(2) != bond:
+                    continue
+                times.append(datetime.strptime(match.group(1), "%Y-%m-%d %H:%M:%S").timestamp())
+                rates.append(float(match.group(4)))
+    order = np.argsort(times, kind="stable")
+    return np.asarray(times, dtype=np.float64)[order], np.asarray(rates, dtype=np.float64)[order]
+
+
+def load_csv(path):
+    """timestamp(秒),value 形式の CSV（ヘッダ行は読み飛ばす）"""
+    data = np.genfromtxt(path, delimiter=",", dtype=np.float64, invalid_raise=False)
+    data = data[np.isfinite(data[:, 0])]
+    return data[:, 0], data[:, 1]
+
+
+# ---- CLI ------------------------------------------------------------------------
+
+
+def parse_grid(values):
+    """"0.01" や "0.01:0.1:10"（linspace）を並べたグリッド指定を配列に展開"""
+    grid = []
+    for value in values:
+        if ":" in value:
+            start, stop, num = value.split(":")
+            grid.extend(np.linspace(float(start), float(stop), int(num)))
+        else:
+            grid.append(float(value))
+    return np.asarray(grid, dtype=np.float64)
+
+
+def _load_config():
+    path = os.path.join(BASE_DIR, "config.json")
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def _defaults(source, config):
+    """グリッド未指定時に使う現在の設定値 (thresholds, cooldowns, levels)"""
+    if source == "bitcoin":
+        alerts = config.get("bitcoin", {}).get("alerts", {})
+        return alerts.get("price_change_threshold"), alerts.get("cooldown_seconds", 0), None
+    if source == "fx":
+        fx = config.get("exchange_rate", {})
+        return fx.get("threshold"), fx.get("cooldown_seconds", 0), None
+    if source == "bonds":
+        monitoring = config.get("us_bonds", {}).get("monitoring", {})
+        return (
+            monitoring.get("volatility_threshold", 0.05),
+            monitoring.get("cooldown_seconds", 0),
+            monitoring.get("absolute_threshold"),
+        )
+    return None, 0, None
+
+
+def _iso(ts):
+    return datetime.fromtimestamp(ts).isoformat(timespec="minutes") if np.isfinite(ts) else None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="アラート閾値・cooldown のバックテスト")
+    parser.add_argument("source", choices=["bitcoin", "fx", "bonds", "csv"])
+    parser.add_argument("--thresholds", nargs="+", help="変動率の閾値（例: 0.01 0.02 / 0.005:0.05:10）")
+    parser.add_argument("--cooldowns", nargs="+", help="cooldown 秒（例: 0 3600 / 0:86400:25）")
+    parser.add_argument("--levels", nargs="+", help="10年債の state transition 閾値（%%）")
+    parser.add_argument("--file", help="csv: timestamp,value の CSV / bitcoin: 履歴ストアまたは JSON")
+    parser.add_argument("--store-dir", help="fx: rate_store のディレクトリ")
+    parser.add_argument("--log", nargs="+", help="bonds: us_bonds のログファイル")
+    parser.add_argument("--bond", default=TEN_YEAR, help="bonds: ボラ判定する銘柄")
+    parser.add_argument("--json", action="store_true", help="結果を JSON で出力")
+    args = parser.parse_args(argv)
+
+    config = _load_config()
+    default_threshold, default_cooldown, default_level = _defaults(args.source, config)
+
+    if args.source == "bitcoin":
+        times, values = load_bitcoin_history(
+            args.file or config.get("bitcoin", {}).get("history_dir", BITCOIN_HISTORY)
+        )
+    elif args.source == "fx":
+        store_dir = args.store_dir or os.path.join(
+            BASE_DIR, "rate-exchange", config.get("exchange_rate", {}).get("store_dir", "usd_jpy_store")
+        )
+        times, values = load_rate_samples(store_dir)
+    elif args.source == "bonds":
+        if not args.log:
+            parser.error("bonds には --log が必要です")
+        times, values = load_bond_log(args.log, args.bond)
+    else:
+        if not args.file:
+            parser.error("csv には --file が必要です")
+        times, values = load_csv(args.file)
+
+    if args.thresholds:
+        thresholds = parse_grid(args.thresholds)
+    elif default_threshold is not None:
+        thresholds = np.array([default_threshold], dtype=np.float64)
+    else:
+        parser.error("--thresholds を指定してください")
+    cooldowns = parse_grid(args.cooldowns) if args.cooldowns else np.array([float(default_cooldown)])
+
+    started = time.perf_counter()
+    volatility = backtest_volatility(times, values, thresholds, cooldowns)
+    rows = []
+    for i, threshold in enumerate(thresholds):
+        for j, cooldown in enumerate(cooldowns):
+            rows.append(
+                {
+                    "threshold": float(threshold),
+                    "cooldown_seconds": float(cooldown),
+                    "notifications": int(volatility["notifications"][i, j]),
+                    "suppressed": int(volatility["exceeded"][i, j] - volatility["notifications"][i, j]),
+                    "first": _iso(volatility["first_ts"][i, j]),
+                    "last": _iso(volatility["last_ts"][i, j]),
+                    "mean_interval_seconds": (
+                        float(volatility["mean_interval"][i, j])
+                        if np.isfinite(volatility["mean_interval"][i, j])
+                        else None
+                    ),
+                }
+            )
+
+    transitions = []
+    levels = parse_grid(args.levels) if args.levels else None
+    if levels is None and args.source == "bonds" and default_level is not None:
+        levels = np.array([default_level], dtype=np.float64)
+    if levels is not None:
+        if args.source == "bonds" and args.bond != TEN_YEAR:
+            times, values = load_bond_log(args.log, TEN_YEAR)
+        result = backtest_transitions(times, values, levels)
+        transitions = [
+            {
+                "level": float(level),
+                "notifications": int(result["notifications"][k]),
+                "first": _iso(result["first_ts"][k]),
+                "last": _iso(result["last_ts"][k]),
+            }
+            for k, level in enumerate(levels)
+        ]
+    elapsed = time.perf_counter() - started
+
+    summary = {
+        "source": args.source,
+        "samples": int(len(times)),
+        "parameter_sets": len(rows) + len(transitions),
+        "elapsed_seconds": elapsed,
+        "volatility": rows,
+        "transitions": transitions,
+    }
+    if args.json:
+        print(json.dumps(summary, ensure_ascii=False, indent=2))
+        return
+
+    print(f"{args.source}: {len(times)}サンプル / {summary['parameter_sets']}通り ({elapsed:.2f}s)")
+    print(f"{'threshold':>10}{'cooldown(s)':>13}{'notify':>8}{'suppress':>10}  first / last")
+    for row in rows:
+        print(
+            f"{row['threshold']:>10.4f}{row['cooldown_seconds']:>13.0f}{row['notifications']:>8}"
+            f"{row['suppressed']:>10}  {row['first'] or '-'} / {row['last'] or '-'}"
+        )
+    for row in transitions:
+        print(f"10年債 {row['level']:.2f}% 跨ぎ: {row['notifications']}回 ({row['first'] or '-'} / {row['last'] or '-'})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+"""
+監視ジョブ常駐デーモン
+
+cron で毎回インタプリタを起動する代わりに、1つの asyncio イベントループで
+為替・Bitcoin・米国債の各チェックと朝のレポートをスケジュール実行する。
+モジュール・設定・HTTPセッションはプロセス内で保持され、実行間で再利用される。
+
+使い方（/home/opc で実行）:
+    python3 -m common.daemon              # 常駐
+    python3 -m common.daemon --list       # ジョブ一覧
+    python3 -m common.daemon --once us_bonds
+"""
+
+import argparse
+import asyncio
+import concurrent.futures
+import fcntl
+import importlib.util
+import json
+import logging
+import os
+import random
+import signal
+import sys
+import time
+from datetime import datetime, timedelta
+
+from common import metrics
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+logger = logging.getLogger("monitor_daemon")
+
+LOG_FORMAT = "%(asctime)s - %(levelname)s - %(message)s"
+
+# 監視モジュール: 名前 → (スクリプトパス, ログ設定キー)
+MONITORS = {
+    "rate_exchange": ("rate-exchange/rate-exchange.py", "rate_exchange_log"),
+    "bitcoin_tracker": ("bitcoin/bitcoin_tracker.py", "bitcoin_log"),
+    "us_bond_checker": ("us_bonds/us_bond_checker.py", "us_bonds_log"),
+}
+
+# ジョブ既定値（config.json の daemon.jobs で上書き）
+DEFAULT_JOBS = {
+    "rate_exchange": {
+        "monitor": "rate_exchange",
+        "func": "check_usdjpy",
+        "interval_seconds": 900,
+        "jitter_seconds": 30,
+    },
+    "bitcoin": {
+        "monitor": "bitcoin_tracker",
+        "func": "main",
+        "interval_seconds": 900,
+        "jitter_seconds": 30,
+        "persistent": "BitcoinTracker",
+    },
+    "us_bonds": {
+        "monitor": "us_bond_checker",
+        "func": "check_us_bonds",
+        "interval_seconds": 900,
+        "jitter_seconds": 30,
+    },
+    "rate_exchange_morning_report": {
+        "monitor": "rate_exchange",
+        "func": "send_morning_report",
+        "at": "10:00",
+        "jitter_seconds": 0,
+        "enabled": False,
+    },
+    "us_bonds_morning_report": {
+        "monitor": "us_bond_checker",
+        "func": "send_morning_report",
+        "at": "10:00",
+        "jitter_seconds": 0,
+        "enabled": False,
+    },
+}
+
+
+def load_config():
+    """設定ファイルを読み込み"""
+    config_path = os.path.join(BASE_DIR, "config.json")
+    if not os.path.exists(config_path):
+        raise FileNotFoundError("config.json not found")
+
+    with open(config_path, "r") as f:
+        return json.load(f)
+
+
+class MonitorLoader:
+    """監視スクリプトを一度だけ import し、モジュールを保持する"""
+
+    def __init__(self, config):
+        self.config = config
+        self.modules = {}
+
+    def get(self, name):
+        if name not in self.modules:
+            self.modules[name] = self._load(name)
+        return self.modules[name]
+
+    def _load(self, name):
+        relpath, log_key = MONITORS[name]
+        path = os.path.join(BASE_DIR, relpath)
+        directory = os.path.dirname(path)
+        if directory not in sys.path:
+            sys.path.insert(0, directory)
+
+        logger.info(f"モジュール読み込み: {relpath}")
+        spec = importlib.util.spec_from_file_location(name, path)
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[name] = module
+        with working_directory(directory):
+            try:
+                spec.loader.exec_module(module)
+            except Exception:
+                sys.modules.pop(name, None)
+                raise
+            # basicConfig はデーモン側で設定済みのため、監視ごとのログファイルを個別に付与
+            log_file = self.config["logging"].get(log_key)
+            if log_file:
+                handler = logging.FileHandler(log_file)
+                handler.setFormatter(logging.Formatter(LOG_FORMAT))
+                module.logger.addHandler(handler)
+        return module
+
+
+class working_directory:
+    """cron の `cd <dir> &&` と同じ相対パス解決になるよう一時的に chdir"""
+
+    def __init__(self, path):
+        self.path = path
+        self.previous = None
+
+    def __enter__(self):
+        self.previous = os.getcwd()
+        os.chdir(self.path)
+
+    def __exit__(self, *exc):
+        os.chdir(self.previous)
+
+
+class Job:
+    def __init__(self, name, settings, loader):
+        self.name = name
+        self.settings = settings
+        self.loader = loader
+        self.interval = settings.get("interval_seconds")
+        self.at = settings.get("at")
+        self.jitter = settings.get("jitter_seconds", 0)
+        self.running = None
+        self.instance = None
+        self.runs = 0
+        self.skipped = 0
+        self.failures = 0
+
+    def next_delay(self, now=None):
+        """次回実行までの秒数（interval は時計に整列、at は毎日指定時刻）"""
+        now = now or datetime.now()
+        if self.at:
+            hour, minute = (int(v) for v in self.at.split(":"))
+            target = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+            if target <= now:
+                target += timedelta(days=1)
+            delay = (target - now).total_seconds()
+        else:
+            ts = now.timestamp()
+            delay = self.interval - (ts % self.interval)
+        if self.jitter:
+            delay += random.uniform(0, self.jitter)
+        return delay
+
+    def run(self):
+        """ワーカースレッドで同期実行（監視モジュールのディレクトリを cwd にする）"""
+        module = self.loader.get(self.settings["monitor"])
+        func = getattr(module, self.settings["func"])
+        args = ()
+        persistent = self.settings.get("persistent")
+        if persistent:
+            if self.instance is None:
+                with working_directory(os.path.dirname(module.__file__)):
+                    self.instance = getattr(module, persistent)()
+            args = (self.instance,)
+        try:
+            with working_directory(os.path.dirname(module.__file__)), metrics.stage(self.name, "cycle"):
+                return func(*args)
+        finally:
+            # /metrics で公開しない場合はジョブごとにテキストファイルへ書き出す
+            metrics.flush()
+
+
+class Scheduler:
+    def __init__(self, jobs):
+        self.jobs = jobs
+        # 監視モジュールはスレッドセーフでない（chdir / matplotlib）ため1スレッドで直列実行
+        self.executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="monitor-job"
+        )
+        self.stopping = None
+
+    async def _run_job(self, job):
+        started = time.monotonic()
+        logger.info(f"[{job.name}] 実行開始")
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(self.executor, job.run)
+            job.runs += 1
+            logger.info(f"[{job.name}] 実行完了 ({time.monotonic() - started:.2f}s)")
+        except Exception as e:
+            job.failures += 1
+            logger.error(f"[{job.name}] 実行エラー: {e}")
+
+    async def _job_loop(self, job):
+        while not self.stopping.is_set():
+            delay = job.next_delay()
+            try:
+                await asyncio.wait_for(self.stopping.wait(), timeout=delay)
+                break
+            except asyncio.TimeoutError:
+                pass
+            # 前回の実行が終わっていなければ重複起動しない
+            if job.running is not None and not job.running.done():
+                job.skipped += 1
+                logger.warning(f"[{job.name}] 前回の実行が継続中のためスキップ")
+                continue
+            job.running = asyncio.ensure_future(self._run_job(job))
+
+    async def run_forever(self):
+        self.stopping = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(sig, self.stopping.set)
+
+        for job in self.jobs:
+            logger.info(f"[{job.name}] 登録: 次回 {job.next_delay():.0f}s 後")
+        await asyncio.gather(*(self._job_loop(job) for job in self.jobs))
+
+        running = [job.running for job in self.jobs if job.running and not job.running.done()]
+        if running:
+            logger.info(f"実行中ジョブの完了待ち: {len(running)}件")
+            await asyncio.gather(*running)
+        self.executor.shutdown(wait=True)
+        for job in self.jobs:
+            logger.info(
+                f"[{job.name}] 実行 {job.runs} / スキップ {job.skipped} / 失敗 {job.failures}"
+            )
+
+
+def build_jobs(config, loader):
+    """既定ジョブに config.json の daemon.jobs をマージして有効なジョブを返す"""
+    overrides = config.get("daemon", {}).get("jobs", {})
+    jobs = []
+    for name in list(DEFAULT_JOBS) + [n for n in overrides if n not in DEFAULT_JOBS]:
+        settings = dict(DEFAULT_JOBS.get(name, {}))
+        settings.update(overrides.get(name, {}))
+        if not settings.get("enabled", True):
+            continue
+        if not settings.get("interval_seconds") and not settings.get("at"):
+            raise ValueError(f"ジョブ {name} に interval_seconds または at が必要です")
+        jobs.append(Job(name, settings, loader))
+    return jobs
+
+
+def acquire_pidfile(path):
+    """二重起動防止のロックを取得（プロセス終了で自動解放）"""
+    handle = open(path, "a+")
+    try:
+        fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        raise SystemExit(f"既にデーモンが起動しています: {path}")
+    handle.seek(0)
+    handle.truncate()
+    handle.write(str(os.getpid()))
+    handle.flush()
+    return handle
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="監視ジョブ常駐デーモン")
+    parser.add_argument("--list", action="store_true", help="有効なジョブ一覧を表示")
+    parser.add_argument("--once", metavar="JOB", help="指定ジョブを1回だけ実行して終了")
+    args = parser.parse_args(argv)
+
+    # 監視モジュールの basicConfig より先に設定し、ルートへはコンソール出力のみ
+    logging.basicConfig(level=logging.INFO, format=LOG_FORMAT, handlers=[logging.StreamHandler()])
+
+    config = load_config()
+    # 監視モジュールの import より先に有効化する（以降の configure は無視される）
+    metrics.configure(config)
+    loader = MonitorLoader(config)
+    jobs = build_jobs(config, loader)
+
+    if args.list:
+        for job in jobs:
+            schedule = f"毎日 {job.at}" if job.at else f"{job.interval}s 間隔"
+            print(f"{job.name}: {job.settings['monitor']}.{job.settings['func']} ({schedule})")
+        return
+
+    if args.once:
+        job = next((j for j in jobs if j.name == args.once), None)
+        if job is None:
+            raise SystemExit(f"ジョブが見つかりません: {args.once}")
+        job.run()
+        return
+
+    pidfile = config.get("daemon", {}).get("pid_file", "/tmp/monitor-daemon.pid")
+    lock = acquire_pidfile(pidfile)
+    listen_port = (config.get("metrics") or {}).get("listen_port")
+    if metrics.enabled() and listen_port:
+        metrics.serve(listen_port)
+        logger.info(f"メトリクス公開: http://127.0.0.1:{listen_port}/metrics")
+    try:
+        asyncio.run(Scheduler(jobs).run_forever())
+    finally:
+        lock.close()
+
+
+if __name__ == "__main__":
+    main()
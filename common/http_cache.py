@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""
+上流マーケットAPI向けの共有HTTPレスポンスキャッシュ
+
+- キー: メソッド + URL + パラメータ（ソート済み）の SHA-256
+- エンドポイント（URL前方一致）ごとの TTL
+- 期限切れ時は ETag / Last-Modified による条件付きリクエストで再検証
+- 合計サイズ上限を超えたら最終アクセスの古い順に削除（LRU）
+- 複数の cron プロセスから同時に使えるよう、エントリは原子的に置き換え、
+  取得処理はキー単位の flock で直列化する
+
+使い方（/home/opc で実行）:
+    python3 -m common.http_cache stats
+    python3 -m common.http_cache clear
+"""
+
+import argparse
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+from urllib.parse import urlencode
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DIRECTORY = "/tmp/monitor_http_cache"
+DEFAULT_MAX_BYTES = 10 * 1024 * 1024
+DEFAULT_TTL_SECONDS = 60
+STAT_KEYS = ("hits", "misses", "revalidated", "evictions")
+
+
+class CachedResponse:
+    """requests.Response 互換の最小限のレスポンス"""
+
+    def __init__(self, status_code, content, headers, from_cache):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers
+        self.from_cache = from_cache
+
+    @property
+    def text(self):
+        return self.content.decode("utf-8", errors="replace")
+
+    def json(self):
+        return json.loads(self.content)
+
+    def raise_for_status(self):
+        """キャッシュ経由のレスポンスは成功応答のみ（エラーは取得時に送出済み）"""
+
+
+@contextmanager
+def _flock(path, mode=fcntl.LOCK_EX):
+    with open(path, "a+") as handle:
+        fcntl.flock(handle, mode)
+        try:
+            yield handle
+        finally:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+class HttpCache:
+    def __init__(
+        self,
+        session,
+        directory=DEFAULT_DIRECTORY,
+        max_bytes=DEFAULT_MAX_BYTES,
+        default_ttl=DEFAULT_TTL_SECONDS,
+        ttl_rules=None,
+        enabled=True,
+    ):
+        self.session = session
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        # 長い前方一致を優先
+        self.ttl_rules = sorted((ttl_rules or {}).items(), key=lambda kv: -len(kv[0]))
+        self.enabled = enabled
+        self.stats = dict.fromkeys(STAT_KEYS, 0)
+        if enabled:
+            os.makedirs(directory, exist_ok=True)
+
+    @classmethod
+    def from_config(cls, config, session):
+        """config.json の http_cache セクションから生成（未設定時は既定値）"""
+        cache_config = config.get("http_cache", {})
+        return cls(
+            session,
+            directory=cache_config.get("directory", DEFAULT_DIRECTORY),
+            max_bytes=cache_config.get("max_bytes", DEFAULT_MAX_BYTES),
+            default_ttl=cache_config.get("default_ttl_seconds", DEFAULT_TTL_SECONDS),
+            ttl_rules=cache_config.get("ttl_seconds"),
+            enabled=cache_config.get("enabled", True),
+        )
+
+    # ---- 公開API --------------------------------------------------------
+
+    def ttl_for(self, url):
+        for prefix, ttl in self.ttl_rules:
+            if url.startswith(prefix):
+                return ttl
+        return self.default_ttl
+
+    def get(self, url, params=None, timeout=30, ttl=None):
+        """GET（TTL 内ならキャッシュから返し、期限切れなら条件付きで再検証）"""
+        if not self.enabled:
+            response = self.session.get(url, params=params, timeout=timeout)
+            response.raise_for_status()
+            return response
+
+        ttl = self.ttl_for(url) if ttl is None else ttl
+        key = self._key(url, params)
+
+        entry = self._read(key)
+        if entry and entry[0]["expires_at"] > time.time():
+            self._hit(key, "hits")
+            return self._response(entry, from_cache=True)
+
+        # 同じキーの取得は1プロセスだけが行い、他はその結果を使う
+        with _flock(self._path(key, ".lock")):
+            entry = self._read(key)
+            if entry and entry[0]["expires_at"] > time.time():
+                self._hit(key, "hits")
+                return self._response(entry, from_cache=True)
+            return self._fetch(key, url, params, timeout, ttl, entry)
+
+    def get_stats(self):
+        """プロセス内の統計と、全プロセス累計の統計"""
+        return {"process": dict(self.stats), "total": self._load_shared_stats()}
+
+    def clear(self):
+        for name in os.listdir(self.directory):
+            if name.endswith((".entry", ".lock")):
+                os.remove(os.path.join(self.directory, name))
+
+    # ---- 内部処理 -------------------------------------------------------
+
+    def _key(self, url, params):
+        query = urlencode(sorted((params or {}).items()))
+        return hashlib.sha256(f"GET {url}?{query}".encode("utf-8")).hexdigest()
+
+    def _path(self, key, suffix=".entry"):
+        return os.path.join(self.directory, key + suffix)
+
+    def _fetch(self, key, url, params, timeout, ttl, stale):
+        headers = {}
+        if stale:
+            meta = stale[0]
+            if meta.get("etag"):
+                headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                headers["If-Modified-Since"] = meta["last_modified"]
+
+        response = self.session.get(url, params=params, headers=headers, timeout=timeout)
+        if response.status_code == 304 and stale:
+            meta, body = stale
+            meta["expires_at"] = time.time() + ttl
+            self._write(key, meta, body)
+            self._count("revalidated")
+            logger.info(f"キャッシュ再検証 (304): {url}")
+            return self._response((meta, body), from_cache=True)
+
+        response.raise_for_status()
+        self._count("misses")
+        meta = {
+            "url": url,
+            "params": params or {},
+            "status": response.status_code,
+            "content_type": response.headers.get("Content-Type"),
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "fetched_at": time.time(),
+            "expires_at": time.time() + ttl,
+        }
+        self._write(key, meta, response.content)
+        self._evict()
+        return response
+
+    def _response(self, entry, from_cache):
+        meta, body = entry
+        headers = {"Content-Type": meta.get("content_type") or "application/json"}
+        return CachedResponse(meta["status"], body, headers, from_cache)
+
+    def _read(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                meta = json.loads(f.readline())
+                body = f.read()
+        except (OSError, ValueError):
+            return None
+        return meta, body
+
+    def _write(self, key, meta, body):
+        # 一時ファイルに書いてから rename し、読み手が途中状態を見ないようにする
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(json.dumps(meta).encode("utf-8") + b"\n")
+            f.write(body)
+        os.replace(tmp_path, self._path(key))
+
+    def _hit(self, key, stat):
+        try:
+            # mtime を最終アクセス時刻として LRU に使う
+            os.utime(self._path(key))
+        except OSError:
+            pass
+        self._count(stat)
+
+    def _evict(self):
+        with _flock(os.path.join(self.directory, "evict.lock")):
+            entries = []
+            total = 0
+            for name in os.listdir(self.directory):
+                if not name.endswith(".entry"):
+                    continue
+                path = os.path.join(self.directory, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+            if total <= self.max_bytes:
+                return
+            for _, size, path in sorted(entries):
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                total -= size
+                self._count("evictions")
+                if total <= self.max_bytes:
+                    break
+
+    def _count(self, stat):
+        self.stats[stat] += 1
+        path = os.path.join(self.directory, "stats.json")
+        try:
+            with _flock(os.path.join(self.directory, "stats.lock")):
+                shared = self._load_shared_stats()
+                shared[stat] = shared.get(stat, 0) + 1
+                with open(path + ".tmp", "w") as f:
+                    json.dump(shared, f)
+                os.replace(path + ".tmp", path)
+        except OSError as e:
+            logger.warning(f"キャッシュ統計の更新に失敗: {e}")
+
+    def _load_shared_stats(self):
+        path = os.path.join(self.directory, "stats.json")
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return dict.fromkeys(STAT_KEYS, 0)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="共有HTTPレスポンスキャッシュ")
+    parser.add_argument("command", choices=["stats", "clear"])
+    parser.add_argument("--directory", default=DEFAULT_DIRECTORY)
+    args = parser.parse_args(argv)
+
+    cache = HttpCache(None, directory=args.directory)
+    if args.command == "stats":
+        stats = cache.get_stats()["total"]
+        lookups = stats.get("hits", 0) + stats.get("misses", 0) + stats.get("revalidated", 0)
+        ratio = (stats.get("hits", 0) + stats.get("revalidated", 0)) / lookups if lookups else 0
+        print(json.dumps({**stats, "hit_ratio": round(ratio, 4)}, indent=2))
+    else:
+        cache.clear()
+        print(f"キャッシュを削除しました: {args.directory}")
+
+
+if __name__ == "__main__":
+    main()
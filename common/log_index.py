@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+"""
+監視ログの日付インデックス
+
+ログの各行は "YYYY-MM-DD HH:MM:SS ..." で始まる（日付のない行は直前の行と同じ日とする）。
+ログと同じ場所の <ログ>.index.json に、日ごとの
+- バイト範囲（どのセグメントの何バイト目から何バイト目までがその日か）
+- マーカー文字列（"A1インスタンス作成成功" など）を含む日付つきの行数
+  （grep -c と同じく1行に複数あっても1件。複数行メッセージの2行目以降は数えない）
+を記録する。
+
+- 追記された分だけを読む（前回読んだ位置から再開）
+- ローテートされたログ（<ログ>.1, <ログ>.2.gz, <ログ>-20250101.gz など）も対象。
+  セグメントは先頭行で識別するため、名前が変わったり gzip 圧縮されたりしても読み直さない
+- 件数の問い合わせはインデックスを読むだけ、行の取り出しはその日の位置まで seek する
+  （gzip は先頭から展開し直すため、その日の位置までの展開コストがかかる）
+
+インデックスはマーカーの組み合わせごとに1つ。別のマーカーで開くと作り直す。
+
+使い方（/home/opc で実行）:
+    python3 -m common.log_index counts /tmp/a1_check.log --date 2025-01-01 \\
+        --marker checks=A1インスタンス空き確認開始 --marker success=A1インスタンス作成成功
+    python3 -m common.log_index days /tmp/a1_check.log
+    python3 -m common.log_index lines /tmp/a1_check.log --date 2025-01-01
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+
+logger = logging.getLogger(__name__)
+
+INDEX_VERSION = 2
+CHUNK_SIZE = 256 * 1024
+# セグメントの識別に使う先頭行の最大長
+FINGERPRINT_BYTES = 4096
+DAY_LINE = re.compile(rb"^(\d{4}-\d{2}-\d{2})[ T]", re.M)
+ROTATED_SUFFIX = re.compile(r"^(\.\d+|-\d{8,10})(\.gz)?$")
+
+
+def _day_key(day):
+    return day.isoformat() if hasattr(day, "isoformat") else str(day)
+
+
+def _open(path):
+    return gzip.open(path, "rb") if path.endswith(".gz") else open(path, "rb")
+
+
+def fingerprint(path):
+    """先頭行の SHA-1（行がまだ書き終わっていなければ None）"""
+    with _open(path) as f:
+        head = f.readline(FINGERPRINT_BYTES)
+    if not head.endswith(b"\n") and len(head) < FINGERPRINT_BYTES:
+        return None
+    return hashlib.sha1(head).hexdigest()[:16]
+
+
+def log_segments(path):
+    """現行のログとローテート済みのログ（古い順）"""
+    directory = os.path.dirname(path)
+    name = os.path.basename(path)
+    paths = [path] if os.path.exists(path) else []
+    try:
+        entries = os.listdir(directory or ".")
+    except OSError:
+        entries = []
+    for entry in entries:
+        if entry.startswith(name) and ROTATED_SUFFIX.match(entry[len(name) :]):
+            paths.append(os.path.join(directory, entry))
+    return sorted(paths, key=lambda p: (os.path.getmtime(p), p != path))
+
+
+def _count_lines(block, marker):
+    """marker を含む日付つきの行数（grep -c と同じく1行に複数あっても1件）"""
+    count = 0
+    position = block.find(marker)
+    while position != -1:
+        start = block.rfind(b"\n", 0, position) + 1
+        if DAY_LINE.match(block, start):
+            count += 1
+        end = block.find(b"\n", position)
+        if end == -1:
+            break
+        position = block.find(marker, end)
+    return count
+
+
+class LogIndex:
+    def __init__(self, path, markers=None, index_path=None):
+        """
+        markers: {名前: 数えるマーカー文字列}。None なら既存のインデックスのマーカーを使う
+        """
+        self.path = path
+        self.index_path = index_path or f"{path}.index.json"
+        self._data = self._load()
+        if markers is not None and markers != self._data["markers"]:
+            if self._data["runs"]:
+                logger.info(f"マーカーが変わったためインデックスを作り直します: {self.index_path}")
+            self._data = self._empty(markers)
+        self.markers = self._data["markers"]
+        self._encoded = [text.encode("utf-8") for text in self.markers.values()]
+
+    # ---- 永続化 ---------------------------------------------------------
+
+    @staticmethod
+    def _empty(markers):
+        # runs: [日付, セグメント, 開始, 終了, [マーカーごとの件数]]（ログ上の出現順）
+        return {"version": INDEX_VERSION, "markers": dict(markers or {}), "segments": {}, "runs": []}
+
+    def _load(self):
+        try:
+            with open(self.index_path) as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return self._empty({})
+        except (OSError, ValueError) as e:
+            logger.warning(f"ログインデックスを読めないため作り直します: {e}")
+            return self._empty({})
+        if data.get("version") != INDEX_VERSION:
+            return self._empty(data.get("markers"))
+        return data
+
+    def _save(self):
+        directory = os.path.dirname(self.index_path) or "."
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(self._data, f)
+        os.replace(tmp_path, self.index_path)
+
+    # ---- 更新 -----------------------------------------------------------
+
+    def update(self):
+        """追記・ローテートされた分をインデックスに反映し、読んだバイト数を返す"""
+        segments = self._data["segments"]
+        seen = {}
+        for path in log_segments(self.path):
+            try:
+                key = fingerprint(path)
+            except (OSError, EOFError) as e:
+                logger.warning(f"ログを読めません: {path}: {e}")
+                continue
+            if key is not None and key not in seen:
+                seen[key] = path
+
+        changed = set(seen) != set(segments)
+        for key in set(segments) - set(seen):
+            # 削除されたセグメント
+            self._drop(key)
+
+        scanned = 0
+        for key, path in seen.items():
+            segment = segments.get(key)
+            if segment is None:
+                segment = segments[key] = {"seq": self._next_seq(), "offset": 0, "complete": False}
+            changed |= segment.get("path") != path
+            segment["path"] = path
+            if segment["complete"]:
+                continue
+            compressed = path.endswith(".gz")
+            if not compressed and os.path.getsize(path) < segment["offset"]:
+                # 同じ先頭行のまま縮んだ（書き直された）
+                self._data["runs"] = [run for run in self._data["runs"] if run[1] != key]
+                segment["offset"] = 0
+            scanned += self._scan(key, path, segment, final=compressed)
+            # 圧縮済みのセグメントはもう増えない
+            segment["complete"] = compressed
+
+        if changed or scanned:
+            self._save()
+        return scanned
+
+    def _next_seq(self):
+        return max((s["seq"] for s in self._data["segments"].values()), default=-1) + 1
+
+    def _drop(self, key):
+        self._data["segments"].pop(key, None)
+        self._data["runs"] = [run for run in self._data["runs"] if run[1] != key]
+
+    def _scan(self, key, path, segment, final):
+        start = segment["offset"]
+        runs = [run for run in self._data["runs"] if run[1] == key]
+        # 前回の最後の日に続く行（日付のない行）はその日に数える
+        day = runs[-1][0] if runs and runs[-1][3] == start else None
+        offset, pending = start, b""
+        with _open(path) as f:
+            f.seek(start)
+            while True:
+                chunk = f.read(CHUNK_SIZE)
+                data = pending + chunk
+                cut = len(data) if not chunk and final else data.rfind(b"\n") + 1
+                if cut:
+                    day = self._add_block(key, data[:cut], offset, day)
+                    offset += cut
+                pending = data[cut:]
+                if not chunk:
+                    break
+        segment["offset"] = offset
+        return offset - start
+
+    def _add_block(self, key, block, offset, day):
+        """改行で終わるブロックを日ごとに数え、最後の行の日付を返す"""
+        days = DAY_LINE.findall(block)
+        if not days:
+            if day is not None:
+                self._add(key, day, offset, block)
+            return day
+        first = days[0].decode()
+        if days.count(days[0]) == len(days) and (day == first or DAY_LINE.match(block)):
+            # ブロック全体が同じ日（日付の変わり目を含まないブロックはこちら）
+            self._add(key, first, offset, block)
+            return first
+        position = 0
+        for line in block.split(b"\n"):
+            if position + len(line) < len(block):
+                line += b"\n"
+            elif not line:
+                break
+            match = DAY_LINE.match(line)
+            if match:
+                day = match.group(1).decode()
+            # 日付のある行より前の行は数えない
+            if day is not None:
+                self._add(key, day, offset + position, line)
+            position += len(line)
+        return day
+
+    def _add(self, key, day, start, block):
+        counts = [_count_lines(block, marker) for marker in self._encoded]
+        runs = self._data["runs"]
+        last = runs[-1] if runs else None
+        end = start + len(block)
+        if last and last[0] == day and last[1] == key and last[3] == start:
+            last[3] = end
+            last[4] = [a + b for a, b in zip(last[4], counts)]
+        else:
+            runs.append([day, key, start, end, counts])
+
+    # ---- 問い合わせ -----------------------------------------------------
+
+    def _runs(self, day):
+        day = _day_key(day)
+        segments = self._data["segments"]
+        runs = [run for run in self._data["runs"] if run[0] == day and run[1] in segments]
+        return sorted(runs, key=lambda run: (segments[run[1]]["seq"], run[2]))
+
+    def counts(self, day):
+        """その日のマーカーごとの件数 {名前: 件数}"""
+        totals = [0] * len(self.markers)
+        for run in self._runs(day):
+            totals = [a + b for a, b in zip(totals, run[4])]
+        return dict(zip(self.markers, totals))
+
+    def days(self):
+        """インデックス済みの日付（昇順）"""
+        return sorted({run[0] for run in self._data["runs"]})
+
+    def lines(self, day):
+        """その日のログ行（その日の位置まで seek して読む）"""
+        segments = self._data["segments"]
+        for day_, key, start, end, _ in self._runs(day):
+            with _open(segments[key]["path"]) as f:
+                f.seek(start)
+                content = f.read(end - start)
+            yield from content.decode("utf-8", errors="replace").splitlines()
+
+
+def _marker(value):
+    name, sep, text = value.partition("=")
+    if not sep or not name.isidentifier() or not text:
+        raise argparse.ArgumentTypeError(f"名前=文字列 の形式で指定してください: {value}")
+    return name, text
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    parser = argparse.ArgumentParser(description="監視ログの日付インデックス")
+    parser.add_argument("command", choices=["counts", "days", "lines"])
+    parser.add_argument("log", help="ログファイル")
+    parser.add_argument("--date", help="counts / lines: 日付（YYYY-MM-DD）")
+    parser.add_argument(
+        "--marker", type=_marker, action="append", default=[], help="counts: 名前=数える文字列（複数指定可）"
+    )
+    parser.add_argument("--json", action="store_true", help="counts: JSON で出力")
+    args = parser.parse_args()
+
+    index = LogIndex(args.log, dict(args.marker) if args.marker else None)
+    index.update()
+    if args.command == "days":
+        for day in index.days():
+            counts = ", ".join(f"{name}={count}" for name, count in index.counts(day).items())
+            print(f"{day} {counts}".rstrip())
+    elif not args.date:
+        parser.error("--date を指定してください")
+    elif args.command == "lines":
+        for line in index.lines(args.date):
+            print(line)
+    elif args.json:
+        print(json.dumps(index.counts(args.date), ensure_ascii=False))
+    else:
+        # シェルスクリプトから eval できる 名前=件数 の行
+        for name, count in index.counts(args.date).items():
+            print(f"{name}={count}")
+
+
+if __name__ == "__main__":
+    main()
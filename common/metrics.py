@@ -0,0 +1,354 @@
+#!/usr/bin/env python3
+"""
+監視処理のメトリクス（Prometheus テキスト形式）
+
+各監視の取得・状態の読み書き・アラート判定・描画・通知の所要時間をヒストグラムで、
+API エラー・cooldown による通知抑制・通知件数をカウンタで記録する。
+
+- 単発実行（cron）: プロセス終了時に textfile collector 用の `monitor_<監視>.prom` へ書き出す。
+  前回書き出してからの増分を既存ファイルの値に足すため、カウンタ・ヒストグラムは実行をまたいで累計になる
+- 常駐デーモン: `listen_port` を指定するとローカルの `/metrics` で公開する
+- 無効時（既定）は stage() が共有の空コンテキストを返し、count() はすぐ戻る
+
+使い方（/home/opc で実行）:
+    python3 -m common.metrics show      # 書き出し済みのファイルを表示
+"""
+
+import argparse
+import atexit
+import bisect
+import contextlib
+import fcntl
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_TEXTFILE_DIR = "/tmp/monitor_metrics"
+# 秒（ローカルの状態ストア〜上流API・描画までを1つのバケットで扱う）
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# メトリクス名 → (種類, HELP)
+FAMILIES = {
+    "monitor_stage_duration_seconds": ("histogram", "監視処理の段階ごとの所要時間（秒）"),
+    "monitor_api_errors_total": ("counter", "上流API呼び出しのエラー回数"),
+    "monitor_cooldown_suppressed_total": ("counter", "閾値超過だが cooldown 中のため通知しなかった件数"),
+    "monitor_notifications_total": ("counter", "送信キューに積んだ通知の件数"),
+    "monitor_last_run_timestamp_seconds": ("gauge", "監視処理の段階が最後に終わった時刻（UNIX 秒）"),
+}
+HISTOGRAM = "monitor_stage_duration_seconds"
+LAST_RUN = "monitor_last_run_timestamp_seconds"
+
+SAMPLE_LINE = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(\{.*\})? (\S+)$')
+LE_LABEL = re.compile(r',?le="([^"]*)"')
+
+
+def format_value(value):
+    value = float(value)
+    if value == float("inf"):
+        return "+Inf"
+    if value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+def escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def sample_key(name, labels):
+    """`name{k="v",...}`（ラベルは渡した順）"""
+    if not labels:
+        return name
+    return name + "{" + ",".join(f'{k}="{escape(v)}"' for k, v in labels) + "}"
+
+
+def family_of(name):
+    if name in FAMILIES:
+        return name
+    for suffix in ("_bucket", "_sum", "_count"):
+        if name.endswith(suffix) and name[: -len(suffix)] in FAMILIES:
+            return name[: -len(suffix)]
+    return name
+
+
+def _sort_key(key):
+    """ファミリー順 → ラベル順、同じ系列のバケットは le の昇順"""
+    name = key.split("{", 1)[0]
+    family = family_of(name)
+    order = list(FAMILIES).index(family) if family in FAMILIES else len(FAMILIES)
+    match = LE_LABEL.search(key)
+    le = float(match.group(1).replace("+Inf", "inf")) if match else 0.0
+    return (order, family, LE_LABEL.sub("", key).replace(name, "", 1), name, le)
+
+
+def format_samples(values):
+    """{sample_key: 値} をファミリーごとの HELP / TYPE 付きのテキストにする"""
+    lines = []
+    current = None
+    for key in sorted(values, key=_sort_key):
+        family = family_of(key.split("{", 1)[0])
+        if family != current:
+            current = family
+            if family in FAMILIES:
+                kind, help_text = FAMILIES[family]
+                lines.append(f"# HELP {family} {help_text}")
+                lines.append(f"# TYPE {family} {kind}")
+        lines.append(f"{key} {format_value(values[key])}")
+    return "\n".join(lines) + "\n" if lines else ""
+
+
+def parse_samples(text):
+    """テキスト形式をサンプル {sample_key: 値} に戻す（コメント行・不正な行は無視）"""
+    values = {}
+    for line in text.splitlines():
+        match = SAMPLE_LINE.match(line.strip())
+        if match:
+            values[(match.group(1) + (match.group(2) or ""))] = float(match.group(3).replace("+Inf", "inf"))
+    return values
+
+
+class Registry:
+    """プロセス内のメトリクス（スレッドセーフ）"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.lock = threading.Lock()
+        # (monitor, stage) → [バケットごとの件数..., +Inf の件数, 合計秒]
+        self.histograms = {}
+        # (ファミリー, ラベルのタプル) → 値
+        self.counters = {}
+        self.gauges = {}
+
+    def observe(self, monitor, stage, seconds, now=None):
+        index = bisect.bisect_left(self.buckets, seconds)
+        with self.lock:
+            series = self.histograms.get((monitor, stage))
+            if series is None:
+                series = self.histograms[(monitor, stage)] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += seconds
+            self.gauges[(LAST_RUN, (("monitor", monitor),))] = now or time.time()
+
+    def inc(self, family, labels, amount=1):
+        key = (family, tuple(labels))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def samples(self):
+        """[(監視名, sample_key, 値, ゲージか)]"""
+        with self.lock:
+            histograms = {key: list(series) for key, series in self.histograms.items()}
+            counters = dict(self.counters)
+            gauges = dict(self.gauges)
+        result = []
+        for (monitor, stage), series in histograms.items():
+            labels = (("monitor", monitor), ("stage", stage))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series[:-1]):
+                cumulative += count
+                key = sample_key(f"{HISTOGRAM}_bucket", labels + (("le", format_value(bound)),))
+                result.append((monitor, key, cumulative, False))
+            result.append((monitor, sample_key(f"{HISTOGRAM}_sum", labels), series[-1], False))
+            result.append((monitor, sample_key(f"{HISTOGRAM}_count", labels), cumulative, False))
+        for values, is_gauge in ((counters, False), (gauges, True)):
+            for (family, labels), value in values.items():
+                result.append((dict(labels)["monitor"], sample_key(family, labels), value, is_gauge))
+        return result
+
+    def render(self):
+        return format_samples({key: value for _, key, value, _ in self.samples()})
+
+
+class _Timer:
+    __slots__ = ("monitor", "stage", "started")
+
+    def __init__(self, monitor, stage):
+        self.monitor = monitor
+        self.stage = stage
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        # 例外で抜けた場合もそこまでの時間を記録する
+        registry.observe(self.monitor, self.stage, time.perf_counter() - self.started)
+
+
+registry = Registry()
+_NOOP = contextlib.nullcontext()
+_enabled = False
+_configured = False
+_textfile_dir = None
+# 前回の書き出し時点の値（増分の計算用）
+_flushed = {}
+_flush_lock = threading.Lock()
+
+
+def configure(config):
+    """
+    config.json の metrics セクションで有効化（未設定・enabled: false なら何もしない）
+    プロセスで最初の呼び出しだけが有効（常駐デーモンの設定を監視モジュールの import で上書きしない）
+    """
+    global _enabled, _configured, _textfile_dir
+    if _configured:
+        return _enabled
+    _configured = True
+    settings = config.get("metrics") or {}
+    if not settings.get("enabled", False):
+        return False
+    if settings.get("buckets"):
+        registry.buckets = tuple(sorted(settings["buckets"]))
+    _textfile_dir = settings.get("textfile_dir", DEFAULT_TEXTFILE_DIR)
+    _enabled = True
+    # Notifier の atexit（送信スレッドの終了）より先に登録され、atexit は逆順に実行されるため、
+    # 終了時の送信の記録も含めて書き出せる
+    atexit.register(flush)
+    return True
+
+
+def enabled():
+    return _enabled
+
+
+def stage(monitor, name):
+    """段階の所要時間を計るコンテキスト（無効時は何もしない共有オブジェクト）"""
+    if not _enabled:
+        return _NOOP
+    return _Timer(monitor, name)
+
+
+def observe(monitor, name, seconds):
+    """計測済みの所要時間を記録"""
+    if _enabled:
+        registry.observe(monitor, name, seconds)
+
+
+def count(monitor, name, amount=1, **labels):
+    """monitor_<name>_total を amount 増やす（api_errors / cooldown_suppressed / notifications）"""
+    if not _enabled or not amount:
+        return
+    registry.inc(f"monitor_{name}_total", (("monitor", monitor),) + tuple(sorted(labels.items())), amount)
+
+
+def textfile_path(directory, monitor):
+    return os.path.join(directory, f"monitor_{monitor}.prom")
+
+
+def flush():
+    """前回からの増分を監視ごとのファイルに足し込む（textfile_dir 未設定・無効時は何もしない）"""
+    if not _enabled or _textfile_dir is None:
+        return
+    with _flush_lock:
+        current = {}
+        gauges = set()
+        for monitor, key, value, is_gauge in registry.samples():
+            current.setdefault(monitor, {})[key] = value
+            if is_gauge:
+                gauges.add(key)
+        os.makedirs(_textfile_dir, exist_ok=True)
+        for monitor, values in current.items():
+            previous = _flushed.get(monitor, {})
+            changes = {}
+            for key, value in values.items():
+                if key in gauges:
+                    if value != previous.get(key):
+                        changes[key] = ("set", value)
+                elif key not in previous or value != previous[key]:
+                    # 件数 0 のバケットも初回は書き出す
+                    changes[key] = ("add", value - previous.get(key, 0))
+            if changes:
+                merge_textfile(textfile_path(_textfile_dir, monitor), changes)
+            _flushed[monitor] = values
+
+
+def merge_textfile(path, changes):
+    """
+    changes（{sample_key: ("add" | "set", 値)}）をファイルに反映
+    同時に終了した cron ジョブの書き込みが消えないよう、ロックして読み込み → 一時ファイル + rename
+    """
+    with open(path + ".lock", "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            with open(path) as f:
+                values = parse_samples(f.read())
+        except FileNotFoundError:
+            values = {}
+        for key, (op, value) in changes.items():
+            values[key] = value if op == "set" else values.get(key, 0) + value
+
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                f.write(format_samples(values))
+            # node_exporter は別ユーザーで読むため
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = registry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(port, host="127.0.0.1"):
+    """
+    /metrics をバックグラウンドスレッドで公開（常駐デーモン用）
+    スクレイプで読むためテキストファイルには書き出さない
+    """
+    global _textfile_dir
+    _textfile_dir = None
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True)
+    thread.start()
+    return server
+
+
+def load_config():
+    """設定ファイルを読み込み（見つからなければ既定値）"""
+    config_path = os.path.join(BASE_DIR, "config.json")
+    if not os.path.exists(config_path):
+        return {}
+    with open(config_path, "r") as f:
+        return json.load(f)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="監視メトリクス")
+    parser.add_argument("command", choices=["show"])
+    parser.add_argument("--directory", help="textfile_dir（既定: config.json の metrics.textfile_dir）")
+    args = parser.parse_args(argv)
+
+    directory = args.directory or (load_config().get("metrics") or {}).get("textfile_dir", DEFAULT_TEXTFILE_DIR)
+    if not os.path.isdir(directory):
+        print(f"メトリクスがありません: {directory}")
+        return
+    for name in sorted(os.listdir(directory)):
+        if name.endswith(".prom"):
+            with open(os.path.join(directory, name)) as f:
+                print(f"==> {name} <==")
+                print(f.read(), end="")
+
+
+if __name__ == "__main__":
+    main()
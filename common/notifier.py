@@ -0,0 +1,542 @@
+#!/usr/bin/env python3
+"""
+監視スクリプト共通の Pushover 通知ディスパッチャ
+
+- 通知はまずディスク上の送信待ちキュー（SQLite / WAL）に書き込み、呼び出し元はすぐ戻る
+- 送信はバックグラウンドスレッドで keep-alive の HTTP セッションを使って行う
+- 失敗した通知は指数バックオフ + ジッタで再送し、プロセスが終了しても次回の起動で再送する
+- 短い時間窓（coalesce_seconds）内に積まれた同じタイトルの通知は1通にまとめる
+- 送信待ちの取り出しは1トランザクションで行うため、cron ジョブが重なっても二重送信しない
+- 送信はトークンバケット（キューと同じ SQLite ファイルに置き、全プロセスで共有）で流量を制限し、
+  優先度（state transition > ボラティリティアラート > 定期レポート）の高い順に送る
+- Pushover の上限（本文 1024 文字・タイトル 250 文字）を超える通知は分割してキューに積む
+- 古くなったアラート・レポートや上限を超えたキューは優先度の低いものから破棄する
+
+使い方（/home/opc で実行。シェルスクリプトからの送信にも使う）:
+    python3 -m common.notifier send --title "タイトル" --message "本文" --source check_a1
+    python3 -m common.notifier flush
+    python3 -m common.notifier status
+"""
+
+import argparse
+import atexit
+import json
+import logging
+import os
+import random
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from common import metrics
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_PATH = os.path.join(BASE_DIR, "notify_outbox.db")
+PUSHOVER_URL = "https://api.pushover.net/1/messages.json"
+BUSY_TIMEOUT_SECONDS = 30
+# 送信中のまま残った行（送信中にプロセスが落ちた）を送信待ちに戻すまでの秒数
+CLAIM_LEASE_SECONDS = 300
+# Pushover の上限（文字数）
+MESSAGE_LIMIT = 1024
+TITLE_LIMIT = 250
+
+# 優先度クラス（大きいほど先に送る）
+PRIORITIES = {"transition": 2, "alert": 1, "report": 0}
+# 優先度ごとの有効期限（秒）。過ぎても送れていない通知は破棄する（None は破棄しない）
+DEFAULT_EXPIRE_SECONDS = {"transition": None, "alert": 6 * 3600, "report": 12 * 3600}
+DEFAULT_MAX_PENDING = 1000
+# 無料アプリの上限（月 10,000 通）を 31 日で均した回復速度
+DEFAULT_RATE_LIMIT = {"capacity": 20, "refill_per_second": 10000 / (31 * 86400)}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    source TEXT,
+    title TEXT NOT NULL,
+    message TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 1,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    claimed_at REAL,
+    sent_at REAL,
+    last_error TEXT
+)
+"""
+INDEX = "CREATE INDEX IF NOT EXISTS outbox_due ON outbox (status, next_attempt_at)"
+BUCKET_SCHEMA = """
+CREATE TABLE IF NOT EXISTS rate_limit (
+    name TEXT PRIMARY KEY,
+    tokens REAL NOT NULL,
+    updated_at REAL NOT NULL
+)
+"""
+BUCKET_UPSERT = """
+INSERT INTO rate_limit (name, tokens, updated_at) VALUES (?, ?, ?)
+ON CONFLICT (name) DO UPDATE SET tokens = excluded.tokens, updated_at = excluded.updated_at
+"""
+
+
+class DeliveryError(Exception):
+    """送信失敗（retryable=False なら再送しない）"""
+
+    def __init__(self, message, retryable=True):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+def backoff_delay(attempts, base_delay, max_delay, rng=random):
+    """attempts 回失敗した後の待ち時間（指数バックオフ、上限 max_delay、後半半分にジッタ）"""
+    delay = min(max_delay, base_delay * 2 ** (attempts - 1))
+    return rng.uniform(delay / 2, delay)
+
+
+def split_message(message, limit=MESSAGE_LIMIT):
+    """limit 文字以内に分割（段落 → 行の区切りを優先し、なければ limit 文字で切る）"""
+    parts = []
+    rest = message
+    while len(rest) > limit:
+        for separator in ("\n\n", "\n"):
+            cut = rest.rfind(separator, 1, limit + len(separator))
+            if cut > 0:
+                parts.append(rest[:cut])
+                rest = rest[cut + len(separator) :]
+                break
+        else:
+            parts.append(rest[:limit])
+            rest = rest[limit:]
+    parts.append(rest)
+    return parts
+
+
+def coalesce(rows, window, limit=MESSAGE_LIMIT):
+    """
+    (id, title, message, created_at, priority) の行を、同じ優先度・タイトルで作成時刻が先頭から
+    window 秒以内、連結後も limit 文字以内のものごとにまとめる。
+    戻り値: [(ids, title, message), ...]（行の順）
+    """
+    groups = []
+    open_groups = {}
+    for row_id, title, message, created_at, priority in rows:
+        key = (priority, title)
+        group = open_groups.get(key)
+        if (
+            group is None
+            or created_at - group["start"] > window
+            or group["length"] + 2 + len(message) > limit
+        ):
+            group = {"start": created_at, "ids": [], "title": title, "messages": [], "length": -2}
+            open_groups[key] = group
+            groups.append(group)
+        group["ids"].append(row_id)
+        group["messages"].append(message)
+        group["length"] += 2 + len(message)
+    return [(g["ids"], g["title"], "\n\n".join(g["messages"])) for g in groups]
+
+
+class TokenBucket:
+    """
+    SQLite に置いたトークンバケット（同じファイルを使う全プロセスで共有）
+    capacity 通まで続けて送れ、その後は refill_per_second 通/秒で回復する
+    """
+
+    def __init__(self, capacity, refill_per_second, name="pushover"):
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self.name = name
+
+    @classmethod
+    def from_config(cls, settings):
+        settings = {**DEFAULT_RATE_LIMIT, **(settings or {})}
+        if not settings.get("enabled", True):
+            return None
+        return cls(settings["capacity"], settings["refill_per_second"])
+
+    def _tokens(self, conn, now):
+        row = conn.execute(
+            "SELECT tokens, updated_at FROM rate_limit WHERE name = ?", (self.name,)
+        ).fetchone()
+        if row is None:
+            return float(self.capacity)
+        tokens, updated_at = row
+        return min(self.capacity, tokens + max(0.0, now - updated_at) * self.refill_per_second)
+
+    def _update(self, conn, change):
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            result = change()
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        return result
+
+    def acquire(self, conn, now=None):
+        """1通分を取得。取得できれば 0、できなければ取得できるまでの秒数を返す"""
+        now = time.time() if now is None else now
+
+        def change():
+            tokens = self._tokens(conn, now)
+            if tokens >= 1:
+                conn.execute(BUCKET_UPSERT, (self.name, tokens - 1, now))
+                return 0.0
+            return (1 - tokens) / self.refill_per_second
+
+        return self._update(conn, change)
+
+    def drain(self, conn, until, now=None):
+        """until（epoch 秒）まで送れないようにする（API 側の上限に達したとき）"""
+        now = time.time() if now is None else now
+
+        def change():
+            # until にちょうど1通分が回復する残量
+            debt = 1 - (until - now) * self.refill_per_second
+            conn.execute(BUCKET_UPSERT, (self.name, min(self._tokens(conn, now), debt), now))
+
+        self._update(conn, change)
+
+
+class Notifier:
+    def __init__(
+        self,
+        token,
+        user,
+        path=DEFAULT_PATH,
+        api_url=PUSHOVER_URL,
+        timeout=10,
+        coalesce_seconds=5,
+        base_delay=30,
+        max_delay=3600,
+        max_attempts=10,
+        rate_limit=None,
+        expire_seconds=None,
+        max_pending=DEFAULT_MAX_PENDING,
+        session=None,
+    ):
+        """rate_limit: TokenBucket（None は制限なし） / expire_seconds: 優先度名 → 有効期限（秒）"""
+        self.token = token
+        self.user = user
+        self.path = path
+        self.api_url = api_url
+        self.timeout = timeout
+        self.coalesce_seconds = coalesce_seconds
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_attempts = max_attempts
+        self.rate_limit = rate_limit
+        self.expire_seconds = {**DEFAULT_EXPIRE_SECONDS, **(expire_seconds or {})}
+        self.max_pending = max_pending
+        self.session = session or self._new_session()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closing = threading.Event()
+        self._worker = None
+
+    @classmethod
+    def from_config(cls, config):
+        """
+        config.json の pushover / notifier セクションから生成
+        同じキューを使うインスタンスはプロセス内で共有する（常駐モードで送信スレッドを1本にする）。
+        生成時に前回までに送れなかった通知があれば送信を再開する
+        """
+        settings = config.get("notifier", {})
+        path = settings.get("outbox_path", DEFAULT_PATH)
+        with _instances_lock:
+            notifier = _instances.get(path)
+            if notifier is None:
+                notifier = cls(
+                    config["pushover"]["api_token"],
+                    config["pushover"]["user_key"],
+                    path=path,
+                    timeout=settings.get("timeout_seconds", 10),
+                    coalesce_seconds=settings.get("coalesce_seconds", 5),
+                    base_delay=settings.get("retry_base_seconds", 30),
+                    max_delay=settings.get("retry_max_seconds", 3600),
+                    max_attempts=settings.get("max_attempts", 10),
+                    rate_limit=TokenBucket.from_config(settings.get("rate_limit")),
+                    expire_seconds=settings.get("expire_seconds"),
+                    max_pending=settings.get("max_pending", DEFAULT_MAX_PENDING),
+                )
+                _instances[path] = notifier
+                notifier.resume()
+        return notifier
+
+    @staticmethod
+    def _new_session():
+        """Pushover 向けの keep-alive セッション（再送はキュー側で行うので接続の自動再試行はしない）"""
+        session = requests.Session()
+        session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=2, max_retries=0))
+        session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=2, max_retries=0))
+        return session
+
+    @property
+    def connection(self):
+        """スレッドごとの接続（呼び出し元スレッドと送信スレッドで分ける）"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT_SECONDS, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(SCHEMA)
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(outbox)")]
+            if "priority" not in columns:
+                # 優先度導入前に作られたキュー
+                conn.execute("ALTER TABLE outbox ADD COLUMN priority INTEGER NOT NULL DEFAULT 1")
+            conn.execute(INDEX)
+            conn.execute(BUCKET_SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    # ---- 呼び出し元 -----------------------------------------------------
+
+    def notify(self, message, title, source=None, priority="alert"):
+        """
+        通知をキューに積み、送信スレッドを起こしてすぐ戻る
+        priority: transition（状態の変化） / alert（ボラティリティ） / report（定期レポート）
+        """
+        now = time.time()
+        title = title[:TITLE_LIMIT]
+        parts = split_message(message)
+        if len(parts) > 1:
+            # 分割した分はタイトルに番号を付ける（番号の分だけタイトルを詰める）
+            width = TITLE_LIMIT - len(f" ({len(parts)}/{len(parts)})")
+            titles = [f"{title[:width]} ({i}/{len(parts)})" for i in range(1, len(parts) + 1)]
+        else:
+            titles = [title]
+        conn = self.connection
+        conn.executemany(
+            "INSERT INTO outbox (source, title, message, created_at, next_attempt_at, priority) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            [(source, t, part, now, now, PRIORITIES[priority]) for t, part in zip(titles, parts)],
+        )
+        logger.info(f"通知をキューに追加: {title}" + (f"（{len(parts)}通に分割）" if len(parts) > 1 else ""))
+        self._enforce_max_pending()
+        self.start()
+        self._wake.set()
+
+    def resume(self):
+        """前回までに送れなかった通知があれば送信スレッドを起動"""
+        if self.pending_count():
+            self.start()
+            self._wake.set()
+
+    def start(self):
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._closing.clear()
+                if self._worker is None:
+                    atexit.register(self.close)
+                self._worker = threading.Thread(target=self._run, name="notifier", daemon=True)
+                self._worker.start()
+
+    def close(self, timeout=None):
+        """時間窓を待たずに送信可能な通知を送って送信スレッドを止める（送れなかった分はキューに残る）"""
+        worker = self._worker
+        if worker is None:
+            return
+        self._closing.set()
+        self._wake.set()
+        worker.join(self.timeout + 5 if timeout is None else timeout)
+
+    def _enforce_max_pending(self):
+        """送信待ちが max_pending を超えたら優先度の低い古いものから破棄"""
+        overflow = self.pending_count() - self.max_pending
+        if overflow <= 0:
+            return
+        self.connection.execute(
+            "UPDATE outbox SET status = 'dropped', last_error = 'queue full' WHERE id IN ("
+            "SELECT id FROM outbox WHERE status = 'pending' ORDER BY priority, created_at, id LIMIT ?)",
+            (overflow,),
+        )
+        logger.warning(f"送信待ちが上限（{self.max_pending}件）を超えたため {overflow}件を破棄")
+
+    def pending_count(self):
+        row = self.connection.execute(
+            "SELECT COUNT(*) FROM outbox WHERE status IN ('pending', 'sending')"
+        ).fetchone()
+        return row[0]
+
+    def status(self):
+        rows = self.connection.execute("SELECT status, COUNT(*) FROM outbox GROUP BY status").fetchall()
+        return dict(rows)
+
+    # ---- 送信スレッド ---------------------------------------------------
+
+    def _run(self):
+        while True:
+            woken = self._wake.wait(timeout=self._next_due_delay())
+            if woken:
+                self._wake.clear()
+                # 続けて積まれる通知を1通にまとめるため時間窓だけ待つ（終了時は待たない）
+                self._closing.wait(self.coalesce_seconds)
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"通知キュー処理エラー: {e}")
+            if self._closing.is_set():
+                break
+
+    def _next_due_delay(self):
+        row = self.connection.execute(
+            "SELECT MIN(next_attempt_at) FROM outbox WHERE status = 'pending'"
+        ).fetchone()
+        if row[0] is None:
+            return None
+        return max(0.0, row[0] - time.time())
+
+    def _claim_due(self, now):
+        """送信時刻になった行を送信中にして取り出す（他プロセスとは取り合わない）"""
+        conn = self.connection
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "UPDATE outbox SET status = 'pending' WHERE status = 'sending' AND claimed_at < ?",
+                (now - CLAIM_LEASE_SECONDS,),
+            )
+            for name, expire in self.expire_seconds.items():
+                if expire is None:
+                    continue
+                dropped = conn.execute(
+                    "UPDATE outbox SET status = 'dropped', last_error = 'expired' "
+                    "WHERE status = 'pending' AND priority = ? AND created_at < ?",
+                    (PRIORITIES[name], now - expire),
+                ).rowcount
+                if dropped:
+                    logger.warning(f"有効期限切れの通知を破棄: {name} {dropped}件")
+            rows = conn.execute(
+                "SELECT id, title, message, created_at, priority FROM outbox "
+                "WHERE status = 'pending' AND next_attempt_at <= ? "
+                "ORDER BY priority DESC, created_at, id",
+                (now,),
+            ).fetchall()
+            conn.executemany(
+                "UPDATE outbox SET status = 'sending', claimed_at = ? WHERE id = ?",
+                [(now, row[0]) for row in rows],
+            )
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        return rows
+
+    def flush(self):
+        """送信時刻になった通知を優先度順にまとめて送信し、送信した通数を返す"""
+        sent = 0
+        groups = coalesce(self._claim_due(time.time()), self.coalesce_seconds)
+        for index, (ids, title, message) in enumerate(groups):
+            if self.rate_limit is not None:
+                wait = self.rate_limit.acquire(self.connection)
+                if wait > 0:
+                    # 残りは試行回数を増やさずに、送れるようになる時刻まで送信待ちに戻す
+                    retry_at = time.time() + wait
+                    rest = [row_id for group in groups[index:] for row_id in group[0]]
+                    self._mark(
+                        rest,
+                        "UPDATE outbox SET status = 'pending', next_attempt_at = ? WHERE id = ?",
+                        retry_at,
+                    )
+                    logger.info(f"送信レート上限のため {len(rest)}件を {wait:.0f}s 後に送信")
+                    break
+            try:
+                with metrics.stage("notifier", "deliver"):
+                    self._deliver(title, message)
+            except DeliveryError as e:
+                metrics.count("notifier", "api_errors", api="pushover")
+                self._failed(ids, e)
+                continue
+            self._mark(ids, "UPDATE outbox SET status = 'sent', sent_at = ? WHERE id = ?", time.time())
+            sent += 1
+            suffix = f"（{len(ids)}件をまとめて送信）" if len(ids) > 1 else ""
+            logger.info(f"通知送信成功: {title}{suffix}")
+        return sent
+
+    def _deliver(self, title, message):
+        try:
+            response = self.session.post(
+                self.api_url,
+                data={"token": self.token, "user": self.user, "message": message, "title": title},
+                timeout=self.timeout,
+            )
+        except requests.RequestException as e:
+            raise DeliveryError(str(e))
+        remaining = response.headers.get("X-Limit-App-Remaining")
+        reset = response.headers.get("X-Limit-App-Reset")
+        if self.rate_limit is not None and reset and (remaining == "0" or response.status_code == 429):
+            # アプリの送信上限に達した: リセット時刻まで全プロセスで送信を止める
+            self.rate_limit.drain(self.connection, float(reset))
+            logger.warning(f"Pushover の送信上限に到達（リセット: {datetime.fromtimestamp(float(reset))}）")
+        if response.status_code == 429 or response.status_code >= 500:
+            raise DeliveryError(f"HTTP {response.status_code}")
+        if response.status_code >= 400:
+            # トークン不正・本文不正などは再送しても成功しない
+            raise DeliveryError(f"HTTP {response.status_code}: {response.text[:200]}", retryable=False)
+
+    def _failed(self, ids, error):
+        now = time.time()
+        conn = self.connection
+        for row_id in ids:
+            attempts = conn.execute("SELECT attempts FROM outbox WHERE id = ?", (row_id,)).fetchone()[0] + 1
+            if not error.retryable or attempts >= self.max_attempts:
+                conn.execute(
+                    "UPDATE outbox SET status = 'failed', attempts = ?, last_error = ? WHERE id = ?",
+                    (attempts, str(error), row_id),
+                )
+                logger.error(f"通知送信失敗（再送しません）: {error}")
+                continue
+            delay = backoff_delay(attempts, self.base_delay, self.max_delay)
+            conn.execute(
+                "UPDATE outbox SET status = 'pending', attempts = ?, next_attempt_at = ?, last_error = ? "
+                "WHERE id = ?",
+                (attempts, now + delay, str(error), row_id),
+            )
+            logger.warning(f"通知送信エラー: {error}（{attempts}回目、{delay:.0f}s 後に再送）")
+
+    def _mark(self, ids, sql, value):
+        self.connection.executemany(sql, [(value, row_id) for row_id in ids])
+
+
+_instances = {}
+_instances_lock = threading.Lock()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="監視スクリプト共通の Pushover 通知ディスパッチャ")
+    parser.add_argument("command", choices=["send", "flush", "status"])
+    parser.add_argument("--title", help="send: 通知タイトル")
+    parser.add_argument("--message", help="send: 本文（省略時は標準入力）")
+    parser.add_argument("--source", help="send: 送信元の監視名")
+    parser.add_argument("--priority", choices=list(PRIORITIES), default="alert", help="send: 優先度")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    with open(os.path.join(BASE_DIR, "config.json"), "r") as f:
+        config = json.load(f)
+    metrics.configure(config)
+    notifier = Notifier.from_config(config)
+
+    if args.command == "send":
+        if not args.title:
+            parser.error("send には --title が必要です")
+        message = args.message if args.message is not None else sys.stdin.read()
+        notifier.notify(message, args.title, source=args.source, priority=args.priority)
+        metrics.count(args.source or "notifier", "notifications", priority=args.priority)
+        notifier.close()
+    elif args.command == "flush":
+        notifier.flush()
+    print(json.dumps(notifier.status(), ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+監視スクリプト共通の状態ストア（SQLite / WALモード）
+
+各監視の前回値・cooldown 時刻・状態フラグを (namespace, key) 単位で保存する。
+1キーの更新は1トランザクションの UPSERT で行うため、書き込み途中でプロセスが
+落ちても前回の状態が壊れない。WAL により cron ジョブが重なっても読み手は
+書き手を待たずに読み取れる。
+
+使い方（/home/opc で実行）:
+    python3 -m common.state_store migrate   # 既存の JSON 状態ファイルを取り込み
+    python3 -m common.state_store dump
+"""
+
+import argparse
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_PATH = os.path.join(BASE_DIR, "monitor_state.db")
+BUSY_TIMEOUT_SECONDS = 30
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS state (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (namespace, key)
+)
+"""
+
+UPSERT = """
+INSERT INTO state (namespace, key, value, updated_at) VALUES (?, ?, ?, ?)
+ON CONFLICT (namespace, key) DO UPDATE SET
+    value = excluded.value,
+    updated_at = excluded.updated_at
+"""
+
+
+class StateStore:
+    def __init__(self, path=DEFAULT_PATH, timeout=BUSY_TIMEOUT_SECONDS):
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+
+    @classmethod
+    def from_config(cls, config):
+        """config.json の state_store セクションから生成（未設定時は /home/opc/monitor_state.db）"""
+        return cls(config.get("state_store", {}).get("path", DEFAULT_PATH))
+
+    @property
+    def connection(self):
+        """スレッドごとの接続（常駐モードのワーカースレッドからも安全に使う）"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    # ---- 読み取り -------------------------------------------------------
+
+    def get(self, namespace, key, default=None):
+        row = self.connection.execute(
+            "SELECT value FROM state WHERE namespace = ? AND key = ?", (namespace, key)
+        ).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def get_all(self, namespace):
+        rows = self.connection.execute(
+            "SELECT key, value FROM state WHERE namespace = ?", (namespace,)
+        ).fetchall()
+        return {key: json.loads(value) for key, value in rows}
+
+    def namespaces(self):
+        rows = self.connection.execute("SELECT DISTINCT namespace FROM state").fetchall()
+        return [row[0] for row in rows]
+
+    # ---- 書き込み -------------------------------------------------------
+
+    def set(self, namespace, key, value):
+        """1キーを原子的に UPSERT"""
+        self.connection.execute(UPSERT, (namespace, key, json.dumps(value), time.time()))
+
+    def set_many(self, namespace, values):
+        """複数キーを1トランザクションで UPSERT（全て反映されるか、何も反映されないか）"""
+        now = time.time()
+        rows = [(namespace, key, json.dumps(value), now) for key, value in values.items()]
+        conn = self.connection
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(UPSERT, rows)
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def delete(self, namespace, key):
+        self.connection.execute(
+            "DELETE FROM state WHERE namespace = ? AND key = ?", (namespace, key)
+        )
+
+
+# ---- 既存 JSON 状態ファイルからの移行 ----------------------------------------
+
+
+def legacy_rate_states(data):
+    """rate-exchange の save_file（旧: 単一ペア / 新: pairs）をペアごとの状態に変換"""
+    if not data:
+        return {}
+    if "pairs" in data:
+        return data["pairs"]
+    return {"USD/JPY": {"rate": data.get("rate"), "last_notif_ts": data.get("last_notif_ts")}}
+
+
+def legacy_bond_states(data):
+    """us_bonds の save_file をキーごとの状態に変換"""
+    if not data:
+        return {}
+    states = {"rates": data.get("data") or {}, "cooldown": data.get("cooldown") or {}}
+    if data.get("above_absolute_threshold") is not None:
+        states["above_absolute_threshold"] = data["above_absolute_threshold"]
+    return states
+
+
+def load_json(path):
+    if not path or not os.path.exists(path):
+        return None
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def migrate_legacy_files(store, config, overwrite=False):
+    """既存の JSON 状態ファイルを取り込む（既に状態がある namespace は上書きしない）"""
+    targets = [
+        (
+            "rate_exchange",
+            os.path.join(BASE_DIR, "rate-exchange", config["exchange_rate"]["save_file"]),
+            legacy_rate_states,
+        ),
+        (
+            "bitcoin",
+            "/tmp/bitcoin_current_price.json",
+            lambda data: {"current_price": data} if data else {},
+        ),
+        (
+            "us_bonds",
+            os.path.join(BASE_DIR, "us_bonds", config["us_bonds"]["monitoring"]["save_file"]),
+            legacy_bond_states,
+        ),
+    ]
+    migrated = {}
+    for namespace, path, convert in targets:
+        if store.get_all(namespace) and not overwrite:
+            logger.info(f"{namespace}: 既に状態があるため移行をスキップ")
+            continue
+        states = convert(load_json(path))
+        if not states:
+            continue
+        store.set_many(namespace, states)
+        migrated[namespace] = len(states)
+        logger.info(f"{namespace}: {path} から {len(states)}キーを移行")
+    return migrated
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="監視スクリプト共通の状態ストア")
+    parser.add_argument("command", choices=["migrate", "dump"])
+    parser.add_argument("--overwrite", action="store_true", help="既存の状態も上書きして移行")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    with open(os.path.join(BASE_DIR, "config.json"), "r") as f:
+        config = json.load(f)
+    store = StateStore.from_config(config)
+
+    if args.command == "migrate":
+        migrated = migrate_legacy_files(store, config, overwrite=args.overwrite)
+        print(json.dumps(migrated, ensure_ascii=False))
+    else:
+        dump = {ns: store.get_all(ns) for ns in store.namespaces()}
+        print(json.dumps(dump, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+"""
+ウォッチリストの一括判定（為替・暗号資産・米国債で共通）
+
+監視対象ごとの今回値・前回値・最終通知時刻を配列で受け取り、
+変動閾値と cooldown を NumPy で一括判定する
+"""
+
+import numpy as np
+
+
+def evaluate_thresholds(current, previous, last_notif, now_ts, thresholds, cooldowns):
+    """
+    current / previous / last_notif: 監視対象順の配列（欠損は NaN、未通知は 0）
+    thresholds / cooldowns: 監視対象ごとの変動閾値（比率）と cooldown 秒数
+    戻り値: change, valid, exceeded, suppressed, notify, last_notif（通知したものは now_ts に更新）
+    """
+    current = np.asarray(current, dtype=np.float64)
+    previous = np.asarray(previous, dtype=np.float64)
+    last_notif = np.nan_to_num(np.asarray(last_notif, dtype=np.float64))
+
+    valid = np.isfinite(current) & np.isfinite(previous) & (previous != 0)
+    safe_previous = np.where(valid, previous, 1.0)
+    change = np.where(valid, (current - safe_previous) / safe_previous, 0.0)
+    exceeded = valid & (np.abs(change) >= thresholds)
+    suppressed = exceeded & (last_notif > 0) & ((now_ts - last_notif) < cooldowns)
+    notify = exceeded & ~suppressed
+    new_last_notif = np.where(notify, float(now_ts), last_notif)
+    return {
+        "change": change,
+        "valid": valid,
+        "exceeded": exceeded,
+        "suppressed": suppressed,
+        "notify": notify,
+        "last_notif": new_last_notif,
+    }
@@ -43,14 +43,21 @@ mkdir -p /home/opc/rate-exchange
 mkdir -p /home/opc/bitcoin  
 mkdir -p /home/opc/check_a1
 mkdir -p /home/opc/us_bonds
+mkdir -p /home/opc/common
 '
 
 # Step 4: 各プロジェクトのスクリプトをアップロード
 echo "4. Uploading project scripts..."
 
+# Common modules
+echo "   Uploading common modules..."
+scp -i "$SSH_KEY" common/*.py "$OCI_USER@$OCI_HOST:/home/opc/common/"
+
 # Rate Exchange
 echo "   Uploading rate-exchange files..."
 scp -i "$SSH_KEY" rate-exchange/rate-exchange.py "$OCI_USER@$OCI_HOST:/home/opc/rate-exchange/"
+scp -i "$SSH_KEY" rate-exchange/rate_store.py "$OCI_USER@$OCI_HOST:/home/opc/rate-exchange/"
+scp -i "$SSH_KEY" rate-exchange/fx_watchlist.py "$OCI_USER@$OCI_HOST:/home/opc/rate-exchange/"
 scp -i "$SSH_KEY" rate-exchange/requirements.txt "$OCI_USER@$OCI_HOST:/home/opc/rate-exchange/"
 
 # Bitcoin
@@ -58,15 +65,30 @@ echo "   Uploading bitcoin files..."
 scp -i "$SSH_KEY" bitcoin/bitcoin_tracker.py "$OCI_USER@$OCI_HOST:/home/opc/bitcoin/"
 scp -i "$SSH_KEY" bitcoin/bitcoin_chart.py "$OCI_USER@$OCI_HOST:/home/opc/bitcoin/"
 scp -i "$SSH_KEY" bitcoin/bitcoin_trading_tool.py "$OCI_USER@$OCI_HOST:/home/opc/bitcoin/"
+scp -i "$SSH_KEY" bitcoin/history_ingest.py "$OCI_USER@$OCI_HOST:/home/opc/bitcoin/"
+scp -i "$SSH_KEY" bitcoin/history_store.py "$OCI_USER@$OCI_HOST:/home/opc/bitcoin/"
+scp -i "$SSH_KEY" bitcoin/ohlcv_rollup.py "$OCI_USER@$OCI_HOST:/home/opc/bitcoin/"
+scp -i "$SSH_KEY" bitcoin/candlestick_renderer.py "$OCI_USER@$OCI_HOST:/home/opc/bitcoin/"
+scp -i "$SSH_KEY" bitcoin/downsample.py "$OCI_USER@$OCI_HOST:/home/opc/bitcoin/"
+scp -i "$SSH_KEY" bitcoin/chart_cache.py "$OCI_USER@$OCI_HOST:/home/opc/bitcoin/"
+scp -i "$SSH_KEY" bitcoin/chart_jobs.py "$OCI_USER@$OCI_HOST:/home/opc/bitcoin/"
+scp -i "$SSH_KEY" bitcoin/indicators.py "$OCI_USER@$OCI_HOST:/home/opc/bitcoin/"
+scp -i "$SSH_KEY" bitcoin/asset_watchlist.py "$OCI_USER@$OCI_HOST:/home/opc/bitcoin/"
 
 # Check A1
 echo "   Uploading check_a1 files..."
 scp -i "$SSH_KEY" check_a1/check_a1_availability.sh "$OCI_USER@$OCI_HOST:/home/opc/check_a1/"
 scp -i "$SSH_KEY" check_a1/check_a1_availability_with_pushover.sh "$OCI_USER@$OCI_HOST:/home/opc/check_a1/"
+scp -i "$SSH_KEY" check_a1/a1_config.py "$OCI_USER@$OCI_HOST:/home/opc/check_a1/"
+scp -i "$SSH_KEY" check_a1/a1_probe.py "$OCI_USER@$OCI_HOST:/home/opc/check_a1/"
 
 # US Bonds
 echo "   Uploading us_bonds files..."
 scp -i "$SSH_KEY" us_bonds/us_bond_checker.py "$OCI_USER@$OCI_HOST:/home/opc/us_bonds/"
+scp -i "$SSH_KEY" us_bonds/bond_watchlist.py "$OCI_USER@$OCI_HOST:/home/opc/us_bonds/"
+scp -i "$SSH_KEY" us_bonds/curve_store.py "$OCI_USER@$OCI_HOST:/home/opc/us_bonds/"
+scp -i "$SSH_KEY" us_bonds/curve_ingest.py "$OCI_USER@$OCI_HOST:/home/opc/us_bonds/"
+scp -i "$SSH_KEY" us_bonds/curve_analytics.py "$OCI_USER@$OCI_HOST:/home/opc/us_bonds/"
 scp -i "$SSH_KEY" us_bonds/us_bonds_data.json "$OCI_USER@$OCI_HOST:/home/opc/us_bonds/"
 
 # Step 5: 実行権限設定
@@ -26,11 +26,12 @@ ssh -i "$SSH_KEY" -o ConnectTimeout=10 "$REMOTE_USER@$VM_IP" "echo 'SSH接続成
 
 # リモートディレクトリ作成
 echo "2. リモートディレクトリ作成..."
-ssh -i "$SSH_KEY" "$REMOTE_USER@$VM_IP" "mkdir -p $REMOTE_DIR"
+ssh -i "$SSH_KEY" "$REMOTE_USER@$VM_IP" "mkdir -p $REMOTE_DIR /home/opc/common"
 
 # ファイル転送
 echo "3. ファイル転送..."
-scp -i "$SSH_KEY" rate-exchange.py "$REMOTE_USER@$VM_IP:$REMOTE_DIR/"
+scp -i "$SSH_KEY" rate-exchange.py rate_store.py fx_watchlist.py "$REMOTE_USER@$VM_IP:$REMOTE_DIR/"
+scp -i "$SSH_KEY" ../common/*.py "$REMOTE_USER@$VM_IP:/home/opc/common/"
 scp -i "$SSH_KEY" requirements.txt "$REMOTE_USER@$VM_IP:$REMOTE_DIR/"
 
 # リモートでのセットアップ実行
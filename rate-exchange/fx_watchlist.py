@@ -0,0 +1,64 @@
+"""
+為替ウォッチリスト監視
+
+1回のAPIレスポンス (基軸通貨建ての rates テーブル) から監視対象の全ペアを
+クロスレートとして導出し、変動閾値と cooldown を NumPy で一括判定する
+"""
+
+import numpy as np
+
+from common.watchlist import evaluate_thresholds
+
+
+def parse_pair(pair):
+    """"EUR/JPY" → ("EUR", "JPY")"""
+    base, quote = pair.upper().replace("-", "/").split("/")
+    return base, quote
+
+
+class Watchlist:
+    def __init__(self, entries, default_threshold, default_cooldown=0):
+        """
+        entries: ["USD/JPY", {"pair": "EUR/JPY", "threshold": 0.03, "cooldown_seconds": 3600}, ...]
+        ペアごとに閾値・cooldown を上書き可能（未指定は既定値）
+        """
+        self.pairs = []
+        thresholds = []
+        cooldowns = []
+        for entry in entries:
+            if isinstance(entry, str):
+                entry = {"pair": entry}
+            base, quote = parse_pair(entry["pair"])
+            self.pairs.append(f"{base}/{quote}")
+            thresholds.append(entry.get("threshold", default_threshold))
+            cooldowns.append(entry.get("cooldown_seconds", default_cooldown))
+        self.thresholds = np.asarray(thresholds, dtype=np.float64)
+        self.cooldowns = np.asarray(cooldowns, dtype=np.float64)
+
+    def __len__(self):
+        return len(self.pairs)
+
+    def derive_rates(self, rates, api_base):
+        """
+        rates: {"JPY": 147.1, "EUR": 0.92, ...}（api_base 建て）
+        各ペア BASE/QUOTE = rates[QUOTE] / rates[BASE]。取得できない通貨は NaN
+        """
+        currencies = {api_base.upper(): 1.0}
+        currencies.update({k.upper(): v for k, v in rates.items()})
+        table = np.array(
+            [currencies.get(c, np.nan) for pair in self.pairs for c in parse_pair(pair)],
+            dtype=np.float64,
+        ).reshape(-1, 2)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            derived = table[:, 1] / table[:, 0]
+        derived[~np.isfinite(derived)] = np.nan
+        return derived
+
+    def evaluate(self, current, previous, last_notif, now_ts):
+        """
+        全ペアの閾値判定と cooldown 判定を一括で行う（common.watchlist.evaluate_thresholds）
+
+        current / previous / last_notif: ペア順の配列（欠損は NaN、未通知は 0）
+        戻り値: change, valid, exceeded, suppressed, notify, last_notif
+        """
+        return evaluate_thresholds(current, previous, last_notif, now_ts, self.thresholds, self.cooldowns)
@@ -3,8 +3,21 @@ import json
 import time
 from datetime import datetime, timedelta, timezone
 import os
+import sys
 import logging
 
+import numpy as np
+
+# 共通モジュール（/home/opc/common）を参照できるようにする
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common import metrics
+from common.http_cache import HttpCache
+from common.notifier import Notifier
+from common.state_store import StateStore, legacy_rate_states, load_json
+
+from fx_watchlist import Watchlist
+from rate_store import RateStore, import_logs
+
 
 def load_config():
     """設定ファイルを読み込み"""
@@ -24,6 +37,7 @@ def load_config():
 
 # 設定読み込み
 config = load_config()
+metrics.configure(config)
 
 # ログ設定
 logging.basicConfig(
@@ -37,122 +51,115 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 # 設定から値を取得
-SAVE_FILE = config["exchange_rate"]["save_file"]
-PUSHOVER_USER_KEY = config["pushover"]["user_key"]
-PUSHOVER_API_TOKEN = config["pushover"]["api_token"]
-
-
-# 取得API（為替レート：USD/JPY）
-def get_usdjpy():
+SAVE_FILE = config["exchange_rate"]["save_file"]  # 状態ストア導入前の状態ファイル（移行元）
+STATE_NAMESPACE = "rate_exchange"
+state_store = StateStore.from_config(config)
+# Pushover 通知（キューに積んでバックグラウンドで送信・再送）
+notifier = Notifier.from_config(config)
+
+# HTTP セッション（常駐モードでは実行間で接続を再利用）
+session = requests.Session()
+http_cache = HttpCache.from_config(config, session)
+RATE_STORE_DIR = config["exchange_rate"].get("store_dir", "usd_jpy_store")
+rate_store = RateStore(RATE_STORE_DIR)
+STORE_PAIR = "USD/JPY"
+
+
+# 取得API（為替レートテーブル：1リクエストで全通貨）
+def get_rates():
     try:
         url = config["exchange_rate"]["api_url"]
         logger.info(f"APIリクエスト: {url}")
-        r = requests.get(url, timeout=30)
-        r.raise_for_status()
-        data = r.json()
-        rate = data["rates"]["JPY"]
-        logger.info(f"現在のUSD/JPYレート: {rate}")
-        return rate
+        with metrics.stage(STATE_NAMESPACE, "fetch"):
+            r = http_cache.get(url, timeout=30)
+            r.raise_for_status()
+            data = r.json()
+        return data.get("base", "USD"), data["rates"]
     except Exception as e:
+        metrics.count(STATE_NAMESPACE, "api_errors", api="exchangerate")
         logger.error(f"APIリクエストエラー: {e}")
         raise
 
 
-# 前回保存データの読み込み
-def load_previous_rate():
-    if not os.path.exists(SAVE_FILE):
-        return None
-    with open(SAVE_FILE, "r") as f:
-        return json.load(f)
-
-
-# レート記録保存
-def save_rate(rate, last_notif_ts=None):
-    payload = {"rate": rate, "timestamp": datetime.now(timezone.utc).isoformat()}
-    if last_notif_ts is not None:
-        payload["last_notif_ts"] = last_notif_ts
-    with open(SAVE_FILE, "w") as f:
-        json.dump(payload, f)
+# 取得API（為替レート：USD/JPY）
+def get_usdjpy():
+    base, rates = get_rates()
+    rate = Watchlist([STORE_PAIR], 0).derive_rates(rates, base)[0]
+    if np.isnan(rate):
+        raise KeyError(f"レートテーブルに {STORE_PAIR} がありません")
+    rate = float(rate)
+    logger.info(f"現在のUSD/JPYレート: {rate}")
+    return rate
+
+
+# 前回保存データの読み込み（ペアごとの状態）
+def load_pair_states():
+    with metrics.stage(STATE_NAMESPACE, "state_load"):
+        states = state_store.get_all(STATE_NAMESPACE)
+        if not states:
+            # 状態ストア導入前の JSON ファイルから引き継ぎ
+            states = legacy_rate_states(load_json(SAVE_FILE))
+    return states
+
+
+# レート記録保存（ペアごとに原子的に UPSERT）
+def save_rates(pair_states):
+    timestamp = datetime.now(timezone.utc).isoformat()
+    with metrics.stage(STATE_NAMESPACE, "state_save"):
+        state_store.set_many(
+            STATE_NAMESPACE,
+            {pair: {**state, "timestamp": timestamp} for pair, state in pair_states.items()},
+        )
 
 
 # Pushover通知送信
-def send_notification(message, title="💱 USD/JPY為替レート通知"):
-    try:
-        logger.info(f"通知送信: {message}")
-        response = requests.post(
-            "https://api.pushover.net/1/messages.json",
-            data={
-                "token": PUSHOVER_API_TOKEN,
-                "user": PUSHOVER_USER_KEY,
-                "message": message,
-                "title": title,
-            },
-            timeout=30,
-        )
-        response.raise_for_status()
-        logger.info("通知送信成功")
-    except Exception as e:
-        logger.error(f"通知送信エラー: {e}")
+def send_notification(message, title="💱 USD/JPY為替レート通知", priority="alert"):
+    logger.info(f"通知送信: {message}")
+    with metrics.stage(STATE_NAMESPACE, "notify"):
+        notifier.notify(message, title, source=STATE_NAMESPACE, priority=priority)
+    metrics.count(STATE_NAMESPACE, "notifications", priority=priority)
 
 
 # 昨日のレート変動サマリーを取得
 def get_yesterday_rate_summary():
-    """昨日の為替レート変動サマリーを取得"""
+    """昨日の為替レート変動サマリーを取得（サンプルストアの日次ロールアップを参照）"""
     try:
         yesterday = datetime.now() - timedelta(days=1)
         yesterday_str = yesterday.strftime("%Y-%m-%d")
 
-        # ログファイルから昨日のデータを検索
-        log_file = config["logging"]["rate_exchange_log"]
-        if not os.path.exists(log_file):
-            return "📊 昨日のログファイルが見つかりません"
-
-        with open(log_file, "r") as f:
-            log_content = f.read()
-
-        # 昨日のレート情報を抽出
-        yesterday_logs = [
-            line
-            for line in log_content.split("\n")
-            if yesterday_str in line and "Current:" in line
-        ]
-
-        if not yesterday_logs:
+        summary = rate_store.get_daily_summary(yesterday)
+        if summary is None:
             return f"📊 昨日({yesterday_str})のレートデータが見つかりません"
 
-        # 最初と最後のレートを取得
-        rates = []
-        for log in yesterday_logs:
-            try:
-                # "Current: 146.3400" のような形式から数値を抽出
-                if "Current:" in log:
-                    rate_str = log.split("Current:")[1].split(",")[0].strip()
-                    rates.append(float(rate_str))
-            except:
-                continue
-
-        if len(rates) < 2:
+        if summary["count"] < 2:
             return f"📊 昨日({yesterday_str})のレートデータが不十分です"
 
-        start_rate = rates[0]
-        end_rate = rates[-1]
-        min_rate = min(rates)
-        max_rate = max(rates)
+        start_rate = summary["open"]
+        end_rate = summary["close"]
         change_percent = ((end_rate - start_rate) / start_rate) * 100
 
         return f"""📊 昨日({yesterday_str})のUSD/JPY変動：
 開始: ${start_rate:.2f}
 終了: ${end_rate:.2f}
-最高: ${max_rate:.2f}
-最安: ${min_rate:.2f}
+最高: ${summary["high"]:.2f}
+最安: ${summary["low"]:.2f}
 変動: {change_percent:+.2f}%
-データポイント: {len(rates)}件"""
+データポイント: {summary["count"]}件"""
 
     except Exception as e:
         logger.error(f"昨日のサマリー取得エラー: {e}")
         return "📊 昨日のデータ取得中にエラーが発生しました"
 
 
+# サンプルストアへ記録
+def record_sample(rate):
+    try:
+        rate_store.append(rate, time.time())
+    except Exception as e:
+        # 記録失敗で監視自体は止めない
+        logger.error(f"サンプル記録エラー: {e}")
+
+
 # 朝の定期レポート送信
 def send_morning_report():
     """朝の定期レポートを送信"""
@@ -167,9 +174,9 @@ def send_morning_report():
         yesterday_summary = get_yesterday_rate_summary()
 
         # 24時間変動を計算（前回データとの比較）
-        data = load_previous_rate()
+        data = load_pair_states().get(STORE_PAIR)
         change_24h = 0
-        if data:
+        if data and data.get("rate"):
             previous_rate = data["rate"]
             change_24h = ((current_rate - previous_rate) / previous_rate) * 100
 
@@ -188,7 +195,7 @@ def send_morning_report():
 
 今日も相場を監視します！"""
 
-        send_notification(report_message, "🌅 USD/JPY 朝のレポート")
+        send_notification(report_message, "🌅 USD/JPY 朝のレポート", priority="report")
         logger.info("朝の定期レポート送信完了")
 
     except Exception as e:
@@ -196,56 +203,87 @@ def send_morning_report():
         raise
 
 
-# メイン処理
-def check_usdjpy(threshold=None):
+# ウォッチリスト構築
+def build_watchlist(threshold=None):
+    exchange_config = config["exchange_rate"]
     if threshold is None:
-        threshold = config["exchange_rate"]["threshold"]
-    cooldown_seconds = config["exchange_rate"].get("cooldown_seconds", 0)
-    try:
-        logger.info("為替レートチェック開始")
-        current_rate = get_usdjpy()
-        data = load_previous_rate()
+        threshold = exchange_config["threshold"]
+    return Watchlist(
+        exchange_config.get("watchlist", [STORE_PAIR]),
+        threshold,
+        exchange_config.get("cooldown_seconds", 0),
+    )
 
-        notified_ts = None
-        carry_last_notif_ts = None
 
-        if data:
-            previous_rate = data["rate"]
-            carry_last_notif_ts = data.get("last_notif_ts")
-            if not previous_rate:
+# メイン処理（ウォッチリストの全ペアを1リクエストで判定）
+def check_usdjpy(threshold=None):
+    watchlist = build_watchlist(threshold)
+    try:
+        logger.info(f"為替レートチェック開始 ({len(watchlist)}ペア)")
+        base, rates = get_rates()
+        current = watchlist.derive_rates(rates, base)
+        states = load_pair_states()
+
+        previous = np.array(
+            [(states.get(p) or {}).get("rate") or np.nan for p in watchlist.pairs],
+            dtype=np.float64,
+        )
+        last_notif = np.array(
+            [(states.get(p) or {}).get("last_notif_ts") or 0 for p in watchlist.pairs],
+            dtype=np.float64,
+        )
+        now_ts = int(time.time())
+        with metrics.stage(STATE_NAMESPACE, "evaluate"):
+            result = watchlist.evaluate(current, previous, last_notif, now_ts)
+
+        messages = []
+        for i, pair in enumerate(watchlist.pairs):
+            if np.isnan(current[i]):
+                logger.warning(f"[{pair}] レートテーブルに通貨がありません - スキップ")
+                continue
+            if pair == STORE_PAIR:
+                record_sample(float(current[i]))
+            if pair not in states:
+                logger.info(f"[{pair}] 初回実行 - ベースラインを設定")
+                continue
+            if not result["valid"][i]:
                 logger.warning(
-                    f"前回レートが 0 または欠損: {previous_rate!r} - ベースライン再設定"
+                    f"[{pair}] 前回レートが 0 または欠損: {states[pair].get('rate')!r} - ベースライン再設定"
                 )
-                save_rate(current_rate, carry_last_notif_ts)
-                return
-            rate_change = (current_rate - previous_rate) / previous_rate
-
+                continue
             logger.info(
-                f"Previous: {previous_rate:.4f}, Current: {current_rate:.4f}, Change: {rate_change:.2%}"
+                f"[{pair}] Previous: {previous[i]:.4f}, Current: {current[i]:.4f}, Change: {result['change'][i]:.2%}"
             )
-
-            if abs(rate_change) >= threshold:
-                now_ts = int(time.time())
-                if (
-                    carry_last_notif_ts
-                    and (now_ts - carry_last_notif_ts) < cooldown_seconds
-                ):
-                    elapsed = now_ts - carry_last_notif_ts
-                    logger.info(
-                        f"閾値超過だが cooldown 中 (前回通知から {elapsed}s < {cooldown_seconds}s) - 通知スキップ"
-                    )
-                else:
-                    direction = "上昇" if rate_change > 0 else "下落"
-                    message = f"USD/JPYが{direction}：{rate_change:.2%}変動\n現在のレート: {current_rate:.2f}"
-                    send_notification(message)
-                    notified_ts = now_ts
+            if result["suppressed"][i]:
+                metrics.count(STATE_NAMESPACE, "cooldown_suppressed")
+                elapsed = now_ts - int(last_notif[i])
+                logger.info(
+                    f"[{pair}] 閾値超過だが cooldown 中 (前回通知から {elapsed}s < {int(watchlist.cooldowns[i])}s) - 通知スキップ"
+                )
+            elif result["notify"][i]:
+                direction = "上昇" if result["change"][i] > 0 else "下落"
+                messages.append(
+                    f"{pair}が{direction}：{result['change'][i]:.2%}変動\n現在のレート: {current[i]:.2f}"
+                )
             else:
-                logger.info("閾値未満のため通知なし")
-        else:
-            logger.info("初回実行 - ベースラインを設定")
+                logger.info(f"[{pair}] 閾値未満のため通知なし")
+
+        if len(messages) == 1 and len(watchlist) == 1:
+            send_notification(messages[0], f"💱 {watchlist.pairs[0]}為替レート通知")
+        elif messages:
+            send_notification("\n\n".join(messages), "💱 為替レート通知")
 
         # 必ず更新（cooldown 履歴は通知発火時のみ更新、それ以外は前回値を引き継ぐ）
-        save_rate(current_rate, notified_ts or carry_last_notif_ts)
+        new_states = {}
+        for i, pair in enumerate(watchlist.pairs):
+            if np.isnan(current[i]):
+                continue
+            last_ts = int(result["last_notif"][i])
+            new_states[pair] = {
+                "rate": float(current[i]),
+                "last_notif_ts": last_ts or None,
+            }
+        save_rates(new_states)
         logger.info("為替レートチェック完了")
 
     except Exception as e:
@@ -254,10 +292,10 @@ def check_usdjpy(threshold=None):
 
 
 if __name__ == "__main__":
-    import sys
-
     # コマンドライン引数のチェック
     if len(sys.argv) > 1 and sys.argv[1] == "--morning-report":
         send_morning_report()
+    elif len(sys.argv) > 2 and sys.argv[1] == "--import-log":
+        import_logs(rate_store, sys.argv[2:])
     else:
         check_usdjpy()
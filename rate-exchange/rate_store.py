@@ -0,0 +1,277 @@
+"""
+USD/JPYレートの追記専用サンプルストア
+
+samples.bin : 固定長レコード (epoch秒 int64 + レート float64) の追記専用ファイル
+daily.bin   : 暦日ごとの固定長レコード (先頭サンプル位置・件数・始値/高値/安値/終値)
+              ヘッダに先頭日の序数を持ち、任意の日付へ O(1) でシークできる
+"""
+
+import gzip
+import logging
+import mmap
+import os
+import struct
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_FORMAT = "<qd"  # timestamp(秒), rate
+SAMPLE_SIZE = struct.calcsize(SAMPLE_FORMAT)
+
+DAILY_MAGIC = b"RXD1"
+DAILY_HEADER_FORMAT = "<4sq"  # magic, 先頭日の序数
+DAILY_HEADER_SIZE = struct.calcsize(DAILY_HEADER_FORMAT)
+DAILY_FORMAT = "<qqdddd"  # 先頭サンプル位置, 件数, open, high, low, close
+DAILY_SIZE = struct.calcsize(DAILY_FORMAT)
+
+LOG_TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def _day_ordinal(ts):
+    """epoch秒をローカル日付の序数に変換（ログと同じローカル時刻基準）"""
+    return datetime.fromtimestamp(ts).date().toordinal()
+
+
+class RateStore:
+    def __init__(self, directory):
+        self.directory = directory
+        self.samples_path = os.path.join(directory, "samples.bin")
+        self.daily_path = os.path.join(directory, "daily.bin")
+
+    # ---- 読み取り -------------------------------------------------------
+
+    def __len__(self):
+        if not os.path.exists(self.samples_path):
+            return 0
+        return os.path.getsize(self.samples_path) // SAMPLE_SIZE
+
+    def _read_daily_header(self, f):
+        header = f.read(DAILY_HEADER_SIZE)
+        if len(header) < DAILY_HEADER_SIZE:
+            return None
+        magic, first_ordinal = struct.unpack(DAILY_HEADER_FORMAT, header)
+        if magic != DAILY_MAGIC:
+            raise ValueError(f"daily.bin のフォーマットが不正です: {self.daily_path}")
+        return first_ordinal
+
+    def _daily_count(self):
+        if not os.path.exists(self.daily_path):
+            return 0
+        size = os.path.getsize(self.daily_path) - DAILY_HEADER_SIZE
+        return max(size, 0) // DAILY_SIZE
+
+    def _read_daily_record(self, f, first_ordinal, ordinal):
+        index = ordinal - first_ordinal
+        if index < 0:
+            return None
+        f.seek(DAILY_HEADER_SIZE + index * DAILY_SIZE)
+        raw = f.read(DAILY_SIZE)
+        if len(raw) < DAILY_SIZE:
+            return None
+        return struct.unpack(DAILY_FORMAT, raw)
+
+    def get_daily_summary(self, day):
+        """指定日の集計 (open/high/low/close/count) を O(1) で返す。データなしは None"""
+        if isinstance(day, datetime):
+            day = day.date()
+        if not os.path.exists(self.daily_path):
+            return None
+        with open(self.daily_path, "rb") as f:
+            first_ordinal = self._read_daily_header(f)
+            if first_ordinal is None:
+                return None
+            record = self._read_daily_record(f, first_ordinal, day.toordinal())
+        if record is None or record[1] == 0:
+            return None
+        offset, count, open_, high, low, close = record
+        return {
+            "date": day.isoformat(),
+            "offset": offset,
+            "count": count,
+            "open": open_,
+            "high": high,
+            "low": low,
+            "close": close,
+        }
+
+    def iter_samples(self, start=0, stop=None):
+        """サンプルを (timestamp, rate) で列挙（mmap で読み取り）"""
+        total = len(self)
+        stop = total if stop is None else min(stop, total)
+        if start >= stop:
+            return
+        with open(self.samples_path, "rb") as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                for i in range(start, stop):
+                    yield struct.unpack_from(SAMPLE_FORMAT, mm, i * SAMPLE_SIZE)
+
+    def get_day_samples(self, day):
+        """指定日のサンプルをオフセット索引から直接読み出す"""
+        summary = self.get_daily_summary(day)
+        if summary is None:
+            return []
+        start = summary["offset"]
+        return list(self.iter_samples(start, start + summary["count"]))
+
+    def last_sample(self):
+        total = len(self)
+        if total == 0:
+            return None
+        with open(self.samples_path, "rb") as f:
+            f.seek((total - 1) * SAMPLE_SIZE)
+            return struct.unpack(SAMPLE_FORMAT, f.read(SAMPLE_SIZE))
+
+    # ---- 書き込み -------------------------------------------------------
+
+    def append(self, rate, ts):
+        """サンプルを1件追記し、日次ロールアップを更新。時刻が逆行する場合は False"""
+        ts = int(ts)
+        os.makedirs(self.directory, exist_ok=True)
+        last = self.last_sample()
+        if last is not None and ts < last[0]:
+            logger.warning(f"時刻が逆行したサンプルを無視: {ts} < {last[0]}")
+            return False
+
+        index = len(self)
+        if os.path.exists(self.samples_path) and (
+            os.path.getsize(self.samples_path) != index * SAMPLE_SIZE
+        ):
+            # 書き込み途中で落ちた端数バイトを切り捨ててレコード境界を揃える
+            os.truncate(self.samples_path, index * SAMPLE_SIZE)
+        if not self._index_is_consistent():
+            self.rebuild_index()
+
+        with open(self.samples_path, "ab") as f:
+            f.write(struct.pack(SAMPLE_FORMAT, ts, rate))
+        self._update_daily(_day_ordinal(ts), index, rate)
+        return True
+
+    def _update_daily(self, ordinal, sample_index, rate):
+        if not os.path.exists(self.daily_path) or self._daily_count() == 0:
+            with open(self.daily_path, "wb") as f:
+                f.write(struct.pack(DAILY_HEADER_FORMAT, DAILY_MAGIC, ordinal))
+                f.write(struct.pack(DAILY_FORMAT, sample_index, 1, rate, rate, rate, rate))
+            return
+
+        with open(self.daily_path, "r+b") as f:
+            first_ordinal = self._read_daily_header(f)
+            day_count = self._daily_count()
+            index = ordinal - first_ordinal
+            if index < day_count:
+                offset, count, open_, high, low, close = self._read_daily_record(
+                    f, first_ordinal, ordinal
+                )
+                if count == 0:
+                    record = (sample_index, 1, rate, rate, rate, rate)
+                else:
+                    record = (
+                        offset,
+                        count + 1,
+                        open_,
+                        max(high, rate),
+                        min(low, rate),
+                        rate,
+                    )
+                f.seek(DAILY_HEADER_SIZE + index * DAILY_SIZE)
+                f.write(struct.pack(DAILY_FORMAT, *record))
+            else:
+                # 欠損日は件数 0 のレコードで埋め、位置計算を固定長のまま保つ
+                f.seek(0, os.SEEK_END)
+                empty = struct.pack(DAILY_FORMAT, sample_index, 0, 0.0, 0.0, 0.0, 0.0)
+                f.write(empty * (index - day_count))
+                f.write(struct.pack(DAILY_FORMAT, sample_index, 1, rate, rate, rate, rate))
+
+    def _index_is_consistent(self):
+        """最終日レコードの終端がサンプル数と一致するか（書き込み途中のクラッシュ検出）"""
+        total = len(self)
+        day_count = self._daily_count()
+        if day_count == 0:
+            return total == 0
+        with open(self.daily_path, "rb") as f:
+            first_ordinal = self._read_daily_header(f)
+            offset, count = self._read_daily_record(
+                f, first_ordinal, first_ordinal + day_count - 1
+            )[:2]
+        return offset + count == total
+
+    def rebuild_index(self):
+        """samples.bin から daily.bin を再構築"""
+        logger.info(f"日次インデックス再構築: {self.daily_path}")
+        tmp_path = self.daily_path + ".tmp"
+        records = []
+        first_ordinal = None
+        for i, (ts, rate) in enumerate(self.iter_samples()):
+            ordinal = _day_ordinal(ts)
+            if first_ordinal is None:
+                first_ordinal = ordinal
+            index = ordinal - first_ordinal
+            while len(records) <= index:
+                records.append([i, 0, 0.0, 0.0, 0.0, 0.0])
+            rec = records[index]
+            if rec[1] == 0:
+                records[index] = [i, 1, rate, rate, rate, rate]
+            else:
+                rec[1] += 1
+                rec[3] = max(rec[3], rate)
+                rec[4] = min(rec[4], rate)
+                rec[5] = rate
+        if first_ordinal is None:
+            if os.path.exists(self.daily_path):
+                os.remove(self.daily_path)
+            return
+        with open(tmp_path, "wb") as f:
+            f.write(struct.pack(DAILY_HEADER_FORMAT, DAILY_MAGIC, first_ordinal))
+            for rec in records:
+                f.write(struct.pack(DAILY_FORMAT, *rec))
+        os.replace(tmp_path, self.daily_path)
+
+    def import_samples(self, samples):
+        """既存データとマージ（時刻重複は既存優先）して書き直し、インデックスを再構築"""
+        os.makedirs(self.directory, exist_ok=True)
+        merged = {}
+        for ts, rate in samples:
+            merged.setdefault(int(ts), rate)
+        for ts, rate in self.iter_samples():
+            merged[ts] = rate
+        tmp_path = self.samples_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            for ts in sorted(merged):
+                f.write(struct.pack(SAMPLE_FORMAT, ts, merged[ts]))
+        os.replace(tmp_path, self.samples_path)
+        self.rebuild_index()
+        return len(merged)
+
+
+def parse_log_samples(path, marker="Current:", pair="USD/JPY"):
+    """
+    ログファイル（.gz 可）から (timestamp, rate) を抽出
+    "[EUR/JPY] Previous: ..." のようにペア付きの行は pair と一致するものだけ採用し、
+    ペア表記のない旧形式の行は USD/JPY として扱う
+    """
+    opener = gzip.open if path.endswith(".gz") else open
+    tag = f"[{pair}]"
+    with opener(path, "rt", encoding="utf-8", errors="replace") as f:
+        for line in f:
+            if marker not in line:
+                continue
+            prefix = line.split(marker)[0]
+            if "/" in prefix.split(" - ")[-1] and tag not in prefix:
+                continue
+            try:
+                ts = datetime.strptime(line[:19], LOG_TIME_FORMAT).timestamp()
+                rate = float(line.split(marker)[1].split(",")[0].strip())
+            except (ValueError, IndexError):
+                continue
+            yield int(ts), rate
+
+
+def import_logs(store, paths):
+    """既存ログファイル群からストアをバックフィル"""
+    samples = []
+    for path in paths:
+        found = list(parse_log_samples(path))
+        logger.info(f"ログ取り込み: {path} ({len(found)}件)")
+        samples.extend(found)
+    total = store.import_samples(samples)
+    logger.info(f"バックフィル完了: 合計{total}件")
+    return total
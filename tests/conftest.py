@@ -0,0 +1,10 @@
+"""Test configuration: make the monitor directories importable."""
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+for subdir in ("", "rate-exchange", "bitcoin", "us_bonds", "check_a1"):
+    path = os.path.join(ROOT, subdir)
+    if path not in sys.path:
+        sys.path.insert(0, path)
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Fake `oci` CLI for the A1 checker tests.
+
+Simulates `compute instance launch` / `list` / `terminate` locally. Behaviour comes from the JSON
+file named by FAKE_OCI_SCENARIO:
+
+    {"responses": {"AD-2/2": "success"}, "default": "capacity",
+     "delays": {"AD-1/4": 2.0}, "log": "/tmp/calls.jsonl"}
+
+Keys are "<availability domain>/<ocpus>". A response is "success", "capacity" or "error".
+Each launch appends a "start" record to the log before the delay and an "end" record after it,
+so tests can see concurrency and which attempts were killed before finishing.
+`list --display-name` reports a launch whose response is "success" as RUNNING once it has
+started, even if it was killed before printing (OCI had already accepted the request).
+"""
+import json
+import os
+import sys
+import time
+
+
+def _option(args, name):
+    return args[args.index(name) + 1] if name in args else None
+
+
+def _log(scenario, record):
+    if scenario.get("log"):
+        with open(scenario["log"], "a") as f:
+            f.write(json.dumps(record) + "\n")
+
+
+def main(args):
+    with open(os.environ["FAKE_OCI_SCENARIO"]) as f:
+        scenario = json.load(f)
+    if args[:3] == ["compute", "instance", "terminate"]:
+        instance_id = _option(args, "--instance-id")
+        _log(scenario, {"event": "terminate", "instance_id": instance_id, "region": _option(args, "--region")})
+        return 0
+    if args[:3] == ["compute", "instance", "list"]:
+        name = _option(args, "--display-name")
+        with open(scenario["log"]) as f:
+            started = [json.loads(line) for line in f]
+        data = [
+            {"id": f"ocid1.instance.oc1..{name}", "display-name": name, "lifecycle-state": "RUNNING"}
+            for record in started
+            if record["event"] == "start" and record["name"] == name
+            and scenario.get("responses", {}).get(record["key"], scenario.get("default", "capacity")) == "success"
+        ]
+        _log(scenario, {"event": "list", "name": name, "region": _option(args, "--region")})
+        print(json.dumps({"data": data}, indent=2))
+        return 0
+    if args[:3] != ["compute", "instance", "launch"]:
+        print(f"unsupported: {' '.join(args)}", file=sys.stderr)
+        return 2
+
+    domain = _option(args, "--availability-domain")
+    ocpus = json.loads(_option(args, "--shape-config"))["ocpus"]
+    key = f"{domain}/{ocpus}"
+    record = {"key": key, "region": _option(args, "--region"), "name": _option(args, "--display-name")}
+    _log(scenario, {"event": "start", "time": time.time(), **record})
+    time.sleep(scenario.get("delays", {}).get(key, 0))
+    response = scenario.get("responses", {}).get(key, scenario.get("default", "capacity"))
+    _log(scenario, {"event": "end", "time": time.time(), "response": response, **record})
+
+    if response == "success":
+        data = {"id": f"ocid1.instance.oc1..{record['name']}", "lifecycle-state": "PROVISIONING"}
+        print(json.dumps({"data": data}, indent=2))
+        return 0
+    if response == "capacity":
+        print('ServiceError:\n{"code": "InternalError", "message": "Out of host capacity.", "status": 500}')
+        return 1
+    print('ServiceError:\n{"code": "NotAuthenticated", "message": "The required information to complete '
+          'authentication was not provided.", "status": 401}')
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,70 @@
+"""Tests for the A1 checker's single-pass config / OCI CLI output loader."""
+import json
+import os
+import subprocess
+import sys
+
+from a1_config import config_values, image_values, main, shell_assignments
+from benchmarks import bench_a1_checker
+
+SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "check_a1", "a1_config.py")
+
+
+def _eval_in_bash(assignments, *names):
+    """bash で eval した結果の変数の値"""
+    script = 'eval "$1"; for name in "${@:2}"; do printf "%s\\0" "${!name}"; done'
+    output = subprocess.run(
+        ["bash", "-c", script, "bash", assignments, *names], capture_output=True, text=True, check=True
+    ).stdout
+    return output.split("\0")[:-1]
+
+
+def test_env_values_survive_shell_eval(tmp_path):
+    config = {
+        "oci": {"ssh_key": "ssh-ed25519 AAAA user@host", "passphrase": "p'a$s `x` \"q\"\nline2"},
+        "a1_instance": {"shape": "VM.Standard.A1.Flex", "check_interval_minutes": 15, "shape_config": {"ocpus": 2}},
+        "logging": {"a1_check_log": "/tmp/a1 check.log"},
+    }
+    path = tmp_path / "config.json"
+    path.write_text(json.dumps(config))
+    output = subprocess.run(
+        [sys.executable, SCRIPT, "env", str(path)], capture_output=True, text=True, check=True
+    ).stdout
+    names = ("SSH_KEY", "OCI_CLI_PASSPHRASE", "SHAPE", "CHECK_INTERVAL_MINUTES", "LOG_FILE", "OCPUS", "MEMORY", "SUBNET_ID")
+    assert _eval_in_bash(output, *names) == [
+        "ssh-ed25519 AAAA user@host",
+        "p'a$s `x` \"q\"\nline2",
+        "VM.Standard.A1.Flex",
+        "15",
+        "/tmp/a1 check.log",
+        "2",
+        # 未設定は従来と同じ既定値（メモリ 24GB、それ以外は空）
+        "24",
+        "",
+    ]
+
+
+def test_missing_sections_use_defaults():
+    values = config_values({"oci": None})
+    assert values["OCPUS"] == 4
+    assert values["SHAPE"] == ""
+    assert shell_assignments({"A": "x y", "B": 3}) == "A='x y'\nB=3\n"
+
+
+def test_image_values_from_cli_output(monkeypatch, capsys):
+    image = {"data": {"display-name": "Oracle-Linux-9", "size-in-mbs": 47694, "lifecycle-state": "AVAILABLE"}}
+    assert image_values(image) == {"IMAGE_NAME": "Oracle-Linux-9", "IMAGE_SIZE_GB": 46.6, "IMAGE_STATE": "AVAILABLE"}
+    assert image_values({"data": {"display-name": "x"}})["IMAGE_SIZE_GB"] == "Unknown"
+
+    # 認証エラーなどで JSON でない出力
+    monkeypatch.setattr(sys, "stdin", open(os.devnull))
+    main(["image"])
+    assert capsys.readouterr().out == "IMAGE_NAME=Unknown\nIMAGE_SIZE_GB=Unknown\nIMAGE_STATE=Unknown\n"
+
+
+def test_checker_python_process_count_per_run():
+    results = {r["mode"]: r for r in bench_a1_checker.run(repeat=1)}
+    # 設定の読み込み1回 + a1_probe.py 1回 + OCI CLI（インスタンス作成、組み合わせ1つ）1回
+    assert results["check"]["python_processes"] == 3
+    # 設定・ログインデックス・イメージ取得・イメージ情報の取り出し・通知
+    assert results["morning-report"]["python_processes"] == 5
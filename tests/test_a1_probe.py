@@ -0,0 +1,196 @@
+"""Tests for the concurrent A1 capacity probe (cancel-on-success, bounded concurrency, backoff)."""
+import json
+import os
+import shlex
+import subprocess
+import sys
+import time
+
+import pytest
+
+from a1_probe import ProbeBackoff, ProbeScheduler, classify, probe_targets, result_values
+from common.state_store import StateStore
+
+FAKE_OCI = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fake_oci.py")
+PROBE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "check_a1", "a1_probe.py")
+
+
+def _config(tmp_path, domains=("AD-1", "AD-2", "AD-3"), shape_configs=((4, 24), (2, 12)), **probe):
+    return {
+        "oci": {"compartment_id": "ocid1.compartment", "subnet_id": "ocid1.subnet", "image_id": "ocid1.image"},
+        "a1_instance": {
+            "shape": "VM.Standard.A1.Flex",
+            "probe": {
+                "targets": [{"availability_domains": list(domains)}],
+                "shape_configs": [{"ocpus": o, "memory_in_gbs": m} for o, m in shape_configs],
+                **probe,
+            },
+        },
+        "state_store": {"path": str(tmp_path / "state.db")},
+    }
+
+
+@pytest.fixture
+def scenario(tmp_path, monkeypatch):
+    """Write the fake oci scenario; returns a function reading the recorded calls."""
+    path = tmp_path / "scenario.json"
+    log = tmp_path / "calls.jsonl"
+    monkeypatch.setenv("FAKE_OCI_SCENARIO", str(path))
+
+    def configure(**settings):
+        path.write_text(json.dumps({"log": str(log), **settings}))
+
+    def calls(event=None):
+        if not log.exists():
+            return []
+        records = [json.loads(line) for line in log.read_text().splitlines()]
+        return [r for r in records if event is None or r["event"] == event]
+
+    configure()
+    configure.calls = calls
+    return configure
+
+
+def _scheduler(config):
+    return ProbeScheduler.from_config(
+        config, StateStore(config["state_store"]["path"]), command=[sys.executable, FAKE_OCI]
+    )
+
+
+def test_targets_expand_shape_configs_regions_and_domains():
+    config = {
+        "oci": {"availability_domain": "AD-1", "subnet_id": "s", "image_id": "i", "compartment_id": "c"},
+        "a1_instance": {
+            "shape_config": {"ocpus": 4, "memory_in_gbs": 24},
+            "probe": {
+                "targets": [{}, {"region": "ap-osaka-1", "availability_domains": ["OSAKA-AD-1"], "subnet_id": "s2"}]
+            },
+        },
+    }
+    targets = probe_targets(config)
+    assert [t["key"] for t in targets] == ["default|AD-1|4x24", "ap-osaka-1|OSAKA-AD-1|4x24"]
+    assert targets[1]["subnet_id"] == "s2" and targets[1]["image_id"] == "i"
+    # probe 未設定なら従来どおり1つだけ
+    assert len(probe_targets({"oci": {"availability_domain": "AD-1"}, "a1_instance": {}})) == 1
+    assert classify('ServiceError: {"message": "Out of host capacity."}') == ("capacity", None)
+
+
+def test_first_success_stops_pending_attempts_and_waits_for_running_ones(tmp_path, scenario):
+    scenario(responses={"AD-2/4": "success"}, delays={"AD-1/4": 1.0, "AD-2/4": 0.3})
+    result = _scheduler(_config(tmp_path, max_concurrency=2)).run()
+
+    assert result["status"] == "success"
+    assert result["target"]["availability_domain"] == "AD-2"
+    assert result["instance_id"].startswith("ocid1.instance.oc1..a1-instance-")
+    outcomes = {a["target"]["key"]: a["outcome"] for a in result["attempts"]}
+    assert outcomes == {"default|AD-1|4x24": "capacity", "default|AD-2|4x24": "success"}
+    # 実行中だった AD-1 は結果が分かるまで待ち、残りの組み合わせは起動しない
+    assert sorted(c["key"] for c in scenario.calls("start")) == ["AD-1/4", "AD-2/4"]
+    assert sorted(c["key"] for c in scenario.calls("end")) == ["AD-1/4", "AD-2/4"]
+    assert scenario.calls("terminate") == [] and result["removed"] == []
+
+
+def test_concurrent_successes_terminate_the_extra_instances(tmp_path, scenario):
+    scenario(responses={"AD-1/4": "success", "OSAKA-AD-1/4": "success"}, delays={"AD-1/4": 0.6})
+    config = _config(tmp_path, domains=("AD-1",), shape_configs=((4, 24),), max_concurrency=2)
+    config["a1_instance"]["probe"]["targets"].append(
+        {"region": "ap-osaka-1", "availability_domains": ["OSAKA-AD-1"]}
+    )
+    result = _scheduler(config).run()
+
+    assert result["status"] == "success"
+    assert result["target"]["region"] == "ap-osaka-1"
+    # 後から成功した AD-1 のインスタンスは probe が削除し、シェルには勝者だけを返す
+    extra = [a for a in result["attempts"] if a["target"]["availability_domain"] == "AD-1"][0]
+    assert extra["outcome"] == "success"
+    assert result["removed"] == [f"ocid1.instance.oc1..{extra['display_name']}"]
+    assert [(c["instance_id"], c["region"]) for c in scenario.calls("terminate")] == [(result["removed"][0], None)]
+    assert result_values(result)["INSTANCE_ID"] == result["instance_id"] != result["removed"][0]
+    assert "余分なインスタンス削除 1" in result_values(result)["PROBE_SUMMARY"]
+
+
+def test_timed_out_launch_is_looked_up_by_name_and_terminated(tmp_path, scenario):
+    scenario(responses={"OSAKA-AD-1/4": "success"}, delays={"OSAKA-AD-1/4": 10})
+    config = _config(tmp_path, domains=("AD-1",), shape_configs=((4, 24),), timeout_seconds=0.5)
+    config["a1_instance"]["probe"]["targets"] = [{"region": "ap-osaka-1", "availability_domains": ["OSAKA-AD-1"]}]
+    result = _scheduler(config).run()
+
+    assert result["status"] == "error"
+    assert [a["outcome"] for a in result["attempts"]] == ["timeout"]
+    name = result["attempts"][0]["display_name"]
+    # CLI は止めたが OCI 側では受け付けられていた
+    assert scenario.calls("end") == []
+    assert [(c["name"], c["region"]) for c in scenario.calls("list")] == [(name, "ap-osaka-1")]
+    assert [(c["instance_id"], c["region"]) for c in scenario.calls("terminate")] == [
+        (f"ocid1.instance.oc1..{name}", "ap-osaka-1")
+    ]
+    assert result["removed"] == [f"ocid1.instance.oc1..{name}"]
+
+
+def test_concurrency_is_bounded(tmp_path, scenario):
+    delays = {f"AD-{d}/{o}": 0.4 for d in (1, 2, 3) for o in (4, 2)}
+    scenario(delays=delays)
+    result = _scheduler(_config(tmp_path, max_concurrency=3)).run()
+    assert result["status"] == "capacity"
+    assert len(result["attempts"]) == 6
+
+    events = sorted(
+        [(c["time"], 1) for c in scenario.calls("start")] + [(c["time"], -1) for c in scenario.calls("end")]
+    )
+    running = peak = 0
+    for _, delta in events:
+        running += delta
+        peak = max(peak, running)
+    assert peak == 3
+    # シェイプ構成の順（4 OCPU を先に）に試行する
+    assert [c["key"][-1] for c in scenario.calls("start")[:3]] == ["4", "4", "4"]
+
+
+def test_capacity_errors_back_off_per_target(tmp_path, scenario):
+    scenario(responses={"AD-2/4": "error"})
+    config = _config(tmp_path, domains=("AD-1", "AD-2"), shape_configs=((4, 24),), backoff_base_seconds=600)
+    now = 1_000_000.0
+    first = _scheduler(config).run(now=now)
+    assert {a["target"]["key"]: a["outcome"] for a in first["attempts"]} == {
+        "default|AD-1|4x24": "capacity",
+        "default|AD-2|4x24": "error",
+    }
+    assert first["status"] == "error"
+
+    # 容量不足だった AD-1 だけ backoff（別プロセス = 状態ストアから読み直し）
+    second = _scheduler(config).run(now=now + 300)
+    assert [a["target"]["availability_domain"] for a in second["attempts"]] == ["AD-2"]
+    assert [t["availability_domain"] for t in second["skipped"]] == ["AD-1"]
+
+    # backoff 明けに再び容量不足なら次は2倍
+    scenario(responses={"AD-2/4": "error"})
+    _scheduler(config).run(now=now + 600)
+    backoff = ProbeBackoff(StateStore(config["state_store"]["path"]))
+    assert backoff.entries["default|AD-1|4x24"] == {"failures": 2, "next_at": now + 600 + 1200}
+
+    # 成功したら backoff を解除
+    scenario(responses={"AD-1/4": "success"})
+    result = _scheduler(config).run(now=now + 600 + 1200)
+    assert result["status"] == "success"
+    assert "default|AD-1|4x24" not in ProbeBackoff(StateStore(config["state_store"]["path"])).entries
+
+
+def test_cli_prints_shell_values_and_logs_each_attempt(tmp_path, scenario):
+    scenario(responses={"AD-3/2": "success"})
+    path = tmp_path / "config.json"
+    path.write_text(json.dumps(_config(tmp_path, max_concurrency=1)))
+    completed = subprocess.run(
+        [sys.executable, PROBE, "launch", str(path), "--oci-command", f"{sys.executable} {FAKE_OCI}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    values = dict(line.split("=", 1) for line in shlex.split(completed.stdout))
+    assert values["PROBE_STATUS"] == "success"
+    assert values["PROBE_AD"] == "AD-3"
+    assert (values["OCPUS"], values["MEMORY"]) == ("2", "12")
+    assert values["PROBE_SUMMARY"].startswith("6件試行: 容量不足 5, 作成成功 1")
+    # a1_check_log と同じ形式のログで、朝のレポートの集計マーカーを含まない
+    log_lines = completed.stderr.splitlines()
+    assert all(line[:4].isdigit() and " - 起動試行" in line for line in log_lines)
+    assert not any("A1インスタンス作成" in line for line in log_lines)
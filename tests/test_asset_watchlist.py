@@ -0,0 +1,45 @@
+"""Tests for the batched multi-asset watchlist."""
+import numpy as np
+
+from asset_watchlist import AssetWatchlist
+
+
+def test_batches_cover_every_id_in_ceil_n_over_batch_calls():
+    watchlist = AssetWatchlist([f"coin-{i}" for i in range(250)] + ["coin-0"], 0.05)
+    batches = watchlist.batches(100)
+    assert len(watchlist) == 250
+    assert [len(b) for b in batches] == [100, 100, 50]
+    assert watchlist.expected_calls(100) == 3
+    assert sum(batches, []) == watchlist.ids
+
+
+def test_price_table_marks_missing_assets_as_nan():
+    watchlist = AssetWatchlist(["bitcoin", {"id": "Ethereum", "label": "ETH"}, "missing"], 0.05)
+    data = {
+        "bitcoin": {"usd": 90000.0, "usd_24h_change": 1.5, "last_updated_at": 100},
+        "ethereum": {"usd": 3000.0, "usd_24h_vol": 1e9},
+    }
+    table = watchlist.price_table(data, "usd")
+    assert watchlist.labels == ["Bitcoin", "ETH", "Missing"]
+    assert table["price"][:2].tolist() == [90000.0, 3000.0]
+    assert np.isnan(table["price"][2])
+    assert np.isnan(table["change_24h"][1]) and table["volume_24h"][1] == 1e9
+
+
+def test_evaluate_per_asset_thresholds_and_cooldowns():
+    watchlist = AssetWatchlist(
+        ["bitcoin", {"id": "ethereum", "threshold": 0.01, "cooldown_seconds": 600}, "solana"],
+        0.05,
+        3600,
+    )
+    now = 10_000
+    result = watchlist.evaluate(
+        current=[95000.0, 3100.0, 200.0],
+        previous=[90000.0, 3000.0, np.nan],
+        last_notif=[now - 100, now - 700, 0],
+        now_ts=now,
+    )
+    assert result["exceeded"].tolist() == [True, True, False]
+    assert result["suppressed"].tolist() == [True, False, False]
+    assert result["notify"].tolist() == [False, True, False]
+    assert result["last_notif"].tolist() == [now - 100, now, 0]
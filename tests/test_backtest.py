@@ -0,0 +1,71 @@
+"""The vectorized backtester must match a sample-by-sample replay of the live rules."""
+import numpy as np
+
+from common.backtest import backtest_transitions, backtest_volatility, parse_grid
+
+
+def _replay(times, values, threshold, cooldown):
+    """監視スクリプトと同じ順次判定（前回値との比較 + cooldown 抑制）"""
+    notified = []
+    last_notif = None
+    previous = None
+    for ts, value in zip(times, values):
+        if previous is not None and np.isfinite(previous) and previous != 0 and np.isfinite(value):
+            if abs((value - previous) / previous) >= threshold:
+                if last_notif is None or ts - last_notif >= cooldown:
+                    notified.append(ts)
+                    last_notif = ts
+        previous = value
+    return notified
+
+
+def _replay_transitions(values, level):
+    state = None
+    count = 0
+    for value in values:
+        if not np.isfinite(value):
+            continue
+        above = value >= level
+        if state is not None and above != state:
+            count += 1
+        state = above
+    return count
+
+
+def _history(n=5000, seed=0):
+    rng = np.random.default_rng(seed)
+    times = np.cumsum(rng.integers(30, 120, n)).astype(np.float64)
+    values = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+    values[rng.integers(0, n, 20)] = np.nan
+    values[rng.integers(0, n, 5)] = 0.0
+    return times, values
+
+
+def test_volatility_grid_matches_sequential_replay():
+    times, values = _history()
+    thresholds = np.array([0.0, 0.005, 0.01, 0.02, 0.035, 0.5])
+    cooldowns = np.array([0, 30, 60, 600, 3600, 86400, 10**9], dtype=np.float64)
+    result = backtest_volatility(times, values, thresholds, cooldowns)
+
+    for i, threshold in enumerate(thresholds):
+        for j, cooldown in enumerate(cooldowns):
+            expected = _replay(times, values, threshold, cooldown)
+            assert result["notifications"][i, j] == len(expected), (threshold, cooldown)
+            if expected:
+                assert result["first_ts"][i, j] == expected[0]
+                assert result["last_ts"][i, j] == expected[-1]
+            else:
+                assert np.isnan(result["last_ts"][i, j])
+
+
+def test_transitions_match_sequential_replay():
+    times, values = _history(seed=1)
+    levels = np.array([80.0, 100.0, 120.0, 1e6])
+    result = backtest_transitions(times, values, levels)
+    expected = [_replay_transitions(values, level) for level in levels]
+    assert result["notifications"].tolist() == expected
+    assert np.isnan(result["first_ts"][-1])
+
+
+def test_parse_grid_expands_ranges():
+    assert parse_grid(["0.01", "0:1:3"]).tolist() == [0.01, 0.0, 0.5, 1.0]
@@ -0,0 +1,83 @@
+"""Tests for the monitor benchmark suite (fixture server, synthetic data, baseline comparison)."""
+import json
+import os
+
+from benchmarks import bench_suite
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _report(**results):
+    return {"results": {name: dict(zip(("wall_seconds", "peak_memory_mb", "max_rss_mb"), v)) for name, v in results.items()}}
+
+
+def test_compare_flags_only_changes_beyond_tolerance_and_floor():
+    baseline = _report(fast=(0.001, 0.1, 40), slow=(1.0, 50, 100), big=(0.5, 100, 200), gone=(0.1, 1, 40))
+    current = _report(
+        fast=(0.004, 0.5, 40),  # 4倍だが差は最小差分未満
+        slow=(1.5, 50, 100),
+        big=(0.5, 40, 200),
+        added=(0.1, 1, 40),
+    )
+    rows = {row["name"]: row for row in bench_suite.compare(current, baseline, tolerance=0.25)}
+
+    assert rows["fast"]["status"] == "ok"
+    assert rows["slow"]["status"] == "regression"
+    assert rows["slow"]["regressions"] == ["wall_seconds"]
+    assert rows["slow"]["wall_ratio"] == 1.5
+    assert rows["big"]["status"] == "improved"
+    assert rows["added"]["status"] == "new"
+    assert rows["gone"]["status"] == "missing"
+    # メモリだけ別の許容率
+    rows = {row["name"]: row for row in bench_suite.compare(current, baseline, 0.25, memory_tolerance=0.1)}
+    assert rows["big"]["status"] == "improved"
+
+
+def test_fixture_server_serves_recorded_treasury_months():
+    status, _, body = bench_suite.upstream_route(
+        "GET", "/daily-treasury-rates.csv/2025/all", {"field_tdr_date_value_month": "202503"}, b""
+    )
+    lines = body.decode().splitlines()
+    assert status == 200
+    assert lines[0].startswith("Date")
+    assert lines[1:] and all(line.startswith("03/") for line in lines[1:])
+    # 記録がない年はヘッダのみ
+    _, _, body = bench_suite.upstream_route("GET", "/daily-treasury-rates.csv/1990/all", {"field_tdr_date_value": "1990"}, b"")
+    assert len(body.decode().splitlines()) == 1
+    assert bench_suite.upstream_route("GET", "/unknown", {}, b"")[0] == 404
+
+
+def test_small_suite_runs_every_pipeline_and_matches_itself(tmp_path):
+    options = {"repeat": 1, "log_lines": [500], "ticks": 2000, "assets": 10}
+    # 描画（300dpi）は重いので除外
+    only = ["rate_exchange.*", "bitcoin.*", "us_bonds.*", "check_a1.*", "bitcoin_chart.load_*", "bitcoin_chart.generate_*"]
+    report = bench_suite.run(options, only=only)
+
+    assert set(report["results"]) == {
+        "rate_exchange.check_usdjpy",
+        "rate_exchange.get_yesterday_rate_summary[samples=500]",
+        "bitcoin.check_price_alerts[assets=10]",
+        "us_bonds.check_us_bonds",
+        "us_bonds.get_yesterday_summary[lines=500,index=cold]",
+        "us_bonds.get_yesterday_summary[lines=500,index=warm]",
+        "check_a1.get_yesterday_log_summary[lines=500,index=cold]",
+        "check_a1.get_yesterday_log_summary[lines=500,index=warm]",
+        "bitcoin_chart.load_historical_data[ticks=2000]",
+        "bitcoin_chart.generate_summary[ticks=2000]",
+    }
+    for result in report["results"].values():
+        assert result["wall_seconds"] > 0
+        assert result["peak_memory_mb"] >= 0
+        assert result["max_rss_mb"] > 0
+    assert report["options"]["log_days"] == bench_suite.DEFAULT_OPTIONS["log_days"]
+
+    path = tmp_path / "baseline.json"
+    path.write_text(json.dumps(report))
+    rows = bench_suite.compare(report, json.loads(path.read_text()))
+    assert {row["status"] for row in rows} == {"ok"}
+
+
+def test_stored_baseline_covers_the_default_cases():
+    with open(os.path.join(REPO, "benchmarks", "baseline.json")) as f:
+        baseline = json.load(f)
+    assert set(baseline["results"]) == set(bench_suite.build_cases(baseline["options"]))
@@ -0,0 +1,35 @@
+"""The vectorized candlestick renderer must match the per-candle artist output."""
+import matplotlib
+
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+import numpy as np
+
+from benchmarks.bench_candlestick import draw_legacy, draw_vectorized, synthetic_ohlcv
+from candlestick_renderer import candle_geometry
+
+
+def _pixels(draw, data):
+    fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(6, 4), gridspec_kw={"height_ratios": [3, 1]})
+    draw(ax1, ax2, *data)
+    fig.canvas.draw()
+    image = np.asarray(fig.canvas.buffer_rgba(), dtype=np.int16)
+    plt.close(fig)
+    return image
+
+
+def test_geometry_and_colour_masks():
+    body, wicks, up = candle_geometry([0, 1], [10, 12], [13, 12.5], [9, 8], [12, 9])
+    assert up.tolist() == [True, False]
+    assert body[1, :, 1].min() == 9 and body[1, :, 1].max() == 12
+    assert body[0, :, 0].min() == -0.3 and body[0, :, 0].max() == 0.3
+    assert wicks[1].tolist() == [[1, 8], [1, 12.5]]
+
+
+def test_output_matches_legacy_renderer():
+    data = synthetic_ohlcv(60, seed=3)
+    legacy = _pixels(draw_legacy, data)
+    vectorized = _pixels(draw_vectorized, data)
+    assert legacy.shape == vectorized.shape
+    differing = np.any(np.abs(legacy - vectorized) > 16, axis=-1)
+    assert differing.mean() < 0.002
@@ -0,0 +1,57 @@
+"""Tests for the content-addressed chart render cache."""
+import os
+
+import numpy as np
+import pandas as pd
+
+from chart_cache import ChartCache
+
+OPTIONS = {"width": 12, "height": 8, "style": "default", "show_volume": True, "save_path": "a.png"}
+
+
+def _frame(n=48, shift=0.0):
+    index = pd.date_range("2025-01-01", periods=n, freq="1h")
+    prices = 90000 + np.arange(n) * 10.0 + shift
+    return pd.DataFrame({"price": prices, "volume": np.full(n, 1e9)}, index=index)
+
+
+def test_fingerprint_tracks_inputs_that_affect_the_image(tmp_path):
+    cache = ChartCache(str(tmp_path))
+    base = cache.fingerprint(_frame(), "line", OPTIONS)
+
+    assert cache.fingerprint(_frame(), "line", dict(OPTIONS, save_path="b.png")) == base
+    assert cache.fingerprint(_frame(), "line", dict(OPTIONS, cache={"max_bytes": 1})) == base
+    assert cache.fingerprint(_frame(shift=0.5), "line", OPTIONS) != base
+    assert cache.fingerprint(_frame(n=47), "line", OPTIONS) != base
+    assert cache.fingerprint(_frame(), "candlestick", OPTIONS) != base
+    assert cache.fingerprint(_frame(), "line", dict(OPTIONS, show_volume=False)) != base
+
+
+def test_restore_skips_render_and_copies_artifact(tmp_path):
+    cache = ChartCache(str(tmp_path / "cache"))
+    target = tmp_path / "chart.png"
+    key = cache.fingerprint(_frame(), "line", OPTIONS)
+
+    assert not cache.restore(key, str(target))
+    target.write_bytes(b"png-1")
+    cache.store(key, str(target))
+
+    target.unlink()
+    assert cache.restore(key, str(target))
+    assert target.read_bytes() == b"png-1"
+    assert cache.stats == {"rendered": 1, "skipped": 1}
+
+
+def test_eviction_keeps_most_recently_used(tmp_path):
+    cache = ChartCache(str(tmp_path / "cache"), max_bytes=250)
+    artifact = tmp_path / "chart.png"
+    artifact.write_bytes(b"x" * 100)
+    for i, key in enumerate(["a", "b", "c"]):
+        cache.store(key, str(artifact))
+        os.utime(cache._path(key), (1000 + i, 1000 + i))
+        # a を使うと最終利用が更新され、次の追加では b が削除される
+        if key == "b":
+            cache.restore("a", str(tmp_path / "out.png"))
+
+    names = sorted(os.listdir(tmp_path / "cache"))
+    assert names == ["a.png", "c.png"]
@@ -0,0 +1,107 @@
+"""Chart render jobs: job expansion, worker bounds and a pooled render from the memmapped stores."""
+import json
+import os
+import subprocess
+import sys
+
+import numpy as np
+
+from benchmarks.bench_startup import build_tree
+from chart_jobs import build_jobs, resolve_workers
+from history_store import HistoryStore
+
+CHART_CONFIG = {
+    "width": 8,
+    "height": 5,
+    "style": "default",
+    "save_path": "/charts/btc.png",
+    "show_volume": True,
+    "chart_type": "candlestick",
+}
+
+PROBE = """
+import json, os, sys
+import chart_jobs
+# コア数によらずプールを通す
+executor = chart_jobs.start_executor(2)
+summary = chart_jobs.run(timeframes=sys.argv[1:], executor=executor)
+executor.shutdown()
+print(json.dumps({"parent": os.getpid(), "jobs": summary["render_jobs"],
+                  "timeframe": summary["timeframe"], "stats": summary["render_stats"]}))
+"""
+
+
+def test_build_jobs_expands_timeframes_with_distinct_paths():
+    # 既定は chart_type / timeframe の1枚（従来の保存先）
+    assert build_jobs(CHART_CONFIG) == [
+        {
+            "name": "candlestick_1h",
+            "chart_type": "candlestick",
+            "timeframe": "1h",
+            "save_path": "/charts/btc_candlestick.png",
+        }
+    ]
+
+    config = dict(CHART_CONFIG, jobs=[{"chart_type": "line"}, {"chart_type": "candlestick"}])
+    jobs = build_jobs(config, ["1h", "4h", "1d", "4h"])
+    assert [job["name"] for job in jobs] == ["line", "candlestick_1h", "candlestick_4h", "candlestick_1d"]
+    assert [job["save_path"] for job in jobs] == [
+        "/charts/btc.png",
+        "/charts/btc_candlestick.png",
+        "/charts/btc_candlestick_4h.png",
+        "/charts/btc_candlestick_1d.png",
+    ]
+
+
+def test_resolve_workers_is_bounded_by_cores_and_jobs(monkeypatch):
+    monkeypatch.setattr(os, "cpu_count", lambda: 4)
+    assert resolve_workers(None, 10) == 4
+    assert resolve_workers(8, 10) == 4
+    assert resolve_workers(2, 10) == 2
+    assert resolve_workers(None, 3) == 3
+    assert resolve_workers(None, 0) == 1
+    monkeypatch.setattr(os, "cpu_count", lambda: None)
+    assert resolve_workers(None, 5) == 1
+
+
+def test_pool_renders_each_job_from_the_stores(tmp_path):
+    workdir = build_tree(str(tmp_path))
+    history = HistoryStore(str(tmp_path / "history"))
+    rng = np.random.default_rng(0)
+    timestamps = 1_735_689_600_000 + np.arange(2000, dtype=np.int64) * 300_000
+    history.append(timestamps, 90000 + np.cumsum(rng.normal(0, 50, 2000)), rng.uniform(1e6, 5e6, 2000))
+    config = {
+        "logging": {"bitcoin_log": str(tmp_path / "bitcoin.log")},
+        "bitcoin": {
+            "trading": {"symbol": "bitcoin", "vs_currency": "usd", "chart_days": 3},
+            "chart": dict(
+                CHART_CONFIG,
+                save_path=str(tmp_path / "btc.png"),
+                cache={"directory": str(tmp_path / "cache")},
+            ),
+            "history_dir": str(tmp_path / "history"),
+            "rollup_dir": str(tmp_path / "rollup"),
+        },
+    }
+    with open(tmp_path / "config.json", "w") as f:
+        json.dump(config, f)
+
+    output = subprocess.run(
+        [sys.executable, "-c", PROBE, "4h", "1h", "1d"],
+        cwd=workdir,
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+
+    assert result["timeframe"] == "4h"
+    assert result["stats"] == {"rendered": 3, "skipped": 0}
+    assert [job["name"] for job in result["jobs"]] == ["candlestick_4h", "candlestick_1h", "candlestick_1d"]
+    for job in result["jobs"]:
+        # 描画はワーカープロセスで行われる
+        assert job["pid"] != result["parent"]
+        assert job["seconds"] > 0
+        assert os.path.getsize(job["save_path"]) > 0
+    assert (tmp_path / "btc_candlestick_4h.png").exists()
+    assert (tmp_path / "rollup" / "state.json").exists()
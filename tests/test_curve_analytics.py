@@ -0,0 +1,119 @@
+"""Tests for yield-curve analytics (spreads, inversion events, spline interpolation, per-date cache)."""
+import time
+from datetime import date, timedelta
+
+import numpy as np
+
+from benchmarks.bench_curve_analytics import loop_interpolate, loop_second_derivatives, synthetic_history
+from curve_analytics import (
+    METRICS,
+    CurveAnalytics,
+    curve_metrics,
+    interpolate,
+    inversion_events,
+    second_derivatives,
+)
+from curve_store import LABELS, YEARS, CurveStore
+
+
+def _curve(rates):
+    """{"2-Year": 4.0, ...} から1日分のカーブ（指定のない年限は NaN）"""
+    curve = np.full(len(LABELS), np.nan)
+    for name, rate in rates.items():
+        curve[LABELS.index(f"{name} Treasury")] = rate
+    return curve
+
+
+def test_spreads_and_shape_metrics():
+    rates = np.vstack([_curve({"3-Month": 5.0, "2-Year": 4.5, "10-Year": 4.2}), _curve({"2-Year": 4.0})])
+    metrics = dict(zip(METRICS, curve_metrics(rates).T))
+    np.testing.assert_allclose(metrics["spread_2s10s"][0], -0.3)
+    np.testing.assert_allclose(metrics["spread_3m10y"][0], -0.8)
+    np.testing.assert_allclose(metrics["level"][0], 13.7 / 3)
+    np.testing.assert_allclose(metrics["slope"][0], -0.8)
+    np.testing.assert_allclose(metrics["curvature"][0], 9.0 - 9.2)
+    assert np.isnan(curve_metrics(rates)[1]).all()
+
+
+def test_spline_matches_per_date_reference_with_changing_knots():
+    days, rates = synthetic_history(1999, 2003)
+    tenors = np.array([0.05, 0.1, 0.7, 1.5, 4, 8.5, 15, 25, 30])
+    m2 = second_derivatives(rates)
+    np.testing.assert_allclose(m2, loop_second_derivatives(rates), atol=1e-9)
+    expected = loop_interpolate(rates, m2, tenors)
+    np.testing.assert_allclose(interpolate(rates, m2, tenors), expected, atol=1e-12)
+    # 1ヶ月物のない日は 0.1 年が範囲外、ある日は範囲内
+    one_month = np.isfinite(rates[:, LABELS.index("1-Month Treasury")])
+    assert np.isnan(interpolate(rates, m2, [0.1])[~one_month]).all()
+    assert np.isfinite(interpolate(rates, m2, [0.1])[one_month]).all()
+
+
+def test_spline_reproduces_knots_and_straight_lines():
+    line = 3 + 0.05 * YEARS
+    rates = np.vstack([line, np.where(np.arange(len(YEARS)) % 3 == 0, np.nan, line)])
+    m2 = second_derivatives(rates)
+    np.testing.assert_allclose(m2[np.isfinite(m2)], 0, atol=1e-12)
+    tenors = np.array([0.25, 2.5, 12.0, 29.0])
+    np.testing.assert_allclose(interpolate(rates, m2, tenors), np.tile(3 + 0.05 * tenors, (2, 1)))
+    np.testing.assert_allclose(interpolate(rates[:1], m2[:1], YEARS)[0], line)
+
+
+def test_inversion_events_start_end_and_ongoing():
+    days = np.arange(np.datetime64("2024-01-01"), np.datetime64("2024-01-11"))
+    spread = np.array([0.2, -0.1, -0.3, np.nan, -0.2, 0.1, 0.0, -0.05, np.nan, -0.1])
+    events = inversion_events(days, spread)
+    assert events == [
+        {"start": date(2024, 1, 2), "end": date(2024, 1, 6), "days": 3, "min": -0.3},
+        {"start": date(2024, 1, 8), "end": None, "days": 2, "min": -0.1},
+    ]
+    assert inversion_events(days, np.abs(spread)) == []
+    assert inversion_events(days, np.full(10, np.nan)) == []
+
+
+def test_cache_computes_only_new_dates_and_rebuilds(tmp_path):
+    days, rates = synthetic_history(2020, 2021)
+    store = CurveStore(str(tmp_path))
+    store.append(days[:-1], rates[:-1])
+    analytics = CurveAnalytics(store)
+    assert analytics.update() == len(days) - 1
+    assert analytics.update() == 0
+
+    store.append(days[-1:], rates[-1:])
+    assert analytics.update() == 1
+    latest = analytics.latest()
+    assert latest["date"] == days[-1]
+    np.testing.assert_allclose(
+        [latest[name] for name in METRICS], curve_metrics(rates[-1:])[0], equal_nan=True
+    )
+    tenors = [0.75, 6.0]
+    cached = analytics.interpolate(tenors, start=days[-30])
+    np.testing.assert_allclose(
+        cached["rates"], interpolate(rates[-30:], second_derivatives(rates[-30:]), tenors)
+    )
+    assert analytics.inversions("2s10s") == inversion_events(
+        np.array(days, dtype="datetime64[D]"), curve_metrics(rates)[:, 0]
+    )
+
+    # 利回りのストアを作り直したらキャッシュも作り直す
+    store.clear()
+    store.append(days[:10], rates[:10])
+    assert analytics.update() == 10
+    assert analytics.latest()["date"] == days[9]
+
+
+def test_decades_of_curves_in_well_under_a_second():
+    days, rates = synthetic_history(1990, 2025)
+    assert len(days) > 9000
+    started = time.perf_counter()
+    metrics = curve_metrics(rates)
+    m2 = second_derivatives(rates)
+    interpolate(rates, m2, np.linspace(0.25, 30, 50))
+    inversion_events(np.array(days, dtype="datetime64[D]"), metrics[:, 0])
+    assert time.perf_counter() - started < 1.0
+
+
+def test_date_helpers_accept_date_lists():
+    days = [date(2024, 1, 1) + timedelta(days=i) for i in range(3)]
+    assert inversion_events(days, [-1.0, -1.0, 1.0]) == [
+        {"start": date(2024, 1, 1), "end": date(2024, 1, 3), "days": 2, "min": -1.0}
+    ]
@@ -0,0 +1,65 @@
+"""Tests for the resident monitor scheduler."""
+import asyncio
+import threading
+import time
+from datetime import datetime
+
+from common.daemon import Job, Scheduler, build_jobs
+
+
+class _FakeLoader:
+    pass
+
+
+def test_build_jobs_merges_overrides_and_skips_disabled():
+    config = {
+        "daemon": {
+            "jobs": {
+                "bitcoin": {"enabled": False},
+                "us_bonds": {"interval_seconds": 60},
+                "us_bonds_morning_report": {"enabled": True, "at": "09:30"},
+            }
+        }
+    }
+    jobs = {job.name: job for job in build_jobs(config, _FakeLoader())}
+    assert "bitcoin" not in jobs
+    assert "rate_exchange_morning_report" not in jobs
+    assert jobs["us_bonds"].interval == 60
+    assert jobs["us_bonds_morning_report"].at == "09:30"
+
+
+def test_next_delay_aligns_to_interval_and_daily_time():
+    job = Job("j", {"interval_seconds": 900}, None)
+    now = datetime(2025, 1, 1, 10, 10, 0)
+    assert job.next_delay(now) == 300
+    daily = Job("d", {"at": "10:00"}, None)
+    assert daily.next_delay(now) == 24 * 3600 - 600
+
+
+def test_overlapping_runs_are_skipped():
+    calls = []
+    release = threading.Event()
+
+    job = Job("slow", {"interval_seconds": 0.05}, None)
+    job.next_delay = lambda now=None: 0.05
+
+    def slow_run():
+        calls.append(time.monotonic())
+        release.wait(1)
+
+    job.run = slow_run
+    scheduler = Scheduler([job])
+
+    async def scenario():
+        scheduler.stopping = asyncio.Event()
+        loop_task = asyncio.ensure_future(scheduler._job_loop(job))
+        await asyncio.sleep(0.3)
+        release.set()
+        scheduler.stopping.set()
+        await loop_task
+        await job.running
+
+    asyncio.run(scenario())
+    scheduler.executor.shutdown(wait=True)
+    assert len(calls) == 1
+    assert job.skipped >= 2
@@ -0,0 +1,82 @@
+"""Downsampling must keep extremes, match reference LTTB, conserve volume and render near-identically."""
+import numpy as np
+
+from benchmarks.bench_downsample import draw_downsampled, draw_full, pixel_diff, render, synthetic_series
+from downsample import bucket_sum, downsample, lttb_indices, minmax_indices
+
+
+def _lttb_reference(x, y, n_out):
+    """1点ずつ計算する素朴な LTTB"""
+    n = len(y)
+    every = (n - 2) / (n_out - 2)
+    bounds = [int(1 + i * every) for i in range(n_out - 2)] + [n - 1, n]
+    selected = [0]
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = bounds[i], bounds[i + 1]
+        nlo, nhi = bounds[i + 1], bounds[i + 2]
+        avg_x = sum(x[nlo:nhi]) / (nhi - nlo)
+        avg_y = sum(y[nlo:nhi]) / (nhi - nlo)
+        best, best_area = lo, -1.0
+        for j in range(lo, hi):
+            area = abs((x[a] - avg_x) * (y[j] - y[a]) - (x[a] - x[j]) * (avg_y - y[a]))
+            if area > best_area:
+                best, best_area = j, area
+        selected.append(best)
+        a = best
+    selected.append(n - 1)
+    return selected
+
+
+def test_lttb_matches_reference():
+    rng = np.random.default_rng(0)
+    x = np.cumsum(rng.uniform(0.5, 1.5, 997))
+    y = np.cumsum(rng.normal(0, 1, 997))
+    indices = lttb_indices(x, y, 101)
+    assert len(indices) == 101
+    assert indices.tolist() == _lttb_reference(x.tolist(), y.tolist(), 101)
+
+
+def test_minmax_keeps_extremes_of_every_bucket():
+    rng = np.random.default_rng(1)
+    x = np.sort(rng.uniform(0, 100, 20000))
+    y = rng.normal(0, 1, 20000)
+    indices = minmax_indices(x, y, 50)
+    assert np.all(np.diff(indices) > 0)
+    assert {0, len(y) - 1} <= set(indices.tolist())
+    buckets = np.minimum(((x - x[0]) / (x[-1] - x[0]) * 50).astype(int), 49)
+    kept = set(indices.tolist())
+    for bucket in range(50):
+        members = np.flatnonzero(buckets == bucket)
+        assert members[np.argmin(y[members])] in kept
+        assert members[np.argmax(y[members])] in kept
+    assert len(indices) <= 2 * 50 + 2
+
+
+def test_downsample_skips_nan_and_short_series():
+    y = np.concatenate([np.full(24, np.nan), np.arange(100.0)])
+    x = np.arange(len(y), dtype=float)
+    assert downsample(x, y, 1000).tolist() == list(range(24, 124))
+    assert not np.isnan(y[downsample(x, y, 10, "lttb")]).any()
+    assert len(downsample(x, y, 10, "none")) == 100
+
+
+def test_bucket_sum_conserves_volume():
+    rng = np.random.default_rng(2)
+    x = np.sort(rng.uniform(0, 10, 5000))
+    volume = rng.uniform(1, 2, 5000)
+    centers, sums, width = bucket_sum(x, volume, 40)
+    assert np.isclose(sums.sum(), volume.sum())
+    assert width == (x[-1] - x[0]) / 40
+    assert np.all(np.abs(centers[:, None] - x[None, :]).min(axis=0) <= width / 2 + 1e-9)
+
+
+def test_downsampled_line_is_nearly_identical():
+    data = synthetic_series(20000, seed=3)
+    _, full = render(draw_full, data, 100, figsize=(6, 3), volume=False)
+    # minmax は各画素列の極値を残すので LTTB より差が小さい
+    for method, limit in (("minmax", 0.01), ("lttb", 0.02)):
+        _, reduced = render(draw_downsampled, data, 100, figsize=(6, 3), method=method, volume=False)
+        assert full.shape == reduced.shape
+        assert pixel_diff(full, reduced, tolerance=64) < limit, method
+
@@ -0,0 +1,33 @@
+"""Tests for the vectorized FX watchlist evaluation."""
+import numpy as np
+
+from fx_watchlist import Watchlist
+
+
+def test_derive_cross_rates_from_usd_base():
+    watchlist = Watchlist(["USD/JPY", "EUR/JPY", "GBP/USD", "XXX/JPY"], 0.05)
+    rates = {"JPY": 150.0, "EUR": 0.9, "GBP": 0.8}
+    derived = watchlist.derive_rates(rates, "USD")
+    assert derived[0] == 150.0
+    assert np.isclose(derived[1], 150.0 / 0.9)
+    assert np.isclose(derived[2], 1 / 0.8)
+    assert np.isnan(derived[3])
+
+
+def test_evaluate_thresholds_and_cooldowns():
+    watchlist = Watchlist(
+        ["USD/JPY", {"pair": "EUR/JPY", "threshold": 0.01, "cooldown_seconds": 600}, "GBP/JPY"],
+        0.05,
+        3600,
+    )
+    now = 10_000
+    result = watchlist.evaluate(
+        current=[160.0, 163.0, 190.0],
+        previous=[150.0, 160.0, np.nan],
+        last_notif=[now - 100, now - 700, 0],
+        now_ts=now,
+    )
+    assert result["exceeded"].tolist() == [True, True, False]
+    assert result["suppressed"].tolist() == [True, False, False]
+    assert result["notify"].tolist() == [False, True, False]
+    assert result["last_notif"].tolist() == [now - 100, now, 0]
@@ -0,0 +1,131 @@
+"""Tests for incremental CoinGecko history ingestion against a replay server."""
+import json
+import os
+
+import requests
+
+from history_ingest import HOUR_MS, HistoryIngestor
+from tests.stub_server import StubServer
+
+FIXTURE = os.path.join(
+    os.path.dirname(__file__), "fixtures", "coingecko_market_chart_range_bitcoin_usd.json"
+)
+
+
+def _replay(recorded):
+    """Slice the recorded market_chart/range response to the requested window."""
+
+    def route(method, path, query, body):
+        assert path == "/coins/bitcoin/market_chart/range"
+        start, end = int(query["from"]) * 1000, int(query["to"]) * 1000
+        return 200, {}, {
+            key: [p for p in series if start <= p[0] <= end]
+            for key, series in recorded.items()
+        }
+
+    return route
+
+
+def _ingestor(server, tmp_path):
+    return HistoryIngestor(
+        requests.Session(), server.url, "bitcoin", "usd", str(tmp_path / "history")
+    )
+
+
+def test_first_run_fetches_window_then_only_the_gap(tmp_path):
+    with open(FIXTURE) as f:
+        recorded = json.load(f)
+    first_ts = recorded["prices"][0][0]
+
+    with StubServer(_replay(recorded)) as server:
+        ingestor = _ingestor(server, tmp_path)
+        now = first_ts + 7 * 24 * HOUR_MS
+        points = ingestor.refresh(days=7, now_ms=now)
+        assert len(server.requests) == 1
+        assert points["timestamp"][0] >= first_ts
+        assert points["volume"][-1] > 0
+
+        # 1時間後: 末尾の差分だけを小さなレンジで取得
+        points = ingestor.refresh(days=7, now_ms=now + HOUR_MS)
+        assert len(server.requests) == 2
+        query = server.requests[-1][2]
+        assert int(query["to"]) - int(query["from"]) <= 2 * 3600
+        timestamps = points["timestamp"].tolist()
+        assert timestamps == sorted(set(timestamps))
+        assert timestamps[-1] > now
+
+
+def test_holes_are_filled_and_overlaps_deduplicated(tmp_path):
+    with open(FIXTURE) as f:
+        recorded = json.load(f)
+    now = recorded["prices"][-1][0]
+
+    with StubServer(_replay(recorded)) as server:
+        ingestor = _ingestor(server, tmp_path)
+        full = {k: v.copy() for k, v in ingestor.refresh(days=7, now_ms=now).items()}
+        ingestor.store.replace(
+            *(list(full[k][:50]) + list(full[k][60:]) for k in ("timestamp", "price", "volume"))
+        )
+        # 取得記録のない欠損（旧履歴の移行分など）として扱う
+        os.remove(ingestor.state_path)
+
+        refilled = ingestor.refresh(days=7, now_ms=now)
+        assert refilled["timestamp"].tolist() == full["timestamp"].tolist()
+        assert refilled["price"].tolist() == full["price"].tolist()
+        hole_query = server.requests[1][2]
+        assert int(hole_query["from"]) * 1000 == full["timestamp"][49] // 1000 * 1000
+
+
+def test_hole_the_api_cannot_fill_is_not_refetched(tmp_path):
+    with open(FIXTURE) as f:
+        recorded = json.load(f)
+    first_ts = recorded["prices"][0][0]
+    outage = (first_ts + 49 * HOUR_MS, first_ts + 61 * HOUR_MS)
+    recorded = {
+        key: [p for p in series if not outage[0] < p[0] < outage[1]]
+        for key, series in recorded.items()
+    }
+
+    with StubServer(_replay(recorded)) as server:
+        ingestor = _ingestor(server, tmp_path)
+        now = first_ts + 7 * 24 * HOUR_MS
+        points = ingestor.refresh(days=7, now_ms=now)
+        assert len(server.requests) == 1
+        assert ingestor.find_holes(points["timestamp"])
+
+        # 欠損は取得済みの範囲内なので、以降の実行は末尾の差分1回だけ
+        for run in range(1, 4):
+            ingestor.refresh(days=7, now_ms=now + run * 15 * 60 * 1000)
+            assert len(server.requests) == 1 + run
+            query = server.requests[-1][2]
+            assert int(query["from"]) * 1000 > outage[1]
+
+
+def test_legacy_json_history_is_migrated_once(tmp_path):
+    with open(FIXTURE) as f:
+        recorded = json.load(f)
+    now = recorded["prices"][-1][0]
+    legacy = [
+        {"timestamp": ts, "price": price, "volume": 1.0, "datetime": "x"}
+        for ts, price in recorded["prices"]
+    ]
+    legacy_path = tmp_path / "bitcoin_historical_data.json"
+    legacy_path.write_text(json.dumps(legacy, indent=2))
+
+    with StubServer(_replay(recorded)) as server:
+        ingestor = HistoryIngestor(
+            requests.Session(),
+            server.url,
+            "bitcoin",
+            "usd",
+            str(tmp_path / "history"),
+            legacy_path=str(legacy_path),
+        )
+        points = ingestor.refresh(days=7, now_ms=now)
+        # 旧ファイルの末尾以降だけを取得する
+        assert len(server.requests) == 1
+        assert len(ingestor.store) == len(legacy)
+        window_start = now - 7 * 24 * HOUR_MS
+        assert points["timestamp"].tolist() == [
+            p["timestamp"] for p in legacy if p["timestamp"] >= window_start
+        ]
@@ -0,0 +1,58 @@
+"""Tests for the columnar, memory-mapped bitcoin history store."""
+import json
+
+import numpy as np
+
+from history_store import HistoryStore, import_json
+
+
+def test_append_window_and_crash_tail(tmp_path):
+    store = HistoryStore(str(tmp_path / "history"))
+    ts = np.arange(0, 100_000, 1000, dtype=np.int64)
+    assert store.append(ts[:60], ts[:60] * 0.5, np.ones(60)) == 60
+    # 既存の最終時刻以前は無視される
+    assert store.append(ts[50:], ts[50:] * 0.5, np.ones(50)) == 40
+    assert len(store) == 100
+
+    window = store.window(10_500, 20_000)
+    assert window["timestamp"].tolist() == list(range(11_000, 21_000, 1000))
+    assert isinstance(window["price"], np.memmap)
+    assert window["price"].tolist() == [t * 0.5 for t in range(11_000, 21_000, 1000)]
+
+    # 件数確定前に落ちた書き込み（端数バイト）は読まれず、次の追記で切り捨てられる
+    with open(store._column_path("price", 0), "ab") as f:
+        f.write(b"\x00" * 5)
+    assert len(store.columns()["price"]) == 100
+    store.append([200_000], [1.0], [2.0])
+    assert store.columns()["price"][-2:].tolist() == [49_500.0, 1.0]
+
+
+def test_merge_overwrites_last_point_and_inserts_holes(tmp_path):
+    store = HistoryStore(str(tmp_path / "history"))
+    store.merge([0, 1000, 4000], [1.0, 2.0, 5.0], [0.0, 0.0, 0.0])
+    store.merge([4000, 5000], [5.5, 6.0], [1.0, 1.0])
+    assert store.meta()["generation"] == 0
+    store.merge([2000, 3000, 1000], [3.0, 4.0, 2.5], [1.0, 1.0, 1.0])
+    columns = store.columns()
+    assert columns["timestamp"].tolist() == [0, 1000, 2000, 3000, 4000, 5000]
+    assert columns["price"].tolist() == [1.0, 2.5, 3.0, 4.0, 5.5, 6.0]
+    assert sorted(p.name for p in (tmp_path / "history").glob("*.bin")) == [
+        "price.1.bin",
+        "timestamp.1.bin",
+        "volume.1.bin",
+    ]
+
+
+def test_import_json_converts_legacy_history(tmp_path):
+    points = [
+        {"timestamp": 3000, "price": 3.0, "volume": 30.0, "datetime": "1970-01-01T00:00:03"},
+        {"timestamp": 1000, "price": 1.0, "volume": 10.0, "datetime": "1970-01-01T00:00:01"},
+        {"timestamp": 2000, "price": 2.0},
+    ]
+    path = tmp_path / "history.json"
+    path.write_text(json.dumps(points, indent=2))
+    store = HistoryStore(str(tmp_path / "history"))
+    assert import_json(store, str(path)) == 3
+    columns = store.columns()
+    assert columns["timestamp"].tolist() == [1000, 2000, 3000]
+    assert columns["volume"].tolist() == [10.0, 0.0, 30.0]
@@ -0,0 +1,70 @@
+"""Tests for the shared on-disk HTTP response cache."""
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from common.http_cache import HttpCache
+
+
+class _Handler(BaseHTTPRequestHandler):
+    requests_seen = []
+
+    def do_GET(self):
+        self.requests_seen.append((self.path, self.headers.get("If-None-Match")))
+        if self.headers.get("If-None-Match") == '"v1"':
+            self.send_response(304)
+            self.end_headers()
+            return
+        body = json.dumps({"path": self.path, "pad": "x" * 200}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("ETag", '"v1"')
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    _Handler.requests_seen = []
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_port}"
+    httpd.shutdown()
+
+
+def test_hit_within_ttl_is_shared_across_instances(server, tmp_path):
+    first = HttpCache(requests.Session(), directory=str(tmp_path), default_ttl=60)
+    second = HttpCache(requests.Session(), directory=str(tmp_path), default_ttl=60)
+    assert first.get(f"{server}/rates", params={"b": 1, "a": 2}).json()["path"] == "/rates?b=1&a=2"
+    assert second.get(f"{server}/rates", params={"a": 2, "b": 1}).json()["path"] == "/rates?b=1&a=2"
+    assert len(_Handler.requests_seen) == 1
+    assert second.stats["hits"] == 1
+    assert first.get_stats()["total"]["misses"] == 1
+
+
+def test_expired_entry_is_revalidated_with_etag(server, tmp_path):
+    cache = HttpCache(requests.Session(), directory=str(tmp_path), ttl_rules={server: 0})
+    cache.get(f"{server}/price")
+    response = cache.get(f"{server}/price")
+    assert response.json()["path"] == "/price"
+    assert _Handler.requests_seen[-1] == ("/price", '"v1"')
+    assert cache.stats == {"hits": 0, "misses": 1, "revalidated": 1, "evictions": 0}
+
+
+def test_lru_eviction_bounds_size(server, tmp_path):
+    cache = HttpCache(requests.Session(), directory=str(tmp_path), max_bytes=700)
+    for name in ("a", "b", "c", "d"):
+        cache.get(f"{server}/{name}")
+    entries = [p for p in tmp_path.iterdir() if p.suffix == ".entry"]
+    assert sum(p.stat().st_size for p in entries) <= 700
+    assert cache.stats["evictions"] >= 1
+    cache.get(f"{server}/d")
+    assert cache.stats["hits"] == 1
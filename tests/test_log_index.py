@@ -0,0 +1,170 @@
+"""Tests for the per-day log index (incremental updates, rotated/gzip segments, day lookups)."""
+import gzip
+import os
+import subprocess
+import sys
+from datetime import date, timedelta
+
+import pytest
+
+from common import log_index
+from common.log_index import LogIndex
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MARKERS = {"checks": "A1インスタンス空き確認開始", "success": "A1インスタンス作成成功", "fail": "A1インスタンス作成失敗"}
+
+
+def _log_lines(first_day, days, per_day=24):
+    lines = []
+    for offset in range(days):
+        day = first_day + timedelta(days=offset)
+        for hour in range(per_day):
+            stamp = f"{day} {hour % 24:02d}:{offset % 60:02d}:00"
+            lines.append(f"{stamp} - A1インスタンス空き確認開始\n")
+            if hour % 5 == 0:
+                # 複数行のメッセージ（2行目以降は日付なし）
+                lines.append(f"{stamp} - Pushover通知送信: 結果\nA1インスタンス作成失敗 (code {hour})\n")
+            elif hour % 11 == 0:
+                lines.append(f"{stamp} - A1インスタンス作成成功\n")
+    return lines
+
+
+def _naive_counts(text):
+    """grep -c と同じく1行ずつ見て、マーカーを含む日付つきの行を数える参照実装"""
+    counts = {}
+    for line in text.splitlines():
+        if log_index.DAY_LINE.match(line.encode()):
+            totals = counts.setdefault(line[:10], dict.fromkeys(MARKERS, 0))
+            for name, marker in MARKERS.items():
+                totals[name] += marker in line
+    return counts
+
+
+def _write(path, lines, mode="w"):
+    with open(path, mode, encoding="utf-8") as f:
+        f.write("".join(lines))
+
+
+@pytest.mark.parametrize("chunk_size", [64, 1000, 256 * 1024])
+def test_counts_match_line_by_line_reference(tmp_path, monkeypatch, chunk_size):
+    monkeypatch.setattr(log_index, "CHUNK_SIZE", chunk_size)
+    path = str(tmp_path / "a1.log")
+    lines = ["起動時のメッセージ（日付なし）\n"] + _log_lines(date(2025, 1, 30), 5)
+    _write(path, lines)
+    index = LogIndex(path, MARKERS)
+    assert index.update() == os.path.getsize(path)
+
+    expected = _naive_counts("".join(lines))
+    assert index.days() == sorted(expected)
+    for day, counts in expected.items():
+        assert index.counts(day) == counts
+    assert index.counts(date(2025, 2, 1)) == expected["2025-02-01"]
+    assert index.counts("2024-12-31") == dict.fromkeys(MARKERS, 0)
+    day_lines = list(index.lines("2025-02-02"))
+    assert day_lines[0].startswith("2025-02-02 00:")
+    assert day_lines[2] == "A1インスタンス作成失敗 (code 0)"
+    assert all(line.startswith("2025-02-02") or not line[:1].isdigit() for line in day_lines)
+
+
+def test_only_appended_bytes_are_read(tmp_path):
+    path = str(tmp_path / "a1.log")
+    _write(path, _log_lines(date(2025, 1, 1), 365))
+    assert LogIndex(path, MARKERS).update() == os.path.getsize(path)
+
+    index = LogIndex(path, MARKERS)
+    assert index.update() == 0
+    before = index.counts("2025-12-31")
+
+    appended = "2025-12-31 23:59:00 - A1インスタンス作成成功\n"
+    # 書き込み途中の行は次の更新まで数えない
+    _write(path, [appended, "2026-01-01 00:00:00 - A1インスタンス"], mode="a")
+    assert index.update() == len(appended.encode())
+    assert index.counts("2025-12-31")["success"] == before["success"] + 1
+    _write(path, ["空き確認開始\n"], mode="a")
+    index.update()
+    assert index.counts("2026-01-01")["checks"] == 1
+    assert LogIndex(path, MARKERS).counts("2026-01-01")["checks"] == 1
+
+
+def test_rotated_and_compressed_segments_are_not_rescanned(tmp_path):
+    path = str(tmp_path / "a1.log")
+    old = _log_lines(date(2025, 3, 1), 3)
+    _write(path, old)
+    index = LogIndex(path, MARKERS)
+    index.update()
+    expected = _naive_counts("".join(old))
+
+    # logrotate: a1.log → a1.log.1（ローテート前に追記された行もある）
+    late = "2025-03-03 23:59:59 - A1インスタンス作成成功\n"
+    _write(path, [late], mode="a")
+    os.rename(path, path + ".1")
+    new = _log_lines(date(2025, 3, 4), 1)
+    _write(path, new)
+    assert index.update() == len(late.encode()) + os.path.getsize(path)
+    assert index.counts("2025-03-03")["success"] == expected["2025-03-03"]["success"] + 1
+
+    # 次のローテートで圧縮: a1.log.1 → a1.log.2.gz
+    with open(path + ".1", "rb") as src, gzip.open(path + ".2.gz", "wb") as dst:
+        dst.write(src.read())
+    os.remove(path + ".1")
+    index = LogIndex(path)
+    assert index.update() == 0
+    assert index.counts("2025-03-01") == expected["2025-03-01"]
+    assert list(index.lines("2025-03-03"))[-1] == late.rstrip("\n")
+    assert index.days() == ["2025-03-01", "2025-03-02", "2025-03-03", "2025-03-04"]
+
+    # 保持期間を過ぎて削除されたら、その日は索引から外れる
+    os.remove(path + ".2.gz")
+    index.update()
+    assert index.days() == ["2025-03-04"]
+
+
+def test_multi_line_records_count_once_per_dated_line(tmp_path):
+    path = str(tmp_path / "us_bonds.log")
+    lines = [
+        "2025-04-01 10:00:00,001 - INFO - 10-Year Treasury: 4.20% (2025-03-31)\n",
+        # 通知本文を含む複数行のレコード（続きの行にもマーカーがある）
+        "2025-04-01 10:00:01,002 - INFO - 通知送信: 米国債 Treasury: 10-Year Treasury: 4.20%\n",
+        "2-Year Treasury: 3.90%\n",
+        "30-Year Treasury: 4.60%\n",
+    ]
+    _write(path, lines)
+    index = LogIndex(path, {"treasury": "Treasury:"})
+    index.update()
+    # 変更前の us_bonds と同じく「日付があり Treasury: を含む行」の数
+    expected = sum(1 for line in lines if "2025-04-01" in line and "Treasury:" in line)
+    assert index.counts("2025-04-01") == {"treasury": expected} == {"treasury": 2}
+    # 日付のない行もその日の行としては取り出せる
+    assert list(index.lines("2025-04-01"))[-1] == "30-Year Treasury: 4.60%"
+
+
+def test_truncated_log_and_marker_change_rebuild(tmp_path):
+    path = str(tmp_path / "bonds.log")
+    _write(path, _log_lines(date(2025, 5, 1), 2))
+    index = LogIndex(path, MARKERS)
+    index.update()
+    # copytruncate で空にされてから書き直された
+    _write(path, ["2025-05-03 00:00:00 - A1インスタンス作成成功\n"])
+    index.update()
+    assert index.days() == ["2025-05-03"]
+
+    treasury = LogIndex(path, {"treasury": "Treasury:"})
+    _write(path, ["2025-05-03 00:05:00 - 10-Year Treasury: 4.2% (2025-05-02)\n"], mode="a")
+    treasury.update()
+    assert treasury.counts("2025-05-03") == {"treasury": 1}
+
+
+def test_cli_prints_shell_assignments(tmp_path):
+    path = str(tmp_path / "a1.log")
+    lines = _log_lines(date(2025, 6, 1), 2)
+    _write(path, lines)
+    markers = [f"--marker={name}={text}" for name, text in MARKERS.items()]
+    output = subprocess.run(
+        [sys.executable, "-m", "common.log_index", "counts", path, "--date", "2025-06-02", *markers],
+        cwd=BASE_DIR,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    expected = _naive_counts("".join(lines))["2025-06-02"]
+    assert output.splitlines() == [f"{name}={count}" for name, count in expected.items()]
@@ -0,0 +1,156 @@
+"""Tests for the Prometheus metrics layer (histograms, counters, textfile merge, /metrics endpoint)."""
+import os
+import subprocess
+import sys
+import urllib.error
+import urllib.request
+
+import pytest
+
+from benchmarks import bench_metrics
+from common import metrics
+from common.notifier import Notifier
+from tests.stub_server import StubServer
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def enabled(tmp_path, monkeypatch):
+    """このテストの間だけ有効化（textfile は tmp_path）"""
+    monkeypatch.setattr(metrics, "registry", metrics.Registry())
+    monkeypatch.setattr(metrics, "_enabled", True)
+    monkeypatch.setattr(metrics, "_textfile_dir", str(tmp_path))
+    monkeypatch.setattr(metrics, "_flushed", {})
+    return tmp_path
+
+
+def _samples(path):
+    return metrics.parse_samples(path.read_text())
+
+
+def test_histogram_and_counters_render_as_text_exposition():
+    registry = metrics.Registry(buckets=(0.1, 1.0))
+    for seconds in (0.05, 0.1, 0.5, 3.0):
+        registry.observe("bitcoin", "fetch", seconds, now=1700000000)
+    registry.inc("monitor_notifications_total", (("monitor", "bitcoin"), ("priority", "alert")), 2)
+    text = registry.render()
+
+    assert text.splitlines() == [
+        "# HELP monitor_stage_duration_seconds 監視処理の段階ごとの所要時間（秒）",
+        "# TYPE monitor_stage_duration_seconds histogram",
+        'monitor_stage_duration_seconds_bucket{monitor="bitcoin",stage="fetch",le="0.1"} 2',
+        'monitor_stage_duration_seconds_bucket{monitor="bitcoin",stage="fetch",le="1"} 3',
+        'monitor_stage_duration_seconds_bucket{monitor="bitcoin",stage="fetch",le="+Inf"} 4',
+        'monitor_stage_duration_seconds_count{monitor="bitcoin",stage="fetch"} 4',
+        'monitor_stage_duration_seconds_sum{monitor="bitcoin",stage="fetch"} 3.65',
+        "# HELP monitor_notifications_total 送信キューに積んだ通知の件数",
+        "# TYPE monitor_notifications_total counter",
+        'monitor_notifications_total{monitor="bitcoin",priority="alert"} 2',
+        "# HELP monitor_last_run_timestamp_seconds 監視処理の段階が最後に終わった時刻（UNIX 秒）",
+        "# TYPE monitor_last_run_timestamp_seconds gauge",
+        'monitor_last_run_timestamp_seconds{monitor="bitcoin"} 1700000000',
+    ]
+    assert metrics.parse_samples(text)['monitor_stage_duration_seconds_bucket{monitor="bitcoin",stage="fetch",le="+Inf"}'] == 4
+
+
+def test_disabled_metrics_are_no_ops(monkeypatch):
+    monkeypatch.setattr(metrics, "registry", metrics.Registry())
+    monkeypatch.setattr(metrics, "_enabled", False)
+    # 計測のたびにオブジェクトを作らない
+    assert metrics.stage("bitcoin", "fetch") is metrics.stage("us_bonds", "notify")
+    with metrics.stage("bitcoin", "fetch"):
+        metrics.count("bitcoin", "api_errors", api="coingecko")
+        metrics.observe("bitcoin_chart", "render", 1.0)
+    metrics.flush()
+    assert metrics.registry.samples() == []
+
+
+def test_stage_records_time_even_when_the_block_raises(enabled):
+    with pytest.raises(ValueError):
+        with metrics.stage("rate_exchange", "fetch"):
+            raise ValueError("upstream")
+    metrics.count("rate_exchange", "api_errors", api="exchangerate")
+    text = metrics.registry.render()
+    assert 'monitor_stage_duration_seconds_count{monitor="rate_exchange",stage="fetch"} 1' in text
+    assert 'monitor_api_errors_total{monitor="rate_exchange",api="exchangerate"} 1' in text
+
+
+def test_flush_writes_only_the_increase_since_the_last_flush(enabled):
+    metrics.count("us_bonds", "cooldown_suppressed", 2)
+    metrics.observe("us_bonds", "evaluate", 0.002)
+    metrics.flush()
+    metrics.flush()
+    metrics.count("us_bonds", "cooldown_suppressed")
+    metrics.flush()
+
+    values = _samples(enabled / "monitor_us_bonds.prom")
+    assert values['monitor_cooldown_suppressed_total{monitor="us_bonds"}'] == 3
+    assert values['monitor_stage_duration_seconds_count{monitor="us_bonds",stage="evaluate"}'] == 1
+    # 監視ごとに別ファイル
+    assert sorted(p.name for p in enabled.glob("*.prom")) == ["monitor_us_bonds.prom"]
+
+
+def test_one_shot_runs_accumulate_in_the_textfile(tmp_path):
+    """cron の単発実行を模して別プロセスで2回実行し、終了時の書き出しが足し込まれることを確認"""
+    script = (
+        "from common import metrics\n"
+        f"metrics.configure({{'metrics': {{'enabled': True, 'textfile_dir': {str(tmp_path)!r}}}}})\n"
+        "with metrics.stage('rate_exchange', 'fetch'):\n"
+        "    pass\n"
+        "metrics.count('rate_exchange', 'notifications', priority='alert')\n"
+    )
+    for _ in range(2):
+        subprocess.run([sys.executable, "-c", script], cwd=REPO, check=True)
+
+    path = tmp_path / "monitor_rate_exchange.prom"
+    values = _samples(path)
+    assert values['monitor_notifications_total{monitor="rate_exchange",priority="alert"}'] == 2
+    assert values['monitor_stage_duration_seconds_bucket{monitor="rate_exchange",stage="fetch",le="+Inf"}'] == 2
+    assert "# TYPE monitor_stage_duration_seconds histogram" in path.read_text()
+    # node_exporter（別ユーザー）が読めるパーミッション
+    assert os.stat(path).st_mode & 0o777 == 0o644
+
+
+def test_notifier_records_delivery_time_and_pushover_errors(enabled, tmp_path):
+    statuses = [400]
+
+    def pushover(method, path, query, body):
+        return (statuses.pop(0) if statuses else 200), {}, {"status": 1}
+
+    with StubServer(pushover) as server:
+        notifier = Notifier(
+            "token", "user", path=str(tmp_path / "outbox.db"), api_url=server.url + "/1/messages.json",
+            coalesce_seconds=0, timeout=2,
+        )
+        notifier.notify("a", "title-a")
+        notifier.notify("b", "title-b")
+        notifier.close()
+
+    text = metrics.registry.render()
+    assert 'monitor_api_errors_total{monitor="notifier",api="pushover"} 1' in text
+    assert 'monitor_stage_duration_seconds_count{monitor="notifier",stage="deliver"} 2' in text
+
+
+def test_metrics_endpoint_serves_the_registry(enabled):
+    metrics.count("check_a1", "notifications", priority="transition")
+    server = metrics.serve(0)
+    try:
+        url = f"http://127.0.0.1:{server.server_port}"
+        with urllib.request.urlopen(url + "/metrics", timeout=5) as response:
+            assert response.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+            body = response.read().decode()
+        assert 'monitor_notifications_total{monitor="check_a1",priority="transition"} 1' in body
+        with pytest.raises(urllib.error.HTTPError):
+            urllib.request.urlopen(url + "/", timeout=5)
+    finally:
+        server.shutdown()
+        server.server_close()
+    # スクレイプで公開している間は textfile に書き出さない
+    assert metrics._textfile_dir is None
+
+
+def test_disabled_overhead_is_small():
+    results = bench_metrics.run(iterations=20000, directory=None)
+    assert results["disabled"]["stage_ns"] < 5000
+    assert results["disabled"]["count_ns"] < 5000
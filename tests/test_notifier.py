@@ -0,0 +1,255 @@
+"""Tests for the shared notification dispatcher (outbox, retries, coalescing, rate limiting, priorities)."""
+import random
+import threading
+import time
+from urllib.parse import parse_qs
+
+from benchmarks.bench_notifier import run as run_load_test
+from common.notifier import MESSAGE_LIMIT, PRIORITIES, Notifier, TokenBucket, backoff_delay, coalesce, split_message
+from tests.stub_server import StubServer
+
+
+class Pushover:
+    """Pushover API の代役（statuses の順に応答し、受け取ったフォームを記録）"""
+
+    def __init__(self, statuses=(), delay=0.0, headers=None):
+        self.statuses = list(statuses)
+        self.delay = delay
+        self.headers = headers or {}
+        self.received = []
+        self.lock = threading.Lock()
+
+    def __call__(self, method, path, query, body):
+        time.sleep(self.delay)
+        form = {k: v[-1] for k, v in parse_qs(body.decode()).items()}
+        with self.lock:
+            self.received.append(form)
+            status = self.statuses.pop(0) if self.statuses else 200
+        return status, self.headers, {"status": 1 if status == 200 else 0}
+
+
+def _notifier(tmp_path, url, **kwargs):
+    kwargs.setdefault("coalesce_seconds", 0.2)
+    kwargs.setdefault("timeout", 2)
+    return Notifier("token", "user", path=str(tmp_path / "outbox.db"), api_url=url + "/1/messages.json", **kwargs)
+
+
+def _insert(notifier, rows):
+    """送信スレッドを起こさずに (title, message, priority 名, created_at) をキューに積む"""
+    notifier.connection.executemany(
+        "INSERT INTO outbox (title, message, created_at, next_attempt_at, priority) VALUES (?, ?, ?, 0, ?)",
+        [(title, message, created_at, PRIORITIES[priority]) for title, message, priority, created_at in rows],
+    )
+
+
+def _wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def test_notify_returns_immediately_and_coalesces(tmp_path):
+    api = Pushover(delay=0.5)
+    with StubServer(api) as server:
+        notifier = _notifier(tmp_path, server.url)
+        started = time.monotonic()
+        notifier.notify("USD/JPY 上昇", "💱 為替レート通知")
+        notifier.notify("EUR/JPY 上昇", "💱 為替レート通知")
+        notifier.notify("10年債 5%超え", "🏦 米国債金利アラート")
+        # 送信（0.5 秒かかる）を待たずに戻る
+        assert time.monotonic() - started < 0.3
+        assert _wait_for(lambda: notifier.status() == {"sent": 3})
+        notifier.close()
+
+    assert len(api.received) == 2
+    by_title = {form["title"]: form for form in api.received}
+    assert by_title["💱 為替レート通知"]["message"] == "USD/JPY 上昇\n\nEUR/JPY 上昇"
+    assert by_title["🏦 米国債金利アラート"]["token"] == "token"
+
+
+def test_transient_failures_are_retried_with_backoff(tmp_path):
+    api = Pushover(statuses=[500, 429])
+    with StubServer(api) as server:
+        notifier = _notifier(tmp_path, server.url, base_delay=0.1, max_delay=0.2)
+        notifier.notify("alert", "title")
+        assert _wait_for(lambda: notifier.status() == {"sent": 1})
+        notifier.close()
+    assert len(api.received) == 3
+    attempts = notifier.connection.execute("SELECT attempts, last_error FROM outbox").fetchone()
+    assert attempts == (2, "HTTP 429")
+
+
+def test_permanent_failures_are_not_retried(tmp_path):
+    api = Pushover(statuses=[400])
+    with StubServer(api) as server:
+        notifier = _notifier(tmp_path, server.url, base_delay=0.05)
+        notifier.notify("alert", "title")
+        assert _wait_for(lambda: notifier.status() == {"failed": 1})
+        time.sleep(0.2)
+        notifier.close()
+    assert len(api.received) == 1
+
+
+def test_outbox_survives_until_a_later_process_delivers(tmp_path):
+    # 接続できない宛先では送れず、キューに残る
+    offline = _notifier(tmp_path, "http://127.0.0.1:9", base_delay=0.05, max_delay=0.05)
+    offline.notify("queued while offline", "title")
+    offline.close()
+    assert offline.status().get("pending") == 1
+
+    api = Pushover()
+    with StubServer(api) as server:
+        later = _notifier(tmp_path, server.url)
+        later.resume()
+        assert _wait_for(lambda: later.status() == {"sent": 1})
+        later.close()
+    assert [form["message"] for form in api.received] == ["queued while offline"]
+
+
+def test_concurrent_flushes_send_each_message_once(tmp_path):
+    api = Pushover(delay=0.05)
+    with StubServer(api) as server:
+        writer = _notifier(tmp_path, server.url, coalesce_seconds=0)
+        for i in range(20):
+            writer.connection.execute(
+                "INSERT INTO outbox (title, message, created_at, next_attempt_at) VALUES (?, ?, ?, ?)",
+                (f"title {i}", f"message {i}", time.time(), 0),
+            )
+        flushers = [_notifier(tmp_path, server.url, coalesce_seconds=0) for _ in range(4)]
+        threads = [threading.Thread(target=f.flush) for f in flushers]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    assert sorted(form["message"] for form in api.received) == sorted(f"message {i}" for i in range(20))
+    assert writer.status() == {"sent": 20}
+
+
+def test_backoff_and_coalesce_helpers():
+    rng = random.Random(0)
+    for attempts in range(1, 12):
+        delay = backoff_delay(attempts, 30, 3600, rng)
+        cap = min(3600, 30 * 2 ** (attempts - 1))
+        assert cap / 2 <= delay <= cap
+
+    rows = [(1, "a", "x", 0.0, 1), (2, "b", "y", 1.0, 1), (3, "a", "z", 4.0, 1), (4, "a", "w", 6.0, 1)]
+    assert coalesce(rows, 5) == [([1, 3], "a", "x\n\nz"), ([2], "b", "y"), ([4], "a", "w")]
+    # 優先度が違うもの・連結すると上限を超えるものはまとめない
+    rows = [(1, "a", "x", 0.0, 2), (2, "a", "y", 0.0, 1), (3, "a", "z" * 8, 0.0, 1)]
+    assert coalesce(rows, 5, limit=10) == [([1], "a", "x"), ([2], "a", "y"), ([3], "a", "z" * 8)]
+
+
+def test_split_message_prefers_paragraph_and_line_breaks():
+    assert split_message("short") == ["short"]
+    assert split_message("aaaa\n\nbbbb\ncccc", limit=10) == ["aaaa", "bbbb\ncccc"]
+    assert split_message("aaaa\nbbbb\ncccc", limit=10) == ["aaaa\nbbbb", "cccc"]
+    assert split_message("x" * 25, limit=10) == ["x" * 10, "x" * 10, "x" * 5]
+    message = "\n".join(f"line {i}" for i in range(500))
+    parts = split_message(message)
+    assert all(len(part) <= MESSAGE_LIMIT for part in parts)
+    assert "\n".join(parts) == message
+
+
+def test_oversized_notifications_are_split_and_delivered(tmp_path):
+    api = Pushover()
+    message = "\n".join(f"🚨 alert {i}: 4.321%" for i in range(200))
+    with StubServer(api) as server:
+        notifier = _notifier(tmp_path, server.url, coalesce_seconds=0)
+        notifier.notify(message, "t" * 300)
+        assert _wait_for(lambda: notifier.status().get("sent", 0) > 1 and not notifier.pending_count())
+        notifier.close()
+    assert notifier.status() == {"sent": len(api.received)}
+    parts = {form["title"]: form["message"] for form in api.received}
+    count = len(parts)
+    # タイトルは 250 文字に収まるよう詰めて番号を付ける
+    width = 250 - len(f" ({count}/{count})")
+    titles = [f"{'t' * width} ({i}/{count})" for i in range(1, count + 1)]
+    assert sorted(parts) == sorted(titles)
+    assert all(len(part) <= MESSAGE_LIMIT for part in parts.values())
+    assert "\n".join(parts[title] for title in titles) == message
+
+
+def test_higher_priorities_are_sent_first(tmp_path):
+    api = Pushover()
+    with StubServer(api) as server:
+        notifier = _notifier(tmp_path, server.url, coalesce_seconds=0)
+        now = time.time()
+        _insert(
+            notifier,
+            [
+                ("morning", "report", "report", now - 3),
+                ("vol", "alert 1", "alert", now - 2),
+                ("state", "10y crossed 5%", "transition", now - 1),
+                ("vol", "alert 2", "alert", now),
+            ],
+        )
+        assert notifier.flush() == 4
+    assert [form["message"] for form in api.received] == ["10y crossed 5%", "alert 1", "alert 2", "report"]
+
+
+def test_token_bucket_is_shared_between_processes(tmp_path):
+    bucket = TokenBucket(capacity=3, refill_per_second=0.5)
+    first = _notifier(tmp_path, "http://127.0.0.1:9").connection
+    second = _notifier(tmp_path, "http://127.0.0.1:9").connection
+    now = 1000.0
+    assert [bucket.acquire(conn, now) for conn in (first, second, first)] == [0, 0, 0]
+    assert bucket.acquire(second, now) == 2.0
+    assert bucket.acquire(first, now + 2) == 0
+    bucket.drain(second, until=now + 12, now=now + 2)
+    assert bucket.acquire(first, now + 2) == 10.0
+
+
+def test_rate_limited_rows_wait_without_counting_attempts(tmp_path):
+    api = Pushover()
+    with StubServer(api) as server:
+        notifier = _notifier(tmp_path, server.url, coalesce_seconds=0, rate_limit=TokenBucket(2, 0.01))
+        now = time.time()
+        _insert(notifier, [(f"t{i}", f"m{i}", "alert", now) for i in range(5)])
+        assert notifier.flush() == 2
+    assert len(api.received) == 2
+    rows = notifier.connection.execute(
+        "SELECT attempts, next_attempt_at FROM outbox WHERE status = 'pending'"
+    ).fetchall()
+    assert len(rows) == 3
+    assert all(attempts == 0 and next_at >= now + 90 for attempts, next_at in rows)
+
+
+def test_app_limit_headers_pause_all_senders(tmp_path):
+    reset = int(time.time()) + 600
+    api = Pushover(statuses=[429], headers={"X-Limit-App-Remaining": "0", "X-Limit-App-Reset": str(reset)})
+    with StubServer(api) as server:
+        notifier = _notifier(tmp_path, server.url, coalesce_seconds=0, rate_limit=TokenBucket(20, 1.0))
+        _insert(notifier, [("t", "m", "alert", time.time())])
+        notifier.flush()
+        other = _notifier(tmp_path, server.url, rate_limit=TokenBucket(20, 1.0))
+        assert other.rate_limit.acquire(other.connection) > 590
+    assert len(api.received) == 1
+
+
+def test_stale_and_overflowing_notifications_are_dropped(tmp_path):
+    notifier = _notifier(tmp_path, "http://127.0.0.1:9", expire_seconds={"alert": 60}, max_pending=3)
+    now = time.time()
+    _insert(notifier, [("old", "stale alert", "alert", now - 120), ("old", "stale state", "transition", now - 1e6)])
+    notifier._claim_due(now)
+    statuses = dict(notifier.connection.execute("SELECT message, status FROM outbox").fetchall())
+    assert statuses == {"stale alert": "dropped", "stale state": "sending"}
+
+    notifier.connection.execute("DELETE FROM outbox")
+    notifier.notify("report", "r", priority="report")
+    notifier.notify("alert", "a")
+    notifier.notify("state", "s", priority="transition")
+    notifier.notify("alert 2", "a")
+    notifier.close(timeout=0.5)
+    dropped = notifier.connection.execute("SELECT message FROM outbox WHERE status = 'dropped'").fetchall()
+    assert dropped == [("report",)]
+
+
+def test_load_test_respects_server_limit():
+    result = run_load_test(alerts=300, processes=2, capacity=10, rate=150, server_rate=200, oversize=0.02, timeout=30)
+    assert result["server"]["throttled"] == 0
+    assert result["server"]["rejected"] == 0
+    assert result["outbox"] == {"sent": result["server"]["ok"]}
+    assert result["server"]["ok"] > 300
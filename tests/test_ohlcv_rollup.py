@@ -0,0 +1,119 @@
+"""Incrementally maintained OHLCV bars must match pandas resample over the full history."""
+import numpy as np
+import pandas as pd
+
+from history_store import HistoryStore
+from ohlcv_rollup import TIMEFRAMES, OhlcvRollup
+
+RULES = {"1m": "1min", "5m": "5min", "15m": "15min", "1h": "1h", "4h": "4h", "1d": "1D"}
+
+
+def _ticks(n=6000, seed=0):
+    rng = np.random.default_rng(seed)
+    # 数秒〜数時間の不規則な間隔（足をまたぐ空白を含む）
+    gaps = rng.choice([7_000, 45_000, 130_000, 3_700_000], size=n, p=[0.4, 0.4, 0.15, 0.05])
+    timestamps = 1_735_689_600_000 + np.cumsum(gaps)
+    prices = np.round(90000 * np.exp(np.cumsum(rng.normal(0, 0.002, n))), 2)
+    volumes = rng.uniform(1e6, 5e6, n)
+    return timestamps, prices, volumes
+
+
+def _resample(timestamps, prices, volumes, rule):
+    df = pd.DataFrame(
+        {"price": prices, "volume": volumes}, index=pd.to_datetime(timestamps, unit="ms")
+    )
+    bars = df.resample(rule).agg({"price": ["first", "max", "min", "last"], "volume": "sum"}).dropna()
+    bars.columns = ["open", "high", "low", "close", "volume"]
+    return bars
+
+
+def _assert_matches(rollup, timestamps, prices, volumes):
+    for name in TIMEFRAMES:
+        bars = rollup.bars(name)
+        expected = _resample(timestamps, prices, volumes, RULES[name])
+        assert len(bars["timestamp"]) == len(expected), name
+        assert np.array_equal(
+            pd.to_datetime(bars["timestamp"], unit="ms").to_numpy(),
+            expected.index.to_numpy().astype("datetime64[ns]"),
+        ), name
+        for column in ("open", "high", "low", "close"):
+            assert np.array_equal(bars[column], expected[column].to_numpy()), (name, column)
+        np.testing.assert_allclose(bars["volume"], expected["volume"].to_numpy(), rtol=1e-12)
+
+
+def test_incremental_updates_match_resample(tmp_path):
+    timestamps, prices, volumes = _ticks()
+    history = HistoryStore(str(tmp_path / "history"))
+    rollup = OhlcvRollup(str(tmp_path / "rollup"))
+
+    rng = np.random.default_rng(1)
+    position = 0
+    while position < len(timestamps):
+        # cron 1回分（1点）から大きなバックフィルまで、ばらばらの単位で追記
+        step = int(rng.choice([1, 1, 1, 3, 17, 250]))
+        chunk = slice(position, position + step)
+        history.append(timestamps[chunk], prices[chunk], volumes[chunk])
+        rollup.update(history)
+        position += step
+
+    # 確定足は未確定足を除いた分だけ保存されている
+    assert len(rollup.stores["1d"]) == len(rollup.bars("1d")["timestamp"]) - 1
+    _assert_matches(rollup, timestamps, prices, volumes)
+
+
+def test_history_rewrite_rebuilds_bars(tmp_path):
+    timestamps, prices, volumes = _ticks(n=2000, seed=2)
+    history = HistoryStore(str(tmp_path / "history"))
+    rollup = OhlcvRollup(str(tmp_path / "rollup"))
+
+    holes = np.zeros(len(timestamps), dtype=bool)
+    holes[500:520] = True
+    history.append(timestamps[~holes], prices[~holes], volumes[~holes])
+    rollup.update(history)
+    # 欠損区間の補完（途中への挿入）で世代が変わると全件から作り直す
+    history.merge(timestamps[holes], prices[holes], volumes[holes])
+    rollup.update(history)
+    _assert_matches(rollup, timestamps, prices, volumes)
+
+    start = int(timestamps[1000])
+    window = rollup.bars("1h", start - start % TIMEFRAMES["1h"])
+    assert window["timestamp"][0] == start - start % TIMEFRAMES["1h"]
+
+
+def test_overlapping_merge_refolds_the_open_bars(tmp_path):
+    history = HistoryStore(str(tmp_path / "history"))
+    rollup = OhlcvRollup(str(tmp_path / "rollup"))
+
+    history.merge([0, 60_000, 120_000], [1.0, 2.0, 3.0], [1.0, 1.0, 1.0])
+    rollup.update(history)
+    # 末尾の点と重なる取得（同時刻は新しい値で上書き）
+    history.merge([120_000, 130_000], [10.0, 4.0], [5.0, 1.0])
+    rollup.update(history)
+    bar = rollup.bars("1h")
+    assert (bar["high"][-1], bar["close"][-1], bar["volume"][-1]) == (10.0, 4.0, 8.0)
+    # 末尾の1点だけの上書きでも反映する
+    history.merge([130_000], [2.5], [3.0])
+    rollup.update(history)
+    _assert_matches(rollup, [0, 60_000, 120_000, 130_000], [1.0, 2.0, 10.0, 2.5], [1.0, 1.0, 5.0, 3.0])
+
+
+def test_tail_fetches_overlapping_the_last_point_match_resample(tmp_path):
+    timestamps, prices, volumes = _ticks(n=3000, seed=3)
+    history = HistoryStore(str(tmp_path / "history"))
+    rollup = OhlcvRollup(str(tmp_path / "rollup"))
+
+    rng = np.random.default_rng(4)
+    final_prices, final_volumes = prices.copy(), volumes.copy()
+    position = 0
+    while position < len(timestamps):
+        step = int(rng.choice([1, 2, 5, 40]))
+        # トラッカーの末尾取得と同じく、前回の最後の点を更新された値で含める
+        chunk = slice(max(position - 1, 0), position + step)
+        if position:
+            final_prices[position - 1] *= 1 + rng.normal(0, 0.01)
+            final_volumes[position - 1] += rng.uniform(0, 1e6)
+        history.merge(timestamps[chunk], final_prices[chunk], final_volumes[chunk])
+        rollup.update(history)
+        position += step
+
+    _assert_matches(rollup, timestamps, final_prices, final_volumes)
@@ -0,0 +1,61 @@
+"""Tests for the USD/JPY append-only sample store."""
+import gzip
+from datetime import datetime
+
+from rate_store import RateStore, import_logs
+
+
+def _ts(text):
+    return int(datetime.strptime(text, "%Y-%m-%d %H:%M:%S").timestamp())
+
+
+def test_daily_rollup_and_gap_days(tmp_path):
+    store = RateStore(str(tmp_path / "store"))
+    store.append(150.0, _ts("2025-01-01 09:00:00"))
+    store.append(151.5, _ts("2025-01-01 12:00:00"))
+    store.append(149.0, _ts("2025-01-01 18:00:00"))
+    store.append(152.0, _ts("2025-01-04 09:00:00"))
+
+    day1 = store.get_daily_summary(datetime(2025, 1, 1))
+    assert (day1["open"], day1["high"], day1["low"], day1["close"]) == (
+        150.0,
+        151.5,
+        149.0,
+        149.0,
+    )
+    assert day1["count"] == 3
+    assert store.get_daily_summary(datetime(2025, 1, 2)) is None
+    assert store.get_day_samples(datetime(2025, 1, 4)) == [
+        (_ts("2025-01-04 09:00:00"), 152.0)
+    ]
+    # 時刻が逆行したサンプルは追記しない
+    assert store.append(100.0, _ts("2025-01-03 00:00:00")) is False
+    assert len(store) == 4
+
+
+def test_index_recovers_from_partial_write(tmp_path):
+    store = RateStore(str(tmp_path / "store"))
+    store.append(150.0, _ts("2025-01-01 09:00:00"))
+    with open(store.samples_path, "ab") as f:
+        f.write(b"\x00" * 5)
+    store.append(151.0, _ts("2025-01-01 10:00:00"))
+    assert store.get_daily_summary(datetime(2025, 1, 1))["count"] == 2
+
+
+def test_import_logs_backfills_and_merges(tmp_path):
+    log = tmp_path / "rate.log"
+    log.write_text(
+        "2025-01-01 09:00:00,001 - INFO - 現在のUSD/JPYレート: 150.0\n"
+        "2025-01-01 09:00:00,002 - INFO - Previous: 149.0000, Current: 150.0000, Change: 0.67%\n"
+        "2025-01-01 10:00:00,002 - INFO - [USD/JPY] Previous: 150.0000, Current: 151.0000, Change: 0.67%\n"
+        "2025-01-01 10:00:00,003 - INFO - [EUR/JPY] Previous: 160.0000, Current: 161.0000, Change: 0.62%\n"
+    )
+    rotated = tmp_path / "rate.log.1.gz"
+    with gzip.open(rotated, "wt") as f:
+        f.write("2024-12-31 23:00:00,000 - INFO - Previous: 1, Current: 148.5000, Change: 0%\n")
+
+    store = RateStore(str(tmp_path / "store"))
+    store.append(151.0, _ts("2025-01-01 10:00:00"))
+    assert import_logs(store, [str(log), str(rotated)]) == 3
+    assert store.get_daily_summary(datetime(2024, 12, 31))["close"] == 148.5
+    assert store.get_daily_summary(datetime(2025, 1, 1))["count"] == 2
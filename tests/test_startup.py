@@ -0,0 +1,9 @@
+"""The tracking action must start without loading the charting stack (numpy only)."""
+from benchmarks.bench_startup import check, run
+
+
+def test_track_action_does_not_import_heavy_dependencies():
+    results = run(["track"], repeat=1)
+    # numpy is used by the watchlist and history store on every run; nothing else heavy
+    assert results[0]["heavy_modules"] == ["numpy"]
+    assert check(results) == []
@@ -0,0 +1,50 @@
+"""Tests for the shared SQLite state store."""
+import multiprocessing
+
+from common.state_store import StateStore, legacy_bond_states, legacy_rate_states
+
+
+def _writer(path, worker, count):
+    store = StateStore(path)
+    for i in range(count):
+        store.set("load", f"w{worker}", {"i": i})
+        store.set_many("load", {f"w{worker}-a": i, f"w{worker}-b": i})
+    store.close()
+
+
+def test_upserts_and_namespaces(tmp_path):
+    store = StateStore(str(tmp_path / "state.db"))
+    store.set("rate_exchange", "USD/JPY", {"rate": 150.0, "last_notif_ts": None})
+    store.set("rate_exchange", "USD/JPY", {"rate": 151.0, "last_notif_ts": 10})
+    store.set_many("us_bonds", {"cooldown": {"10-Year Treasury": 5}, "above_absolute_threshold": False})
+    assert store.get("rate_exchange", "USD/JPY") == {"rate": 151.0, "last_notif_ts": 10}
+    assert store.get_all("us_bonds")["above_absolute_threshold"] is False
+    assert store.get("bitcoin", "current_price", {}) == {}
+    assert sorted(store.namespaces()) == ["rate_exchange", "us_bonds"]
+
+
+def test_concurrent_writers_from_several_processes(tmp_path):
+    path = str(tmp_path / "state.db")
+    procs = [multiprocessing.Process(target=_writer, args=(path, w, 100)) for w in range(4)]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join()
+        assert p.exitcode == 0
+    state = StateStore(path).get_all("load")
+    assert len(state) == 12
+    assert all(state[f"w{w}"] == {"i": 99} and state[f"w{w}-b"] == 99 for w in range(4))
+
+
+def test_legacy_json_conversion():
+    assert legacy_rate_states({"rate": 150.0, "timestamp": "x", "last_notif_ts": 7}) == {
+        "USD/JPY": {"rate": 150.0, "last_notif_ts": 7}
+    }
+    bonds = legacy_bond_states(
+        {"data": {"10-Year Treasury": {"rate": 4.4}}, "cooldown": {}, "above_absolute_threshold": True}
+    )
+    assert bonds == {
+        "rates": {"10-Year Treasury": {"rate": 4.4}},
+        "cooldown": {},
+        "above_absolute_threshold": True,
+    }
@@ -0,0 +1,200 @@
+"""Tests for Treasury par yield curve ingestion (streaming CSV/XML parsers, store, array checks)."""
+import io
+import os
+from datetime import date
+
+import numpy as np
+import pytest
+import requests
+
+from bond_watchlist import BondWatchlist
+from curve_ingest import CurveIngestor, curve_to_rates, iter_csv_rows, iter_xml_rows
+from curve_store import HEADER_DTYPE, LABELS, CurveStore
+from common.http_cache import HttpCache
+from tests.stub_server import StubServer
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+TEN_YEAR = LABELS.index("10-Year Treasury")
+EMPTY_FEED = b'<?xml version="1.0" encoding="utf-8"?><feed xmlns="http://www.w3.org/2005/Atom"></feed>'
+
+
+def _fixture(name):
+    with open(os.path.join(FIXTURES, name), "rb") as f:
+        return f.read()
+
+
+def _treasury(fail=False):
+    """Serve the recorded feeds; monthly CSV requests are sliced from the yearly file."""
+
+    def route(method, path, query, body):
+        if fail:
+            return 500, {}, b"upstream error"
+        if path.startswith("/daily-treasury-rates.csv/"):
+            assert query["type"] == "daily_treasury_yield_curve"
+            month = query.get("field_tdr_date_value_month")
+            year = month[:4] if month else query["field_tdr_date_value"]
+            content = _fixture(f"treasury_yield_curve_{year}.csv")
+            if month:
+                lines = content.decode("utf-8-sig").splitlines(keepends=True)
+                prefix = f"{month[4:]}/"
+                content = "".join([lines[0]] + [line for line in lines[1:] if line.startswith(prefix)]).encode()
+            return 200, {"Content-Type": "text/csv"}, content
+        if path == "/pages/xml":
+            if query["field_tdr_date_value_month"] != "202401":
+                return 200, {"Content-Type": "application/atom+xml"}, EMPTY_FEED
+            return 200, {"Content-Type": "application/atom+xml"}, _fixture("treasury_yield_curve_202401.xml")
+        return 404, {}, b""
+
+    return route
+
+
+def _ingestor(server, tmp_path, **kwargs):
+    return CurveIngestor(requests.Session(), str(tmp_path / "curve"), base_url=server.url, **kwargs)
+
+
+def test_csv_rows_map_columns_by_header():
+    rows = list(iter_csv_rows(io.StringIO(_fixture("treasury_yield_curve_2025.csv").decode("utf-8-sig"))))
+    by_date = dict(rows)
+    assert len(rows) == 60
+    one_and_half = LABELS.index("1.5-Month Treasury")
+    # 1.5 Month は 2025-02-18 から
+    assert np.isnan(by_date[date(2025, 2, 14)][one_and_half])
+    assert by_date[date(2025, 2, 18)][one_and_half] > 0
+    assert by_date[date(2025, 3, 31)][TEN_YEAR] == 4.56
+
+    # 1.5 Month 列のない年は NaN
+    rows_2024 = dict(iter_csv_rows(io.StringIO(_fixture("treasury_yield_curve_2024.csv").decode())))
+    assert np.isnan(rows_2024[date(2024, 1, 2)][one_and_half])
+    assert np.isfinite(np.delete(rows_2024[date(2024, 1, 2)], one_and_half)).all()
+
+
+def test_xml_feed_streams_entries_and_matches_csv():
+    content = _fixture("treasury_yield_curve_202401.xml")
+    consumed = []
+
+    def chunks(size=97):
+        for i in range(0, len(content), size):
+            consumed.append(i)
+            yield content[i : i + size]
+
+    rows = iter_xml_rows(chunks())
+    first_day, _ = next(rows)
+    # 最初の1日分はフィードを読み切る前に返る
+    assert first_day == date(2024, 1, 2)
+    assert len(consumed) < len(content) // 97 // 4
+    xml_rows = [(first_day, None)] + list(rows)
+
+    csv_rows = dict(iter_csv_rows(io.StringIO(_fixture("treasury_yield_curve_2024.csv").decode())))
+    assert len(xml_rows) == 21
+    for day, rates in xml_rows[1:]:
+        np.testing.assert_array_equal(rates, csv_rows[day])
+
+
+def test_backfill_then_incremental_months(tmp_path):
+    with StubServer(_treasury()) as server:
+        ingestor = _ingestor(server, tmp_path, backfill_start_year=2024)
+        day, rates = ingestor.refresh(today=date(2025, 3, 31))
+        assert [request[2].get("field_tdr_date_value") for request in server.requests] == ["2024", "2025"]
+        assert day == date(2025, 3, 31)
+        assert rates[TEN_YEAR] == 4.56
+        stored = len(ingestor.store)
+        assert stored == 250 + 60
+
+        # 同じ日はもう取得しない
+        ingestor.refresh(today=date(2025, 3, 31))
+        assert len(server.requests) == 2
+
+        # 翌月: 先月と今月の月単位リクエストのみ、保存済みの日は追記しない
+        ingestor.refresh(today=date(2025, 4, 1))
+        assert [request[2].get("field_tdr_date_value_month") for request in server.requests[2:]] == [
+            "202503",
+            "202504",
+        ]
+        assert len(ingestor.store) == stored
+
+    window = ingestor.store.window(date(2025, 3, 1), date(2025, 3, 31))
+    assert len(window["date"]) == 21
+    assert np.all(np.diff(window["date"].astype(np.int64)) > 0)
+    assert str(window["date"][-1]) == "2025-03-31"
+
+
+def test_month_feed_is_fetched_once_per_cache_ttl(tmp_path):
+    treasury = _treasury()
+
+    def unpublished_today(method, path, query, body):
+        # 03/31 分はまだ公表されていない
+        status, headers, content = treasury(method, path, query, body)
+        lines = content.decode("utf-8-sig").splitlines(keepends=True)
+        return status, headers, "".join(line for line in lines if not line.startswith("03/31/2025")).encode()
+
+    with StubServer(unpublished_today) as server:
+        session = requests.Session()
+        cache = HttpCache(session, directory=str(tmp_path / "cache"))
+        ingestor = CurveIngestor(session, str(tmp_path / "curve"), base_url=server.url, cache=cache)
+        ingestor.store.append([date(2025, 3, 3)], np.full((1, len(LABELS)), 4.0))
+
+        assert ingestor.refresh(today=date(2025, 3, 31))[0] == date(2025, 3, 28)
+        # 15分後の実行: 同じ月のフィードはキャッシュから読む
+        assert ingestor.refresh(today=date(2025, 3, 31))[0] == date(2025, 3, 28)
+    assert len(server.requests) == 1
+    assert ingestor.api_calls == 1
+    assert cache.stats["hits"] == 1
+
+
+def test_xml_feed_ingests_a_month(tmp_path):
+    with StubServer(_treasury()) as server:
+        ingestor = _ingestor(server, tmp_path, feed="xml")
+        ingestor.store.append([date(2023, 12, 29)], np.full((1, len(LABELS)), 4.0))
+        day, rates = ingestor.refresh(today=date(2024, 1, 31))
+    assert [request[2]["field_tdr_date_value_month"] for request in server.requests] == ["202312", "202401"]
+    assert day == date(2024, 1, 31)
+    assert len(ingestor.store) == 22
+
+
+def test_fetch_failure_falls_back_to_stored_curve(tmp_path):
+    with StubServer(_treasury(fail=True)) as server:
+        ingestor = _ingestor(server, tmp_path)
+        with pytest.raises(requests.HTTPError):
+            ingestor.refresh(today=date(2025, 3, 31))
+        ingestor.store.append([date(2025, 3, 28)], np.full((1, len(LABELS)), 4.2))
+        day, rates = ingestor.refresh(today=date(2025, 3, 31))
+    assert day == date(2025, 3, 28)
+    assert curve_to_rates(day, rates)["10-Year Treasury"] == {"rate": 4.2, "date": "2025-03-28"}
+
+
+def test_store_appends_only_new_dates_and_recovers_torn_writes(tmp_path):
+    store = CurveStore(str(tmp_path))
+    curve = np.arange(len(LABELS), dtype=np.float64)
+    assert store.append([date(2024, 1, 3), date(2024, 1, 2), date(2024, 1, 3)], [curve, curve + 1, curve + 2]) == 2
+    assert store.append([date(2024, 1, 2), date(2024, 1, 4)], [curve, curve + 3]) == 1
+    # 書き込み途中で落ちた半端なレコード
+    with open(store.path, "ab") as f:
+        f.write(b"\x00" * 10)
+    assert len(store) == 3
+    assert store.append([date(2024, 1, 5)], [curve + 4]) == 1
+    assert os.path.getsize(store.path) == HEADER_DTYPE.itemsize + 4 * store.dtype.itemsize
+    window = store.window()
+    assert [str(d) for d in window["date"]] == ["2024-01-02", "2024-01-03", "2024-01-04", "2024-01-05"]
+    np.testing.assert_array_equal(window["rates"][:, 0], [1, 2, 3, 4])
+
+
+def test_bond_watchlist_checks_all_maturities_at_once():
+    watchlist = BondWatchlist(0.05, 3600, overrides={"1-Month Treasury": {"threshold": 0.2}})
+    previous = {label: {"rate": 4.0} for label in LABELS}
+    current = {label: {"rate": 4.0} for label in LABELS}
+    current["1-Month Treasury"] = {"rate": 4.4}  # +10%（上書きした閾値 20% 未満）
+    current["2-Year Treasury"] = {"rate": 4.4}  # +10%
+    current["30-Year Treasury"] = {"rate": 3.6}  # -10%（cooldown 中）
+    del current["1.5-Month Treasury"]
+    now = 10_000
+    result = watchlist.evaluate(
+        watchlist.rate_column(current),
+        watchlist.rate_column(previous),
+        watchlist.cooldown_column({"30-Year Treasury": now - 60}),
+        now,
+    )
+    assert [LABELS[i] for i in np.flatnonzero(result["notify"])] == ["2-Year Treasury"]
+    assert [LABELS[i] for i in np.flatnonzero(result["suppressed"])] == ["30-Year Treasury"]
+    assert not result["valid"][LABELS.index("1.5-Month Treasury")]
+    assert result["last_notif"][LABELS.index("2-Year Treasury")] == now
+
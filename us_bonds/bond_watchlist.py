@@ -0,0 +1,50 @@
+"""
+米国債ウォッチリスト監視
+
+利回りカーブの全年限（1ヶ月〜30年）の変動閾値と cooldown を NumPy で一括判定する
+"""
+
+import numpy as np
+
+from common.watchlist import evaluate_thresholds
+
+from curve_store import LABELS
+
+
+class BondWatchlist:
+    def __init__(self, default_threshold, default_cooldown=0, overrides=None, labels=LABELS):
+        """
+        overrides: {"1-Month Treasury": {"threshold": 0.1, "cooldown_seconds": 3600}, ...}
+        年限ごとに閾値・cooldown を上書き可能（未指定は既定値）
+        """
+        overrides = overrides or {}
+        self.labels = list(labels)
+        self.thresholds = np.array(
+            [overrides.get(label, {}).get("threshold", default_threshold) for label in self.labels],
+            dtype=np.float64,
+        )
+        self.cooldowns = np.array(
+            [overrides.get(label, {}).get("cooldown_seconds", default_cooldown) for label in self.labels],
+            dtype=np.float64,
+        )
+
+    def __len__(self):
+        return len(self.labels)
+
+    def rate_column(self, rates):
+        """{"10-Year Treasury": {"rate": 4.45, ...}, ...} を年限順の配列に変換（ない年限は NaN）"""
+        values = [(rates.get(label) or {}).get("rate") for label in self.labels]
+        return np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+
+    def cooldown_column(self, cooldown):
+        """{"10-Year Treasury": 最終通知の epoch 秒, ...} を年限順の配列に変換（未通知は 0）"""
+        return np.array([cooldown.get(label) or 0 for label in self.labels], dtype=np.float64)
+
+    def evaluate(self, current, previous, last_notif, now_ts):
+        """
+        全年限の閾値判定と cooldown 判定を一括で行う（common.watchlist.evaluate_thresholds）
+
+        current / previous / last_notif: 年限順の配列（欠損は NaN、未通知は 0）
+        戻り値: change, valid, exceeded, suppressed, notify, last_notif
+        """
+        return evaluate_thresholds(current, previous, last_notif, now_ts, self.thresholds, self.cooldowns)
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+米国債利回りカーブの分析（保存済みの全日付をまとめて NumPy で計算）
+
+- スプレッド: 2s10s（10年 - 2年）/ 3m10y（10年 - 3ヶ月）。単位は %pt
+- 形状: level（3ヶ月・2年・10年の平均）/ slope（10年 - 3ヶ月）/ curvature（2 × 2年 - 3ヶ月 - 10年）
+- 補間: 自然3次スプライン。欠損している年限は節点から外す（年限の欠け方が同じ日ごとにまとめて解く）
+- 逆イールド: スプレッドが負になった日から非負に戻る前日までを1回の逆転とする
+
+日ごとの結果（スプレッド・形状・スプラインの2階微分）は curve.bin と同じ形式の
+analytics.bin にキャッシュし、curve.bin に追記された日だけを計算する。朝のレポートや
+アラート判定はキャッシュを読むだけで、任意の年限の補間も2階微分から評価するだけで済む。
+
+    python3 curve_analytics.py info
+    python3 curve_analytics.py interpolate 0.5 4 15
+"""
+
+import argparse
+import logging
+from datetime import date
+
+import numpy as np
+
+from curve_store import DEFAULT_DIRECTORY, MATURITIES, YEARS, CurveStore
+
+logger = logging.getLogger(__name__)
+
+INDEX = {name: i for i, (name, *_) in enumerate(MATURITIES)}
+# スプレッド名 → (短期, 長期)
+SPREADS = {"2s10s": ("2-Year", "10-Year"), "3m10y": ("3-Month", "10-Year")}
+METRICS = tuple(f"spread_{name}" for name in SPREADS) + ("level", "slope", "curvature")
+CACHE_FILENAME = "analytics.bin"
+
+
+def _column(rates, name):
+    return rates[:, INDEX[name]]
+
+
+def curve_metrics(rates):
+    """(日数, 年限数) の利回りから METRICS 順の (日数, 指標数) を計算（年限の欠損は NaN）"""
+    rates = np.asarray(rates, dtype=np.float64)
+    short, two, ten = (_column(rates, name) for name in ("3-Month", "2-Year", "10-Year"))
+    spreads = [_column(rates, long) - _column(rates, short_name) for short_name, long in SPREADS.values()]
+    level = (short + two + ten) / 3
+    slope = ten - short
+    curvature = 2 * two - short - ten
+    return np.column_stack(spreads + [level, slope, curvature])
+
+
+def _knot_groups(rates):
+    """欠損のない年限の組み合わせ（節点）ごとに日のインデックスをまとめる"""
+    present = np.isfinite(rates)
+    # 欠損パターンをビット列の整数にして分類する
+    codes = present.astype(np.int64) @ (1 << np.arange(rates.shape[1], dtype=np.int64))
+    order = np.argsort(codes, kind="stable")
+    _, starts = np.unique(codes[order], return_index=True)
+    for rows in np.split(order, starts[1:]):
+        pattern = present[rows[0]]
+        if pattern.sum() >= 2:
+            yield pattern, rows
+
+
+def second_derivatives(rates, years=YEARS):
+    """
+    各日の自然3次スプラインの節点での2階微分（(日数, 年限数)、節点から外した年限は NaN）
+    節点の組み合わせが同じ日は1つの連立方程式（右辺が日数分）でまとめて解く
+    """
+    rates = np.asarray(rates, dtype=np.float64)
+    result = np.full(rates.shape, np.nan)
+    for pattern, rows in _knot_groups(rates):
+        x = years[pattern]
+        y = rates[np.ix_(rows, np.flatnonzero(pattern))]
+        n = len(x)
+        m = np.zeros((len(rows), n))
+        if n > 2:
+            h = np.diff(x)
+            a = np.zeros((n - 2, n - 2))
+            i = np.arange(n - 2)
+            a[i, i] = 2 * (h[:-1] + h[1:])
+            a[i[1:], i[:-1]] = h[1:-1]
+            a[i[:-1], i[1:]] = h[1:-1]
+            slopes = np.diff(y, axis=1) / h
+            rhs = 6 * np.diff(slopes, axis=1)
+            m[:, 1:-1] = np.linalg.solve(a, rhs.T).T
+        result[np.ix_(rows, np.flatnonzero(pattern))] = m
+    return result
+
+
+def interpolate(rates, m2, tenors, years=YEARS):
+    """
+    2階微分 m2 のスプラインを年限 tenors（年）で評価した (日数, len(tenors))
+    節点の範囲外（その日の最短・最長の年限の外側）は NaN
+    """
+    rates = np.asarray(rates, dtype=np.float64)
+    tenors = np.asarray(tenors, dtype=np.float64)
+    result = np.full((len(rates), len(tenors)), np.nan)
+    for pattern, rows in _knot_groups(rates):
+        columns = np.flatnonzero(pattern)
+        x = years[pattern]
+        y = rates[np.ix_(rows, columns)]
+        m = m2[np.ix_(rows, columns)]
+        inside = (tenors >= x[0]) & (tenors <= x[-1])
+        t = tenors[inside]
+        j = np.clip(np.searchsorted(x, t, side="right") - 1, 0, len(x) - 2)
+        x0, x1 = x[j], x[j + 1]
+        h = x1 - x0
+        left, right = (x1 - t) / h, (t - x0) / h
+        values = (
+            m[:, j] * (x1 - t) ** 3 / (6 * h)
+            + m[:, j + 1] * (t - x0) ** 3 / (6 * h)
+            + (y[:, j] - m[:, j] * h**2 / 6) * left
+            + (y[:, j + 1] - m[:, j + 1] * h**2 / 6) * right
+        )
+        result[np.ix_(rows, np.flatnonzero(inside))] = values
+    return result
+
+
+def inversion_events(dates, spread):
+    """
+    スプレッドの系列から逆イールドの期間を抽出（欠損日は前後の状態に含めない）
+    戻り値: [{"start": date, "end": date | None（継続中）, "days": 営業日数, "min": 最小スプレッド}, ...]
+    end は非負に戻った日
+    """
+    spread = np.asarray(spread, dtype=np.float64)
+    valid = np.flatnonzero(np.isfinite(spread))
+    if not len(valid):
+        return []
+    values = spread[valid]
+    inverted = (values < 0).astype(np.int8)
+    edges = np.diff(np.concatenate([[0], inverted, [0]]))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    if not len(starts):
+        return []
+    minimums = np.minimum.reduceat(values, starts)
+    events = []
+    for start, end, minimum in zip(starts, ends, minimums):
+        ongoing = end == len(values)
+        events.append(
+            {
+                "start": _as_date(dates[valid[start]]),
+                "end": None if ongoing else _as_date(dates[valid[end]]),
+                "days": int(end - start),
+                "min": float(minimum),
+            }
+        )
+    return events
+
+
+def _as_date(value):
+    return value if isinstance(value, date) else value.astype("datetime64[D]").item()
+
+
+class CurveAnalytics:
+    def __init__(self, store=None, directory=None):
+        """store: CurveStore（利回り）。キャッシュは directory（省略時は store と同じ場所）の analytics.bin"""
+        self.store = store or CurveStore()
+        self.cache = CurveStore(
+            directory or self.store.directory, len(METRICS) + len(MATURITIES), filename=CACHE_FILENAME
+        )
+
+    def update(self):
+        """キャッシュより新しい日の指標を計算して追記し、計算した日数を返す"""
+        curve = self.store.records()
+        cached = self.cache.last_date()
+        if cached is not None and (not len(curve) or cached.toordinal() > curve["date"][-1]):
+            # 利回りのストアを作り直した
+            logger.info("利回りカーブが作り直されたため分析キャッシュを再計算します")
+            self.cache.clear()
+            cached = None
+        start = 0 if cached is None else int(np.searchsorted(curve["date"], cached.toordinal(), side="right"))
+        rows = curve[start:]
+        if not len(rows):
+            return 0
+        rates = np.asarray(rows["rates"])
+        values = np.hstack([curve_metrics(rates), second_derivatives(rates)])
+        dates = [date.fromordinal(int(ordinal)) for ordinal in rows["date"]]
+        return self.cache.append(dates, values)
+
+    def metrics(self, start=None, end=None):
+        """キャッシュ済みの指標 {"date": ..., "spread_2s10s": ..., ...}（[start, end]）"""
+        window = self.cache.window(start, end)
+        result = {"date": window["date"]}
+        for i, name in enumerate(METRICS):
+            result[name] = window["rates"][:, i]
+        return result
+
+    def latest(self):
+        """最新日の指標 {"date": date, "spread_2s10s": ..., ...}（キャッシュが空なら {}）"""
+        day, values = self.cache.latest()
+        if day is None:
+            return {}
+        return {"date": day, **{name: float(values[i]) for i, name in enumerate(METRICS)}}
+
+    def interpolate(self, tenors, start=None, end=None):
+        """任意の年限（年）の利回り {"date": ..., "tenors": ..., "rates": (日数, len(tenors))}"""
+        curve = self.store.window(start, end)
+        m2 = self.cache.window(start, end)["rates"][:, len(METRICS) :]
+        if len(m2) != len(curve["rates"]):
+            raise ValueError("分析キャッシュが最新ではありません（update() を先に実行してください）")
+        return {
+            "date": curve["date"],
+            "tenors": np.asarray(tenors, dtype=np.float64),
+            "rates": interpolate(curve["rates"], m2, tenors),
+        }
+
+    def inversions(self, name="2s10s"):
+        """逆イールドの期間（inversion_events を参照）"""
+        metrics = self.metrics()
+        return inversion_events(metrics["date"], metrics[f"spread_{name}"])
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    parser = argparse.ArgumentParser(description="米国債利回りカーブの分析")
+    parser.add_argument("command", choices=["info", "interpolate"])
+    parser.add_argument("tenors", type=float, nargs="*", help="interpolate: 年限（年）")
+    parser.add_argument("--dir", default=DEFAULT_DIRECTORY, help="ストアのディレクトリ")
+    args = parser.parse_args()
+
+    analytics = CurveAnalytics(CurveStore(args.dir))
+    print(f"{analytics.update()}日分を計算")
+    latest = analytics.latest()
+    if not latest:
+        print("利回りカーブのデータがありません")
+        return
+    if args.command == "interpolate":
+        result = analytics.interpolate(args.tenors, start=latest["date"])
+        for tenor, rate in zip(args.tenors, result["rates"][-1]):
+            print(f"  {tenor:g}年: {rate:.3f}%")
+        return
+    print(f"{latest['date']}: " + ", ".join(f"{name}={latest[name]:+.3f}" for name in METRICS))
+    for name in SPREADS:
+        for event in analytics.inversions(name)[-3:]:
+            end = event["end"] or "継続中"
+            print(f"  {name} 逆イールド: {event['start']} 〜 {end}（{event['days']}日, 最小 {event['min']:+.2f}%pt）")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+Treasury.gov の Daily Treasury Par Yield Curve Rates の差分取り込み
+
+CSV / XML フィードをストリーミングで読み（CSV は1行ずつ、XML は XMLPullParser に
+チャンクを渡して1日分ずつ）、最後に保存した日付より新しい日だけを curve_store.py に追記する。
+複数年のバックフィルも1年分のリクエストずつ読み、フィード全体をメモリに載せない。
+
+- 保存なし: backfill_start_year から今年まで年単位で取得
+- 保存あり: 最後の保存日が今月・先月なら月単位、それより古ければ年単位で取得
+- 最後の保存日が今日なら取得しない（Treasury の公表は1日1回）
+- 月単位のフィードは共有 HTTP キャッシュ（common.http_cache）を通し、cache_ttl 秒以内は
+  再取得しない（当日分の公表前・休日に 15 分ごとに同じフィードを取り直さない）
+
+    python3 curve_ingest.py backfill --from-year 2015
+    python3 curve_ingest.py refresh --feed xml
+"""
+
+import argparse
+import csv
+import logging
+import time
+import xml.etree.ElementTree as ET
+from datetime import date, datetime
+
+import numpy as np
+import requests
+
+from curve_store import DEFAULT_DIRECTORY, LABELS, MATURITIES, CurveStore
+
+logger = logging.getLogger(__name__)
+
+BASE_URL = "https://home.treasury.gov/resource-center/data-chart-center/interest-rates"
+FEED_TYPE = "daily_treasury_yield_curve"
+FEEDS = ("csv", "xml")
+CHUNK_SIZE = 64 * 1024
+# 月単位フィードのキャッシュ有効期間（公表は1日1回、引け後）
+DEFAULT_CACHE_TTL_SECONDS = 3600
+
+ATOM = "{http://www.w3.org/2005/Atom}"
+DATA = "{http://schemas.microsoft.com/ado/2007/08/dataservices}"
+METADATA = "{http://schemas.microsoft.com/ado/2007/08/dataservices/metadata}"
+
+CSV_COLUMNS = {column: i for i, (_, _, column, _) in enumerate(MATURITIES)}
+XML_FIELDS = {field: i for i, (_, _, _, field) in enumerate(MATURITIES)}
+
+
+def _rate(text):
+    text = (text or "").strip()
+    if not text or text.upper() == "N/A":
+        return np.nan
+    return float(text)
+
+
+def iter_csv_rows(lines):
+    """
+    CSV フィードの行を1日分ずつ (date, 利回りの配列) に変換
+    列はヘッダ行で対応付け、ないか空の年限は NaN（1.5 Month は 2025 年以降のみ）
+    """
+    reader = csv.reader(lines)
+    header = next(reader, None)
+    if header is None:
+        return
+    header = [name.strip() for name in header]
+    if header[0] != "Date":
+        raise ValueError(f"Treasury CSV のヘッダが不正です: {header[:3]}")
+    columns = [(i, CSV_COLUMNS[name]) for i, name in enumerate(header) if name in CSV_COLUMNS]
+    for row in reader:
+        if not row or not row[0].strip():
+            continue
+        rates = np.full(len(MATURITIES), np.nan)
+        for source, target in columns:
+            if source < len(row):
+                rates[target] = _rate(row[source])
+        yield datetime.strptime(row[0].strip(), "%m/%d/%Y").date(), rates
+
+
+def iter_xml_rows(chunks):
+    """
+    XML（Atom）フィードのチャンクを1日分（entry）ずつ (date, 利回りの配列) に変換
+    読み終えた entry は捨てるため、メモリ使用量はフィードの長さによらない
+    """
+    parser = ET.XMLPullParser(events=("start", "end"))
+    root = None
+    for chunk in chunks:
+        parser.feed(chunk)
+        for event, elem in parser.read_events():
+            if event == "start":
+                if root is None:
+                    root = elem
+                continue
+            if elem.tag == f"{METADATA}properties":
+                values = {child.tag[len(DATA) :]: child.text for child in elem if child.tag.startswith(DATA)}
+                if not values.get("NEW_DATE"):
+                    continue
+                rates = np.full(len(MATURITIES), np.nan)
+                for field, i in XML_FIELDS.items():
+                    rates[i] = _rate(values.get(field))
+                yield datetime.strptime(values["NEW_DATE"][:10], "%Y-%m-%d").date(), rates
+            elif elem.tag == f"{ATOM}entry":
+                root.clear()
+    parser.close()
+
+
+class CurveIngestor:
+    def __init__(
+        self,
+        session,
+        directory=DEFAULT_DIRECTORY,
+        base_url=BASE_URL,
+        feed="csv",
+        timeout=30,
+        backfill_start_year=None,
+        cache=None,
+        cache_ttl=DEFAULT_CACHE_TTL_SECONDS,
+    ):
+        """cache: HttpCache（月単位のフィードだけキャッシュ経由で取得。年単位は大きいためストリーミング）"""
+        if feed not in FEEDS:
+            raise ValueError(f"未対応のフィードです: {feed}（{', '.join(FEEDS)}）")
+        self.session = session
+        self.store = CurveStore(directory)
+        self.base_url = base_url.rstrip("/")
+        self.feed = feed
+        self.timeout = timeout
+        self.backfill_start_year = backfill_start_year
+        self.cache = cache
+        self.cache_ttl = cache_ttl
+        self.api_calls = 0
+
+    # ---- 取得 -----------------------------------------------------------
+
+    def _request(self, period):
+        """period: "2024"（年）または "202406"（月）"""
+        key = "field_tdr_date_value" if len(period) == 4 else "field_tdr_date_value_month"
+        if self.feed == "csv":
+            url = f"{self.base_url}/daily-treasury-rates.csv/{period}/all"
+            params = {"type": FEED_TYPE, key: period, "page": "", "_format": "csv"}
+        else:
+            url = f"{self.base_url}/pages/xml"
+            params = {"data": FEED_TYPE, key: period}
+        return url, params
+
+    def iter_period(self, period):
+        """
+        period の日次カーブを読み出す
+        年単位はストリーミング、月単位は cache があれば共有キャッシュ経由（TTL 内は再取得しない）
+        """
+        url, params = self._request(period)
+        logger.info(f"米国債利回りカーブ取得: {period} ({self.feed})")
+        if self.cache is not None and len(period) == 6:
+            response = self.cache.get(url, params=params, timeout=self.timeout, ttl=self.cache_ttl)
+            if not getattr(response, "from_cache", False):
+                self.api_calls += 1
+            if self.feed == "csv":
+                # 先頭に BOM が付くことがある
+                yield from iter_csv_rows(response.content.decode("utf-8-sig").splitlines())
+            else:
+                yield from iter_xml_rows([response.content])
+            return
+        with self.session.get(url, params=params, timeout=self.timeout, stream=True) as response:
+            response.raise_for_status()
+            self.api_calls += 1
+            if self.feed == "csv":
+                # 先頭に BOM が付くことがある
+                response.encoding = "utf-8-sig"
+                yield from iter_csv_rows(response.iter_lines(decode_unicode=True))
+            else:
+                yield from iter_xml_rows(response.iter_content(CHUNK_SIZE))
+
+    def ingest_period(self, period):
+        """period を取り込み、新しく保存した日数を返す（1回のリクエストは最大1年分）"""
+        dates, rows = [], []
+        for day, rates in self.iter_period(period):
+            dates.append(day)
+            rows.append(rates)
+        if not dates:
+            return 0
+        return self.store.append(dates, np.vstack(rows))
+
+    def periods(self, today):
+        """最後の保存日から today までを取得するリクエスト単位"""
+        last = self.store.last_date()
+        if last is None:
+            start_year = self.backfill_start_year or today.year
+            return [str(year) for year in range(start_year, today.year + 1)]
+        if last >= today:
+            return []
+        months_behind = (today.year - last.year) * 12 + today.month - last.month
+        if months_behind == 0:
+            return [f"{today:%Y%m}"]
+        if months_behind == 1:
+            return [f"{last:%Y%m}", f"{today:%Y%m}"]
+        return [str(year) for year in range(last.year, today.year + 1)]
+
+    def refresh(self, today=None):
+        """
+        保存済みカーブを最新化して最新日の (date, 利回りの配列) を返す
+        取得に失敗しても保存済みのカーブがあればそれを返す
+        """
+        today = today or date.today()
+        added = 0
+        try:
+            for period in self.periods(today):
+                added += self.ingest_period(period)
+        except (requests.RequestException, ValueError, ET.ParseError) as e:
+            if self.store.last_date() is None:
+                raise
+            logger.warning(f"利回りカーブの取得に失敗したため保存済みの値を使用: {e}")
+        day, rates = self.store.latest()
+        if day is None:
+            raise ValueError("利回りカーブのデータがありません")
+        logger.info(f"利回りカーブ更新完了: 新規 {added}日 (API {self.api_calls}回, 最新 {day})")
+        return day, rates
+
+
+def curve_to_rates(day, rates):
+    """(date, 利回りの配列) を {"10-Year Treasury": {"rate": 4.45, "date": "2024-06-03"}, ...} に変換（NaN は除く）"""
+    return {
+        label: {"rate": float(rate), "date": day.isoformat()}
+        for label, rate in zip(LABELS, rates)
+        if np.isfinite(rate)
+    }
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    parser = argparse.ArgumentParser(description="米国債利回りカーブの取り込み")
+    parser.add_argument("command", choices=["backfill", "refresh"])
+    parser.add_argument("--from-year", type=int, help="backfill: 取り込みを始める年")
+    parser.add_argument("--feed", choices=FEEDS, default="csv")
+    parser.add_argument("--dir", default=DEFAULT_DIRECTORY, help="ストアのディレクトリ")
+    args = parser.parse_args()
+
+    ingestor = CurveIngestor(requests.Session(), args.dir, feed=args.feed, backfill_start_year=args.from_year)
+    started = time.perf_counter()
+    if args.command == "backfill":
+        last = ingestor.store.last_date()
+        first_year = args.from_year or date.today().year
+        if last is not None and last.year > first_year:
+            # 保存済みより古い日は追記できないため、保存済みの年から取り込む
+            logger.info(f"{last} まで保存済みのため {last.year} 年から取り込みます")
+            first_year = last.year
+        for year in range(first_year, date.today().year + 1):
+            ingestor.ingest_period(str(year))
+    day, rates = ingestor.refresh()
+    print(f"{len(ingestor.store)}日保存 ({time.perf_counter() - started:.1f}s, API {ingestor.api_calls}回)")
+    for label, info in curve_to_rates(day, rates).items():
+        print(f"  {label:<20} {info['rate']:.3f}% ({info['date']})")
+
+
+if __name__ == "__main__":
+    main()
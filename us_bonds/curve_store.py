@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+米国債 par yield curve（日次）の追記専用ストア
+
+curve.bin : ヘッダ（magic + 年限数）のあとに固定長レコード
+            （日付の序数 int64 + 年限ごとの利回り float64 × 年限数、欠損は NaN）を日付の昇順に並べる
+
+読み取りは np.memmap で開き、期間の切り出しは日付の二分探索とスライスで行う。
+追記は最後に保存した日付より新しい日だけを末尾に書く。書き込み途中で落ちて
+末尾に半端なレコードが残った場合は、次の追記時に切り詰める。
+
+    python3 curve_store.py info
+"""
+
+import argparse
+import logging
+import os
+from datetime import date
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# (ラベル, 年数, Treasury CSV の列名, Treasury XML の要素名)
+MATURITIES = (
+    ("1-Month", 1 / 12, "1 Mo", "BC_1MONTH"),
+    ("1.5-Month", 1.5 / 12, "1.5 Month", "BC_1_5MONTH"),
+    ("2-Month", 2 / 12, "2 Mo", "BC_2MONTH"),
+    ("3-Month", 3 / 12, "3 Mo", "BC_3MONTH"),
+    ("4-Month", 4 / 12, "4 Mo", "BC_4MONTH"),
+    ("6-Month", 6 / 12, "6 Mo", "BC_6MONTH"),
+    ("1-Year", 1, "1 Yr", "BC_1YEAR"),
+    ("2-Year", 2, "2 Yr", "BC_2YEAR"),
+    ("3-Year", 3, "3 Yr", "BC_3YEAR"),
+    ("5-Year", 5, "5 Yr", "BC_5YEAR"),
+    ("7-Year", 7, "7 Yr", "BC_7YEAR"),
+    ("10-Year", 10, "10 Yr", "BC_10YEAR"),
+    ("20-Year", 20, "20 Yr", "BC_20YEAR"),
+    ("30-Year", 30, "30 Yr", "BC_30YEAR"),
+)
+# 状態ストア・通知で使う銘柄名（"10-Year Treasury" など、従来の3銘柄と同じ形式）
+LABELS = tuple(f"{name} Treasury" for name, *_ in MATURITIES)
+YEARS = np.array([years for _, years, *_ in MATURITIES], dtype=np.float64)
+
+MAGIC = b"YCV1"
+HEADER_DTYPE = np.dtype([("magic", "S4"), ("maturities", "<i4")])
+DEFAULT_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "yield_curve")
+
+
+def record_dtype(maturities=len(MATURITIES)):
+    return np.dtype([("date", "<i8"), ("rates", "<f8", (maturities,))])
+
+
+class CurveStore:
+    def __init__(self, directory=DEFAULT_DIRECTORY, maturities=len(MATURITIES), filename="curve.bin"):
+        """maturities: 1日あたりの値の数（curve_analytics.py の派生値キャッシュでも同じ形式を使う）"""
+        self.directory = directory
+        self.path = os.path.join(directory, filename)
+        self.dtype = record_dtype(maturities)
+        self.maturities = maturities
+
+    # ---- 読み取り -------------------------------------------------------
+
+    def _check_header(self):
+        header = np.fromfile(self.path, dtype=HEADER_DTYPE, count=1)
+        if len(header) < 1 or header["magic"][0] != MAGIC or header["maturities"][0] != self.maturities:
+            raise ValueError(f"{os.path.basename(self.path)} のフォーマットが不正です: {self.path}")
+
+    def __len__(self):
+        if not os.path.exists(self.path):
+            return 0
+        return max(0, os.path.getsize(self.path) - HEADER_DTYPE.itemsize) // self.dtype.itemsize
+
+    def records(self):
+        """全レコード（memmap、読み取り専用）"""
+        count = len(self)
+        if not count:
+            return np.empty(0, dtype=self.dtype)
+        self._check_header()
+        return np.memmap(self.path, dtype=self.dtype, mode="r", offset=HEADER_DTYPE.itemsize, shape=(count,))
+
+    def window(self, start=None, end=None):
+        """
+        [start, end]（date、None は端まで）の日付と利回り
+        戻り値: {"date": datetime64[D] の配列, "rates": (日数, 年限数) の配列}
+        """
+        records = self.records()
+        ordinals = records["date"]
+        lo = 0 if start is None else int(np.searchsorted(ordinals, start.toordinal(), side="left"))
+        hi = len(ordinals) if end is None else int(np.searchsorted(ordinals, end.toordinal(), side="right"))
+        return {"date": ordinals_to_dates(ordinals[lo:hi]), "rates": records["rates"][lo:hi]}
+
+    def last_date(self):
+        """最後に保存した日付（空なら None）"""
+        records = self.records()
+        if not len(records):
+            return None
+        return date.fromordinal(int(records["date"][-1]))
+
+    def latest(self):
+        """最新日の (date, 利回りの配列)。空なら (None, None)"""
+        records = self.records()
+        if not len(records):
+            return None, None
+        return date.fromordinal(int(records["date"][-1])), np.array(records["rates"][-1])
+
+    # ---- 書き込み -------------------------------------------------------
+
+    def append(self, dates, rates):
+        """
+        最後に保存した日付より新しい日だけを日付順に追記し、追記した日数を返す
+        dates: date の列 / rates: (日数, 年限数) の配列。同じ日付が複数あれば後ろを残す
+        """
+        if not len(dates):
+            return 0
+        ordinals = np.array([d.toordinal() for d in dates], dtype=np.int64)
+        rates = np.asarray(rates, dtype=np.float64).reshape(len(ordinals), self.maturities)
+        order = np.argsort(ordinals, kind="stable")
+        ordinals, rates = ordinals[order], rates[order]
+        keep = np.append(ordinals[1:] != ordinals[:-1], True)
+        ordinals, rates = ordinals[keep], rates[keep]
+
+        last = self.last_date()
+        if last is not None:
+            new = ordinals > last.toordinal()
+            ordinals, rates = ordinals[new], rates[new]
+        if not len(ordinals):
+            return 0
+
+        rows = np.empty(len(ordinals), dtype=self.dtype)
+        rows["date"] = ordinals
+        rows["rates"] = rates
+        os.makedirs(self.directory, exist_ok=True)
+        if not os.path.exists(self.path):
+            np.array([(MAGIC, self.maturities)], dtype=HEADER_DTYPE).tofile(self.path)
+        with open(self.path, "r+b") as f:
+            # 前回の書き込み途中で残った半端なレコードを切り詰める
+            f.truncate(HEADER_DTYPE.itemsize + len(self) * self.dtype.itemsize)
+            f.seek(0, os.SEEK_END)
+            f.write(rows.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        return len(rows)
+
+    def clear(self):
+        """全レコードを削除"""
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def ordinals_to_dates(ordinals):
+    """date.toordinal() の配列を datetime64[D] に変換"""
+    epoch = date(1970, 1, 1).toordinal()
+    return (np.asarray(ordinals, dtype=np.int64) - epoch).astype("datetime64[D]")
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    parser = argparse.ArgumentParser(description="米国債 par yield curve のストア")
+    parser.add_argument("command", choices=["info"])
+    parser.add_argument("--dir", default=DEFAULT_DIRECTORY, help="ストアのディレクトリ")
+    args = parser.parse_args()
+
+    store = CurveStore(args.dir)
+    window = store.window()
+    print(f"{args.dir}: {len(window['date'])}日")
+    if len(window["date"]):
+        print(f"  {window['date'][0]} 〜 {window['date'][-1]}")
+        for label, rate in zip(LABELS, window["rates"][-1]):
+            print(f"  {label:<20} {rate:.3f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,8 +3,24 @@ import json
 import time
 from datetime import datetime, timedelta, timezone
 import os
+import sys
 import logging
 
+import numpy as np
+
+# 共通モジュール（/home/opc/common）を参照できるようにする
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common import metrics
+from common.http_cache import HttpCache
+from common.log_index import LogIndex
+from common.notifier import Notifier
+from common.state_store import StateStore, legacy_bond_states, load_json
+
+from bond_watchlist import BondWatchlist
+from curve_analytics import SPREADS, CurveAnalytics
+from curve_ingest import BASE_URL as TREASURY_URL, DEFAULT_CACHE_TTL_SECONDS, CurveIngestor, curve_to_rates
+from curve_store import DEFAULT_DIRECTORY as CURVE_DIRECTORY
+
 
 def load_config():
     """設定ファイルを読み込み"""
@@ -18,6 +34,7 @@ def load_config():
 
 # 設定読み込み
 config = load_config()
+metrics.configure(config)
 
 # ログ設定
 logging.basicConfig(
@@ -31,81 +48,119 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 # 設定から値を取得
-SAVE_FILE = config["us_bonds"]["monitoring"]["save_file"]
-PUSHOVER_USER_KEY = config["pushover"]["user_key"]
-PUSHOVER_API_TOKEN = config["pushover"]["api_token"]
+SAVE_FILE = config["us_bonds"]["monitoring"]["save_file"]  # 状態ストア導入前の状態ファイル（移行元）
+STATE_NAMESPACE = "us_bonds"
+state_store = StateStore.from_config(config)
+# Pushover 通知（キューに積んでバックグラウンドで送信・再送）
+notifier = Notifier.from_config(config)
+
+# HTTP セッション（常駐モードでは実行間で接続を再利用）
+session = requests.Session()
+# 上流APIレスポンスの共有キャッシュ（月単位の利回りカーブフィード）
+http_cache = HttpCache.from_config(config, session)
+
+# Treasury.gov の利回りカーブ（日次・1ヶ月〜30年）の差分取り込み
+treasury_config = config["us_bonds"].get("treasury", {})
+ingestor = CurveIngestor(
+    session,
+    directory=treasury_config.get("data_dir", CURVE_DIRECTORY),
+    base_url=treasury_config.get("base_url", TREASURY_URL),
+    feed=treasury_config.get("feed", "csv"),
+    timeout=treasury_config.get("timeout_seconds", 30),
+    backfill_start_year=treasury_config.get("backfill_start_year"),
+    cache=http_cache,
+    cache_ttl=treasury_config.get("cache_ttl_seconds", DEFAULT_CACHE_TTL_SECONDS),
+)
+# スプレッド・逆イールド・補間（日ごとの結果は利回りカーブと同じ場所にキャッシュ）
+analytics = CurveAnalytics(ingestor.store)
 
 
-# 米国債金利取得API (FRED API使用)
+# 米国債金利取得（Treasury.gov の Daily Treasury Par Yield Curve Rates）
 def get_us_treasury_rates():
-    """米国債金利データを取得"""
+    """米国債金利データ（最新日の全年限）を取得"""
     try:
-        # FRED APIの無料エンドポイント
-        rates_data = {}
-
-        # 簡単な債券データ（固定値でテスト）
         logger.info("米国債金利データを取得中...")
-
-        # 実際のAPIが利用できない場合の代替手段
-        # Treasury.govのデータを手動で設定
-        current_date = datetime.now().strftime("%Y-%m-%d")
-
-        # サンプルデータ（実際の運用では実APIを使用）
-        rates_data = {
-            "2-Year Treasury": {"rate": 4.25, "date": current_date},
-            "10-Year Treasury": {"rate": 4.45, "date": current_date},
-            "30-Year Treasury": {"rate": 4.65, "date": current_date},
-        }
+        with metrics.stage(STATE_NAMESPACE, "fetch"):
+            rates_data = curve_to_rates(*ingestor.refresh())
 
         for bond_type, info in rates_data.items():
             logger.info(f"{bond_type}: {info['rate']}% ({info['date']})")
 
         return rates_data
     except Exception as e:
+        metrics.count(STATE_NAMESPACE, "api_errors", api="treasury")
         logger.error(f"APIリクエストエラー: {e}")
         raise
 
 
 # 前回保存データの読み込み
 def load_previous_data():
-    if not os.path.exists(SAVE_FILE):
-        return None
-    with open(SAVE_FILE, "r") as f:
-        return json.load(f)
-
-
-# 債券データ保存
-def save_bonds_data(data, cooldown=None, above_absolute_threshold=None):
-    payload = {
-        "data": data,
+    with metrics.stage(STATE_NAMESPACE, "state_load"):
+        states = state_store.get_all(STATE_NAMESPACE)
+        if not states:
+            # 状態ストア導入前の JSON ファイルから引き継ぎ
+            states = legacy_bond_states(load_json(SAVE_FILE))
+    return states
+
+
+# 債券データ保存（金利・cooldown・state を1トランザクションで更新）
+def save_bonds_data(data, cooldown=None, above_absolute_threshold=None, curve_inverted=None):
+    values = {
+        "rates": data,
         "timestamp": datetime.now(timezone.utc).isoformat(),
     }
     if cooldown is not None:
-        payload["cooldown"] = cooldown
+        values["cooldown"] = cooldown
     if above_absolute_threshold is not None:
-        payload["above_absolute_threshold"] = above_absolute_threshold
-    with open(SAVE_FILE, "w") as f:
-        json.dump(payload, f, indent=2)
+        values["above_absolute_threshold"] = above_absolute_threshold
+    if curve_inverted is not None:
+        values["curve_inverted"] = curve_inverted
+    with metrics.stage(STATE_NAMESPACE, "state_save"):
+        state_store.set_many(STATE_NAMESPACE, values)
 
 
 # Pushover通知送信
-def send_notification(message, title="🏦 米国債金利通知"):
+def send_notification(message, title="🏦 米国債金利通知", priority="alert"):
+    logger.info(f"通知送信: {message}")
+    with metrics.stage(STATE_NAMESPACE, "notify"):
+        notifier.notify(message, title, source=STATE_NAMESPACE, priority=priority)
+    metrics.count(STATE_NAMESPACE, "notifications", priority=priority)
+
+
+# イールドカーブのサマリー（分析キャッシュの最新日）
+def get_curve_summary():
+    """スプレッド・逆イールドの継続日数・傾き・曲率"""
     try:
-        logger.info(f"通知送信: {message}")
-        response = requests.post(
-            "https://api.pushover.net/1/messages.json",
-            data={
-                "token": PUSHOVER_API_TOKEN,
-                "user": PUSHOVER_USER_KEY,
-                "message": message,
-                "title": title,
-            },
-            timeout=30,
-        )
-        response.raise_for_status()
-        logger.info("通知送信成功")
+        analytics.update()
+        curve = analytics.latest()
+        if not curve:
+            return "📈 カーブ分析のデータがありません"
+        lines = [f"📈 イールドカーブ（{curve['date']}）:"]
+        for name in SPREADS:
+            spread = curve[f"spread_{name}"]
+            if np.isnan(spread):
+                continue
+            line = f"• {name}: {spread * 100:+.0f}bp"
+            events = analytics.inversions(name)
+            if events and events[-1]["end"] is None:
+                line += f"（逆イールド {events[-1]['days']}営業日目）"
+            lines.append(line)
+        lines.append(f"• 傾き(10年-3ヶ月): {curve['slope'] * 100:+.0f}bp / 曲率: {curve['curvature'] * 100:+.0f}bp")
+        return "\n".join(lines)
     except Exception as e:
-        logger.error(f"通知送信エラー: {e}")
+        logger.error(f"カーブ分析エラー: {e}")
+        return "📈 カーブ分析中にエラーが発生しました"
+
+
+def inversion_message(name, spread, events):
+    """逆イールドの発生・解消の通知本文"""
+    if spread < 0:
+        return f"🔀 {name} が逆イールドに\n現在: {spread * 100:+.0f}bp"
+    message = f"✅ {name} の逆イールドが解消"
+    if events and events[-1]["end"] is not None:
+        last = events[-1]
+        message += f"（{last['start']} から {last['days']}営業日、最大 {last['min'] * 100:+.0f}bp）"
+    return message + f"\n現在: {spread * 100:+.0f}bp"
 
 
 # 昨日の金利変動サマリーを取得
@@ -119,19 +174,15 @@ def get_yesterday_summary():
         if not os.path.exists(log_file):
             return "📊 昨日のログファイルが見つかりません"
 
-        with open(log_file, "r") as f:
-            log_content = f.read()
-
-        yesterday_logs = [
-            line
-            for line in log_content.split("\n")
-            if yesterday_str in line and "Treasury:" in line
-        ]
+        # 日付インデックスで昨日の件数だけを引く（ログ全体は読まない）
+        index = LogIndex(log_file, {"treasury": "Treasury:"})
+        index.update()
+        count = index.counts(yesterday_str)["treasury"]
 
-        if not yesterday_logs:
+        if not count:
             return f"📊 昨日({yesterday_str})の金利データが見つかりません"
 
-        return f"📊 昨日({yesterday_str})の金利データ: {len(yesterday_logs)}件記録"
+        return f"📊 昨日({yesterday_str})の金利データ: {count}件記録"
 
     except Exception as e:
         logger.error(f"昨日のサマリー取得エラー: {e}")
@@ -163,6 +214,8 @@ def send_morning_report():
 
         report_message += f"""
 
+{get_curve_summary()}
+
 {yesterday_summary}
 
 設定:
@@ -171,7 +224,7 @@ def send_morning_report():
 
 今日も金利を監視します！"""
 
-        send_notification(report_message, "🌅 米国債金利 朝のレポート")
+        send_notification(report_message, "🌅 米国債金利 朝のレポート", priority="report")
         logger.info("朝の定期レポート送信完了")
 
     except Exception as e:
@@ -182,10 +235,11 @@ def send_morning_report():
 # メイン処理
 def check_us_bonds(absolute_threshold=None, volatility_threshold=None):
     """
-    米国債金利を 2 軸で判定:
+    米国債金利を 3 軸で判定:
     1) ボラ型: |Δ%| が volatility_threshold 以上 → 通知（cooldown あり）
     2) state transition: 10 年債が absolute_threshold を「跨いだ」ときだけ通知
        （超え続けている間は鳴らない）
+    3) state transition: 2s10s / 3m10y スプレッドが逆イールドになった・解消したときだけ通知
     """
     monitoring_config = config["us_bonds"]["monitoring"]
     if absolute_threshold is None:
@@ -198,39 +252,44 @@ def check_us_bonds(absolute_threshold=None, volatility_threshold=None):
         logger.info("米国債金利チェック開始")
         current_data = get_us_treasury_rates()
         previous = load_previous_data() or {}
-        previous_rates = previous.get("data") or {}
+        previous_rates = previous.get("rates") or {}
         cooldown_state = previous.get("cooldown") or {}
 
         notifications = []
+        transitions = []
         new_cooldown_state = dict(cooldown_state)
         now_ts = int(time.time())
 
-        # 1) ボラ型判定（全銘柄）
-        for bond_type, info in current_data.items():
-            current_rate = info["rate"]
-            prev_info = previous_rates.get(bond_type) or {}
-            previous_rate = prev_info.get("rate")
-            if previous_rate is None or previous_rate == 0:
+        # 1) ボラ型判定（全年限を配列で一括判定）
+        watchlist = BondWatchlist(volatility_threshold, cooldown_seconds, monitoring_config.get("maturities"))
+        current = watchlist.rate_column(current_data)
+        previous_column = watchlist.rate_column(previous_rates)
+        with metrics.stage(STATE_NAMESPACE, "evaluate"):
+            result = watchlist.evaluate(
+                current, previous_column, watchlist.cooldown_column(cooldown_state), now_ts
+            )
+        for i, bond_type in enumerate(watchlist.labels):
+            if np.isnan(current[i]):
+                continue
+            if not result["valid"][i]:
                 logger.info(f"{bond_type}: 初回 or 0 値、ボラ判定スキップ")
                 continue
-            delta_pct = (current_rate - previous_rate) / previous_rate
+            current_rate, previous_rate, delta_pct = current[i], previous_column[i], result["change"][i]
             logger.info(
                 f"{bond_type}: prev={previous_rate:.3f}%, curr={current_rate:.3f}%, Δ={delta_pct:.2%}"
             )
-            if abs(delta_pct) < volatility_threshold:
-                continue
-            last_ts = cooldown_state.get(bond_type)
-            if last_ts and (now_ts - last_ts) < cooldown_seconds:
+            if result["suppressed"][i]:
+                metrics.count(STATE_NAMESPACE, "cooldown_suppressed")
                 logger.info(
-                    f"{bond_type}: 閾値超過だが cooldown 中 (前回通知から {now_ts - last_ts}s) - スキップ"
+                    f"{bond_type}: 閾値超過だが cooldown 中 (前回通知から {now_ts - int(cooldown_state[bond_type])}s) - スキップ"
                 )
-                continue
-            direction = "上昇" if delta_pct > 0 else "下落"
-            notifications.append(
-                f"🚨 {bond_type}が{direction}：{delta_pct:.2%}変動\n"
-                f"現在: {current_rate:.3f}% (前回: {previous_rate:.3f}%)"
-            )
-            new_cooldown_state[bond_type] = now_ts
+            elif result["notify"][i]:
+                direction = "上昇" if delta_pct > 0 else "下落"
+                notifications.append(
+                    f"🚨 {bond_type}が{direction}：{delta_pct:.2%}変動\n"
+                    f"現在: {current_rate:.3f}% (前回: {previous_rate:.3f}%)"
+                )
+                new_cooldown_state[bond_type] = now_ts
 
         # 2) state transition: 10 年債が absolute_threshold を跨いだか
         if "10-Year Treasury" in current_data:
@@ -244,18 +303,35 @@ def check_us_bonds(absolute_threshold=None, volatility_threshold=None):
                 logger.info(f"10年債 state transition 初期化: above_5pct={curr_above}")
             elif curr_above != prev_above:
                 event = "突破" if curr_above else "割り込み"
-                notifications.append(
+                transitions.append(
                     f"📊 10年国債が {absolute_threshold:.1f}% を{event}\n"
                     f"現在: {curr_10y:.3f}%"
                     + (f" (前回: {prev_10y:.3f}%)" if prev_10y is not None else "")
                 )
             previous["above_absolute_threshold"] = curr_above
 
-        # 通知送信
+        # 3) state transition: 2s10s / 3m10y が逆イールドになった・解消したか
+        analytics.update()
+        curve = analytics.latest()
+        curve_inverted = dict(previous.get("curve_inverted") or {})
+        for name in SPREADS:
+            spread = curve.get(f"spread_{name}", np.nan)
+            if np.isnan(spread):
+                continue
+            curr_inverted = bool(spread < 0)
+            prev_inverted = curve_inverted.get(name)
+            if prev_inverted is None:
+                logger.info(f"{name} 逆イールド state 初期化: inverted={curr_inverted}")
+            elif curr_inverted != prev_inverted:
+                transitions.append(inversion_message(name, spread, analytics.inversions(name)))
+            curve_inverted[name] = curr_inverted
+
+        # 通知送信（state transition はボラ型アラートより優先して送る）
+        if transitions:
+            send_notification("\n\n".join(transitions), "🏦 米国債金利アラート", priority="transition")
         if notifications:
-            full_message = "\n\n".join(notifications)
-            send_notification(full_message, "🏦 米国債金利アラート")
-        else:
+            send_notification("\n\n".join(notifications), "🏦 米国債金利アラート")
+        if not transitions and not notifications:
             logger.info("発火条件未達のため通知なし")
 
         # 保存（cooldown / state を引き継ぎ）
@@ -263,6 +339,7 @@ def check_us_bonds(absolute_threshold=None, volatility_threshold=None):
             current_data,
             cooldown=new_cooldown_state,
             above_absolute_threshold=previous.get("above_absolute_threshold"),
+            curve_inverted=curve_inverted,
         )
         logger.info("米国債金利チェック完了")
 
@@ -272,8 +349,6 @@ def check_us_bonds(absolute_threshold=None, volatility_threshold=None):
 
 
 if __name__ == "__main__":
-    import sys
-
     # コマンドライン引数のチェック
     if len(sys.argv) > 1 and sys.argv[1] == "--morning-report":
         send_morning_report()